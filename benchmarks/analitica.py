@@ -0,0 +1,85 @@
+"""
+Benchmark de la analítica de ventas sobre líneas sintéticas.
+
+Compara las métricas calculadas con diccionarios en Python (recorriendo las
+líneas una a una) con las de `AnaliticaVentas` sobre columnas de NumPy.
+
+Uso:
+    python benchmarks/analitica.py [--lineas 1000000] [--productos 5000]
+
+No requiere base de datos: las líneas se generan en memoria.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+raiz = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, raiz)
+sys.path.insert(0, os.path.join(raiz, 'src'))
+
+from modulos.analitica import AnaliticaVentas
+
+
+def generar(lineas, productos, semilla=0):
+    """Genera columnas de líneas de venta con una demanda sesgada entre productos."""
+    rng = np.random.default_rng(semilla)
+    venta_id = np.sort(rng.integers(1, lineas // 3 + 2, lineas))
+    producto_id = (rng.zipf(1.3, lineas) % productos) + 1
+    cantidad = rng.integers(1, 6, lineas)
+    precio = np.round(rng.uniform(100, 10000, lineas), 2)
+    fecha = np.sort(rng.integers(1_700_000_000, 1_730_000_000, lineas))
+    stock = {i: int(s) for i, s in enumerate(rng.integers(0, 500, productos), start=1)}
+    return venta_id, producto_id, cantidad, precio, fecha, stock
+
+
+def con_diccionarios(filas, stock, n=10):
+    """Ruta de referencia: agrupa recorriendo cada línea en Python."""
+    ingresos, unidades, canastas = {}, {}, {}
+    for fila in filas:
+        producto = fila['producto_id']
+        ingresos[producto] = ingresos.get(producto, 0.0) + fila['cantidad'] * fila['precio']
+        unidades[producto] = unidades.get(producto, 0) + fila['cantidad']
+        canastas[fila['venta_id']] = canastas.get(fila['venta_id'], 0) + fila['cantidad']
+    orden = sorted(ingresos, key=ingresos.get, reverse=True)
+    total = sum(ingresos.values())
+    acumulado, clases = 0.0, {}
+    for producto in orden:
+        clases[producto] = 'A' if acumulado < 0.8 * total else 'B' if acumulado < 0.95 * total else 'C'
+        acumulado += ingresos[producto]
+    tasas = {p: unidades.get(p, 0) / (unidades.get(p, 0) + s) if unidades.get(p, 0) + s else 0.0
+             for p, s in stock.items()}
+    tamanos = sorted(canastas.values())
+    return orden[:n], clases, sorted(tasas, key=tasas.get, reverse=True)[:n], tamanos[len(tamanos) // 2]
+
+
+def medir(funcion):
+    inicio = time.perf_counter()
+    funcion()
+    return time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--lineas', type=int, default=1_000_000)
+    parser.add_argument('--productos', type=int, default=5000)
+    args = parser.parse_args()
+
+    venta_id, producto_id, cantidad, precio, fecha, stock = generar(args.lineas, args.productos)
+    filas = [{'venta_id': v, 'producto_id': p, 'cantidad': c, 'precio': pr}
+             for v, p, c, pr in zip(venta_id.tolist(), producto_id.tolist(), cantidad.tolist(), precio.tolist())]
+    analitica = AnaliticaVentas(venta_id, producto_id, cantidad, precio, fecha, stock)
+
+    anterior = medir(lambda: con_diccionarios(filas, stock))
+    actual = medir(analitica.resumen)
+
+    print(f"Analítica de {args.lineas} líneas y {args.productos} productos (s)")
+    print(f"{'ruta':<20}{'tiempo':>10}")
+    for nombre, tiempo in (('diccionarios', anterior), ('numpy', actual)):
+        print(f"{nombre:<20}{tiempo:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark de lecturas con `fetch_all` sobre 10.000 filas.
+
+Compara la ruta de lectura anterior (transacción implícita + COMMIT después de
+cada SELECT) con la actual (conexión en autocommit, sin COMMIT).
+
+Uso:
+    python benchmarks/lecturas.py [--filas 10000] [--repeticiones 200]
+
+Requiere una base de datos PostgreSQL accesible con la configuración de
+`database_config` (variables DB_HOST, DB_NAME, DB_USER, DB_PASSWORD, DB_PORT).
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+raiz = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, raiz)
+sys.path.insert(0, os.path.join(raiz, 'src'))
+
+from database.postgres_database import PostgresDatabase
+from database.database_config import CURRENT_CONFIG
+
+CONSULTA = "SELECT id, nombre, precio FROM benchmark_lecturas"
+
+
+def preparar(db, filas):
+    cursor = db.connection.cursor()
+    cursor.execute("""
+        CREATE TEMP TABLE benchmark_lecturas AS
+        SELECT g AS id, md5(g::text) AS nombre, (g % 1000)::numeric(10,2) AS precio
+        FROM generate_series(1, %s) AS g
+    """, (filas,))
+    cursor.close()
+
+
+def lectura_con_commit(db):
+    """Reproduce la ruta anterior: SELECT dentro de una transacción y COMMIT."""
+    cursor = db.connection.cursor()
+    cursor.execute(CONSULTA)
+    db.connection.commit()
+    resultado = cursor.fetchall()
+    cursor.close()
+    return resultado
+
+
+def medir(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    tiempos.sort()
+    return {
+        'media': statistics.mean(tiempos),
+        'p50': tiempos[len(tiempos) // 2],
+        'p95': tiempos[int(len(tiempos) * 0.95) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--filas', type=int, default=10000)
+    parser.add_argument('--repeticiones', type=int, default=200)
+    args = parser.parse_args()
+
+    db = PostgresDatabase(CURRENT_CONFIG)
+    db.connect()
+    try:
+        preparar(db, args.filas)
+
+        db.connection.autocommit = False
+        anterior = medir(lambda: lectura_con_commit(db), args.repeticiones)
+        db.connection.autocommit = True
+        actual = medir(lambda: db.fetch_all(CONSULTA), args.repeticiones)
+    finally:
+        db.disconnect()
+        db.pool.cerrar()
+
+    print(f"fetch_all de {args.filas} filas, {args.repeticiones} repeticiones (ms)")
+    print(f"{'ruta':<20}{'media':>10}{'p50':>10}{'p95':>10}")
+    for nombre, tiempos in (('con COMMIT', anterior), ('autocommit', actual)):
+        print(f"{nombre:<20}{tiempos['media']:>10.3f}{tiempos['p50']:>10.3f}{tiempos['p95']:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Benchmark del cálculo de reabastecimiento de todo el catálogo.
+
+Mide el lote completo (demanda EWMA de cada producto y puntos de pedido) y la
+actualización incremental por venta sobre líneas sintéticas.
+
+Uso:
+    python benchmarks/reabastecimiento.py [--lineas 1000000] [--productos 20000] [--dias 180]
+
+No requiere base de datos: las líneas se generan en memoria.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+raiz = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, raiz)
+sys.path.insert(0, os.path.join(raiz, 'src'))
+
+from modulos.reabastecimiento import MotorReabastecimiento
+
+HOY = datetime(2025, 6, 30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--lineas', type=int, default=1_000_000)
+    parser.add_argument('--productos', type=int, default=20000)
+    parser.add_argument('--dias', type=int, default=180)
+    parser.add_argument('--ventas', type=int, default=10000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    fin = int((HOY - datetime(1970, 1, 1)).total_seconds())
+    producto_id = (rng.zipf(1.3, args.lineas) % args.productos) + 1
+    cantidad = rng.integers(1, 6, args.lineas)
+    fecha = rng.integers(fin - args.dias * 86400, fin, args.lineas)
+    catalogo = [{'id': i, 'nombre': f'producto {i}', 'cantidad': int(s), 'stock_minimo': 5}
+                for i, s in enumerate(rng.integers(0, 500, args.productos), start=1)]
+
+    inicio = time.perf_counter()
+    motor = MotorReabastecimiento.desde_columnas(producto_id, cantidad, fecha, HOY,
+                                                 ids=(p['id'] for p in catalogo))
+    sugerencias = motor.sugerencias(catalogo, fecha=HOY)
+    lote = time.perf_counter() - inicio
+
+    ventas = rng.integers(1, args.productos + 1, args.ventas)
+    inicio = time.perf_counter()
+    for producto in ventas.tolist():
+        motor.registrar_venta([(producto, 1)], HOY)
+    incremental = (time.perf_counter() - inicio) / args.ventas * 1e6
+
+    print(f"{args.lineas} líneas, {args.productos} productos, {args.dias} días")
+    print(f"lote completo: {lote:.3f} s ({len(sugerencias)} productos a reponer)")
+    print(f"venta incremental: {incremental:.1f} µs")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,12 +3,15 @@ from modelos.producto import Producto
 from modelos.usuario import Usuario
 from modulos.gestor_usuarios import GestorUsuarios
 from modulos.tienda import Tienda
+from modulos.importador import ImportadorProductos
+from modulos.analitica import AnaliticaVentas
 from errores.usuario_no_encontrado import UsuarioNoEncontradoError
 from modelos.venta import Venta
 from errores import *
 from datetime import datetime
 import os
 from database.database_interface import DatabaseInterface
+from database.instrumentacion import medir_accion
 
 
 class ConsoleUI:
@@ -40,7 +43,9 @@ class ConsoleUI:
         print("2. Eliminar producto")
         print("3. Actualizar stock")
         print("4. Inventario")
-        print("5. Volver al menú principal")
+        print("5. Importar productos (CSV/JSON)")
+        print("6. Sugerencias de reabastecimiento")
+        print("7. Volver al menú principal")
         return input("\n📌 Seleccione una opción: ").strip()
 
     def _menu_usuarios(self):
@@ -64,7 +69,11 @@ class ConsoleUI:
                 self._actualizar_stock()
             elif op == "4":  # Mostrar inventario
                 self._mostrar_inventario()
-            elif op == "5":
+            elif op == "5":  # Importar productos
+                self._importar_productos()
+            elif op == "6":  # Reabastecimiento
+                self._mostrar_reabastecimiento()
+            elif op == "7":
                 break
             else:
                 self._mostrar_error("Opción inválida")
@@ -85,6 +94,7 @@ class ConsoleUI:
             else:
                 self._mostrar_error("Opción inválida")
 
+    @medir_accion('cli.agregar_producto')
     def _agregar_producto(self):
         try:
             self._mostrar_titulo("nuevo producto")
@@ -102,6 +112,28 @@ class ConsoleUI:
             print(f"\n❌ Error: {str(e)}")
         self._esperar_continuar()
 
+    @medir_accion('cli.importar_productos')
+    def _importar_productos(self):
+        try:
+            self._mostrar_titulo("importar productos")
+            ruta = input("Ruta del archivo (.csv, .json o .ndjson): ").strip()
+            resultado = ImportadorProductos(self.inventario.db).importar_archivo(ruta)
+            self.mostrar_resultado_importacion(resultado)
+        except Exception as e:
+            print(f"\n❌ Error: {str(e)}")
+        self._esperar_continuar()
+
+    @staticmethod
+    def mostrar_resultado_importacion(resultado, max_errores=20):
+        print(f"\n✅ {resultado['importadas']} productos importados de {resultado['procesadas']} filas.")
+        if resultado['errores']:
+            print(f"⚠️ {len(resultado['errores'])} filas con errores:")
+            for error in resultado['errores'][:max_errores]:
+                print(f"   Fila {error['fila']}: {error['error']}")
+            if len(resultado['errores']) > max_errores:
+                print(f"   ... y {len(resultado['errores']) - max_errores} más")
+
+    @medir_accion('cli.eliminar_producto')
     def _eliminar_producto(self):
         try:
             self._mostrar_titulo("eliminar producto")
@@ -115,6 +147,7 @@ class ConsoleUI:
                 print(f"\n❌ Error: {msg}")
         self._esperar_continuar()
 
+    @medir_accion('cli.actualizar_stock')
     def _actualizar_stock(self):
         try:
             self._mostrar_titulo("actualizar stock")
@@ -125,6 +158,7 @@ class ConsoleUI:
             print(f"\n❌ Error: {str(e)}")
         self._esperar_continuar()
 
+    @medir_accion('cli.mostrar_inventario')
     def _mostrar_inventario(self):
         try:
             self._mostrar_titulo("inventario completo")
@@ -148,6 +182,26 @@ class ConsoleUI:
             print(f"\n❌ Error: {str(e)}")
         self._esperar_continuar()
 
+    @medir_accion('cli.mostrar_reabastecimiento')
+    def _mostrar_reabastecimiento(self):
+        self._limpiar_pantalla()
+        self._mostrar_titulo("reabastecimiento")
+        try:
+            sugerencias = self.tienda.sugerencias_reabastecimiento()
+        except Exception as e:
+            self._mostrar_error(str(e))
+            self._esperar_continuar()
+            return
+        if not sugerencias:
+            print("\n✅ Ningún producto llegó a su punto de pedido.")
+        for s in sugerencias:
+            print(f"\n📦 {s['nombre']} (ID {s['producto_id']})")
+            print(f"   Stock: {s['stock']} | Punto de pedido: {s['punto_pedido']} (mínimo {s['stock_minimo']})")
+            print(f"   Demanda diaria: {s['demanda_diaria']:.1f} ± {s['desviacion']:.1f} | "
+                  f"Pedir: {s['cantidad_sugerida']} u.")
+        self._esperar_continuar()
+
+    @medir_accion('cli.crear_usuario')
     def _crear_usuario(self):
         try:
             self._mostrar_titulo("nuevo usuario")
@@ -162,6 +216,7 @@ class ConsoleUI:
             print(f"\n❌ Error: {str(e)}")
         self._esperar_continuar()
 
+    @medir_accion('cli.eliminar_usuario')
     def _eliminar_usuario(self):
         try:
             self._mostrar_titulo("eliminar usuario")
@@ -175,6 +230,7 @@ class ConsoleUI:
                 print(f"\n❌ Error: {msg}")
         self._esperar_continuar()
 
+    @medir_accion('cli.listar_usuarios')
     def _listar_usuarios(self):
         try:
             self._mostrar_titulo("usuarios registrados")
@@ -188,6 +244,7 @@ class ConsoleUI:
             print(f"\n❌ Error: {str(e)}")
         self._esperar_continuar()
 
+    @medir_accion('cli.registrar_venta')
     def _registrar_venta(self):
         try:
             self._mostrar_titulo("nueva venta")
@@ -259,6 +316,7 @@ class ConsoleUI:
             print(f"\n❌ Error crítico: {str(e)}")
         self._esperar_continuar()
 
+    @medir_accion('cli.mostrar_historial_ventas')
     def _mostrar_historial_ventas(self):
         while True:
             self._limpiar_pantalla()
@@ -276,18 +334,45 @@ class ConsoleUI:
                     print(f"👤 Empleado ID: {venta['empleado']}")
                     print("-" * 50)
             print("\n1. Borrar historial de ventas")
-            print("2. Volver al menú principal")
+            print("2. Análisis de ventas")
+            print("3. Volver al menú principal")
             op = input("\nSeleccione una opción: ").strip()
             if op == "1":
                 mensaje = self.tienda.borrar_historial_ventas()
                 print(f"\n✅ {mensaje}")
                 self._esperar_continuar()
             elif op == "2":
+                self._mostrar_analitica()
+            elif op == "3":
                 break
             else:
                 print("\n❌ Opción inválida")
                 self._esperar_continuar()
 
+    @medir_accion('cli.mostrar_analitica')
+    def _mostrar_analitica(self):
+        self._limpiar_pantalla()
+        self._mostrar_titulo("análisis de ventas")
+        try:
+            resumen = AnaliticaVentas.desde_base(self.inventario.db).resumen()
+        except Exception as e:
+            self._mostrar_error(str(e))
+            self._esperar_continuar()
+            return
+        print("\n🏆 Productos con más ingresos:")
+        for p in resumen['top']:
+            print(f"   - {p['nombre'] or p['producto_id']}: {p['cantidad']} u. / ${int(p['ingresos']):,}")
+        print("\n🔤 Clasificación ABC:")
+        for clase, datos in resumen['abc'].items():
+            print(f"   {clase}: {datos['productos']} productos, {datos['participacion']:.0%} de los ingresos")
+        print("\n📈 Mayor tasa de venta:")
+        for p in resumen['tasa_venta']:
+            print(f"   - {p['nombre'] or p['producto_id']}: {p['tasa']:.0%} ({p['vendidas']} vendidas, {p['stock']} en stock)")
+        canasta = resumen['canasta']
+        print(f"\n🧺 Canasta: {canasta['ventas']} ventas, media {canasta['media']:.1f} u., "
+              f"mediana {canasta['mediana']:.0f} u., p90 {canasta['p90']:.0f} u.")
+        self._esperar_continuar()
+
     def _mostrar_error(self, mensaje):
         print(f"\n❌ Error: {mensaje}")
 
@@ -1,14 +1,34 @@
+import sys
 from cli.consoleui import ConsoleUI
 from src.database.postgres_database import PostgresDatabase
+from src.database.cached_database import CachedDatabase
+from src.database.notificaciones import CanalPostgres
 from src.database.database_config import CURRENT_CONFIG
 from src.modelos.inventario import Inventario
 from src.modulos.gestor_usuarios import GestorUsuarios
+from src.modulos.importador import ImportadorProductos
+
+USO = "Uso: python cli_main.py [importar <archivo.csv|archivo.json|archivo.ndjson>]"
 
 if __name__ == "__main__":
-    db = PostgresDatabase(CURRENT_CONFIG)
+    db = CachedDatabase(PostgresDatabase(CURRENT_CONFIG))
     db.connect()
     db.create_tables()
-    inventario = Inventario(db)
-    gestor_usuarios = GestorUsuarios(db)
-    app = ConsoleUI(inventario, gestor_usuarios)
-    app.ejecutar()
\ No newline at end of file
+    try:
+        if len(sys.argv) > 1:
+            # Modo comando: importación masiva sin entrar al menú interactivo
+            if sys.argv[1] != "importar" or len(sys.argv) != 3:
+                sys.exit(USO)
+            resultado = ImportadorProductos(db).importar_archivo(sys.argv[2])
+            ConsoleUI.mostrar_resultado_importacion(resultado)
+            sys.exit(1 if resultado['errores'] else 0)
+        notificaciones = CanalPostgres(CURRENT_CONFIG)
+        db.escuchar(notificaciones)
+        notificaciones.iniciar()
+        inventario = Inventario(db)
+        gestor_usuarios = GestorUsuarios(db)
+        app = ConsoleUI(inventario, gestor_usuarios)
+        app.ejecutar()
+    finally:
+        db.disconnect()
+        db.pool.cerrar()
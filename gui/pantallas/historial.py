@@ -7,6 +7,7 @@ Contiene la pantalla que muestra un listado detallado de todas las transacciones
 from kivy.uix.screenmanager import Screen
 from kivy.properties import ObjectProperty
 from kivy.metrics import dp
+from database.instrumentacion import medir_accion
 
 
 class HistorialScreen(Screen):
@@ -19,6 +20,7 @@ class HistorialScreen(Screen):
 
     tienda = ObjectProperty(None)
 
+    @medir_accion('gui.HistorialScreen.on_pre_enter')
     def on_pre_enter(self):
         """
         Actualiza la lista de ventas al entrar a la pantalla.
@@ -83,6 +85,7 @@ class HistorialScreen(Screen):
             "------------------------------"
         )
 
+    @medir_accion('gui.HistorialScreen.borrar_historial')
     def borrar_historial(self):
         try:
             mensaje = self.tienda.borrar_historial_ventas()
@@ -14,6 +14,7 @@ from kivy.uix.popup import Popup
 from kivy.uix.label import Label
 from kivy.properties import ObjectProperty
 from src.modelos.producto import Producto
+from database.instrumentacion import medir_accion
 
 
 class ProductosMenuScreen(Screen):
@@ -148,6 +149,7 @@ class ActualizarStockScreen(Screen):
         """Carga la lista de productos al entrar en la pantalla."""
         self.cargar_productos()
 
+    @medir_accion('gui.ActualizarStockScreen.cargar_productos')
     def cargar_productos(self):
         """Carga la lista de productos en el RecycleView"""
         try:
@@ -178,6 +180,7 @@ class ActualizarStockScreen(Screen):
         except Exception as e:
             print(f"Error al obtener producto: {str(e)}")
 
+    @medir_accion('gui.ActualizarStockScreen.actualizar_stock')
     def actualizar_stock(self):
         """Actualiza el stock del producto seleccionado"""
         try:
@@ -281,6 +284,7 @@ class VerInventarioScreen(Screen):
     """
     inventario = ObjectProperty(None)
 
+    @medir_accion('gui.VerInventarioScreen.on_pre_enter')
     def on_pre_enter(self):
         """Prepara los datos del inventario antes de mostrar la pantalla."""
         productos = self.inventario.db.get_all_products()
@@ -4,6 +4,7 @@ from kivy.uix.label import Label
 from kivy.properties import ObjectProperty, ListProperty
 from datetime import datetime
 from src.modelos.venta import Venta
+from database.instrumentacion import medir_accion
 
 
 class VentasScreen(Screen):
@@ -25,6 +26,7 @@ class VentasScreen(Screen):
         """Inicializa los campos al entrar a la pantalla"""
         self.resetear_campos()
 
+    @medir_accion('gui.VentasScreen.cargar_productos_disponibles')
     def cargar_productos_disponibles(self):
         """Actualiza la lista de productos mostrada con stock actual y estados"""
         productos = self.inventario.db.get_all_products()
@@ -78,6 +80,7 @@ class VentasScreen(Screen):
         except Exception as e:
             self.mostrar_popup("❌ Error", "Error inesperado al agregar el producto")
 
+    @medir_accion('gui.VentasScreen.procesar_venta')
     def procesar_venta(self):
         """
         Registra una nueva venta en el sistema.
@@ -104,8 +107,10 @@ class VentasScreen(Screen):
 
             # Validar stock antes de procesar la venta
             productos_a_eliminar = []
+            productos_actuales = self.inventario.db.get_products(
+                [producto['id'] for producto, _ in self.productos_seleccionados])
             for producto, cantidad in self.productos_seleccionados:
-                producto_actual = self.inventario.db.get_product(producto['id'])
+                producto_actual = productos_actuales.get(producto['id'])
                 if not producto_actual:
                     productos_a_eliminar.append((producto, cantidad))
                     continue
@@ -165,8 +170,10 @@ class VentasScreen(Screen):
                 return
 
             # Verificar que el stock se actualizó correctamente
+            productos_actuales = self.inventario.db.get_products(
+                [producto['id'] for producto, _ in self.productos_seleccionados])
             for producto, cantidad in self.productos_seleccionados:
-                producto_actual = self.inventario.db.get_product(producto['id'])
+                producto_actual = productos_actuales[producto['id']]
                 if producto_actual['cantidad'] != producto['cantidad'] - cantidad:
                     self.mostrar_popup("Error de stock", f"Error al actualizar el stock de {producto['nombre']}")
                     return
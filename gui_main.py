@@ -6,11 +6,13 @@ sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
 from gui.app import TiendaApp
 from database.postgres_database import PostgresDatabase
+from database.cached_database import CachedDatabase
+from database.notificaciones import CanalPostgres
 from database.database_config import CURRENT_CONFIG
 
 def inicializar_base_datos():
     """Inicializa la base de datos y crea las tablas necesarias."""
-    db = PostgresDatabase(CURRENT_CONFIG)
+    db = CachedDatabase(PostgresDatabase(CURRENT_CONFIG))
     db.connect()
     db.create_tables()
     return db
@@ -18,9 +20,18 @@ def inicializar_base_datos():
 if __name__ == '__main__':
     # Inicializar base de datos
     db = inicializar_base_datos()
+    # Mantener la caché al día con los cambios de otras terminales y de la web
+    notificaciones = CanalPostgres(CURRENT_CONFIG)
+    db.escuchar(notificaciones)
+    notificaciones.iniciar()
     
     # Iniciar la aplicación
     app = TiendaApp(db)
-    app.run()
+    try:
+        app.run()
+    finally:
+        notificaciones.detener()
+        db.disconnect()
+        db.pool.cerrar()
 
 #python gui_main.py ejecutar este comando directamente en consola
\ No newline at end of file
@@ -0,0 +1,262 @@
+"""
+Pool de conexiones PostgreSQL asíncronas para asyncio.
+
+Las conexiones se abren en el modo asíncrono de psycopg2 (`async_=1`): las
+sentencias se envían sin bloquear y el bucle de eventos atiende otras tareas
+hasta que el socket de la conexión está listo (ver `esperar`). Así un solo
+proceso mantiene muchas peticiones en curso mientras PostgreSQL responde, sin
+un hilo por petición.
+
+Las conexiones asíncronas de psycopg2 están siempre en autocommit; las
+transacciones se abren con BEGIN explícito (ver `AsyncPostgresDatabase`).
+"""
+import asyncio
+import time
+from collections import deque
+import psycopg2
+from psycopg2.extensions import POLL_OK, POLL_READ, POLL_WRITE, TRANSACTION_STATUS_IDLE
+from errores.database_error import DatabaseError
+
+
+def _marcar_lista(futuro):
+    if not futuro.done():
+        futuro.set_result(None)
+
+
+async def esperar(conexion):
+    """
+    Espera sin bloquear el bucle de eventos a que termine la operación en curso de
+    una conexión asíncrona (conexión, sentencia enviada con `execute`).
+
+    Args:
+        conexion: Conexión de psycopg2 abierta con `async_=1`
+
+    Raises:
+        psycopg2.Error: Si la operación falla
+    """
+    bucle = asyncio.get_running_loop()
+    while True:
+        estado = conexion.poll()
+        if estado == POLL_OK:
+            return
+        descriptor = conexion.fileno()
+        listo = bucle.create_future()
+        if estado == POLL_READ:
+            bucle.add_reader(descriptor, _marcar_lista, listo)
+            quitar = bucle.remove_reader
+        elif estado == POLL_WRITE:
+            bucle.add_writer(descriptor, _marcar_lista, listo)
+            quitar = bucle.remove_writer
+        else:
+            raise psycopg2.OperationalError(f"Estado inesperado de la conexión: {estado}")
+        try:
+            await listo
+        finally:
+            quitar(descriptor)
+
+
+class AsyncConnectionPool:
+    """
+    Pool de conexiones asíncronas reutilizables entre las tareas de un bucle de eventos.
+
+    Sigue la misma política que `ConnectionPool` (tamaño mínimo y máximo, espera
+    con tiempo límite, vida máxima y verificación de conexiones inactivas), pero
+    la espera de una conexión libre no bloquea el bucle. El pool pertenece al
+    bucle de eventos en el que se usa por primera vez.
+
+    Attributes:
+        config (dict): Parámetros de conexión (host, database, user, password, port)
+        min_size (int): Conexiones que se abren por adelantado en el primer préstamo
+        max_size (int): Máximo de conexiones abiertas simultáneamente
+        timeout (float): Segundos máximos de espera para obtener una conexión
+        max_lifetime (float): Segundos que puede vivir una conexión antes de reemplazarse
+        health_check_interval (float): Segundos de inactividad tras los cuales
+            se verifica la conexión con `SELECT 1` antes de prestarla
+    """
+
+    def __init__(self, config, min_size=1, max_size=10, timeout=30.0, max_lifetime=1800.0,
+                 health_check_interval=30.0, connection_factory=None):
+        """
+        Inicializa el pool sin abrir conexiones todavía.
+
+        Args:
+            config (dict): Parámetros de conexión a PostgreSQL
+            min_size (int): Tamaño mínimo del pool
+            max_size (int): Tamaño máximo del pool
+            timeout (float): Tiempo máximo de espera al pedir una conexión
+            max_lifetime (float): Vida máxima de una conexión en segundos
+            health_check_interval (float): Inactividad que dispara la verificación
+            connection_factory (callable, optional): Corrutina sin argumentos que abre
+                una conexión asíncrona. Por defecto usa `psycopg2.connect` con `config`.
+
+        Raises:
+            ValueError: Si los tamaños del pool no son coherentes
+        """
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError("Los tamaños del pool deben cumplir 0 <= min_size <= max_size y max_size >= 1")
+        self.config = config
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.health_check_interval = health_check_interval
+        self._connection_factory = connection_factory or self._crear_conexion_postgres
+        self._condicion = asyncio.Condition()
+        self._libres = deque()  # (conexion, creada_en, devuelta_en)
+        self._creadas = {}  # id(conexion) -> creada_en
+        self._total = 0
+        self._lleno = False
+        self._cerrado = False
+
+    async def _crear_conexion_postgres(self):
+        conexion = psycopg2.connect(async_=1, **self.config)
+        await esperar(conexion)
+        return conexion
+
+    async def obtener(self):
+        """
+        Presta una conexión del pool, creando una nueva si hay cupo.
+
+        Returns:
+            connection: Conexión asíncrona lista para usar
+
+        Raises:
+            DatabaseError: Si el pool está cerrado, se agota el tiempo de espera
+                o no es posible conectar con la base de datos
+        """
+        limite = time.monotonic() + self.timeout
+        if not self._lleno:
+            self._lleno = True
+            await self._llenar_minimo()
+        while True:
+            entrada = await self._reservar(limite)
+            if entrada is None:
+                return await self._abrir_conexion()
+            conexion, creada_en, devuelta_en = entrada
+            try:
+                valida = await self._es_valida(conexion, creada_en, devuelta_en)
+            except BaseException:
+                # Cancelada durante la verificación: la conexión quedó a medio usar
+                await self._descartar(conexion)
+                raise
+            if valida:
+                return conexion
+            await self._descartar(conexion)
+
+    async def devolver(self, conexion):
+        """
+        Devuelve una conexión prestada al pool.
+
+        Las conexiones cerradas, caducadas, con una sentencia todavía en curso (p. ej.
+        si la tarea se canceló mientras esperaba) o con una transacción abierta se
+        descartan, igual que las devueltas a un pool cerrado.
+
+        Args:
+            conexion: Conexión obtenida previamente con `obtener()`
+        """
+        creada_en = self._creadas.get(id(conexion))
+        if creada_en is None:
+            return
+        caducada = time.monotonic() - creada_en >= self.max_lifetime
+        if (self._cerrado or caducada or conexion.closed or conexion.isexecuting()
+                or conexion.get_transaction_status() != TRANSACTION_STATUS_IDLE):
+            await self._descartar(conexion)
+            return
+        async with self._condicion:
+            self._libres.append((conexion, creada_en, time.monotonic()))
+            self._condicion.notify()
+
+    async def cerrar(self):
+        """Cierra todas las conexiones libres y rechaza nuevos préstamos."""
+        async with self._condicion:
+            self._cerrado = True
+            libres = [conexion for conexion, _, _ in self._libres]
+            self._libres.clear()
+            self._condicion.notify_all()
+        for conexion in libres:
+            await self._descartar(conexion)
+
+    def estadisticas(self):
+        """
+        Retorna el estado actual del pool.
+
+        Returns:
+            dict: Conexiones abiertas, libres, en uso y tamaño máximo
+        """
+        libres = len(self._libres)
+        return {
+            'abiertas': self._total,
+            'libres': libres,
+            'en_uso': self._total - libres,
+            'max_size': self.max_size
+        }
+
+    async def _llenar_minimo(self):
+        faltantes = max(self.min_size - self._total, 0)
+        self._total += faltantes
+        abiertas = await asyncio.gather(*(self._abrir_conexion() for _ in range(faltantes)),
+                                        return_exceptions=True)
+        async with self._condicion:
+            for conexion in abiertas:
+                if not isinstance(conexion, BaseException):
+                    self._libres.append((conexion, self._creadas[id(conexion)], time.monotonic()))
+            self._condicion.notify_all()
+
+    async def _reservar(self, limite):
+        """Toma una conexión libre o reserva cupo para abrir una (retorna None)."""
+        async with self._condicion:
+            while True:
+                if self._cerrado:
+                    raise DatabaseError("El pool de conexiones está cerrado")
+                if self._libres:
+                    return self._libres.pop()
+                if self._total < self.max_size:
+                    self._total += 1
+                    return None
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    raise DatabaseError(
+                        f"Tiempo de espera agotado ({self.timeout}s) al obtener una conexión del pool")
+                try:
+                    await asyncio.wait_for(self._condicion.wait(), restante)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _abrir_conexion(self):
+        """Abre una conexión nueva para un cupo ya reservado en `_total`."""
+        try:
+            conexion = await self._connection_factory()
+        except BaseException as e:
+            self._total -= 1
+            async with self._condicion:
+                self._condicion.notify()
+            if isinstance(e, Exception):
+                raise DatabaseError(f"Error al conectar a PostgreSQL: {str(e)}")
+            raise
+        self._creadas[id(conexion)] = time.monotonic()
+        return conexion
+
+    async def _es_valida(self, conexion, creada_en, devuelta_en):
+        ahora = time.monotonic()
+        if conexion.closed or ahora - creada_en >= self.max_lifetime:
+            return False
+        if ahora - devuelta_en < self.health_check_interval:
+            return True
+        try:
+            cursor = conexion.cursor()
+            cursor.execute("SELECT 1")
+            await esperar(conexion)
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    async def _descartar(self, conexion):
+        if self._creadas.pop(id(conexion), None) is not None:
+            self._total -= 1
+        async with self._condicion:
+            self._condicion.notify()
+        try:
+            conexion.close()
+        except Exception:
+            pass
@@ -0,0 +1,89 @@
+from abc import ABC, abstractmethod
+from typing import List, Dict, Any, Optional, AsyncContextManager
+
+class AsyncDatabaseInterface(ABC):
+    """Interfaz abstracta asíncrona para la base de datos.
+
+    Los métodos tienen el mismo nombre, argumentos y resultado que en
+    `DatabaseInterface`, pero son corrutinas. Cubre las operaciones que usa la API
+    asíncrona (`web.asgi`): productos, ventas, historial y versiones de las tablas.
+    """
+
+    @abstractmethod
+    async def close(self) -> None:
+        """Cierra las conexiones abiertas."""
+        pass
+
+    @abstractmethod
+    def transaction(self) -> AsyncContextManager[None]:
+        """Agrupa las operaciones del bloque `async with` en una sola transacción.
+
+        Todo se confirma al salir sin errores y se revierte si se produce una
+        excepción. Las transacciones anidadas se unen a la exterior. Las
+        operaciones de una transacción no deben lanzarse en paralelo (p. ej. con
+        `asyncio.gather`), porque comparten la conexión.
+        """
+        pass
+
+    # Métodos para Productos
+    @abstractmethod
+    async def create_product(self, product_data: Dict[str, Any]) -> int:
+        """Crea un producto y retorna su ID; el nombre es único (`ProductoDuplicadoError`)."""
+        pass
+
+    @abstractmethod
+    async def get_product(self, product_id: int) -> Optional[Dict[str, Any]]:
+        """Obtiene un producto por su ID."""
+        pass
+
+    @abstractmethod
+    async def get_products(self, product_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Obtiene varios productos por ID en una sola consulta; los IDs inexistentes no aparecen."""
+        pass
+
+    @abstractmethod
+    async def decrement_stock(self, product_id: int, quantity: int) -> int:
+        """Descuenta stock de forma atómica solo si hay suficiente y retorna el stock resultante.
+
+        Lanza StockInsuficienteError si el producto no existe o no tiene stock suficiente."""
+        pass
+
+    # Métodos para Ventas
+    @abstractmethod
+    async def create_sale(self, sale_data: Dict[str, Any]) -> int:
+        """Crea una venta y retorna su ID."""
+        pass
+
+    @abstractmethod
+    async def insert_sale_details(self, details: List[Dict[str, Any]]) -> None:
+        """Inserta varios detalles de venta en una sola operación."""
+        pass
+
+    @abstractmethod
+    async def get_sale(self, sale_id: int) -> Optional[Dict[str, Any]]:
+        """Obtiene una venta por su ID."""
+        pass
+
+    @abstractmethod
+    async def get_sale_details_for_sales(self, sale_ids: List[int]) -> List[Dict[str, Any]]:
+        """Obtiene en una sola consulta los detalles de varias ventas, con el nombre del producto."""
+        pass
+
+    # Métodos de paginación (mismo formato que en `DatabaseInterface`)
+    @abstractmethod
+    async def get_products_page(self, limit: int, offset: int = 0, after_id: Optional[int] = None,
+                                with_total: bool = False) -> Dict[str, Any]:
+        """Obtiene una página de productos ordenados por ID."""
+        pass
+
+    @abstractmethod
+    async def get_sales_page(self, limit: int, offset: int = 0, after_id: Optional[int] = None,
+                             with_total: bool = False) -> Dict[str, Any]:
+        """Obtiene una página de ventas ordenadas por ID."""
+        pass
+
+    # Versiones de los datos
+    @abstractmethod
+    async def get_table_versions(self) -> Dict[str, int]:
+        """Obtiene la versión de cada tabla (ver `DatabaseInterface.get_table_versions`)."""
+        pass
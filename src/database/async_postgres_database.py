@@ -0,0 +1,247 @@
+import contextvars
+import time
+from contextlib import asynccontextmanager
+from psycopg2 import Error
+from psycopg2.errors import UniqueViolation
+from database.async_connection_pool import AsyncConnectionPool, esperar
+from database.async_database_interface import AsyncDatabaseInterface
+from database.database_config import POOL_CONFIG
+from database import instrumentacion
+from database.postgres_database import (CONSULTA_VERSIONES, _armar_pagina, _consulta_pagina, _fila_producto,
+                                        _fila_venta)
+from utils.metricas import CONFLICTOS_STOCK
+from errores.database_error import DatabaseError
+from errores.stock_insuficiente import StockInsuficienteError
+from errores.productos_duplicados import ProductoDuplicadoError
+
+COLUMNAS_PRODUCTO = "id, nombre, precio, cantidad, categoria, stock_minimo, fecha_creacion"
+
+
+class AsyncPostgresDatabase(AsyncDatabaseInterface):
+    """
+    Implementación asíncrona de la base de datos PostgreSQL para asyncio.
+
+    Usa las mismas tablas, consultas y errores que `PostgresDatabase`, sobre
+    conexiones asíncronas de psycopg2 (ver `database.async_connection_pool`).
+    Fuera de una transacción cada sentencia toma una conexión del pool solo
+    mientras se ejecuta, de modo que muchas peticiones concurrentes comparten
+    pocas conexiones. Dentro de `transaction()` la tarea conserva su conexión
+    hasta confirmar; la conexión viaja en una `ContextVar`, así que cada tarea
+    tiene la suya.
+
+    Attributes:
+        config (dict): Configuración de la base de datos (host, port, dbname, user, password)
+        pool (AsyncConnectionPool): Pool del que se obtienen las conexiones
+    """
+
+    def __init__(self, config, pool=None):
+        """
+        Inicializa la base de datos sin abrir conexiones.
+
+        Args:
+            config (dict): Diccionario con la configuración de la base de datos
+            pool (AsyncConnectionPool, optional): Pool a utilizar. Por defecto se
+                crea uno con los parámetros de `POOL_CONFIG`.
+        """
+        self.config = config
+        self.pool = pool if pool is not None else AsyncConnectionPool(config, **POOL_CONFIG)
+        self._transaccion = contextvars.ContextVar(f'transaccion_{id(self)}', default=None)
+
+    async def close(self):
+        """Cierra las conexiones del pool."""
+        await self.pool.cerrar()
+
+    @asynccontextmanager
+    async def _conexion(self):
+        """Conexión de la transacción en curso, o una prestada por el pool para una sentencia."""
+        conexion = self._transaccion.get()
+        if conexion is not None:
+            yield conexion
+            return
+        conexion = await self.pool.obtener()
+        try:
+            yield conexion
+        finally:
+            await self.pool.devolver(conexion)
+
+    async def _ejecutar(self, conexion, consulta, params=None):
+        """
+        Ejecuta una sentencia sin bloquear el bucle y la registra en la instrumentación.
+
+        Returns:
+            tuple: (filas retornadas, filas afectadas)
+        """
+        cursor = conexion.cursor()
+        inicio = time.perf_counter()
+        try:
+            cursor.execute(consulta, params)
+            await esperar(conexion)
+            filas = cursor.fetchall() if cursor.description is not None else []
+            return filas, cursor.rowcount
+        finally:
+            instrumentacion.registrar(consulta, time.perf_counter() - inicio, cursor.rowcount)
+            cursor.close()
+
+    async def _consultar(self, consulta, params=None):
+        async with self._conexion() as conexion:
+            return await self._ejecutar(conexion, consulta, params)
+
+    @asynccontextmanager
+    async def transaction(self):
+        """
+        Ejecuta el bloque `async with` como una única transacción (BEGIN ... COMMIT)
+        sobre una conexión reservada para la tarea actual.
+
+        Raises:
+            DatabaseError: Si falla la confirmación de la transacción
+        """
+        if self._transaccion.get() is not None:
+            yield
+            return
+        conexion = await self.pool.obtener()
+        token = self._transaccion.set(conexion)
+        try:
+            await self._ejecutar(conexion, "BEGIN")
+            try:
+                yield
+            except BaseException:
+                try:
+                    await self._ejecutar(conexion, "ROLLBACK")
+                except Exception:
+                    pass  # El pool descarta la conexión si la transacción quedó abierta
+                raise
+            try:
+                await self._ejecutar(conexion, "COMMIT")
+            except Error as e:
+                raise DatabaseError(f"Error al confirmar la transacción: {str(e)}")
+        finally:
+            self._transaccion.reset(token)
+            await self.pool.devolver(conexion)
+
+    # PRODUCTOS
+    async def create_product(self, product_data):
+        try:
+            filas, _ = await self._consultar(
+                "INSERT INTO productos (nombre, precio, cantidad, categoria, stock_minimo) "
+                "VALUES (%s, %s, %s, %s, %s) RETURNING id",
+                (product_data['nombre'], product_data['precio'], product_data['cantidad'],
+                 product_data['categoria'], product_data['stock_minimo'])
+            )
+            return filas[0][0]
+        except UniqueViolation:
+            raise ProductoDuplicadoError(f"El producto con nombre '{product_data['nombre']}' ya existe en el inventario.")
+        except Error as e:
+            raise DatabaseError(f"Error al insertar producto: {e}")
+
+    async def get_product(self, product_id):
+        try:
+            filas, _ = await self._consultar(f"SELECT {COLUMNAS_PRODUCTO} FROM productos WHERE id = %s",
+                                             (product_id,))
+            return _fila_producto(filas[0]) if filas else None
+        except Error as e:
+            raise DatabaseError(f"Error al obtener producto: {e}")
+
+    async def get_products(self, product_ids):
+        ids = list(set(product_ids))
+        if not ids:
+            return {}
+        try:
+            filas, _ = await self._consultar(f"SELECT {COLUMNAS_PRODUCTO} FROM productos WHERE id = ANY(%s)", (ids,))
+            return {fila[0]: _fila_producto(fila) for fila in filas}
+        except Error as e:
+            raise DatabaseError(f"Error al obtener productos: {e}")
+
+    async def decrement_stock(self, product_id, quantity):
+        try:
+            filas, _ = await self._consultar(
+                "UPDATE productos SET cantidad = cantidad - %s WHERE id = %s AND cantidad >= %s RETURNING cantidad",
+                (quantity, product_id, quantity)
+            )
+        except Error as e:
+            raise DatabaseError(f"Error al descontar stock: {e}")
+        if not filas:
+            CONFLICTOS_STOCK.incrementar()
+            raise StockInsuficienteError(f"Stock insuficiente para el producto con ID {product_id}.")
+        return filas[0][0]
+
+    # VENTAS
+    async def create_sale(self, sale_data):
+        try:
+            filas, _ = await self._consultar(
+                "INSERT INTO ventas (fecha, id_usuario, total) VALUES (%s, %s, %s) RETURNING id",
+                (sale_data['fecha'], sale_data['id_usuario'], sale_data['total'])
+            )
+            return filas[0][0]
+        except Error as e:
+            raise DatabaseError(f"Error al insertar venta: {str(e)}")
+
+    async def insert_sale_details(self, details):
+        """
+        Inserta todos los detalles con una sola sentencia: las columnas viajan como
+        arrays y se expanden con `unnest`.
+        """
+        if not details:
+            return
+        try:
+            await self._consultar(
+                "INSERT INTO detalle_ventas (venta_id, producto_id, cantidad, precio) "
+                "SELECT * FROM unnest(%s::integer[], %s::integer[], %s::integer[], %s::numeric[])",
+                tuple([d[campo] for d in details] for campo in ('venta_id', 'producto_id', 'cantidad', 'precio'))
+            )
+        except Error as e:
+            raise DatabaseError(f"Error al insertar detalles de venta: {e}")
+
+    async def get_sale(self, sale_id):
+        try:
+            filas, _ = await self._consultar("SELECT id, fecha, id_usuario, total FROM ventas WHERE id = %s",
+                                             (sale_id,))
+            return _fila_venta(filas[0]) if filas else None
+        except Error as e:
+            raise DatabaseError(f"Error al obtener venta: {e}")
+
+    async def get_sale_details_for_sales(self, sale_ids):
+        if not sale_ids:
+            return []
+        try:
+            filas, _ = await self._consultar("""
+                SELECT dv.venta_id, dv.producto_id, dv.cantidad, dv.precio, p.nombre
+                FROM detalle_ventas dv
+                LEFT JOIN productos p ON p.id = dv.producto_id
+                WHERE dv.venta_id = ANY(%s)
+                ORDER BY dv.venta_id, dv.producto_id
+            """, (list(sale_ids),))
+            return [
+                {'venta_id': fila[0], 'producto_id': fila[1], 'cantidad': fila[2], 'precio': float(fila[3]),
+                 'producto_nombre': fila[4]}
+                for fila in filas
+            ]
+        except Error as e:
+            raise DatabaseError(f"Error al obtener detalles de ventas: {e}")
+
+    # PAGINACIÓN
+    async def _obtener_pagina(self, tabla, columnas, orden, convertir, limit, offset, after_id, with_total):
+        consulta, params = _consulta_pagina(tabla, columnas, orden, limit, offset, after_id)
+        try:
+            filas, _ = await self._consultar(consulta, params)
+            total = None
+            if with_total:
+                conteo, _ = await self._consultar(f"SELECT COUNT(*) FROM {tabla}")
+                total = conteo[0][0]
+            return _armar_pagina(filas, limit, orden, convertir, total)
+        except Error as e:
+            raise DatabaseError(f"Error al obtener página de {tabla}: {e}")
+
+    async def get_products_page(self, limit, offset=0, after_id=None, with_total=False):
+        return await self._obtener_pagina('productos', COLUMNAS_PRODUCTO, ['id'], _fila_producto,
+                                          limit, offset, after_id, with_total)
+
+    async def get_sales_page(self, limit, offset=0, after_id=None, with_total=False):
+        return await self._obtener_pagina('ventas', 'id, fecha, id_usuario, total', ['id'], _fila_venta,
+                                          limit, offset, after_id, with_total)
+
+    async def get_table_versions(self):
+        try:
+            filas, _ = await self._consultar(CONSULTA_VERSIONES)
+            return dict(filas)
+        except Error as e:
+            raise DatabaseError(f"Error al obtener las versiones de las tablas: {e}")
@@ -0,0 +1,288 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from database.database_interface import DatabaseInterface
+from database.database_config import CACHE_CONFIG
+
+
+class CacheLRU:
+    """
+    Caché en memoria con caducidad por tiempo (TTL) y límite de entradas (LRU).
+
+    Es segura entre hilos y cuenta aciertos y fallos para poder medir su efecto.
+
+    Attributes:
+        ttl (float): Segundos que una entrada se considera vigente
+        max_size (int): Máximo de entradas; al superarlo se descarta la menos usada
+        aciertos (int): Lecturas resueltas desde la caché
+        fallos (int): Lecturas que tuvieron que ir a la base de datos
+    """
+
+    def __init__(self, ttl=30.0, max_size=10000, reloj=time.monotonic):
+        if max_size < 1:
+            raise ValueError("El tamaño máximo de la caché debe ser mayor a cero")
+        self.ttl = ttl
+        self.max_size = max_size
+        self.aciertos = 0
+        self.fallos = 0
+        self._reloj = reloj
+        self._entradas = OrderedDict()  # clave -> (valor, caduca_en)
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def version(self):
+        """Número que cambia con cada invalidación; ver `guardar`."""
+        with self._lock:
+            return self._version
+
+    def obtener(self, clave):
+        """
+        Retorna el valor vigente de una clave.
+
+        Returns:
+            tuple: (encontrado, valor)
+        """
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None and entrada[1] > self._reloj():
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+                return True, entrada[0]
+            if entrada is not None:
+                del self._entradas[clave]
+            self.fallos += 1
+            return False, None
+
+    def guardar(self, clave, valor, version=None):
+        """
+        Guarda un valor en la caché.
+
+        Si se indica `version` y hubo una invalidación desde entonces, el valor se
+        descarta: pudo leerse antes de una escritura que ya se invalidó.
+        """
+        with self._lock:
+            if version is not None and version != self._version:
+                return
+            self._entradas[clave] = (valor, self._reloj() + self.ttl)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_size:
+                self._entradas.popitem(last=False)
+
+    def invalidar(self, clave):
+        with self._lock:
+            self._version += 1
+            self._entradas.pop(clave, None)
+
+    def limpiar(self):
+        with self._lock:
+            self._version += 1
+            self._entradas.clear()
+
+    def estadisticas(self):
+        """
+        Retorna el estado de la caché.
+
+        Returns:
+            dict: Aciertos, fallos, tasa de aciertos, entradas y tamaño máximo
+        """
+        with self._lock:
+            lecturas = self.aciertos + self.fallos
+            return {
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'tasa_aciertos': self.aciertos / lecturas if lecturas else 0.0,
+                'entradas': len(self._entradas),
+                'max_size': self.max_size
+            }
+
+
+def _primer_argumento(entidad_id, *args, **kwargs):
+    return entidad_id
+
+
+def _todos(*args, **kwargs):
+    return None
+
+
+class CachedDatabase:
+    """
+    Base de datos con caché de lectura de productos y usuarios por ID.
+
+    Envuelve otra implementación de `DatabaseInterface` y delega en ella todos los
+    métodos; `get_product`, `get_products` y `get_user` se resuelven desde la caché
+    cuando la entrada está vigente. Las escrituras locales invalidan las entradas
+    afectadas y, con `escuchar()`, también las de otros procesos notificadas por la
+    base de datos.
+
+    Dentro de una transacción no se leen ni guardan entradas, porque los cambios aún
+    no confirmados podrían revertirse; las entradas modificadas se invalidan de nuevo
+    al terminar la transacción.
+
+    Attributes:
+        db (DatabaseInterface): Base de datos envuelta
+        productos (CacheLRU): Caché de productos por ID
+        usuarios (CacheLRU): Caché de usuarios por ID
+    """
+
+    # Método de escritura -> (caché afectada, cómo obtener el ID afectado; None: toda la caché)
+    ESCRITURAS = {
+        'update_product': ('productos', _primer_argumento),
+        'update_stock': ('productos', _primer_argumento),
+        'delete_product': ('productos', _primer_argumento),
+        'decrement_stock': ('productos', _primer_argumento),
+        'increment_stock': ('productos', _primer_argumento),
+        'upsert_products': ('productos', _todos),
+        'update_user': ('usuarios', _primer_argumento),
+        'delete_user': ('usuarios', _primer_argumento),
+    }
+    # Tablas de las notificaciones -> caché que invalidan
+    TABLAS = {'productos': 'productos', 'usuarios': 'usuarios'}
+
+    def __init__(self, db, ttl=None, max_size=None):
+        """
+        Args:
+            db (DatabaseInterface): Base de datos a envolver
+            ttl (float, optional): Vigencia de las entradas en segundos
+            max_size (int, optional): Máximo de productos en caché
+        """
+        self.db = db
+        ttl = CACHE_CONFIG['ttl'] if ttl is None else ttl
+        max_size = CACHE_CONFIG['max_size'] if max_size is None else max_size
+        self.productos = CacheLRU(ttl=ttl, max_size=max_size)
+        self.usuarios = CacheLRU(ttl=ttl, max_size=max_size)
+        self._local = threading.local()
+
+    def __getattr__(self, nombre):
+        atributo = getattr(self.db, nombre)
+        escritura = self.ESCRITURAS.get(nombre)
+        if escritura is None:
+            return atributo
+        cache, calcular_id = escritura
+
+        def escribir(*args, **kwargs):
+            entidad_id = calcular_id(*args, **kwargs)
+            try:
+                return atributo(*args, **kwargs)
+            finally:
+                self.invalidar(cache, entidad_id)
+        return escribir
+
+    def _en_transaccion(self):
+        return getattr(self._local, 'modificados', None) is not None
+
+    def invalidar(self, cache, entidad_id=None):
+        """
+        Descarta una entrada de la caché indicada, o toda la caché si `entidad_id` es None.
+
+        Args:
+            cache (str): 'productos' o 'usuarios'
+            entidad_id (int, optional): ID a descartar
+        """
+        if entidad_id is None:
+            getattr(self, cache).limpiar()
+        else:
+            getattr(self, cache).invalidar(entidad_id)
+        if self._en_transaccion():
+            self._local.modificados.add((cache, entidad_id))
+
+    def invalidar_producto(self, product_id=None):
+        """Descarta un producto de la caché, o todos si `product_id` es None."""
+        self.invalidar('productos', product_id)
+
+    def drop_tables(self):
+        try:
+            return self.db.drop_tables()
+        finally:
+            self.invalidar('productos')
+            self.invalidar('usuarios')
+
+    def escuchar(self, canal):
+        """
+        Suscribe la caché a un canal de notificaciones de cambios.
+
+        Args:
+            canal (CanalLocal): Canal de `database.notificaciones`
+        """
+        canal.suscribir(self._procesar_evento)
+
+    def _procesar_evento(self, evento):
+        if evento['tabla'] is None:
+            for cache in set(self.TABLAS.values()):
+                getattr(self, cache).limpiar()
+            return
+        cache = self.TABLAS.get(evento['tabla'])
+        if cache is None:
+            return
+        if evento['ids'] is None:
+            getattr(self, cache).limpiar()
+            return
+        for entidad_id in evento['ids']:
+            getattr(self, cache).invalidar(entidad_id)
+
+    @contextmanager
+    def transaction(self):
+        """Delegado de `transaction()` que invalida al terminar lo modificado en el bloque."""
+        if self._en_transaccion():
+            with self.db.transaction():
+                yield
+            return
+        self._local.modificados = set()
+        try:
+            with self.db.transaction():
+                yield
+        finally:
+            modificados = self._local.modificados
+            self._local.modificados = None
+            for cache, entidad_id in modificados:
+                self.invalidar(cache, entidad_id)
+
+    def _leer(self, cache, entidad_id, leer):
+        if self._en_transaccion():
+            return leer(entidad_id)
+        cache = getattr(self, cache)
+        encontrado, valor = cache.obtener(entidad_id)
+        if not encontrado:
+            version = cache.version()
+            valor = leer(entidad_id)
+            if valor is None:
+                return None
+            cache.guardar(entidad_id, dict(valor), version)
+        return dict(valor)
+
+    def get_product(self, product_id):
+        return self._leer('productos', product_id, self.db.get_product)
+
+    def get_products(self, product_ids):
+        """Resuelve desde la caché los productos vigentes y lee el resto en una sola consulta."""
+        if self._en_transaccion():
+            return self.db.get_products(product_ids)
+        productos = {}
+        faltantes = []
+        for product_id in set(product_ids):
+            encontrado, valor = self.productos.obtener(product_id)
+            if encontrado:
+                productos[product_id] = dict(valor)
+            else:
+                faltantes.append(product_id)
+        if faltantes:
+            version = self.productos.version()
+            for product_id, valor in self.db.get_products(faltantes).items():
+                self.productos.guardar(product_id, dict(valor), version)
+                productos[product_id] = dict(valor)
+        return productos
+
+    def get_user(self, user_id):
+        return self._leer('usuarios', user_id, self.db.get_user)
+
+    def estadisticas_cache(self):
+        """
+        Retorna los contadores de aciertos y fallos de las cachés.
+
+        Returns:
+            dict: 'productos' y 'usuarios', cada uno como en `CacheLRU.estadisticas`
+        """
+        return {'productos': self.productos.estadisticas(), 'usuarios': self.usuarios.estadisticas()}
+
+
+DatabaseInterface.register(CachedDatabase)
@@ -0,0 +1,255 @@
+import os
+import threading
+import time
+from collections import deque
+import psycopg2
+from errores.database_error import DatabaseError
+from database.database_config import POOL_CONFIG
+from database.instrumentacion import fabrica_cursor
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones PostgreSQL reutilizables y seguro entre hilos.
+
+    Mantiene un conjunto de conexiones abiertas para evitar el costo del handshake
+    TCP y de autenticación en cada petición. Las conexiones se prestan con
+    `obtener()` y se devuelven con `devolver()`.
+
+    Attributes:
+        config (dict): Parámetros de conexión (host, database, user, password, port)
+        min_size (int): Conexiones que se abren por adelantado en el primer préstamo
+        max_size (int): Máximo de conexiones abiertas simultáneamente
+        timeout (float): Segundos máximos de espera para obtener una conexión
+        max_lifetime (float): Segundos que puede vivir una conexión antes de reemplazarse
+        health_check_interval (float): Segundos de inactividad tras los cuales
+            se verifica la conexión con `SELECT 1` antes de prestarla
+    """
+
+    def __init__(self, config, min_size=1, max_size=10, timeout=30.0, max_lifetime=1800.0,
+                 health_check_interval=30.0, connection_factory=None):
+        """
+        Inicializa el pool sin abrir conexiones todavía.
+
+        Args:
+            config (dict): Parámetros de conexión a PostgreSQL
+            min_size (int): Tamaño mínimo del pool
+            max_size (int): Tamaño máximo del pool
+            timeout (float): Tiempo máximo de espera al pedir una conexión
+            max_lifetime (float): Vida máxima de una conexión en segundos
+            health_check_interval (float): Inactividad que dispara la verificación
+            connection_factory (callable, optional): Función que crea una conexión nueva.
+                Por defecto usa `psycopg2.connect` con `config` y cursores instrumentados.
+
+        Raises:
+            ValueError: Si los tamaños del pool no son coherentes
+        """
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError("Los tamaños del pool deben cumplir 0 <= min_size <= max_size y max_size >= 1")
+        self.config = config
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.health_check_interval = health_check_interval
+        self._connection_factory = connection_factory or self._crear_conexion_postgres
+        self._condicion = threading.Condition()
+        self._reiniciar_estado()
+
+    def _reiniciar_estado(self):
+        """Deja el pool vacío, sin conexiones registradas (también tras un fork)."""
+        self._libres = deque()  # (conexion, creada_en, devuelta_en)
+        self._creadas = {}  # id(conexion) -> creada_en
+        self._total = 0
+        self._lleno = False
+        self._cerrado = False
+        self._pid = os.getpid()
+
+    def _crear_conexion_postgres(self):
+        # Los cursores de la conexión miden sus consultas (ver `database.instrumentacion`)
+        return psycopg2.connect(cursor_factory=fabrica_cursor(), **self.config)
+
+    def _verificar_proceso(self):
+        # Las conexiones heredadas de un proceso padre (p. ej. gunicorn con preload)
+        # no deben compartirse: se olvidan sin cerrarlas para no afectar al padre.
+        if self._pid != os.getpid():
+            self._reiniciar_estado()
+
+    def obtener(self):
+        """
+        Presta una conexión del pool, creando una nueva si hay cupo.
+
+        Returns:
+            connection: Conexión lista para usar
+
+        Raises:
+            DatabaseError: Si el pool está cerrado, se agota el tiempo de espera
+                o no es posible conectar con la base de datos
+        """
+        limite = time.monotonic() + self.timeout
+        with self._condicion:
+            self._verificar_proceso()
+            llenar = not self._lleno
+            self._lleno = True
+        if llenar:
+            self._llenar_minimo()
+        while True:
+            entrada = self._reservar(limite)
+            if entrada is None:
+                return self._abrir_conexion()
+            conexion, creada_en, devuelta_en = entrada
+            if self._es_valida(conexion, creada_en, devuelta_en):
+                return conexion
+            self._descartar(conexion)
+
+    def devolver(self, conexion):
+        """
+        Devuelve una conexión prestada al pool.
+
+        Las transacciones abiertas se revierten. Las conexiones cerradas,
+        caducadas o devueltas a un pool cerrado se descartan.
+
+        Args:
+            conexion: Conexión obtenida previamente con `obtener()`
+        """
+        with self._condicion:
+            creada_en = self._creadas.get(id(conexion))
+            if creada_en is None:
+                # No pertenece a este pool (o proviene de otro proceso)
+                return
+        caducada = time.monotonic() - creada_en >= self.max_lifetime
+        if self._cerrado or caducada or conexion.closed:
+            self._descartar(conexion)
+            return
+        try:
+            conexion.rollback()
+        except Exception:
+            self._descartar(conexion)
+            return
+        with self._condicion:
+            self._libres.append((conexion, creada_en, time.monotonic()))
+            self._condicion.notify()
+
+    def cerrar(self):
+        """Cierra todas las conexiones libres y rechaza nuevos préstamos."""
+        with self._condicion:
+            self._cerrado = True
+            libres = [conexion for conexion, _, _ in self._libres]
+            self._libres.clear()
+            self._condicion.notify_all()
+        for conexion in libres:
+            self._descartar(conexion)
+
+    def estadisticas(self):
+        """
+        Retorna el estado actual del pool.
+
+        Returns:
+            dict: Conexiones abiertas, libres, en uso y tamaño máximo
+        """
+        with self._condicion:
+            libres = len(self._libres)
+            return {
+                'abiertas': self._total,
+                'libres': libres,
+                'en_uso': self._total - libres,
+                'max_size': self.max_size
+            }
+
+    def _llenar_minimo(self):
+        while True:
+            with self._condicion:
+                if self._total >= self.min_size or self._cerrado:
+                    return
+                self._total += 1
+            try:
+                conexion = self._abrir_conexion()
+            except DatabaseError:
+                return
+            with self._condicion:
+                self._libres.append((conexion, self._creadas[id(conexion)], time.monotonic()))
+                self._condicion.notify()
+
+    def _reservar(self, limite):
+        """Toma una conexión libre o reserva cupo para abrir una (retorna None)."""
+        with self._condicion:
+            while True:
+                if self._cerrado:
+                    raise DatabaseError("El pool de conexiones está cerrado")
+                if self._libres:
+                    return self._libres.pop()
+                if self._total < self.max_size:
+                    self._total += 1
+                    return None
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    raise DatabaseError(
+                        f"Tiempo de espera agotado ({self.timeout}s) al obtener una conexión del pool")
+                self._condicion.wait(restante)
+
+    def _abrir_conexion(self):
+        """Abre una conexión nueva para un cupo ya reservado en `_total`."""
+        try:
+            conexion = self._connection_factory()
+        except Exception as e:
+            with self._condicion:
+                self._total -= 1
+                self._condicion.notify()
+            raise DatabaseError(f"Error al conectar a PostgreSQL: {str(e)}")
+        with self._condicion:
+            self._creadas[id(conexion)] = time.monotonic()
+        return conexion
+
+    def _es_valida(self, conexion, creada_en, devuelta_en):
+        ahora = time.monotonic()
+        if conexion.closed or ahora - creada_en >= self.max_lifetime:
+            return False
+        if ahora - devuelta_en < self.health_check_interval:
+            return True
+        try:
+            cursor = conexion.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            conexion.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _descartar(self, conexion):
+        with self._condicion:
+            if self._creadas.pop(id(conexion), None) is not None:
+                self._total -= 1
+            self._condicion.notify()
+        try:
+            conexion.close()
+        except Exception:
+            pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def obtener_pool(config, **opciones):
+    """
+    Retorna el pool compartido del proceso para una configuración de conexión.
+
+    La web, la consola y la interfaz gráfica obtienen así el mismo pool en lugar
+    de abrir conexiones sueltas.
+
+    Args:
+        config (dict): Parámetros de conexión a PostgreSQL
+        **opciones: Parámetros del pool que reemplazan a `POOL_CONFIG`
+
+    Returns:
+        ConnectionPool: Pool asociado a la configuración
+    """
+    clave = tuple(sorted(config.items()))
+    with _pools_lock:
+        pool = _pools.get(clave)
+        if pool is None or pool._cerrado:
+            parametros = dict(POOL_CONFIG)
+            parametros.update(opciones)
+            pool = ConnectionPool(config, **parametros)
+            _pools[clave] = pool
+        return pool
@@ -51,4 +51,59 @@ POSTGRES_CONFIG = {
 # Configuración actual del sistema
 # ===============================
 # Se puede cambiar fácilmente a otra configuración si se soportan otros motores.
-CURRENT_CONFIG = POSTGRES_CONFIG 
\ No newline at end of file
+CURRENT_CONFIG = POSTGRES_CONFIG 
+
+# ===============================
+# Configuración del pool de conexiones
+# ===============================
+# Parámetros del pool compartido por la web, la consola y la interfaz gráfica.
+# Los tiempos se expresan en segundos.
+POOL_CONFIG = {
+    'min_size': int(os.getenv('DB_POOL_MIN', '1')),
+    'max_size': int(os.getenv('DB_POOL_MAX', '10')),
+    'timeout': float(os.getenv('DB_POOL_TIMEOUT', '30')),
+    'max_lifetime': float(os.getenv('DB_POOL_MAX_LIFETIME', '1800')),
+    'health_check_interval': float(os.getenv('DB_POOL_HEALTH_CHECK', '30'))
+}
+
+# ===============================
+# Caché de lectura de productos
+# ===============================
+# Vigencia de cada entrada en segundos, máximo de productos guardados por proceso
+# y máximo de fragmentos HTML de listados guardados por proceso web.
+CACHE_CONFIG = {
+    'ttl': float(os.getenv('DB_CACHE_TTL', '30')),
+    'max_size': int(os.getenv('DB_CACHE_MAX', '10000')),
+    'fragmentos_max': int(os.getenv('WEB_CACHE_FRAGMENTOS', '500'))
+}
+
+# ===============================
+# Lecturas por streaming
+# ===============================
+# Filas que trae cada viaje de un cursor del lado del servidor en los métodos iter_*.
+CURSOR_ITERSIZE = int(os.getenv('DB_ITERSIZE', '2000'))
+
+
+# ===============================
+# Instrumentación de consultas
+# ===============================
+# Medición de cada consulta (ver `database.instrumentacion`), umbral en milisegundos
+# a partir del cual una consulta se registra como lenta y ejecuciones de una misma
+# sentencia en una acción a partir de las cuales se avisa de un posible N+1.
+INSTRUMENTACION_CONFIG = {
+    'activa': os.getenv('DB_INSTRUMENTAR', '1') == '1',
+    'lenta_ms': float(os.getenv('DB_CONSULTA_LENTA_MS', '200')),
+    'repeticiones': int(os.getenv('DB_AVISO_REPETICIONES', '20'))
+}
+
+# ===============================
+# Métricas
+# ===============================
+# Directorio compartido por los workers para sumar sus métricas (vacío: un solo
+# proceso), segundos entre volcados de cada worker y token Bearer opcional
+# exigido por /metrics.
+METRICAS_CONFIG = {
+    'directorio': os.getenv('METRICAS_DIR') or None,
+    'intervalo': float(os.getenv('METRICAS_INTERVALO', '5')),
+    'token': os.getenv('METRICAS_TOKEN') or None
+}
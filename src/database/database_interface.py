@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
+from datetime import date, datetime
+from typing import List, Dict, Any, Optional, Tuple, ContextManager, Iterator
 
 class DatabaseInterface(ABC):
     """Interfaz abstracta para la base de datos."""
@@ -14,6 +15,16 @@ class DatabaseInterface(ABC):
         """Cierra la conexión con la base de datos."""
         pass
     
+    @abstractmethod
+    def transaction(self) -> ContextManager[None]:
+        """Agrupa las operaciones del bloque `with` en una sola transacción.
+
+        Dentro del bloque los métodos no confirman por separado: todo se confirma
+        al salir sin errores y se revierte si se produce una excepción. Las
+        transacciones anidadas se unen a la exterior.
+        """
+        pass
+    
     @abstractmethod
     def create_tables(self) -> None:
         """Crea las tablas necesarias en la base de datos."""
@@ -53,7 +64,14 @@ class DatabaseInterface(ABC):
     # Métodos para Productos
     @abstractmethod
     def insert_product(self, product_data: Dict[str, Any]) -> int:
-        """Inserta un nuevo producto y retorna su ID."""
+        """Inserta un nuevo producto y retorna su ID.
+
+        El nombre del producto es único: lanza ProductoDuplicadoError si ya existe."""
+        pass
+    
+    @abstractmethod
+    def upsert_products(self, products: List[Dict[str, Any]]) -> int:
+        """Inserta o actualiza por nombre varios productos y retorna cuántos se guardaron."""
         pass
     
     @abstractmethod
@@ -61,6 +79,11 @@ class DatabaseInterface(ABC):
         """Obtiene un producto por su ID."""
         pass
     
+    @abstractmethod
+    def get_products(self, product_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Obtiene en una sola consulta varios productos, indexados por ID; los inexistentes no aparecen."""
+        pass
+    
     @abstractmethod
     def update_product(self, product_id: int, product_data: Dict[str, Any]) -> bool:
         """Actualiza los datos de un producto."""
@@ -76,11 +99,37 @@ class DatabaseInterface(ABC):
         """Obtiene todos los productos."""
         pass
     
+    @abstractmethod
+    def get_products_by_names(self, names: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Obtiene en una sola consulta los productos con los nombres dados, indexados por nombre."""
+        pass
+    
+    @abstractmethod
+    def get_low_stock_products(self, limit: int, category: Optional[str] = None,
+                               after_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Obtiene hasta `limit` productos con cantidad <= stock_minimo, ordenados por ID.
+
+        `after_id` continúa después del último ID de la llamada anterior.
+        """
+        pass
+    
     @abstractmethod
     def update_stock(self, product_id: int, quantity: int) -> bool:
         """Actualiza el stock de un producto."""
         pass
     
+    @abstractmethod
+    def decrement_stock(self, product_id: int, quantity: int) -> int:
+        """Descuenta stock de forma atómica solo si hay suficiente y retorna el nuevo stock.
+
+        Lanza StockInsuficienteError si el producto no existe o no tiene stock suficiente."""
+        pass
+    
+    @abstractmethod
+    def increment_stock(self, product_id: int, quantity: int) -> bool:
+        """Suma stock de forma atómica a un producto (p. ej. al deshacer una venta)."""
+        pass
+    
     # Métodos para Ventas
     @abstractmethod
     def insert_sale(self, sale_data: Dict[str, Any]) -> int:
@@ -92,6 +141,11 @@ class DatabaseInterface(ABC):
         """Inserta un detalle de venta."""
         pass
     
+    @abstractmethod
+    def insert_sale_details(self, details: List[Dict[str, Any]]) -> None:
+        """Inserta varios detalles de venta en una sola operación."""
+        pass
+    
     @abstractmethod
     def get_sale(self, sale_id: int) -> Optional[Dict[str, Any]]:
         """Obtiene una venta por su ID."""
@@ -102,6 +156,16 @@ class DatabaseInterface(ABC):
         """Obtiene los detalles de una venta."""
         pass
     
+    @abstractmethod
+    def get_sale_details_for_sales(self, sale_ids: List[int]) -> List[Dict[str, Any]]:
+        """Obtiene en una sola consulta los detalles de varias ventas, con el nombre del producto."""
+        pass
+    
+    @abstractmethod
+    def product_has_sales(self, product_id: int) -> bool:
+        """Indica si el producto aparece en algún detalle de venta."""
+        pass
+    
     @abstractmethod
     def get_all_sales(self) -> List[Dict[str, Any]]:
         """Obtiene todas las ventas."""
@@ -112,6 +176,42 @@ class DatabaseInterface(ABC):
         """Obtiene todos los detalles de ventas."""
         pass
     
+    @abstractmethod
+    def iter_products(self) -> Iterator[Dict[str, Any]]:
+        """Recorre todos los productos ordenados por ID sin cargarlos en memoria."""
+        pass
+    
+    @abstractmethod
+    def iter_sales(self) -> Iterator[Dict[str, Any]]:
+        """Recorre todas las ventas ordenadas por ID sin cargarlas en memoria."""
+        pass
+    
+    @abstractmethod
+    def iter_sale_details(self) -> Iterator[Dict[str, Any]]:
+        """Recorre todos los detalles de venta sin cargarlos en memoria."""
+        pass
+    
+    @abstractmethod
+    def iter_sales_history(self, date_from: Optional[datetime] = None, date_to: Optional[datetime] = None,
+                           user_id: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Recorre las filas de `get_sales_history` sin cargarlas en memoria.
+
+        Filtra opcionalmente por fecha (`date_from` inclusive, `date_to` exclusiva)
+        y por el usuario que registró la venta.
+        """
+        pass
+    
+    @abstractmethod
+    def get_sales_history(self) -> List[Dict[str, Any]]:
+        """
+        Obtiene el historial de ventas en una sola consulta.
+
+        Retorna una fila por cada detalle de venta (o una fila sin producto si la venta
+        no tiene detalles) con las claves venta_id, fecha, id_usuario, usuario_nombre,
+        total, producto_id, producto_nombre, cantidad y precio, ordenadas por venta.
+        """
+        pass
+    
     @abstractmethod
     def get_sales_by_user(self, user_id: int) -> List[Dict[str, Any]]:
         """Obtiene las ventas de un usuario específico."""
@@ -125,4 +225,76 @@ class DatabaseInterface(ABC):
     @abstractmethod
     def delete_all_sales(self) -> None:
         """Elimina todas las ventas y sus detalles."""
-        pass 
\ No newline at end of file
+        pass
+    
+    # Resúmenes de ventas
+    # Se leen de tablas de resumen mantenidas en cada escritura, por lo que su costo
+    # depende del número de días (y de empleados o productos), no del de ventas.
+    # Filtran opcionalmente por día: `date_from` inclusive, `date_to` exclusivo.
+    @abstractmethod
+    def get_total_revenue(self) -> float:
+        """Obtiene el total facturado por todas las ventas."""
+        pass
+    
+    @abstractmethod
+    def get_revenue_by_day(self, date_from: Optional[date] = None,
+                           date_to: Optional[date] = None) -> List[Dict[str, Any]]:
+        """Obtiene por día ('dia', 'num_ventas', 'total'), ordenado por día."""
+        pass
+    
+    @abstractmethod
+    def get_revenue_by_user(self, date_from: Optional[date] = None,
+                            date_to: Optional[date] = None) -> List[Dict[str, Any]]:
+        """Obtiene por empleado ('id_usuario', 'nombre', 'num_ventas', 'total'), de mayor a menor total."""
+        pass
+    
+    @abstractmethod
+    def get_revenue_by_product(self, date_from: Optional[date] = None,
+                               date_to: Optional[date] = None) -> List[Dict[str, Any]]:
+        """Obtiene por producto ('producto_id', 'nombre', 'cantidad', 'total'), de mayor a menor total."""
+        pass
+    
+    @abstractmethod
+    def get_revenue_by_category(self, date_from: Optional[date] = None,
+                                date_to: Optional[date] = None) -> List[Dict[str, Any]]:
+        """Obtiene por categoría ('categoria', 'cantidad', 'total'), de mayor a menor total."""
+        pass
+    
+    # Métodos de paginación
+    # Todos ordenan por clave primaria ascendente. Si se indica `after_id` se usa
+    # paginación por cursor (keyset) y se ignora `offset`. Retornan un diccionario con
+    # 'items', 'next_after_id' (cursor de la página siguiente o None si no hay más)
+    # y 'total' (solo si `with_total` es True, en caso contrario None).
+    @abstractmethod
+    def get_products_page(self, limit: int, offset: int = 0, after_id: Optional[int] = None,
+                          with_total: bool = False) -> Dict[str, Any]:
+        """Obtiene una página de productos ordenados por ID."""
+        pass
+    
+    @abstractmethod
+    def get_sales_page(self, limit: int, offset: int = 0, after_id: Optional[int] = None,
+                       with_total: bool = False) -> Dict[str, Any]:
+        """Obtiene una página de ventas ordenadas por ID."""
+        pass
+    
+    @abstractmethod
+    def get_users_page(self, limit: int, offset: int = 0, after_id: Optional[int] = None,
+                       with_total: bool = False) -> Dict[str, Any]:
+        """Obtiene una página de usuarios ordenados por ID."""
+        pass
+    
+    @abstractmethod
+    def get_sale_details_page(self, limit: int, offset: int = 0, after_id: Optional[Tuple[int, int]] = None,
+                              with_total: bool = False) -> Dict[str, Any]:
+        """Obtiene una página de detalles de venta ordenados por (venta_id, producto_id).
+
+        El cursor `after_id` es la tupla (venta_id, producto_id) del último detalle leído."""
+        pass
+    
+    # Versiones de los datos
+    @abstractmethod
+    def get_table_versions(self) -> Dict[str, int]:
+        """Obtiene la versión de cada tabla, que aumenta con cada transacción confirmada que la modifica.
+
+        Las tablas que nunca se modificaron no aparecen (versión 0)."""
+        pass
@@ -0,0 +1,276 @@
+"""
+Instrumentación de las consultas a PostgreSQL.
+
+Las conexiones del pool crean cursores que miden cada `execute`: huella de la
+sentencia (SQL con los literales y parámetros reemplazados por '?'), duración,
+filas afectadas y origen (método de la base de datos y código que lo llamó).
+
+Las consultas se acumulan en el registro de la acción en curso: una petición
+Flask, una opción de la consola o un evento de la interfaz gráfica. El registro
+viaja en una `ContextVar`, por lo que cada hilo (y cada tarea asyncio) tiene el
+suyo. Las consultas que superan el umbral se registran en el log aunque no haya
+una acción en curso, y al terminar una acción se avisa de las sentencias que se
+repitieron muchas veces, el patrón típico de un N+1.
+"""
+import contextvars
+import functools
+import logging
+import os
+import re
+import sys
+import time
+from contextlib import contextmanager
+import psycopg2
+from psycopg2.extensions import cursor as CursorBase
+from psycopg2.extras import RealDictCursor
+from database.database_config import INSTRUMENTACION_CONFIG
+from utils.metricas import DURACION_CONSULTAS
+
+logger = logging.getLogger(__name__)
+
+# Consultas guardadas con detalle por acción; las siguientes solo se cuentan
+MAX_CONSULTAS_REGISTRO = 1000
+
+_registro_actual = contextvars.ContextVar('registro_consultas', default=None)
+
+_LITERALES = re.compile(r"'(?:[^']|'')*'|%\(\w+\)s|%s|\b\d+(?:\.\d+)?\b")
+_LISTAS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_FILAS = re.compile(r"\(\?\.\.\.\)(?:\s*,\s*\(\?\.\.\.\))+")
+_ESPACIOS = re.compile(r"\s+")
+_OPERACIONES = {'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH'}
+_DIRECTORIOS_INTERNOS = (os.path.dirname(os.path.abspath(__file__)),
+                         os.path.dirname(os.path.abspath(psycopg2.__file__)))
+
+
+def _normalizar(sql):
+    sql = _LITERALES.sub('?', sql)
+    sql = _LISTAS.sub('(?...)', sql)
+    sql = _FILAS.sub('(?...)', sql)
+    return _ESPACIOS.sub(' ', sql).strip()
+
+
+_normalizar_plantilla = functools.lru_cache(maxsize=1024)(_normalizar)
+
+
+def huella(sql):
+    """
+    Retorna la sentencia sin literales ni parámetros, para agrupar las consultas
+    que solo difieren en sus valores.
+
+    Args:
+        sql (str o bytes): Sentencia ejecutada
+
+    Returns:
+        str: Huella de la sentencia
+    """
+    if isinstance(sql, bytes):
+        # execute_values envía la sentencia ya armada: no se cachea
+        return _normalizar(sql.decode('utf-8', 'replace'))
+    return _normalizar_plantilla(str(sql))
+
+
+def _operacion(sql):
+    """Primera palabra de la sentencia (SELECT, INSERT...) como etiqueta de las métricas."""
+    inicio = sql[:16].decode('ascii', 'replace') if isinstance(sql, bytes) else str(sql)[:16]
+    palabra = inicio.split(None, 1)[0].upper() if inicio.strip() else ''
+    return palabra if palabra in _OPERACIONES else 'OTRA'
+
+
+@functools.lru_cache(maxsize=512)
+def _es_interno(archivo):
+    return os.path.abspath(archivo).startswith(_DIRECTORIOS_INTERNOS)
+
+
+def _origen():
+    """
+    Busca en la pila el método de la capa de base de datos que ejecutó la consulta
+    y el primer código fuera de ella que lo llamó.
+    """
+    metodo = None
+    frame = sys._getframe(2)
+    while frame is not None and _es_interno(frame.f_code.co_filename):
+        metodo = frame.f_code.co_name
+        frame = frame.f_back
+    if frame is None:
+        return {'metodo': metodo, 'origen': None}
+    archivo = os.path.basename(frame.f_code.co_filename)
+    return {'metodo': metodo, 'origen': f"{archivo}:{frame.f_lineno} ({frame.f_code.co_name})"}
+
+
+class RegistroConsultas:
+    """
+    Consultas ejecutadas durante una acción.
+
+    Attributes:
+        nombre (str): Nombre de la acción (endpoint, opción de menú, evento)
+        consultas (list): Diccionarios con 'huella', 'duracion' (s), 'filas', 'metodo' y 'origen'
+        total (int): Consultas ejecutadas, incluidas las que no se guardaron con detalle
+        duracion (float): Segundos totales dentro de la base de datos
+        inicio (float): Momento de inicio de la acción (`time.perf_counter`)
+    """
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self.consultas = []
+        self.total = 0
+        self.duracion = 0.0
+        self.inicio = time.perf_counter()
+
+    def agregar(self, consulta):
+        self.total += 1
+        self.duracion += consulta['duracion']
+        if len(self.consultas) < MAX_CONSULTAS_REGISTRO:
+            self.consultas.append(consulta)
+
+    def por_huella(self):
+        """
+        Agrupa las consultas guardadas por huella.
+
+        Returns:
+            dict: huella -> {'veces', 'duracion', 'origen'} (origen de la primera ejecución)
+        """
+        grupos = {}
+        for consulta in self.consultas:
+            grupo = grupos.setdefault(consulta['huella'], {'veces': 0, 'duracion': 0.0,
+                                                           'origen': consulta['origen']})
+            grupo['veces'] += 1
+            grupo['duracion'] += consulta['duracion']
+        return grupos
+
+    def repetidas(self, minimo):
+        """
+        Retorna las huellas ejecutadas al menos `minimo` veces, de más a menos repetidas.
+        """
+        grupos = self.por_huella()
+        return sorted(((h, g) for h, g in grupos.items() if g['veces'] >= minimo),
+                      key=lambda item: -item[1]['veces'])
+
+    def server_timing(self):
+        """
+        Retorna el valor de la cabecera Server-Timing: tiempo en la base de datos
+        y tiempo total de la acción, en milisegundos.
+        """
+        total = (time.perf_counter() - self.inicio) * 1000
+        return f'db;dur={self.duracion * 1000:.2f};desc="{self.total} consultas", total;dur={total:.2f}'
+
+
+def registro_actual():
+    """Retorna el registro de la acción en curso, o None."""
+    return _registro_actual.get()
+
+
+def registrar(sql, duracion, filas):
+    """
+    Registra una consulta ejecutada en el histograma de latencias, en la acción en
+    curso y en el log si es lenta.
+
+    Args:
+        sql (str o bytes): Sentencia ejecutada
+        duracion (float): Segundos que tardó
+        filas (int): Filas afectadas o retornadas (-1 si no se conocen)
+    """
+    DURACION_CONSULTAS.observar(duracion, (_operacion(sql),))
+    registro = _registro_actual.get()
+    lenta = duracion * 1000 >= INSTRUMENTACION_CONFIG['lenta_ms']
+    if registro is None and not lenta:
+        return
+    consulta = {'huella': huella(sql), 'duracion': duracion, 'filas': filas}
+    consulta.update(_origen())
+    if registro is not None:
+        registro.agregar(consulta)
+    if lenta:
+        logger.warning("Consulta lenta (%.1f ms, %s filas) en %s desde %s: %s", duracion * 1000, filas,
+                       consulta['metodo'], consulta['origen'], consulta['huella'])
+
+
+def iniciar(nombre):
+    """
+    Abre el registro de una acción en el contexto actual.
+
+    Args:
+        nombre (str): Nombre de la acción
+
+    Returns:
+        tuple: (RegistroConsultas, token para `terminar`)
+    """
+    registro = RegistroConsultas(nombre)
+    return registro, _registro_actual.set(registro)
+
+
+def terminar(token):
+    """
+    Cierra el registro abierto con `iniciar` y avisa de las consultas repetidas.
+
+    Args:
+        token: Token retornado por `iniciar`
+
+    Returns:
+        RegistroConsultas: Registro cerrado
+    """
+    registro = _registro_actual.get()
+    _registro_actual.reset(token)
+    if registro is None:
+        return None
+    for sentencia, grupo in registro.repetidas(INSTRUMENTACION_CONFIG['repeticiones']):
+        logger.warning("Posible N+1 en %s: %d ejecuciones (%.1f ms) desde %s: %s", registro.nombre,
+                       grupo['veces'], grupo['duracion'] * 1000, grupo['origen'], sentencia)
+    logger.debug("%s: %d consultas, %.1f ms en la base de datos", registro.nombre, registro.total,
+                 registro.duracion * 1000)
+    return registro
+
+
+@contextmanager
+def medir_accion(nombre):
+    """
+    Agrupa las consultas de un bloque o de una función (usado como decorador)
+    en una acción, p. ej. una opción de la consola o un evento de la interfaz.
+
+    Args:
+        nombre (str): Nombre de la acción
+    """
+    registro, token = iniciar(nombre)
+    try:
+        yield registro
+    finally:
+        terminar(token)
+
+
+class _CursorMedido:
+    """Mide `execute` y `executemany` del cursor de psycopg2 con el que se combina."""
+
+    def execute(self, query, vars=None):
+        inicio = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            registrar(query, time.perf_counter() - inicio, self.rowcount)
+
+    def executemany(self, query, vars_list):
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            registrar(query, time.perf_counter() - inicio, self.rowcount)
+
+
+class CursorInstrumentado(_CursorMedido, CursorBase):
+    """Cursor de tuplas instrumentado."""
+
+
+class CursorDiccionarioInstrumentado(_CursorMedido, RealDictCursor):
+    """Cursor de diccionarios (`RealDictCursor`) instrumentado."""
+
+
+def fabrica_cursor(diccionario=False):
+    """
+    Retorna la clase de cursor a usar según `INSTRUMENTACION_CONFIG['activa']`.
+
+    Args:
+        diccionario (bool): Si es True, un cursor que retorna diccionarios
+
+    Returns:
+        type: Clase de cursor para `cursor_factory`, o None para el cursor por defecto
+    """
+    if not INSTRUMENTACION_CONFIG['activa']:
+        return RealDictCursor if diccionario else None
+    return CursorDiccionarioInstrumentado if diccionario else CursorInstrumentado
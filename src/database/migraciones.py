@@ -0,0 +1,305 @@
+"""
+Migraciones versionadas del esquema PostgreSQL.
+
+Cada migración tiene un número de versión creciente y se aplica una sola vez.
+Las versiones aplicadas se registran en la tabla `schema_version`, de modo que
+`create_tables` puede ejecutarse en cada arranque sin repetir cambios.
+"""
+from errores.database_error import DatabaseError
+from database.notificaciones import CANAL, MAX_IDS_NOTIFICACION
+
+# Clave del bloqueo consultivo que evita que dos procesos migren a la vez
+BLOQUEO_MIGRACIONES = 720_145_001
+
+
+def _triggers_cambios(tabla, columna_id):
+    """Sentencias que crean los triggers por sentencia que acumulan los cambios de `tabla`."""
+    return [
+        f"DROP TRIGGER IF EXISTS cambios_{tabla}_insert ON {tabla}",
+        f"CREATE TRIGGER cambios_{tabla}_insert AFTER INSERT ON {tabla} REFERENCING NEW TABLE AS nuevas "
+        f"FOR EACH STATEMENT EXECUTE FUNCTION acumular_cambios('{columna_id}', 'nuevas')",
+        f"DROP TRIGGER IF EXISTS cambios_{tabla}_update ON {tabla}",
+        f"CREATE TRIGGER cambios_{tabla}_update AFTER UPDATE ON {tabla} REFERENCING NEW TABLE AS nuevas "
+        f"FOR EACH STATEMENT EXECUTE FUNCTION acumular_cambios('{columna_id}', 'nuevas')",
+        f"DROP TRIGGER IF EXISTS cambios_{tabla}_delete ON {tabla}",
+        f"CREATE TRIGGER cambios_{tabla}_delete AFTER DELETE ON {tabla} REFERENCING OLD TABLE AS viejas "
+        f"FOR EACH STATEMENT EXECUTE FUNCTION acumular_cambios('{columna_id}', 'viejas')",
+        f"DROP TRIGGER IF EXISTS cambios_{tabla}_truncate ON {tabla}",
+        f"CREATE TRIGGER cambios_{tabla}_truncate AFTER TRUNCATE ON {tabla} "
+        f"FOR EACH STATEMENT EXECUTE FUNCTION acumular_cambios('{columna_id}', '')",
+    ]
+
+
+# (versión, descripción, sentencias)
+MIGRACIONES = [
+    (1, "Índices secundarios para ventas, detalles y stock bajo", [
+        "CREATE INDEX IF NOT EXISTS idx_ventas_id_usuario ON ventas (id_usuario)",
+        "CREATE INDEX IF NOT EXISTS idx_ventas_fecha ON ventas (fecha)",
+        "CREATE INDEX IF NOT EXISTS idx_detalle_ventas_producto_id ON detalle_ventas (producto_id)",
+        "CREATE INDEX IF NOT EXISTS idx_productos_stock_bajo ON productos (id) WHERE cantidad <= stock_minimo",
+    ]),
+    (2, "Índice de stock bajo por categoría", [
+        "CREATE INDEX IF NOT EXISTS idx_productos_stock_bajo_categoria ON productos (categoria, id) "
+        "WHERE cantidad <= stock_minimo",
+    ]),
+    (3, "Nombre de producto único para la importación por nombre", [
+        # Con nombres repetidos el índice no se puede crear: se informa cuáles son
+        """
+        DO $$
+        DECLARE
+            repetidos TEXT;
+        BEGIN
+            SELECT string_agg(format('%s (%s)', nombre, veces), ', ' ORDER BY nombre) INTO repetidos
+            FROM (
+                SELECT nombre, COUNT(*) AS veces FROM productos
+                GROUP BY nombre HAVING COUNT(*) > 1 ORDER BY nombre LIMIT 20
+            ) d;
+            IF repetidos IS NOT NULL THEN
+                RAISE EXCEPTION 'Hay productos con el mismo nombre: %. Renombre o elimine los repetidos '
+                    'antes de actualizar el esquema (el nombre de producto pasa a ser único).', repetidos;
+            END IF;
+        END
+        $$
+        """,
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_productos_nombre ON productos (nombre)",
+    ]),
+    (4, "Notificaciones de cambios por transacción con versiones por tabla", [
+        # Cambios de la transacción en curso, por tabla; ids NULL: demasiados para enumerarlos
+        """
+        CREATE UNLOGGED TABLE IF NOT EXISTS cambios_pendientes (
+            transaccion BIGINT NOT NULL,
+            tabla TEXT NOT NULL,
+            ids INTEGER[],
+            PRIMARY KEY (transaccion, tabla)
+        )
+        """,
+        # Trigger por sentencia: acumula los IDs de las filas de la tabla de transición
+        # (TG_ARGV[0]: columna del ID, TG_ARGV[1]: tabla de transición)
+        f"""
+        CREATE OR REPLACE FUNCTION acumular_cambios() RETURNS trigger AS $$
+        DECLARE
+            nuevos INTEGER[];
+        BEGIN
+            IF TG_OP <> 'TRUNCATE' THEN
+                -- DISTINCT antes del LIMIT: muchas filas pueden compartir el mismo ID (líneas de una venta)
+                EXECUTE format('SELECT array_agg(%1$I) FROM (SELECT DISTINCT %1$I FROM %2$I LIMIT %3$s) t',
+                               TG_ARGV[0], TG_ARGV[1], {MAX_IDS_NOTIFICACION + 1})
+                INTO nuevos;
+                IF nuevos IS NULL THEN
+                    RETURN NULL;  -- La sentencia no modificó filas
+                END IF;
+                IF cardinality(nuevos) > {MAX_IDS_NOTIFICACION} THEN
+                    nuevos := NULL;
+                END IF;
+            END IF;
+            INSERT INTO cambios_pendientes AS c (transaccion, tabla, ids)
+            VALUES (txid_current(), TG_TABLE_NAME, nuevos)
+            ON CONFLICT (transaccion, tabla) DO UPDATE
+            SET ids = CASE
+                WHEN c.ids IS NULL OR EXCLUDED.ids IS NULL
+                     OR cardinality(c.ids) + cardinality(EXCLUDED.ids) > {MAX_IDS_NOTIFICACION} THEN NULL
+                ELSE ARRAY(SELECT DISTINCT unnest(c.ids || EXCLUDED.ids))
+            END;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        # Una secuencia por tabla, independiente de la tabla: drop_tables no la elimina y las
+        # versiones nunca retroceden. nextval no bloquea, así que las transacciones que
+        # modifican la misma tabla no se esperan entre sí al confirmar
+        *(f"CREATE SEQUENCE IF NOT EXISTS version_{tabla}"
+          for tabla in ('productos', 'usuarios', 'ventas', 'detalle_ventas')),
+        # Trigger diferido hasta el COMMIT: un solo NOTIFY por tabla y transacción
+        f"""
+        CREATE OR REPLACE FUNCTION notificar_cambios() RETURNS trigger AS $$
+        DECLARE
+            cambio cambios_pendientes%ROWTYPE;
+        BEGIN
+            DELETE FROM cambios_pendientes WHERE transaccion = NEW.transaccion AND tabla = NEW.tabla
+            RETURNING * INTO cambio;
+            IF FOUND THEN
+                PERFORM pg_notify('{CANAL}', json_build_object(
+                    'tabla', cambio.tabla, 'ids', cambio.ids,
+                    'version', nextval(format('version_%s', cambio.tabla)::regclass))::text);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        "DROP TRIGGER IF EXISTS notificar_cambios ON cambios_pendientes",
+        "CREATE CONSTRAINT TRIGGER notificar_cambios AFTER INSERT ON cambios_pendientes "
+        "DEFERRABLE INITIALLY DEFERRED FOR EACH ROW EXECUTE FUNCTION notificar_cambios()",
+    ] + [
+        sentencia
+        for tabla, columna_id in (('productos', 'id'), ('usuarios', 'id'), ('ventas', 'id'),
+                                  ('detalle_ventas', 'venta_id'))
+        for sentencia in _triggers_cambios(tabla, columna_id)
+    ]),
+    (5, "Resúmenes de ventas por día, empleado y producto mantenidos por triggers", [
+        """
+        CREATE TABLE IF NOT EXISTS ventas_diarias (
+            dia DATE NOT NULL,
+            id_usuario INTEGER NOT NULL,
+            num_ventas INTEGER NOT NULL,
+            total DECIMAL(14,2) NOT NULL,
+            PRIMARY KEY (dia, id_usuario)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS ventas_producto_dia (
+            dia DATE NOT NULL,
+            producto_id INTEGER NOT NULL,
+            lineas INTEGER NOT NULL,
+            cantidad INTEGER NOT NULL,
+            total DECIMAL(14,2) NOT NULL,
+            PRIMARY KEY (dia, producto_id)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_ventas_producto_dia_producto ON ventas_producto_dia (producto_id)",
+        # Las ventas sin usuario se acumulan con id_usuario 0
+        """
+        CREATE OR REPLACE FUNCTION acumular_venta_diaria(p_dia DATE, p_usuario INTEGER,
+                                                         p_ventas INTEGER, p_total NUMERIC)
+        RETURNS void AS $$
+        BEGIN
+            INSERT INTO ventas_diarias AS r (dia, id_usuario, num_ventas, total)
+            VALUES (p_dia, COALESCE(p_usuario, 0), p_ventas, p_total)
+            ON CONFLICT (dia, id_usuario) DO UPDATE
+            SET num_ventas = r.num_ventas + EXCLUDED.num_ventas, total = r.total + EXCLUDED.total;
+            DELETE FROM ventas_diarias
+            WHERE dia = p_dia AND id_usuario = COALESCE(p_usuario, 0) AND num_ventas = 0;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        """
+        CREATE OR REPLACE FUNCTION acumular_producto_dia(p_dia DATE, p_producto INTEGER, p_lineas INTEGER,
+                                                         p_cantidad INTEGER, p_total NUMERIC)
+        RETURNS void AS $$
+        BEGIN
+            INSERT INTO ventas_producto_dia AS r (dia, producto_id, lineas, cantidad, total)
+            VALUES (p_dia, p_producto, p_lineas, p_cantidad, p_total)
+            ON CONFLICT (dia, producto_id) DO UPDATE
+            SET lineas = r.lineas + EXCLUDED.lineas, cantidad = r.cantidad + EXCLUDED.cantidad,
+                total = r.total + EXCLUDED.total;
+            DELETE FROM ventas_producto_dia WHERE dia = p_dia AND producto_id = p_producto AND lineas = 0;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        """
+        CREATE OR REPLACE FUNCTION resumir_venta() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                PERFORM acumular_venta_diaria(OLD.fecha::date, OLD.id_usuario, -1, -OLD.total);
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                PERFORM acumular_venta_diaria(NEW.fecha::date, NEW.id_usuario, 1, NEW.total);
+            END IF;
+            -- Si cambia el día de la venta, sus líneas pasan al nuevo día
+            IF TG_OP = 'UPDATE' AND OLD.fecha::date IS DISTINCT FROM NEW.fecha::date THEN
+                PERFORM acumular_producto_dia(OLD.fecha::date, d.producto_id, -1, -d.cantidad, -d.cantidad * d.precio)
+                FROM detalle_ventas d WHERE d.venta_id = NEW.id;
+                PERFORM acumular_producto_dia(NEW.fecha::date, d.producto_id, 1, d.cantidad, d.cantidad * d.precio)
+                FROM detalle_ventas d WHERE d.venta_id = NEW.id;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        """
+        CREATE OR REPLACE FUNCTION resumir_detalle_venta() RETURNS trigger AS $$
+        DECLARE
+            v_dia DATE;
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                SELECT fecha::date INTO v_dia FROM ventas WHERE id = OLD.venta_id;
+                IF FOUND THEN
+                    PERFORM acumular_producto_dia(v_dia, OLD.producto_id, -1, -OLD.cantidad,
+                                                  -OLD.cantidad * OLD.precio);
+                END IF;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                SELECT fecha::date INTO v_dia FROM ventas WHERE id = NEW.venta_id;
+                PERFORM acumular_producto_dia(v_dia, NEW.producto_id, 1, NEW.cantidad, NEW.cantidad * NEW.precio);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        "DROP TRIGGER IF EXISTS resumir_ventas ON ventas",
+        "CREATE TRIGGER resumir_ventas AFTER INSERT OR UPDATE OR DELETE ON ventas "
+        "FOR EACH ROW EXECUTE FUNCTION resumir_venta()",
+        "DROP TRIGGER IF EXISTS resumir_detalle_ventas ON detalle_ventas",
+        "CREATE TRIGGER resumir_detalle_ventas AFTER INSERT OR UPDATE OR DELETE ON detalle_ventas "
+        "FOR EACH ROW EXECUTE FUNCTION resumir_detalle_venta()",
+        # Carga inicial con las ventas existentes; los triggers ya bloquean las escrituras concurrentes
+        "DELETE FROM ventas_diarias",
+        "DELETE FROM ventas_producto_dia",
+        """
+        INSERT INTO ventas_diarias (dia, id_usuario, num_ventas, total)
+        SELECT fecha::date, COALESCE(id_usuario, 0), COUNT(*), SUM(total)
+        FROM ventas GROUP BY 1, 2
+        """,
+        """
+        INSERT INTO ventas_producto_dia (dia, producto_id, lineas, cantidad, total)
+        SELECT v.fecha::date, d.producto_id, COUNT(*), SUM(d.cantidad), SUM(d.cantidad * d.precio)
+        FROM detalle_ventas d JOIN ventas v ON v.id = d.venta_id
+        GROUP BY 1, 2
+        """,
+    ]),
+]
+
+
+def version_actual(cursor):
+    """
+    Retorna la última versión aplicada del esquema.
+
+    Args:
+        cursor: Cursor de una conexión PostgreSQL
+
+    Returns:
+        int: Versión del esquema, 0 si no se ha aplicado ninguna migración
+    """
+    cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    return cursor.fetchone()[0]
+
+
+def aplicar_migraciones(db):
+    """
+    Aplica en orden las migraciones pendientes dentro de una transacción.
+
+    Args:
+        db (PostgresDatabase): Base de datos conectada
+
+    Returns:
+        list: Versiones aplicadas en esta llamada
+
+    Raises:
+        DatabaseError: Si alguna migración falla; no se aplica ninguna de las pendientes
+    """
+    aplicadas = []
+    try:
+        with db.transaction():
+            cursor = db.connection.cursor()
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", (BLOQUEO_MIGRACIONES,))
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    descripcion VARCHAR(200) NOT NULL,
+                    aplicada_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            actual = version_actual(cursor)
+            for version, descripcion, sentencias in MIGRACIONES:
+                if version <= actual:
+                    continue
+                for sentencia in sentencias:
+                    cursor.execute(sentencia)
+                cursor.execute(
+                    "INSERT INTO schema_version (version, descripcion) VALUES (%s, %s)",
+                    (version, descripcion)
+                )
+                aplicadas.append(version)
+            cursor.close()
+    except Exception as e:
+        raise DatabaseError(f"Error al aplicar migraciones: {e}")
+    return aplicadas
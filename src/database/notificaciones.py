@@ -0,0 +1,152 @@
+"""
+Notificaciones de cambios entre procesos mediante LISTEN/NOTIFY de PostgreSQL.
+
+Los triggers creados por la migración 4 acumulan, sentencia por sentencia,
+los IDs modificados en productos, usuarios, ventas y detalle_ventas, y al confirmar
+la transacción avanzan la secuencia `version_<tabla>` de cada tabla y envían un
+solo NOTIFY por tabla. Cada proceso (workers web, terminales Kivy, consola)
+escucha el canal y reenvía los eventos a sus suscriptores, por ejemplo para
+invalidar cachés locales.
+
+Un evento es un diccionario con 'tabla', 'ids' (lista de IDs modificados, o None
+si la transacción modificó más de `MAX_IDS_NOTIFICACION` filas de la tabla; en
+detalle_ventas, los IDs de las ventas) y 'version' (nueva versión de la tabla). El
+evento con 'tabla' None significa "pudieron perderse eventos": los suscriptores
+deben descartar todo lo que tengan en caché.
+"""
+import json
+import logging
+import os
+import select
+import threading
+import psycopg2
+
+logger = logging.getLogger(__name__)
+
+CANAL = 'gestor_cambios'
+# IDs por notificación; por encima se notifica la tabla completa (el payload tiene un límite de 8000 bytes)
+MAX_IDS_NOTIFICACION = 100
+EVENTO_REINICIO = {'tabla': None, 'ids': None, 'version': None}
+
+
+class CanalLocal:
+    """
+    Canal de eventos dentro del proceso.
+
+    Entrega los eventos de forma síncrona; sirve como canal de pruebas y como base
+    de `CanalPostgres`.
+    """
+
+    def __init__(self):
+        self._suscriptores = []
+        self._lock = threading.Lock()
+
+    def suscribir(self, funcion):
+        """
+        Registra una función que recibirá cada evento.
+
+        Args:
+            funcion (callable): Función que recibe el diccionario del evento
+        """
+        with self._lock:
+            self._suscriptores.append(funcion)
+
+    def publicar(self, evento):
+        """
+        Entrega un evento a todos los suscriptores.
+
+        Los errores de un suscriptor se registran y no impiden entregar el evento al resto.
+        """
+        with self._lock:
+            suscriptores = list(self._suscriptores)
+        for funcion in suscriptores:
+            try:
+                funcion(evento)
+            except Exception as e:
+                logger.error(f"Error al procesar el evento {evento}: {str(e)}")
+
+
+class CanalPostgres(CanalLocal):
+    """
+    Canal que escucha los NOTIFY de PostgreSQL en un hilo propio.
+
+    Usa una conexión dedicada (fuera del pool) en autocommit. Si la conexión se
+    pierde, reintenta y publica `EVENTO_REINICIO`, ya que los NOTIFY enviados
+    mientras no se escuchaba no se recuperan.
+
+    Attributes:
+        config (dict): Parámetros de conexión a PostgreSQL
+        canal (str): Nombre del canal de LISTEN
+        espera (float): Segundos entre comprobaciones de parada y reintentos
+    """
+
+    def __init__(self, config, canal=CANAL, espera=5.0):
+        super().__init__()
+        self.config = config
+        self.canal = canal
+        self.espera = espera
+        self._hilo = None
+        self._pid = None
+        self._detener = threading.Event()
+
+    def iniciar(self):
+        """
+        Arranca el hilo de escucha si no está activo en este proceso.
+
+        Es seguro llamarlo en cada petición: tras un fork (p. ej. gunicorn con
+        preload) el hijo no hereda el hilo y se arranca uno nuevo.
+        """
+        if self._hilo is not None and self._pid == os.getpid() and self._hilo.is_alive():
+            return
+        with self._lock:
+            if self._hilo is not None and self._pid == os.getpid() and self._hilo.is_alive():
+                return
+            self._detener.clear()
+            self._pid = os.getpid()
+            self._hilo = threading.Thread(target=self._escuchar, name='notificaciones-postgres', daemon=True)
+            self._hilo.start()
+
+    def detener(self):
+        """Pide al hilo de escucha que termine y espera a que lo haga."""
+        self._detener.set()
+        if self._hilo is not None and self._hilo.is_alive():
+            self._hilo.join(self.espera * 2)
+
+    def _escuchar(self):
+        primera_conexion = True
+        while not self._detener.is_set():
+            conexion = None
+            try:
+                conexion = psycopg2.connect(**self.config)
+                conexion.autocommit = True
+                cursor = conexion.cursor()
+                cursor.execute(f"LISTEN {self.canal}")
+                cursor.close()
+                if not primera_conexion:
+                    self.publicar(dict(EVENTO_REINICIO))
+                primera_conexion = False
+                while not self._detener.is_set():
+                    if select.select([conexion], [], [], self.espera) == ([], [], []):
+                        continue
+                    conexion.poll()
+                    while conexion.notifies:
+                        self.publicar(self._decodificar(conexion.notifies.pop(0).payload))
+            except Exception as e:
+                logger.error(f"Error en la escucha de notificaciones: {str(e)}")
+                primera_conexion = False
+                self._detener.wait(self.espera)
+            finally:
+                if conexion is not None:
+                    try:
+                        conexion.close()
+                    except Exception:
+                        pass
+
+    @staticmethod
+    def _decodificar(payload):
+        try:
+            evento = json.loads(payload)
+            return {'tabla': evento.get('tabla'), 'ids': evento.get('ids'), 'version': evento.get('version')}
+        except (ValueError, AttributeError):
+            logger.error(f"Notificación con formato inválido: {payload}")
+            return dict(EVENTO_REINICIO)
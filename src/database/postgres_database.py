@@ -1,11 +1,116 @@
 import psycopg2
 from psycopg2 import Error
+from psycopg2.errors import UniqueViolation
 from database.database_interface import DatabaseInterface
+from database.connection_pool import obtener_pool
+from database.database_config import CURSOR_ITERSIZE
+from database.instrumentacion import fabrica_cursor
+from utils.metricas import CONFLICTOS_STOCK
+from database.migraciones import aplicar_migraciones
 from errores.database_error import DatabaseError
+from errores.stock_insuficiente import StockInsuficienteError
+from errores.productos_duplicados import ProductoDuplicadoError
 import os
+import itertools
+import threading
+from contextlib import contextmanager
 from dotenv import load_dotenv
 import datetime
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import execute_values
+
+def _fila_producto(row):
+    return {
+        'id': row[0],
+        'nombre': row[1],
+        'precio': float(row[2]),
+        'cantidad': row[3],
+        'categoria': row[4],
+        'stock_minimo': row[5],
+        'fecha_creacion': row[6]
+    }
+
+
+def _fila_venta(row):
+    return {
+        'id': row[0],
+        'fecha': row[1],
+        'id_usuario': row[2],
+        'total': float(row[3])
+    }
+
+
+def _fila_detalle(row):
+    return {
+        'venta_id': row[0],
+        'producto_id': row[1],
+        'cantidad': row[2],
+        'precio': float(row[3])
+    }
+
+
+def _fila_historial(row):
+    return {
+        'venta_id': row[0],
+        'fecha': row[1],
+        'id_usuario': row[2],
+        'usuario_nombre': row[3],
+        'total': float(row[4]),
+        'producto_id': row[5],
+        'producto_nombre': row[6],
+        'cantidad': row[7],
+        'precio': float(row[8]) if row[8] is not None else None
+    }
+
+
+CONSULTA_HISTORIAL = """
+    SELECT v.id, v.fecha, v.id_usuario, u.nombre, v.total,
+           dv.producto_id, p.nombre, dv.cantidad, dv.precio
+    FROM ventas v
+    LEFT JOIN usuarios u ON u.id = v.id_usuario
+    LEFT JOIN detalle_ventas dv ON dv.venta_id = v.id
+    LEFT JOIN productos p ON p.id = dv.producto_id
+"""
+ORDEN_HISTORIAL = " ORDER BY v.id, dv.producto_id"
+
+CONSULTA_VERSIONES = (
+    "SELECT substr(sequencename, 9), last_value FROM pg_sequences "
+    "WHERE schemaname = current_schema() AND sequencename LIKE 'version\\_%' AND last_value IS NOT NULL"
+)
+
+
+def _consulta_pagina(tabla, columnas, orden, limit, offset, after_id):
+    """
+    Sentencia y parámetros de una página con orden estable por las columnas de
+    `orden`. Se pide una fila adicional para saber si existe una página siguiente.
+
+    Returns:
+        tuple: (sentencia, parámetros)
+    """
+    if limit < 1:
+        raise ValueError("El tamaño de página debe ser mayor a cero")
+    params = []
+    where = ""
+    if after_id is not None:
+        claves_cursor = tuple(after_id) if isinstance(after_id, (tuple, list)) else (after_id,)
+        where = f"WHERE ({', '.join(orden)}) > ({', '.join(['%s'] * len(claves_cursor))})"
+        params.extend(claves_cursor)
+        offset = 0
+    return (f"SELECT {columnas} FROM {tabla} {where} ORDER BY {', '.join(orden)} LIMIT %s OFFSET %s",
+            params + [limit + 1, offset])
+
+
+def _armar_pagina(rows, limit, orden, convertir, total=None):
+    """Página con 'items', 'next_after_id' y 'total' a partir de las filas de `_consulta_pagina`."""
+    items = [convertir(row) for row in rows[:limit]]
+    next_after_id = None
+    if len(rows) > limit:
+        claves = tuple(items[-1][columna] for columna in orden)
+        next_after_id = claves[0] if len(claves) == 1 else claves
+    return {'items': items, 'next_after_id': next_after_id, 'total': total}
+
+
+_nombres_cursor = itertools.count(1)
+
 
 class PostgresDatabase(DatabaseInterface):
     """
@@ -13,48 +118,134 @@ class PostgresDatabase(DatabaseInterface):
     
     Esta clase maneja todas las operaciones de base de datos usando PostgreSQL,
     incluyendo la creación de tablas, conexión, y operaciones CRUD.
+
+    Las conexiones se toman prestadas de un pool compartido. Cada hilo tiene su
+    propia conexión, por lo que una misma instancia puede atender varias
+    peticiones web concurrentes.
+
+    Las conexiones trabajan en modo autocommit: las lecturas no abren
+    transacciones ni pagan un COMMIT y cada escritura de una sola sentencia es
+    atómica por sí misma. Las escrituras de varias sentencias se agrupan con
+    `transaction()`.
     
     Attributes:
         config (dict): Configuración de la base de datos (host, port, dbname, user, password)
-        connection: Conexión activa a la base de datos PostgreSQL
+        pool (ConnectionPool): Pool del que se obtienen las conexiones
+        itersize (int): Filas por viaje de los cursores de servidor de los métodos iter_*
+        connection: Conexión prestada al hilo actual
     """
     
-    def __init__(self, config):
+    def __init__(self, config, pool=None, itersize=CURSOR_ITERSIZE):
         """
-        Inicializa la conexión a la base de datos PostgreSQL.
+        Inicializa la base de datos PostgreSQL sin abrir conexiones.
         
         Args:
             config (dict): Diccionario con la configuración de la base de datos
+            pool (ConnectionPool, optional): Pool a utilizar. Por defecto se usa
+                el pool compartido del proceso para `config`.
+            itersize (int): Filas por viaje de los cursores de servidor
         """
-        self.config = config
-        self.connection = None
-        self.cursor = None
         load_dotenv()
+        self.config = config
+        self.pool = pool if pool is not None else obtener_pool(config)
+        self.itersize = itersize
+        self._local = threading.local()
+
+    @property
+    def connection(self):
+        """Conexión prestada al hilo actual, o None si no se ha conectado."""
+        return getattr(self._local, 'connection', None)
+
+    @connection.setter
+    def connection(self, valor):
+        self._local.connection = valor
+
+    @property
+    def cursor(self):
+        """Cursor por defecto asociado a la conexión del hilo actual."""
+        return getattr(self._local, 'cursor', None)
+
+    @cursor.setter
+    def cursor(self, valor):
+        self._local.cursor = valor
         
     def connect(self):
         """
-        Establece la conexión con la base de datos PostgreSQL.
+        Toma prestada una conexión del pool para el hilo actual.
+
+        Si el hilo ya tiene una conexión prestada, la reutiliza.
         
         Raises:
             DatabaseError: Si hay un error al conectar con la base de datos
         """
+        if self.connection is not None:
+            return
         try:
-            self.connection = psycopg2.connect(
-                host=os.getenv('DB_HOST', 'localhost'),
-                database=os.getenv('DB_NAME', 'gestor_inventario'),
-                user=os.getenv('DB_USER', 'postgres'),
-                password=os.getenv('DB_PASSWORD', 'postgres'),
-                port=os.getenv('DB_PORT', '5432')
-            )
-            self.cursor = self.connection.cursor(cursor_factory=RealDictCursor)
+            self.connection = self.pool.obtener()
+            self.connection.autocommit = True
+            self.cursor = self.connection.cursor(cursor_factory=fabrica_cursor(diccionario=True))
         except Error as e:
             raise DatabaseError(f"Error al conectar a PostgreSQL: {str(e)}")
 
     def disconnect(self):
+        """Devuelve al pool la conexión prestada al hilo actual."""
+        if self.cursor:
+            self.cursor.close()
+            self.cursor = None
         if self.connection:
-            self.connection.close()
+            self.pool.devolver(self.connection)
             self.connection = None
 
+    @contextmanager
+    def transaction(self):
+        """
+        Ejecuta el bloque `with` como una única transacción.
+
+        Mientras el bloque está activo los métodos no confirman por su cuenta, de
+        modo que todas sus escrituras se confirman juntas al salir (un solo commit)
+        o se revierten juntas si se produce una excepción. Una transacción anidada
+        se une a la exterior.
+
+        Raises:
+            DatabaseError: Si falla la confirmación de la transacción
+        """
+        profundidad = getattr(self._local, 'transaccion', 0)
+        if not profundidad:
+            # Fuera de una transacción la conexión está en autocommit
+            self.connection.autocommit = False
+        self._local.transaccion = profundidad + 1
+        try:
+            yield
+        except BaseException:
+            self._local.transaccion = profundidad
+            if not profundidad:
+                self.connection.rollback()
+                self.connection.autocommit = True
+            raise
+        self._local.transaccion = profundidad
+        if not profundidad:
+            try:
+                self.connection.commit()
+            except Error as e:
+                self.connection.rollback()
+                raise DatabaseError(f"Error al confirmar la transacción: {str(e)}")
+            finally:
+                self.connection.autocommit = True
+
+    def _en_transaccion(self):
+        return getattr(self._local, 'transaccion', 0) > 0
+
+    def _commit(self):
+        """Confirma la operación actual salvo que forme parte de una transacción explícita."""
+        if not self._en_transaccion():
+            self.connection.commit()
+
+    def _rollback(self):
+        # Dentro de una transacción explícita la revierte `transaction()` al propagarse
+        # el error; PostgreSQL rechaza las sentencias siguientes de la transacción abortada.
+        if not self._en_transaccion():
+            self.connection.rollback()
+
     def create_tables(self):
         """
         Crea las tablas necesarias en la base de datos si no existen.
@@ -64,67 +255,71 @@ class PostgresDatabase(DatabaseInterface):
         - productos: Almacena el catálogo de productos
         - ventas: Registra las ventas realizadas
         - detalle_ventas: Almacena los detalles de cada venta
+
+        Después aplica las migraciones pendientes (ver `database.migraciones`).
         
         Raises:
             DatabaseError: Si hay un error al crear las tablas
         """
         try:
-            cursor = self.connection.cursor()
-            
-            # Crear tabla usuarios
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS usuarios (
-                    id SERIAL PRIMARY KEY,
-                    nombre VARCHAR(100) NOT NULL,
-                    rol VARCHAR(50) NOT NULL,
-                    password VARCHAR(100) NOT NULL,
-                    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            # Crear tabla productos
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS productos (
-                    id SERIAL PRIMARY KEY,
-                    nombre VARCHAR(100) NOT NULL,
-                    precio DECIMAL(10,2) NOT NULL,
-                    cantidad INTEGER NOT NULL,
-                    categoria VARCHAR(50) NOT NULL,
-                    stock_minimo INTEGER NOT NULL,
-                    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            # Crear tabla ventas
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS ventas (
-                    id SERIAL PRIMARY KEY,
-                    fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    id_usuario INTEGER REFERENCES usuarios(id),
-                    total DECIMAL(10,2) NOT NULL
-                )
-            """)
-            
-            # Crear tabla detalle_ventas
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS detalle_ventas (
-                    venta_id INTEGER REFERENCES ventas(id),
-                    producto_id INTEGER REFERENCES productos(id),
-                    cantidad INTEGER NOT NULL,
-                    precio DECIMAL(10,2) NOT NULL,
-                    PRIMARY KEY (venta_id, producto_id)
-                )
-            """)
-            
-            self.connection.commit()
-            
+            with self.transaction():
+                self._crear_tablas()
+            # Índices y demás cambios versionados del esquema
+            aplicar_migraciones(self)
             # Actualizar las secuencias después de crear las tablas
             self.actualizar_secuencias()
-            
         except Exception as e:
-            self.connection.rollback()
             raise DatabaseError(f"Error al crear tablas: {e}")
 
+    def _crear_tablas(self):
+        cursor = self.connection.cursor()
+        
+        # Crear tabla usuarios
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS usuarios (
+                id SERIAL PRIMARY KEY,
+                nombre VARCHAR(100) NOT NULL,
+                rol VARCHAR(50) NOT NULL,
+                password VARCHAR(100) NOT NULL,
+                fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
+        # Crear tabla productos
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS productos (
+                id SERIAL PRIMARY KEY,
+                nombre VARCHAR(100) NOT NULL,
+                precio DECIMAL(10,2) NOT NULL,
+                cantidad INTEGER NOT NULL,
+                categoria VARCHAR(50) NOT NULL,
+                stock_minimo INTEGER NOT NULL,
+                fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
+        # Crear tabla ventas
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS ventas (
+                id SERIAL PRIMARY KEY,
+                fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                id_usuario INTEGER REFERENCES usuarios(id),
+                total DECIMAL(10,2) NOT NULL
+            )
+        """)
+        
+        # Crear tabla detalle_ventas
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS detalle_ventas (
+                venta_id INTEGER REFERENCES ventas(id),
+                producto_id INTEGER REFERENCES productos(id),
+                cantidad INTEGER NOT NULL,
+                precio DECIMAL(10,2) NOT NULL,
+                PRIMARY KEY (venta_id, producto_id)
+            )
+        """)
+        cursor.close()
+
     def actualizar_secuencias(self):
         """
         Actualiza las secuencias de autoincremento para que coincidan con el máximo ID actual.
@@ -148,16 +343,18 @@ class PostgresDatabase(DatabaseInterface):
                 SELECT setval('ventas_id_seq', COALESCE((SELECT MAX(id) FROM ventas), 1))
             """)
             
-            self.connection.commit()
+            self._commit()
             cursor.close()
             
         except Exception as e:
-            self.connection.rollback()
+            self._rollback()
             raise DatabaseError(f"Error al actualizar secuencias: {e}")
 
     def execute_query(self, query, params=None):
         """
-        Ejecuta una consulta SQL en la base de datos.
+        Ejecuta una sentencia de escritura y la confirma.
+
+        Dentro de `transaction()` la confirmación se deja para el final del bloque.
         
         Args:
             query (str): Consulta SQL a ejecutar
@@ -175,12 +372,40 @@ class PostgresDatabase(DatabaseInterface):
                 cursor.execute(query, params)
             else:
                 cursor.execute(query)
-            self.connection.commit()
+            self._commit()
             return cursor
         except Error as e:
-            self.connection.rollback()
+            self._rollback()
             raise DatabaseError(f"Error al ejecutar query: {str(e)}")
 
+    def execute_read(self, query, params=None):
+        """
+        Ejecuta una consulta de lectura sin confirmar.
+
+        En autocommit la consulta no abre una transacción, por lo que no hace falta
+        un COMMIT posterior ni queda la conexión "idle in transaction".
+
+        Args:
+            query (str): Consulta SQL a ejecutar
+            params (tuple, optional): Parámetros para la consulta
+
+        Returns:
+            cursor: Cursor con el resultado de la consulta
+
+        Raises:
+            DatabaseError: Si hay un error al ejecutar la consulta
+        """
+        try:
+            cursor = self.connection.cursor()
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
+            return cursor
+        except Error as e:
+            self._rollback()
+            raise DatabaseError(f"Error al ejecutar consulta: {str(e)}")
+
     def fetch_one(self, query, params=None):
         """
         Ejecuta una consulta y retorna un solo resultado.
@@ -192,7 +417,7 @@ class PostgresDatabase(DatabaseInterface):
         Returns:
             tuple: Primera fila del resultado o None si no hay resultados
         """
-        cursor = self.execute_query(query, params)
+        cursor = self.execute_read(query, params)
         result = cursor.fetchone()
         cursor.close()
         return result
@@ -208,7 +433,7 @@ class PostgresDatabase(DatabaseInterface):
         Returns:
             list: Lista de tuplas con todos los resultados
         """
-        cursor = self.execute_query(query, params)
+        cursor = self.execute_read(query, params)
         result = cursor.fetchall()
         cursor.close()
         return result
@@ -270,11 +495,12 @@ class PostgresDatabase(DatabaseInterface):
         """
         try:
             cursor = self.connection.cursor()
-            cursor.execute("DROP TABLE IF EXISTS detalle_ventas, ventas, productos, usuarios CASCADE;")
-            self.connection.commit()
+            cursor.execute("DROP TABLE IF EXISTS detalle_ventas, ventas, productos, usuarios, "
+                           "ventas_diarias, ventas_producto_dia, schema_version CASCADE;")
+            self._commit()
             cursor.close()
         except Exception as e:
-            self.connection.rollback()
+            self._rollback()
             raise DatabaseError(f"Error al eliminar tablas: {e}")
 
     # USUARIOS
@@ -289,11 +515,11 @@ class PostgresDatabase(DatabaseInterface):
                 (user_data['nombre'], user_data['rol'], user_data['password'])
             )
             user_id = cursor.fetchone()[0]
-            self.connection.commit()
+            self._commit()
             cursor.close()
             return user_id
         except Exception as e:
-            self.connection.rollback()
+            self._rollback()
             raise DatabaseError(f"Error al insertar usuario: {e}")
 
     def create_user(self, user_data):
@@ -327,27 +553,35 @@ class PostgresDatabase(DatabaseInterface):
                 "UPDATE usuarios SET nombre=%s, rol=%s, password=%s WHERE id=%s",
                 (user_data['nombre'], user_data['rol'], user_data['password'], user_id)
             )
-            self.connection.commit()
+            self._commit()
             cursor.close()
             return True
         except Exception as e:
-            self.connection.rollback()
+            self._rollback()
             raise DatabaseError(f"Error al actualizar usuario: {e}")
 
     def delete_user(self, user_id):
         try:
             cursor = self.connection.cursor()
             cursor.execute("DELETE FROM usuarios WHERE id=%s", (user_id,))
-            self.connection.commit()
+            self._commit()
             cursor.close()
             return True
         except Exception as e:
-            self.connection.rollback()
+            self._rollback()
             raise DatabaseError(f"Error al eliminar usuario: {e}")
 
     # PRODUCTOS
     def insert_product(self, product_data):
-        print("DEBUG insert_product:", product_data)
+        """
+        Inserta un producto y retorna su ID.
+
+        El nombre es único (índice `idx_productos_nombre`, migración 3).
+
+        Raises:
+            ProductoDuplicadoError: Si ya existe un producto con el mismo nombre
+            DatabaseError: Si falla la inserción por otro motivo
+        """
         try:
             # Eliminar el campo 'id' si existe
             product_data = product_data.copy()
@@ -358,13 +592,57 @@ class PostgresDatabase(DatabaseInterface):
                 (product_data['nombre'], product_data['precio'], product_data['cantidad'], product_data['categoria'], product_data['stock_minimo'])
             )
             product_id = cursor.fetchone()[0]
-            self.connection.commit()
+            self._commit()
             cursor.close()
             return product_id
+        except UniqueViolation:
+            self._rollback()
+            raise ProductoDuplicadoError(f"El producto con nombre '{product_data['nombre']}' ya existe en el inventario.")
         except Exception as e:
-            self.connection.rollback()
+            self._rollback()
             raise DatabaseError(f"Error al insertar producto: {e}")
 
+    def upsert_products(self, products):
+        """
+        Inserta o actualiza productos por nombre con un único INSERT de varias filas.
+
+        Los productos cuyo nombre ya existe actualizan precio, cantidad, categoría y
+        stock mínimo. Los nombres no deben repetirse dentro de la misma llamada.
+
+        Args:
+            products (list): Diccionarios con nombre, precio, cantidad, categoria y stock_minimo
+
+        Returns:
+            int: Cantidad de productos insertados o actualizados
+
+        Raises:
+            DatabaseError: Si hay un error al guardar los productos
+        """
+        if not products:
+            return 0
+        try:
+            cursor = self.connection.cursor()
+            execute_values(
+                cursor,
+                """
+                INSERT INTO productos (nombre, precio, cantidad, categoria, stock_minimo) VALUES %s
+                ON CONFLICT (nombre) DO UPDATE SET
+                    precio = EXCLUDED.precio,
+                    cantidad = EXCLUDED.cantidad,
+                    categoria = EXCLUDED.categoria,
+                    stock_minimo = EXCLUDED.stock_minimo
+                """,
+                [(p['nombre'], p['precio'], p['cantidad'], p['categoria'], p['stock_minimo']) for p in products],
+                page_size=max(len(products), 100)
+            )
+            guardados = cursor.rowcount
+            self._commit()
+            cursor.close()
+            return guardados
+        except Exception as e:
+            self._rollback()
+            raise DatabaseError(f"Error al importar productos: {e}")
+
     def get_product(self, product_id):
         try:
             cursor = self.connection.cursor()
@@ -385,6 +663,32 @@ class PostgresDatabase(DatabaseInterface):
         except Exception as e:
             raise DatabaseError(f"Error al obtener producto: {e}")
 
+    def get_products(self, product_ids):
+        """
+        Obtiene varios productos por ID en una sola consulta.
+
+        Args:
+            product_ids (list): IDs de los productos
+
+        Returns:
+            dict: Productos por ID; los IDs inexistentes no aparecen
+        """
+        ids = list(set(product_ids))
+        if not ids:
+            return {}
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute(
+                "SELECT id, nombre, precio, cantidad, categoria, stock_minimo, fecha_creacion FROM productos "
+                "WHERE id = ANY(%s)",
+                (ids,)
+            )
+            productos = {row[0]: _fila_producto(row) for row in cursor.fetchall()}
+            cursor.close()
+            return productos
+        except Exception as e:
+            raise DatabaseError(f"Error al obtener productos: {e}")
+
     def update_product(self, product_id, product_data):
         try:
             cursor = self.connection.cursor()
@@ -392,35 +696,76 @@ class PostgresDatabase(DatabaseInterface):
                 "UPDATE productos SET nombre=%s, precio=%s, cantidad=%s, categoria=%s, stock_minimo=%s WHERE id=%s",
                 (product_data['nombre'], product_data['precio'], product_data['cantidad'], product_data['categoria'], product_data['stock_minimo'], product_id)
             )
-            self.connection.commit()
+            self._commit()
             cursor.close()
             return True
         except Exception as e:
-            self.connection.rollback()
+            self._rollback()
             raise DatabaseError(f"Error al actualizar producto: {e}")
 
     def delete_product(self, product_id):
         try:
             cursor = self.connection.cursor()
             cursor.execute("DELETE FROM productos WHERE id=%s", (product_id,))
-            self.connection.commit()
+            self._commit()
             cursor.close()
             return True
         except Exception as e:
-            self.connection.rollback()
+            self._rollback()
             raise DatabaseError(f"Error al eliminar producto: {e}")
 
     def update_stock(self, product_id, quantity):
         try:
             cursor = self.connection.cursor()
             cursor.execute("UPDATE productos SET cantidad=%s WHERE id=%s", (quantity, product_id))
-            self.connection.commit()
+            self._commit()
             cursor.close()
             return True
         except Exception as e:
-            self.connection.rollback()
+            self._rollback()
             raise DatabaseError(f"Error al actualizar stock: {e}")
 
+    def decrement_stock(self, product_id, quantity):
+        """
+        Descuenta stock en una sola sentencia condicionada a que haya suficiente.
+
+        Evita la carrera de leer y luego escribir el stock cuando hay ventas concurrentes.
+
+        Returns:
+            int: Stock resultante
+
+        Raises:
+            StockInsuficienteError: Si el producto no existe o no tiene stock suficiente
+        """
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute(
+                "UPDATE productos SET cantidad = cantidad - %s WHERE id = %s AND cantidad >= %s RETURNING cantidad",
+                (quantity, product_id, quantity)
+            )
+            row = cursor.fetchone()
+            self._commit()
+            cursor.close()
+        except Exception as e:
+            self._rollback()
+            raise DatabaseError(f"Error al descontar stock: {e}")
+        if row is None:
+            CONFLICTOS_STOCK.incrementar()
+            raise StockInsuficienteError(f"Stock insuficiente para el producto con ID {product_id}.")
+        return row[0]
+
+    def increment_stock(self, product_id, quantity):
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute("UPDATE productos SET cantidad = cantidad + %s WHERE id = %s", (quantity, product_id))
+            actualizado = cursor.rowcount > 0
+            self._commit()
+            cursor.close()
+            return actualizado
+        except Exception as e:
+            self._rollback()
+            raise DatabaseError(f"Error al sumar stock: {e}")
+
     # VENTAS
     def insert_sale(self, sale_data):
         """
@@ -462,12 +807,38 @@ class PostgresDatabase(DatabaseInterface):
                 "INSERT INTO detalle_ventas (venta_id, producto_id, cantidad, precio) VALUES (%s, %s, %s, %s)",
                 (detail_data['venta_id'], detail_data['producto_id'], detail_data['cantidad'], detail_data['precio'])
             )
-            self.connection.commit()
+            self._commit()
             cursor.close()
         except Exception as e:
-            self.connection.rollback()
+            self._rollback()
             raise DatabaseError(f"Error al insertar detalle de venta: {e}")
 
+    def insert_sale_details(self, details):
+        """
+        Inserta todos los detalles de una venta con un único INSERT de varias filas.
+
+        Args:
+            details (list): Diccionarios con venta_id, producto_id, cantidad y precio
+
+        Raises:
+            DatabaseError: Si hay un error al insertar los detalles
+        """
+        if not details:
+            return
+        try:
+            cursor = self.connection.cursor()
+            execute_values(
+                cursor,
+                "INSERT INTO detalle_ventas (venta_id, producto_id, cantidad, precio) VALUES %s",
+                [(d['venta_id'], d['producto_id'], d['cantidad'], d['precio']) for d in details],
+                page_size=max(len(details), 100)
+            )
+            self._commit()
+            cursor.close()
+        except Exception as e:
+            self._rollback()
+            raise DatabaseError(f"Error al insertar detalles de venta: {e}")
+
     def get_sale(self, sale_id):
         try:
             cursor = self.connection.cursor()
@@ -503,20 +874,61 @@ class PostgresDatabase(DatabaseInterface):
         except Exception as e:
             raise DatabaseError(f"Error al obtener detalles de venta: {e}")
 
-    def get_all_sales(self):
+    def get_sale_details_for_sales(self, sale_ids):
+        if not sale_ids:
+            return []
         try:
             cursor = self.connection.cursor()
-            cursor.execute("SELECT id, fecha, id_usuario, total FROM ventas")
+            cursor.execute("""
+                SELECT dv.venta_id, dv.producto_id, dv.cantidad, dv.precio, p.nombre
+                FROM detalle_ventas dv
+                LEFT JOIN productos p ON p.id = dv.producto_id
+                WHERE dv.venta_id = ANY(%s)
+                ORDER BY dv.venta_id, dv.producto_id
+            """, (list(sale_ids),))
             rows = cursor.fetchall()
-            ventas = []
+            detalles = []
             for row in rows:
-                ventas.append({
-                    'id': row[0],
-                    'fecha': row[1],
-                    'id_usuario': row[2],
-                    'total': float(row[3])
+                detalles.append({
+                    'venta_id': row[0],
+                    'producto_id': row[1],
+                    'cantidad': row[2],
+                    'precio': float(row[3]),
+                    'producto_nombre': row[4]
                 })
             cursor.close()
+            return detalles
+        except Exception as e:
+            raise DatabaseError(f"Error al obtener detalles de ventas: {e}")
+
+    def product_has_sales(self, product_id):
+        """
+        Indica si el producto aparece en algún detalle de venta.
+
+        `EXISTS` se detiene en la primera fila que encuentra con el índice
+        `idx_detalle_ventas_producto_id`, sin recorrer la tabla.
+
+        Args:
+            product_id (int): ID del producto
+
+        Returns:
+            bool: True si hay al menos una venta con el producto
+        """
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute("SELECT EXISTS(SELECT 1 FROM detalle_ventas WHERE producto_id = %s)", (product_id,))
+            existe = cursor.fetchone()[0]
+            cursor.close()
+            return existe
+        except Exception as e:
+            raise DatabaseError(f"Error al verificar ventas del producto: {e}")
+
+    def get_all_sales(self):
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute("SELECT id, fecha, id_usuario, total FROM ventas")
+            ventas = [_fila_venta(row) for row in cursor.fetchall()]
+            cursor.close()
             return ventas
         except Exception as e:
             raise DatabaseError(f"Error al obtener ventas: {e}")
@@ -525,20 +937,109 @@ class PostgresDatabase(DatabaseInterface):
         try:
             cursor = self.connection.cursor()
             cursor.execute("SELECT venta_id, producto_id, cantidad, precio FROM detalle_ventas")
-            rows = cursor.fetchall()
-            detalles = []
-            for row in rows:
-                detalles.append({
-                    'venta_id': row[0],
-                    'producto_id': row[1],
-                    'cantidad': row[2],
-                    'precio': float(row[3])
-                })
+            detalles = [_fila_detalle(row) for row in cursor.fetchall()]
             cursor.close()
             return detalles
         except Exception as e:
             raise DatabaseError(f"Error al obtener detalles de ventas: {e}")
 
+    def get_sales_history(self):
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute(CONSULTA_HISTORIAL + ORDEN_HISTORIAL)
+            historial = [_fila_historial(row) for row in cursor.fetchall()]
+            cursor.close()
+            return historial
+        except Exception as e:
+            raise DatabaseError(f"Error al obtener historial de ventas: {e}")
+
+    # LECTURAS POR STREAMING
+    def _iterar(self, consulta, convertir, params=None, itersize=None):
+        """
+        Recorre el resultado de una consulta con un cursor con nombre (del lado del servidor).
+
+        El servidor envía las filas en bloques de `itersize`, así que la memoria usada
+        no depende del tamaño de la tabla. Los cursores con nombre necesitan una
+        transacción abierta mientras se consume el generador:
+
+        - Dentro de `transaction()` se usa la conexión del hilo, para ver sus cambios
+          aún no confirmados; el cursor vive hasta el final de esa transacción.
+        - Fuera de ella cada recorrido toma su propia conexión del pool con su propia
+          transacción, de modo que varios generadores del mismo hilo pueden
+          intercalarse sin que uno confirme (y cierre) el cursor de otro.
+
+        Yields:
+            dict: Cada fila convertida con `convertir`
+        """
+        propia = not self._en_transaccion()
+        try:
+            conexion = self.pool.obtener() if propia else self.connection
+        except Error as e:
+            raise DatabaseError(f"Error al recorrer resultados: {e}")
+        try:
+            if propia:
+                conexion.autocommit = False
+            cursor = conexion.cursor(name=f"iter_{next(_nombres_cursor)}")
+            cursor.itersize = itersize or self.itersize
+            try:
+                cursor.execute(consulta, params)
+                for row in cursor:
+                    yield convertir(row)
+            finally:
+                cursor.close()
+        except Error as e:
+            raise DatabaseError(f"Error al recorrer resultados: {e}")
+        finally:
+            if propia:
+                # Solo lectura: no hay nada que confirmar
+                try:
+                    conexion.rollback()
+                    conexion.autocommit = True
+                except Error:
+                    pass  # El pool descarta la conexión si quedó inutilizable
+                self.pool.devolver(conexion)
+
+    def iter_products(self):
+        return self._iterar(
+            "SELECT id, nombre, precio, cantidad, categoria, stock_minimo, fecha_creacion FROM productos ORDER BY id",
+            _fila_producto
+        )
+
+    def iter_sales(self):
+        return self._iterar("SELECT id, fecha, id_usuario, total FROM ventas ORDER BY id", _fila_venta)
+
+    def iter_sale_details(self):
+        return self._iterar(
+            "SELECT venta_id, producto_id, cantidad, precio FROM detalle_ventas ORDER BY venta_id, producto_id",
+            _fila_detalle
+        )
+
+    def iter_sales_history(self, date_from=None, date_to=None, user_id=None):
+        """
+        Recorre el historial de ventas filtrado con un cursor del lado del servidor.
+
+        Args:
+            date_from (datetime, optional): Fecha mínima de la venta (inclusive)
+            date_to (datetime, optional): Fecha máxima de la venta (exclusiva)
+            user_id (int, optional): Usuario que registró la venta
+
+        Returns:
+            generator: Filas con el formato de `get_sales_history`
+        """
+        condiciones = []
+        params = []
+        if date_from is not None:
+            condiciones.append("v.fecha >= %s")
+            params.append(date_from)
+        if date_to is not None:
+            condiciones.append("v.fecha < %s")
+            params.append(date_to)
+        if user_id is not None:
+            condiciones.append("v.id_usuario = %s")
+            params.append(user_id)
+        where = f" WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        return self._iterar(CONSULTA_HISTORIAL + where + ORDEN_HISTORIAL, _fila_historial, params or None)
+
     def get_sales_by_user(self, user_id):
         try:
             cursor = self.connection.cursor()
@@ -585,10 +1086,10 @@ class PostgresDatabase(DatabaseInterface):
             cursor = self.connection.cursor()
             cursor.execute("DELETE FROM detalle_ventas;")
             cursor.execute("DELETE FROM ventas;")
-            self.connection.commit()
+            self._commit()
             cursor.close()
         except Exception as e:
-            self.connection.rollback()
+            self._rollback()
             raise DatabaseError(f"Error al eliminar todas las ventas: {e}")
 
     def get_all_users(self):
@@ -615,24 +1116,212 @@ class PostgresDatabase(DatabaseInterface):
         try:
             cursor = self.connection.cursor()
             cursor.execute("SELECT id, nombre, precio, cantidad, categoria, stock_minimo, fecha_creacion FROM productos")
-            rows = cursor.fetchall()
-            productos = []
-            for row in rows:
-                productos.append({
-                    'id': row[0],
-                    'nombre': row[1],
-                    'precio': float(row[2]),
-                    'cantidad': row[3],
-                    'categoria': row[4],
-                    'stock_minimo': row[5],
-                    'fecha_creacion': row[6]
-                })
+            productos = [_fila_producto(row) for row in cursor.fetchall()]
             cursor.close()
             return productos
         except Exception as e:
             print(f"Error al obtener productos: {e}")
             return []
 
+    def get_products_by_names(self, names):
+        """
+        Obtiene en una sola consulta los productos con los nombres indicados.
+
+        Usa el índice único sobre `nombre` en lugar de recorrer el catálogo completo.
+
+        Args:
+            names (list): Nombres de los productos
+
+        Returns:
+            dict: Productos por nombre; los nombres inexistentes no aparecen
+        """
+        nombres = list(set(names))
+        if not nombres:
+            return {}
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute(
+                "SELECT id, nombre, precio, cantidad, categoria, stock_minimo, fecha_creacion FROM productos "
+                "WHERE nombre = ANY(%s)",
+                (nombres,)
+            )
+            productos = {row[1]: _fila_producto(row) for row in cursor.fetchall()}
+            cursor.close()
+            return productos
+        except Exception as e:
+            raise DatabaseError(f"Error al obtener productos por nombre: {e}")
+
+    def get_low_stock_products(self, limit, category=None, after_id=None):
+        """
+        Obtiene productos con stock bajo filtrando en la base de datos.
+
+        Usa los índices parciales sobre `cantidad <= stock_minimo`, por lo que solo
+        se leen los productos con stock bajo y no el catálogo completo.
+
+        Args:
+            limit (int): Máximo de productos a retornar
+            category (str, optional): Categoría por la que filtrar
+            after_id (int, optional): Retorna solo productos con ID mayor
+
+        Returns:
+            list: Productos ordenados por ID
+        """
+        condiciones = ["cantidad <= stock_minimo"]
+        params = []
+        if category is not None:
+            condiciones.append("categoria = %s")
+            params.append(category)
+        if after_id is not None:
+            condiciones.append("id > %s")
+            params.append(after_id)
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute(
+                "SELECT id, nombre, precio, cantidad, categoria, stock_minimo, fecha_creacion FROM productos "
+                f"WHERE {' AND '.join(condiciones)} ORDER BY id LIMIT %s",
+                params + [limit]
+            )
+            productos = [_fila_producto(row) for row in cursor.fetchall()]
+            cursor.close()
+            return productos
+        except Exception as e:
+            raise DatabaseError(f"Error al obtener productos con stock bajo: {e}")
+
+    # RESÚMENES DE VENTAS
+    def _resumen(self, consulta, agrupar, orden, date_from, date_to):
+        """
+        Ejecuta una consulta sobre una tabla de resumen (alias `r`) filtrando por día.
+        """
+        condiciones = []
+        params = []
+        if date_from is not None:
+            condiciones.append("r.dia >= %s")
+            params.append(date_from)
+        if date_to is not None:
+            condiciones.append("r.dia < %s")
+            params.append(date_to)
+        donde = f" WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        try:
+            return self.fetch_all(f"{consulta}{donde} GROUP BY {agrupar} ORDER BY {orden}", params)
+        except Exception as e:
+            raise DatabaseError(f"Error al obtener el resumen de ventas: {e}")
+
+    def get_total_revenue(self):
+        try:
+            fila = self.fetch_one("SELECT COALESCE(SUM(total), 0) FROM ventas_diarias")
+            return float(fila[0])
+        except Exception as e:
+            raise DatabaseError(f"Error al obtener el total de ventas: {e}")
+
+    def get_revenue_by_day(self, date_from=None, date_to=None):
+        filas = self._resumen(
+            "SELECT r.dia, SUM(r.num_ventas), SUM(r.total) FROM ventas_diarias r",
+            "r.dia", "r.dia", date_from, date_to
+        )
+        return [{'dia': f[0], 'num_ventas': int(f[1]), 'total': float(f[2])} for f in filas]
+
+    def get_revenue_by_user(self, date_from=None, date_to=None):
+        filas = self._resumen(
+            "SELECT r.id_usuario, u.nombre, SUM(r.num_ventas), SUM(r.total) "
+            "FROM ventas_diarias r LEFT JOIN usuarios u ON u.id = r.id_usuario",
+            "r.id_usuario, u.nombre", "4 DESC, 1", date_from, date_to
+        )
+        return [{'id_usuario': f[0] or None, 'nombre': f[1], 'num_ventas': int(f[2]), 'total': float(f[3])}
+                for f in filas]
+
+    def get_revenue_by_product(self, date_from=None, date_to=None):
+        filas = self._resumen(
+            "SELECT r.producto_id, p.nombre, SUM(r.cantidad), SUM(r.total) "
+            "FROM ventas_producto_dia r LEFT JOIN productos p ON p.id = r.producto_id",
+            "r.producto_id, p.nombre", "4 DESC, 1", date_from, date_to
+        )
+        return [{'producto_id': f[0], 'nombre': f[1], 'cantidad': int(f[2]), 'total': float(f[3])}
+                for f in filas]
+
+    def get_revenue_by_category(self, date_from=None, date_to=None):
+        filas = self._resumen(
+            "SELECT p.categoria, SUM(r.cantidad), SUM(r.total) "
+            "FROM ventas_producto_dia r JOIN productos p ON p.id = r.producto_id",
+            "p.categoria", "3 DESC, 1", date_from, date_to
+        )
+        return [{'categoria': f[0], 'cantidad': int(f[1]), 'total': float(f[2])} for f in filas]
+
+    # PAGINACIÓN
+    def _obtener_pagina(self, tabla, columnas, orden, convertir, limit, offset, after_id, with_total):
+        """
+        Ejecuta una consulta paginada con orden estable por las columnas de `orden`.
+
+        Se pide una fila adicional para saber si existe una página siguiente sin contar
+        toda la tabla; el conteo solo se hace si se solicita con `with_total`.
+
+        Returns:
+            dict: 'items', 'next_after_id' y 'total'
+        """
+        consulta, params = _consulta_pagina(tabla, columnas, orden, limit, offset, after_id)
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute(consulta, params)
+            rows = cursor.fetchall()
+            total = None
+            if with_total:
+                cursor.execute(f"SELECT COUNT(*) FROM {tabla}")
+                total = cursor.fetchone()[0]
+            cursor.close()
+            return _armar_pagina(rows, limit, orden, convertir, total)
+        except Exception as e:
+            raise DatabaseError(f"Error al obtener página de {tabla}: {e}")
+
+    def get_products_page(self, limit, offset=0, after_id=None, with_total=False):
+        return self._obtener_pagina(
+            'productos', 'id, nombre, precio, cantidad, categoria, stock_minimo, fecha_creacion', ['id'],
+            _fila_producto,
+            limit, offset, after_id, with_total
+        )
+
+    def get_sales_page(self, limit, offset=0, after_id=None, with_total=False):
+        return self._obtener_pagina(
+            'ventas', 'id, fecha, id_usuario, total', ['id'],
+            _fila_venta,
+            limit, offset, after_id, with_total
+        )
+
+    def get_users_page(self, limit, offset=0, after_id=None, with_total=False):
+        return self._obtener_pagina(
+            'usuarios', 'id, nombre, rol, password, fecha_creacion', ['id'],
+            lambda row: {
+                'id': row[0],
+                'nombre': row[1],
+                'rol': row[2],
+                'password': row[3],
+                'fecha_creacion': row[4]
+            },
+            limit, offset, after_id, with_total
+        )
+
+    def get_sale_details_page(self, limit, offset=0, after_id=None, with_total=False):
+        return self._obtener_pagina(
+            'detalle_ventas', 'venta_id, producto_id, cantidad, precio', ['venta_id', 'producto_id'],
+            _fila_detalle,
+            limit, offset, after_id, with_total
+        )
+
+    def get_table_versions(self):
+        """
+        Obtiene las versiones de las tablas: el último valor de las secuencias
+        `version_<tabla>` que avanza el trigger `notificar_cambios`.
+
+        Returns:
+            dict: Nombre de la tabla -> versión
+        """
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute(CONSULTA_VERSIONES)
+            versiones = dict(cursor.fetchall())
+            cursor.close()
+            return versiones
+        except Exception as e:
+            raise DatabaseError(f"Error al obtener las versiones de las tablas: {e}")
+
     def create_sale(self, sale_data):
         return self.insert_sale(sale_data)
 
@@ -663,16 +1352,15 @@ class PostgresDatabase(DatabaseInterface):
         Elimina una venta y sus detalles de la base de datos.
         """
         try:
-            cursor = self.connection.cursor()
-            # Eliminar detalles de la venta
-            cursor.execute("DELETE FROM detalle_ventas WHERE venta_id = %s", (sale_id,))
-            # Eliminar la venta
-            cursor.execute("DELETE FROM ventas WHERE id = %s", (sale_id,))
-            self.connection.commit()
-            cursor.close()
+            with self.transaction():
+                cursor = self.connection.cursor()
+                # Eliminar detalles de la venta
+                cursor.execute("DELETE FROM detalle_ventas WHERE venta_id = %s", (sale_id,))
+                # Eliminar la venta
+                cursor.execute("DELETE FROM ventas WHERE id = %s", (sale_id,))
+                cursor.close()
             return True
         except Exception as e:
-            self.connection.rollback()
             raise DatabaseError(f"Error al eliminar venta: {e}")
 
     def tables_exist(self):
@@ -688,9 +1376,6 @@ class PostgresDatabase(DatabaseInterface):
 
     def close(self):
         """
-        Cierra la conexión a la base de datos.
+        Libera la conexión del hilo actual devolviéndola al pool.
         """
-        if self.cursor:
-            self.cursor.close()
-        if self.connection:
-            self.connection.close() 
\ No newline at end of file
+        self.disconnect()
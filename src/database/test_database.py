@@ -1,7 +1,14 @@
-from typing import Dict, Any, List, Optional
-from src.database.database_interface import DatabaseInterface
-from src.errores.usuario_duplicado import UsuarioDuplicadoError
-from src.errores.productos_duplicados import ProductoDuplicadoError
+import asyncio
+import contextvars
+import copy
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime
+from typing import Dict, Any, Iterator, List, Optional
+from database.async_database_interface import AsyncDatabaseInterface
+from database.database_interface import DatabaseInterface
+from errores.usuario_duplicado import UsuarioDuplicadoError
+from errores.productos_duplicados import ProductoDuplicadoError
+from errores.stock_insuficiente import StockInsuficienteError
 
 class DatabaseTest(DatabaseInterface):
     """Implementación de base de datos en memoria para pruebas."""
@@ -12,6 +19,8 @@ class DatabaseTest(DatabaseInterface):
         self.ventas = {}
         self.detalle_ventas = {}  # {(venta_id, producto_id): detalle}
         self.next_id = 1
+        self.versiones = {}  # Tabla -> versión, como las secuencias version_<tabla> en PostgreSQL
+        self._profundidad_transaccion = 0
     
     def connect(self) -> None:
         """No es necesario conectar en la base de datos de prueba."""
@@ -20,6 +29,37 @@ class DatabaseTest(DatabaseInterface):
     def disconnect(self) -> None:
         """No es necesario desconectar en la base de datos de prueba."""
         pass
+
+    def close(self) -> None:
+        """No es necesario cerrar la base de datos de prueba."""
+        pass
+    
+    @contextmanager
+    def transaction(self):
+        """Guarda una copia de los datos y la restaura si el bloque falla."""
+        if self._profundidad_transaccion:
+            self._profundidad_transaccion += 1
+            try:
+                yield
+            finally:
+                self._profundidad_transaccion -= 1
+            return
+        copia = copy.deepcopy((self.usuarios, self.productos, self.ventas, self.detalle_ventas, self.next_id,
+                               self.versiones))
+        self._profundidad_transaccion = 1
+        try:
+            yield
+        except BaseException:
+            (self.usuarios, self.productos, self.ventas, self.detalle_ventas, self.next_id,
+             self.versiones) = copia
+            raise
+        finally:
+            self._profundidad_transaccion = 0
+    
+    def _modificado(self, *tablas):
+        """Incrementa la versión de las tablas modificadas (en cada escritura, no por transacción)."""
+        for tabla in tablas:
+            self.versiones[tabla] = self.versiones.get(tabla, 0) + 1
     
     def create_tables(self) -> None:
         """No es necesario crear tablas en la base de datos de prueba."""
@@ -32,6 +72,7 @@ class DatabaseTest(DatabaseInterface):
         self.ventas.clear()
         self.detalle_ventas.clear()
         self.next_id = 1
+        self._modificado('usuarios', 'productos', 'ventas', 'detalle_ventas')
     
     def create_user(self, user_data):
         """Crea un nuevo usuario y retorna su ID."""
@@ -43,6 +84,7 @@ class DatabaseTest(DatabaseInterface):
         user = user_data.copy()
         user['id'] = user_id
         self.usuarios[user_id] = user
+        self._modificado('usuarios')
         return user_id
     
     def get_user(self, user_id: int) -> Optional[Dict[str, Any]]:
@@ -52,11 +94,13 @@ class DatabaseTest(DatabaseInterface):
         if user_id not in self.usuarios:
             return False
         self.usuarios[user_id].update(user_data)
+        self._modificado('usuarios')
         return True
     
     def delete_user(self, user_id: int) -> bool:
         if user_id in self.usuarios:
             del self.usuarios[user_id]
+            self._modificado('usuarios')
             return True
         return False
     
@@ -73,20 +117,37 @@ class DatabaseTest(DatabaseInterface):
         product = product_data.copy()
         product['id'] = product_id
         self.productos[product_id] = product
+        self._modificado('productos')
         return product_id
     
+    def upsert_products(self, products: List[Dict[str, Any]]) -> int:
+        por_nombre = {p['nombre']: p for p in self.productos.values()}
+        for product_data in products:
+            existente = por_nombre.get(product_data['nombre'])
+            if existente:
+                existente.update(product_data)
+                self._modificado('productos')
+            else:
+                self.create_product(product_data)
+        return len(products)
+    
     def get_product(self, product_id: int) -> Optional[Dict[str, Any]]:
         return self.productos.get(product_id)
     
+    def get_products(self, product_ids) -> Dict[int, Dict[str, Any]]:
+        return {i: self.productos[i] for i in product_ids if i in self.productos}
+    
     def update_product(self, product_id: int, product_data: Dict[str, Any]) -> bool:
         if product_id not in self.productos:
             return False
         self.productos[product_id].update(product_data)
+        self._modificado('productos')
         return True
     
     def delete_product(self, product_id: int) -> bool:
         if product_id in self.productos:
             del self.productos[product_id]
+            self._modificado('productos')
             return True
         return False
     
@@ -97,6 +158,22 @@ class DatabaseTest(DatabaseInterface):
         if product_id not in self.productos:
             return False
         self.productos[product_id]['cantidad'] += quantity
+        self._modificado('productos')
+        return True
+    
+    def decrement_stock(self, product_id: int, quantity: int) -> int:
+        producto = self.productos.get(product_id)
+        if producto is None or producto['cantidad'] < quantity:
+            raise StockInsuficienteError(f"Stock insuficiente para el producto con ID {product_id}.")
+        producto['cantidad'] -= quantity
+        self._modificado('productos')
+        return producto['cantidad']
+    
+    def increment_stock(self, product_id: int, quantity: int) -> bool:
+        if product_id not in self.productos:
+            return False
+        self.productos[product_id]['cantidad'] += quantity
+        self._modificado('productos')
         return True
     
     def create_sale(self, sale_data: Dict[str, Any]) -> int:
@@ -105,8 +182,13 @@ class DatabaseTest(DatabaseInterface):
         sale = sale_data.copy()
         sale['id'] = sale_id
         self.ventas[sale_id] = sale
+        self._modificado('ventas')
         return sale_id
     
+    def insert_sale_details(self, details: List[Dict[str, Any]]) -> None:
+        for detail_data in details:
+            self.insert_sale_detail(detail_data)
+    
     def insert_sale_detail(self, detail_data: Dict[str, Any]) -> None:
         venta_id = detail_data['venta_id']
         producto_id = detail_data['producto_id']
@@ -117,6 +199,7 @@ class DatabaseTest(DatabaseInterface):
             'cantidad': detail_data['cantidad'],
             'precio': detail_data['precio']
         }
+        self._modificado('detalle_ventas')
     
     def get_sale(self, sale_id: int) -> Optional[Dict[str, Any]]:
         if sale_id not in self.ventas:
@@ -138,6 +221,14 @@ class DatabaseTest(DatabaseInterface):
                 detalles.append(detalle_copy)
         return detalles
     
+    def get_sale_details_for_sales(self, sale_ids: List[int]) -> List[Dict[str, Any]]:
+        ids = set(sale_ids)
+        detalles = [d for d in self.get_all_sale_details() if d['venta_id'] in ids]
+        return sorted(detalles, key=lambda d: (d['venta_id'], d['producto_id']))
+    
+    def product_has_sales(self, product_id: int) -> bool:
+        return any(p_id == product_id for _, p_id in self.detalle_ventas)
+    
     def get_all_sales(self) -> List[Dict[str, Any]]:
         return [self.get_sale(sale_id) for sale_id in self.ventas]
     
@@ -151,6 +242,48 @@ class DatabaseTest(DatabaseInterface):
             detalles.append(detalle_copy)
         return detalles
     
+    def iter_products(self) -> Iterator[Dict[str, Any]]:
+        for product_id in sorted(self.productos):
+            yield self.productos[product_id].copy()
+    
+    def iter_sales(self) -> Iterator[Dict[str, Any]]:
+        for sale_id in sorted(self.ventas):
+            yield self.get_sale(sale_id)
+    
+    def iter_sale_details(self) -> Iterator[Dict[str, Any]]:
+        for clave in sorted(self.detalle_ventas):
+            yield self.detalle_ventas[clave].copy()
+    
+    def get_sales_history(self) -> List[Dict[str, Any]]:
+        return list(self.iter_sales_history())
+    
+    def iter_sales_history(self, date_from=None, date_to=None, user_id=None) -> Iterator[Dict[str, Any]]:
+        for sale_id in sorted(self.ventas):
+            venta = self.ventas[sale_id]
+            if ((date_from is not None and venta['fecha'] < date_from)
+                    or (date_to is not None and venta['fecha'] >= date_to)
+                    or (user_id is not None and venta['id_usuario'] != user_id)):
+                continue
+            usuario = self.usuarios.get(venta['id_usuario'])
+            fila_venta = {
+                'venta_id': sale_id,
+                'fecha': venta['fecha'],
+                'id_usuario': venta['id_usuario'],
+                'usuario_nombre': usuario['nombre'] if usuario else None,
+                'total': venta['total']
+            }
+            detalles = sorted(self.get_sale_details(sale_id), key=lambda d: d['producto_id'])
+            if not detalles:
+                yield dict(fila_venta, producto_id=None, producto_nombre=None, cantidad=None, precio=None)
+            for detalle in detalles:
+                yield dict(
+                    fila_venta,
+                    producto_id=detalle['producto_id'],
+                    producto_nombre=detalle.get('producto_nombre'),
+                    cantidad=detalle['cantidad'],
+                    precio=detalle['precio']
+                )
+    
     def get_sales_by_user(self, user_id: int) -> List[Dict[str, Any]]:
         return [venta for venta in self.get_all_sales() if venta['id_usuario'] == user_id]
     
@@ -163,15 +296,208 @@ class DatabaseTest(DatabaseInterface):
     def delete_all_sales(self) -> None:
         self.ventas.clear()
         self.detalle_ventas.clear()
+        self._modificado('ventas', 'detalle_ventas')
+    
+    @staticmethod
+    def _dia(fecha):
+        if isinstance(fecha, str):
+            fecha = datetime.fromisoformat(fecha)
+        return fecha.date() if isinstance(fecha, datetime) else fecha
+    
+    def _en_rango(self, fecha, date_from, date_to):
+        dia = self._dia(fecha)
+        return (date_from is None or dia >= self._dia(date_from)) and (date_to is None or dia < self._dia(date_to))
+    
+    @staticmethod
+    def _ordenar_por_total(filas):
+        return sorted(filas, key=lambda f: -f['total'])
+    
+    def get_total_revenue(self) -> float:
+        return float(sum(v['total'] for v in self.ventas.values()))
+    
+    def get_revenue_by_day(self, date_from=None, date_to=None) -> List[Dict[str, Any]]:
+        dias = {}
+        for v in self.ventas.values():
+            if self._en_rango(v['fecha'], date_from, date_to):
+                dia = self._dia(v['fecha'])
+                fila = dias.setdefault(dia, {'dia': dia, 'num_ventas': 0, 'total': 0.0})
+                fila['num_ventas'] += 1
+                fila['total'] += v['total']
+        return [dias[dia] for dia in sorted(dias)]
+    
+    def get_revenue_by_user(self, date_from=None, date_to=None) -> List[Dict[str, Any]]:
+        usuarios = {}
+        for v in self.ventas.values():
+            if self._en_rango(v['fecha'], date_from, date_to):
+                usuario = self.usuarios.get(v['id_usuario'])
+                fila = usuarios.setdefault(v['id_usuario'], {
+                    'id_usuario': v['id_usuario'], 'nombre': usuario['nombre'] if usuario else None,
+                    'num_ventas': 0, 'total': 0.0})
+                fila['num_ventas'] += 1
+                fila['total'] += v['total']
+        return self._ordenar_por_total(usuarios.values())
+    
+    def _lineas_en_rango(self, date_from, date_to):
+        for (venta_id, producto_id), detalle in self.detalle_ventas.items():
+            venta = self.ventas.get(venta_id)
+            if venta is not None and self._en_rango(venta['fecha'], date_from, date_to):
+                yield detalle
+    
+    def get_revenue_by_product(self, date_from=None, date_to=None) -> List[Dict[str, Any]]:
+        productos = {}
+        for d in self._lineas_en_rango(date_from, date_to):
+            producto = self.productos.get(d['producto_id'])
+            fila = productos.setdefault(d['producto_id'], {
+                'producto_id': d['producto_id'], 'nombre': producto['nombre'] if producto else None,
+                'cantidad': 0, 'total': 0.0})
+            fila['cantidad'] += d['cantidad']
+            fila['total'] += d['cantidad'] * d['precio']
+        return self._ordenar_por_total(productos.values())
+    
+    def get_revenue_by_category(self, date_from=None, date_to=None) -> List[Dict[str, Any]]:
+        categorias = {}
+        for d in self._lineas_en_rango(date_from, date_to):
+            producto = self.productos.get(d['producto_id'])
+            if producto is None:
+                continue
+            fila = categorias.setdefault(producto['categoria'], {
+                'categoria': producto['categoria'], 'cantidad': 0, 'total': 0.0})
+            fila['cantidad'] += d['cantidad']
+            fila['total'] += d['cantidad'] * d['precio']
+        return self._ordenar_por_total(categorias.values())
+    
+    def _pagina(self, items, clave, limit, offset, after_id, with_total):
+        if limit < 1:
+            raise ValueError("El tamaño de página debe ser mayor a cero")
+        ordenados = sorted(items, key=clave)
+        if after_id is not None:
+            ordenados = [item for item in ordenados if clave(item) > after_id]
+            offset = 0
+        pagina = ordenados[offset:offset + limit]
+        hay_mas = len(ordenados) > offset + limit
+        return {
+            'items': [item.copy() for item in pagina],
+            'next_after_id': clave(pagina[-1]) if hay_mas else None,
+            'total': len(items) if with_total else None
+        }
+    
+    def get_products_by_names(self, names) -> Dict[str, Dict[str, Any]]:
+        buscados = set(names)
+        productos = {}
+        for p in self.productos.values():
+            if p['nombre'] in buscados:
+                productos.setdefault(p['nombre'], p.copy())
+        return productos
+    
+    def get_low_stock_products(self, limit, category=None, after_id=None) -> List[Dict[str, Any]]:
+        productos = [
+            p for p in self.productos.values()
+            if p['cantidad'] <= p['stock_minimo']
+            and (category is None or p['categoria'] == category)
+            and (after_id is None or p['id'] > after_id)
+        ]
+        return [p.copy() for p in sorted(productos, key=lambda p: p['id'])[:limit]]
+    
+    def get_products_page(self, limit, offset=0, after_id=None, with_total=False) -> Dict[str, Any]:
+        return self._pagina(list(self.productos.values()), lambda p: p['id'], limit, offset, after_id, with_total)
+    
+    def get_sales_page(self, limit, offset=0, after_id=None, with_total=False) -> Dict[str, Any]:
+        return self._pagina(list(self.ventas.values()), lambda v: v['id'], limit, offset, after_id, with_total)
+    
+    def get_users_page(self, limit, offset=0, after_id=None, with_total=False) -> Dict[str, Any]:
+        return self._pagina(list(self.usuarios.values()), lambda u: u['id'], limit, offset, after_id, with_total)
+    
+    def get_sale_details_page(self, limit, offset=0, after_id=None, with_total=False) -> Dict[str, Any]:
+        if after_id is not None:
+            after_id = tuple(after_id)
+        return self._pagina(list(self.detalle_ventas.values()), lambda d: (d['venta_id'], d['producto_id']),
+                            limit, offset, after_id, with_total)
+    
+    def get_table_versions(self) -> Dict[str, int]:
+        return dict(self.versiones)
     
     def insert_product(self, *args, **kwargs):
         pass
 
-    def insert_sale(self, *args, **kwargs):
-        pass
+    def insert_sale(self, sale_data: Dict[str, Any]) -> int:
+        if 'id' not in sale_data:
+            return self.create_sale(sale_data)
+        sale = sale_data.copy()
+        self.ventas[sale['id']] = sale
+        self._modificado('ventas')
+        return sale['id']
 
     def insert_user(self, *args, **kwargs):
         pass
 
     def clear_all(self):
-        self.drop_tables() 
\ No newline at end of file
+        self.drop_tables() 
+
+class AsyncDatabaseTest(AsyncDatabaseInterface):
+    """
+    Versión asíncrona de `DatabaseTest` para probar la API asíncrona.
+
+    Cada operación cede el control al bucle de eventos (y espera `latencia` segundos,
+    para simular una base de datos lenta) antes de aplicarse sobre los mismos datos en
+    memoria. Las transacciones se ejecutan de a una, como si cada una bloqueara las
+    filas que toca.
+    """
+
+    def __init__(self, db=None, latencia=0.0):
+        self.db = db if db is not None else DatabaseTest()
+        self.latencia = latencia
+        self._bloqueo = asyncio.Lock()
+        self._en_transaccion = contextvars.ContextVar(f'transaccion_{id(self)}', default=False)
+
+    async def _llamar(self, metodo, *args):
+        await asyncio.sleep(self.latencia)
+        return getattr(self.db, metodo)(*args)
+
+    async def close(self) -> None:
+        pass
+
+    @asynccontextmanager
+    async def transaction(self):
+        if self._en_transaccion.get():
+            yield
+            return
+        async with self._bloqueo:
+            token = self._en_transaccion.set(True)
+            try:
+                with self.db.transaction():
+                    yield
+            finally:
+                self._en_transaccion.reset(token)
+
+    async def create_product(self, product_data):
+        return await self._llamar('create_product', product_data)
+
+    async def get_product(self, product_id):
+        return await self._llamar('get_product', product_id)
+
+    async def get_products(self, product_ids):
+        return await self._llamar('get_products', product_ids)
+
+    async def decrement_stock(self, product_id, quantity):
+        return await self._llamar('decrement_stock', product_id, quantity)
+
+    async def create_sale(self, sale_data):
+        return await self._llamar('create_sale', sale_data)
+
+    async def insert_sale_details(self, details):
+        return await self._llamar('insert_sale_details', details)
+
+    async def get_sale(self, sale_id):
+        return await self._llamar('get_sale', sale_id)
+
+    async def get_sale_details_for_sales(self, sale_ids):
+        return await self._llamar('get_sale_details_for_sales', sale_ids)
+
+    async def get_products_page(self, limit, offset=0, after_id=None, with_total=False):
+        return await self._llamar('get_products_page', limit, offset, after_id, with_total)
+
+    async def get_sales_page(self, limit, offset=0, after_id=None, with_total=False):
+        return await self._llamar('get_sales_page', limit, offset, after_id, with_total)
+
+    async def get_table_versions(self):
+        return await self._llamar('get_table_versions')
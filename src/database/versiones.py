@@ -0,0 +1,131 @@
+"""
+Versiones por tabla para detectar si los datos cambiaron.
+
+Las versiones viven en la base de datos (secuencias `version_<tabla>`, que el
+trigger `notificar_cambios` avanza al confirmar cada transacción) y llegan a cada
+proceso en las notificaciones de cambios. Como todos los procesos ven los mismos
+números, una etiqueta generada por un worker es válida en cualquier otro.
+
+Las secuencias no bloquean, así que dos transacciones pueden confirmarse en orden
+distinto al de sus versiones, y una lectura puede ver la versión de una transacción
+que aún no termina de confirmarse. Por eso una notificación que no supera la versión
+conocida no se descarta: se cuenta aparte ("7+1") para que la etiqueta cambie igual.
+"""
+import threading
+
+
+class VersionesTablas:
+    """
+    Últimas versiones conocidas de las tablas.
+
+    Attributes:
+        cargar (callable): Función sin argumentos que retorna {tabla: versión}
+            leídas de la base de datos (p. ej. `db.get_table_versions`)
+    """
+
+    def __init__(self, cargar):
+        self.cargar = cargar
+        self._versiones = {}  # Tabla -> versión máxima conocida
+        self._tardias = {}  # Tabla -> notificaciones con versión no mayor que la máxima
+        self._vigentes = False
+        self._lock = threading.Lock()
+
+    def actualizar(self, versiones):
+        """
+        Incorpora versiones leídas de la base de datos; las versiones nunca retroceden,
+        por lo que una lectura atrasada no deshace una notificación más reciente.
+
+        Args:
+            versiones (dict): Tabla -> versión
+        """
+        with self._lock:
+            for tabla, version in versiones.items():
+                if version > self._versiones.get(tabla, 0):
+                    self._versiones[tabla] = version
+                    self._tardias.pop(tabla, None)
+
+    def notificar(self, tabla, version):
+        """
+        Incorpora la versión de una transacción confirmada. Si no supera la máxima
+        conocida, la transacción se confirmó después de otra con versión mayor (o su
+        versión se leyó antes de que terminara): sus cambios son nuevos igualmente.
+
+        Args:
+            tabla (str): Tabla modificada
+            version (int): Versión de la transacción
+        """
+        with self._lock:
+            if version > self._versiones.get(tabla, 0):
+                self._versiones[tabla] = version
+                self._tardias.pop(tabla, None)
+            else:
+                self._tardias[tabla] = self._tardias.get(tabla, 0) + 1
+
+    def refrescar(self):
+        """
+        Lee las versiones de la base de datos, p. ej. tras una escritura del propio
+        proceso, para no esperar a que llegue su notificación.
+        """
+        # Se marca antes de leer: un `invalidar` durante la lectura obliga a repetirla
+        self._vigentes = True
+        try:
+            self.actualizar(self.cargar())
+        except Exception:
+            self._vigentes = False
+            raise
+
+    async def refrescar_asincrono(self):
+        """Igual que `refrescar`, cuando `cargar` es una corrutina (p. ej. en `web.asgi`)."""
+        self._vigentes = True
+        try:
+            self.actualizar(await self.cargar())
+        except Exception:
+            self._vigentes = False
+            raise
+
+    def invalidar(self):
+        """Marca las versiones como desconocidas; se vuelven a leer en la próxima etiqueta."""
+        self._vigentes = False
+
+    def etiqueta(self, *tablas):
+        """
+        Retorna una etiqueta que cambia cuando cambia alguna de las tablas.
+
+        Args:
+            *tablas (str): Tablas de las que dependen los datos
+
+        Returns:
+            str: Versiones de las tablas
+        """
+        if not self._vigentes:
+            self.refrescar()
+        with self._lock:
+            return '.'.join(self._version(tabla) for tabla in tablas)
+
+    async def etiqueta_asincrona(self, *tablas):
+        """Igual que `etiqueta`, cuando `cargar` es una corrutina."""
+        if not self._vigentes:
+            await self.refrescar_asincrono()
+        with self._lock:
+            return '.'.join(self._version(tabla) for tabla in tablas)
+
+    def _version(self, tabla):
+        tardias = self._tardias.get(tabla)
+        version = str(self._versiones.get(tabla, 0))
+        return f"{version}+{tardias}" if tardias else version
+
+    def escuchar(self, canal):
+        """
+        Actualiza las versiones con los eventos de un canal de notificaciones.
+
+        Args:
+            canal (CanalLocal): Canal de `database.notificaciones`
+        """
+        canal.suscribir(self._procesar_evento)
+
+    def _procesar_evento(self, evento):
+        if evento['tabla'] is None:
+            # Pudieron perderse notificaciones: se releen las versiones
+            self.invalidar()
+        elif evento.get('version') is not None:
+            self.notificar(evento['tabla'], evento['version'])
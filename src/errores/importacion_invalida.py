@@ -0,0 +1,14 @@
+class ImportacionInvalidaError(Exception):
+    """
+    Excepción lanzada cuando un archivo de importación no se puede procesar.
+    
+    Se utiliza para errores que afectan a todo el archivo (formato no soportado,
+    JSON mal formado, columnas faltantes), no para filas individuales inválidas,
+    que se informan en el resultado de la importación.
+    
+    Attributes:
+        mensaje (str): Descripción detallada del error.
+    """
+    def __init__(self, mensaje="El archivo de importación no es válido"):
+        self.mensaje = mensaje
+        super().__init__(self.mensaje)
@@ -9,7 +9,7 @@ from errores.no_hay_productos import NoHayProductosError
 from errores.stock_insuficiente import StockInsuficienteError
 from database.database_interface import DatabaseInterface
 import logging
-from typing import List
+from typing import Iterator, List, Optional
 
 logger = logging.getLogger(__name__)
 
@@ -132,18 +132,34 @@ class Inventario:
         Raises:
             NoHayProductosError: Si no hay productos en el inventario.
         """
-        productos = self.db.get_all_products()
-        if not productos:
+        productos_stock_bajo = list(self.iterar_stock_bajo())
+        if not productos_stock_bajo and not self.db.get_products_page(1)['items']:
             raise NoHayProductosError("No hay productos en el inventario.")
-        
-        productos_stock_bajo = []
-        for p in productos:
-            producto = Producto.from_dict(p)
-            if producto.cantidad <= producto.stock_minimo:
-                productos_stock_bajo.append(producto)
-        
         return productos_stock_bajo
 
+    def iterar_stock_bajo(self, categoria: Optional[str] = None, tamano_lote: int = 500) -> Iterator[Producto]:
+        """
+        Recorre los productos con stock bajo por lotes, sin cargar el catálogo completo.
+
+        El filtro se resuelve en la base de datos y cada lote continúa tras el último
+        ID del anterior, así que la memoria usada depende del tamaño del lote.
+
+        Args:
+            categoria (str, optional): Categoría por la que filtrar
+            tamano_lote (int): Productos pedidos a la base de datos por consulta
+
+        Yields:
+            Producto: Productos con cantidad menor o igual a su stock mínimo
+        """
+        ultimo_id = None
+        while True:
+            lote = self.db.get_low_stock_products(tamano_lote, category=categoria, after_id=ultimo_id)
+            for p in lote:
+                yield Producto.from_dict(p)
+            if len(lote) < tamano_lote:
+                return
+            ultimo_id = lote[-1]['id']
+
     def actualizar_stock(self, id_producto: int, cantidad: int) -> str:
         """
         Actualiza el stock de un producto al valor absoluto indicado.
@@ -167,6 +183,9 @@ class Inventario:
         """
         Reduce el stock de un producto en la cantidad indicada.
 
+        El descuento se hace en una sola operación atómica en la base de datos,
+        de modo que dos ventas concurrentes no pueden dejar el stock negativo.
+
         Args:
             id_producto (int): ID del producto
             cantidad (int): Cantidad a reducir
@@ -175,15 +194,12 @@ class Inventario:
             str: Mensaje de confirmación
 
         Raises:
-            StockInvalidoError: Si el stock resultante es negativo
+            StockInvalidoError: Si la cantidad a reducir no es positiva
+            StockInsuficienteError: Si el producto no existe o no tiene stock suficiente
         """
-        producto = self.obtener_producto(id_producto)
-        if not producto:
-            raise ProductoNoEncontradoError(f"No se encontró un producto con ID {id_producto}")
-        nuevo_stock = producto.cantidad - cantidad
-        if nuevo_stock < 0:
-            raise StockInvalidoError("No hay suficiente stock para realizar la operación")
-        self.db.update_stock(id_producto, nuevo_stock)
+        if cantidad <= 0:
+            raise StockInvalidoError("La cantidad a reducir debe ser mayor a cero")
+        nuevo_stock = self.db.decrement_stock(id_producto, cantidad)
         return f"Stock reducido a {nuevo_stock} unidades."
 
     def close(self):
@@ -210,5 +226,4 @@ class Inventario:
         Returns:
             list: Lista de instancias de Producto
         """
-        productos_data = self.db.get_all_products()
-        return [Producto.from_dict(p) for p in productos_data]
+        return [Producto.from_dict(p) for p in self.db.iter_products()]
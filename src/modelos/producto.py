@@ -2,6 +2,7 @@ from errores.producto_invalido import ProductoInvalidoError
 from errores.stock_invalido import StockInvalidoError
 from errores.precio_invalido import PrecioInvalidoError
 from errores.categoria_invalida import CategoriaInvalidaError
+import numpy as np
 
 
 class Producto:
@@ -84,6 +85,53 @@ class Producto:
         if self.stock_minimo > self.STOCK_MAXIMO:
             raise ValueError(f"El stock mínimo no puede ser mayor a {self.STOCK_MAXIMO}")
 
+    @classmethod
+    def validar_lote(cls, nombres, precios, cantidades, categorias, stocks_minimos):
+        """
+        Aplica las reglas del constructor a columnas de valores ya convertidos.
+
+        Cada regla se evalúa con una sola operación de NumPy sobre toda la columna.
+        Como en el constructor, a cada fila se le asigna el error de la primera
+        regla que no cumple.
+
+        Args:
+            nombres (list): Nombres (str)
+            precios (ndarray): Precios (float)
+            cantidades (ndarray): Cantidades (int)
+            categorias (list): Categorías (str)
+            stocks_minimos (ndarray): Stocks mínimos (int)
+
+        Returns:
+            list: Por fila, la excepción de la regla que no cumple o None si es válida
+        """
+        nombres = np.asarray(nombres, dtype=str)
+        categorias = np.asarray(categorias, dtype=str)
+        precios = np.asarray(precios, dtype=np.float64)
+        cantidades = np.asarray(cantidades, dtype=np.int64)
+        stocks_minimos = np.asarray(stocks_minimos, dtype=np.int64)
+        reglas = [
+            (np.char.str_len(np.char.strip(nombres)) == 0, ProductoInvalidoError,
+             "El nombre del producto no puede estar vacío"),
+            (np.char.str_len(nombres) < 3, ProductoInvalidoError,
+             "El nombre del producto debe tener al menos 3 caracteres"),
+            (precios <= 0, PrecioInvalidoError, "El precio debe ser mayor que cero"),
+            (cantidades < 0, StockInvalidoError, "La cantidad no puede ser negativa"),
+            (stocks_minimos < 0, StockInvalidoError, "El stock mínimo no puede ser negativo"),
+            (cantidades > cls.STOCK_MAXIMO, StockInvalidoError,
+             f"La cantidad no puede ser mayor a {cls.STOCK_MAXIMO}"),
+            (stocks_minimos > cls.STOCK_MAXIMO, StockInvalidoError,
+             f"El stock mínimo no puede ser mayor a {cls.STOCK_MAXIMO}"),
+            (np.char.str_len(np.char.strip(categorias)) == 0, CategoriaInvalidaError,
+             "La categoría no puede estar vacía"),
+        ]
+        errores = [None] * len(nombres)
+        pendientes = np.ones(len(nombres), dtype=bool)
+        for falla, error, mensaje in reglas:
+            for i in np.flatnonzero(falla & pendientes):
+                errores[i] = error(mensaje)
+            pendientes &= ~falla
+        return errores
+
     def actualizar_stock(self, cantidad):
         """
         Actualiza la cantidad en inventario del producto.
@@ -69,11 +69,12 @@ class Venta:
         # 4. Validar fecha
         # 5. Validar stock
         # 6. Validar venta general
-        self._validar_productos_registrados(inventario)
+        productos_db = self._buscar_productos(inventario)
+        self._validar_productos_registrados(productos_db)
         self._validar_categoria()
         self._validar_cantidades()
         self._validar_fecha(self.fecha)
-        self._validar_stock_suficiente(inventario)
+        self._validar_stock_suficiente(productos_db)
         self._validar_venta()
 
     def validar(self):
@@ -149,36 +150,46 @@ class Venta:
             raise DescuentoInvalidoError("El descuento debe estar entre 0 y 100")
         self.total = max(0, int(self.total * (100 - descuento) / 100))
 
-    def _validar_productos_registrados(self, inventario: Inventario):
+    def _buscar_productos(self, inventario: Inventario):
         """
-        Verifica que todos los productos vendidos estén registrados en el inventario.
+        Obtiene de una sola vez los productos de la venta registrados en el inventario.
 
         Args:
             inventario (Inventario): Inventario contra el que se valida.
 
+        Returns:
+            dict: Productos del inventario por nombre.
+        """
+        return inventario.db.get_products_by_names(
+            [producto['nombre'] for producto, _ in self.productos_vendidos])
+
+    def _validar_productos_registrados(self, productos_db: Dict[str, Dict]):
+        """
+        Verifica que todos los productos vendidos estén registrados en el inventario.
+
+        Args:
+            productos_db (dict): Productos del inventario por nombre.
+
         Raises:
             VentaProductoNoRegistradoError: Si un producto no se encuentra.
         """
-        productos_db = inventario.db.get_all_products()
         for producto, _ in self.productos_vendidos:
-            if not any(p['nombre'] == producto['nombre'] for p in productos_db):
+            if producto['nombre'] not in productos_db:
                 raise VentaProductoNoRegistradoError(
                     f"El producto {producto['nombre']} no está registrado en el inventario")
 
-    def _validar_stock_suficiente(self, inventario: Inventario):
+    def _validar_stock_suficiente(self, productos_db: Dict[str, Dict]):
         """
         Verifica que haya suficiente stock para todos los productos vendidos.
 
         Args:
-            inventario (Inventario): Inventario contra el que se valida.
+            productos_db (dict): Productos del inventario por nombre.
 
         Returns:
             bool: True si hay suficiente stock, False en caso contrario.
         """
-        productos_db = inventario.db.get_all_products()
         for producto, cantidad in self.productos_vendidos:
-            producto_db = next(p for p in productos_db if p['nombre'] == producto['nombre'])
-            if producto_db['cantidad'] < cantidad:
+            if productos_db[producto['nombre']]['cantidad'] < cantidad:
                 return False
         return True
 
@@ -0,0 +1,218 @@
+"""
+Análisis de ventas sobre arrays columnares de NumPy.
+
+Las líneas del historial se leen por bloques desde `iter_sales_history` y se
+guardan como columnas (venta, producto, cantidad, precio y fecha en segundos
+desde 1970 como int64). Las métricas se calculan con agrupaciones vectorizadas
+(`np.unique` + `np.bincount`) en lugar de recorrer diccionarios en Python, por
+lo que escalan a millones de líneas de `detalle_ventas`.
+"""
+import itertools
+import numpy as np
+
+TAMANO_BLOQUE = 50_000
+LIMITE_A = 0.8
+LIMITE_B = 0.95
+
+# Columnas que se extraen de cada línea del historial y su tipo en NumPy
+COLUMNAS = {
+    'venta_id': np.int64,
+    'producto_id': np.int64,
+    'cantidad': np.int64,
+    'precio': np.float64,
+    'fecha': 'datetime64[s]',
+}
+
+
+def _leer_columnas(filas, columnas, tamano_bloque):
+    """
+    Convierte un iterable de diccionarios en un array por columna, leyendo por bloques
+    para no tener todas las filas como objetos de Python a la vez.
+    """
+    filas = iter(filas)
+    bloques = {columna: [] for columna in columnas}
+    while True:
+        bloque = list(itertools.islice(filas, tamano_bloque))
+        if not bloque:
+            break
+        for columna, tipo in columnas.items():
+            bloques[columna].append(np.array([fila[columna] for fila in bloque], dtype=tipo))
+    return {
+        columna: np.concatenate(bloques[columna]) if bloques[columna] else np.empty(0, dtype=tipo)
+        for columna, tipo in columnas.items()
+    }
+
+
+def _agrupar(claves, *pesos):
+    """
+    Agrupa por clave y suma cada array de pesos.
+
+    Returns:
+        tuple: (claves únicas ordenadas, inverso, sumas por clave de cada peso)
+    """
+    unicas, inverso = np.unique(claves, return_inverse=True)
+    sumas = [np.bincount(inverso, weights=peso, minlength=len(unicas)) for peso in pesos]
+    return unicas, inverso, sumas
+
+
+class AnaliticaVentas:
+    """
+    Métricas de ventas calculadas sobre columnas de NumPy.
+
+    Attributes:
+        venta_id (ndarray): ID de la venta de cada línea
+        producto_id (ndarray): ID del producto de cada línea
+        cantidad (ndarray): Unidades vendidas en cada línea
+        precio (ndarray): Precio unitario de cada línea
+        fecha (ndarray): Fecha de la venta de cada línea, en segundos (int64)
+        stock (dict): Stock actual por ID de producto
+        nombres (dict): Nombre por ID de producto
+    """
+
+    def __init__(self, venta_id, producto_id, cantidad, precio, fecha, stock=None, nombres=None):
+        self.venta_id = np.asarray(venta_id, dtype=np.int64)
+        self.producto_id = np.asarray(producto_id, dtype=np.int64)
+        self.cantidad = np.asarray(cantidad, dtype=np.int64)
+        self.precio = np.asarray(precio, dtype=np.float64)
+        self.fecha = np.asarray(fecha, dtype=np.int64)
+        self.stock = stock or {}
+        self.nombres = nombres or {}
+
+    @classmethod
+    def desde_base(cls, db, desde=None, hasta=None, id_usuario=None, tamano_bloque=TAMANO_BLOQUE):
+        """
+        Carga las líneas de venta y el stock actual desde la base de datos.
+
+        Args:
+            db (DatabaseInterface): Base de datos conectada
+            desde (datetime, optional): Primera fecha incluida
+            hasta (datetime, optional): Primera fecha excluida
+            id_usuario (int, optional): Solo las ventas de este empleado
+            tamano_bloque (int): Líneas convertidas a arrays por bloque
+
+        Returns:
+            AnaliticaVentas: Análisis con los datos cargados
+        """
+        lineas = (fila for fila in db.iter_sales_history(date_from=desde, date_to=hasta, user_id=id_usuario)
+                  if fila['producto_id'] is not None)
+        columnas = _leer_columnas(lineas, COLUMNAS, tamano_bloque)
+        stock = {}
+        nombres = {}
+        for producto in db.iter_products():
+            stock[producto['id']] = producto['cantidad']
+            nombres[producto['id']] = producto['nombre']
+        return cls(columnas['venta_id'], columnas['producto_id'], columnas['cantidad'], columnas['precio'],
+                   columnas['fecha'].astype(np.int64), stock, nombres)
+
+    def _por_producto(self):
+        productos, _, (unidades, ingresos) = _agrupar(
+            self.producto_id, self.cantidad, self.cantidad * self.precio)
+        return productos, unidades, ingresos
+
+    def top_productos(self, n=10):
+        """
+        Retorna los `n` productos con más ingresos.
+
+        Returns:
+            list: Diccionarios con 'producto_id', 'nombre', 'cantidad' e 'ingresos'
+        """
+        productos, unidades, ingresos = self._por_producto()
+        orden = np.argsort(-ingresos, kind='stable')[:n]
+        return [
+            {'producto_id': int(productos[i]), 'nombre': self.nombres.get(int(productos[i])),
+             'cantidad': int(unidades[i]), 'ingresos': float(ingresos[i])}
+            for i in orden
+        ]
+
+    def clasificacion_abc(self, limite_a=LIMITE_A, limite_b=LIMITE_B):
+        """
+        Clasifica los productos vendidos por su aporte acumulado a los ingresos.
+
+        Un producto es A si los productos con más ingresos que él suman menos de
+        `limite_a` del total, B si suman menos de `limite_b` y C en otro caso.
+
+        Returns:
+            dict: Para 'A', 'B' y 'C': 'productos' (IDs de mayor a menor ingreso),
+                'ingresos' y 'participacion' (fracción del total)
+        """
+        productos, _, ingresos = self._por_producto()
+        orden = np.argsort(-ingresos, kind='stable')
+        productos, ingresos = productos[orden], ingresos[orden]
+        total = ingresos.sum()
+        previo = (np.cumsum(ingresos) - ingresos) / total if total else np.zeros(len(ingresos))
+        clases = np.where(previo < limite_a, 'A', np.where(previo < limite_b, 'B', 'C'))
+        resultado = {}
+        for clase in ('A', 'B', 'C'):
+            seleccion = clases == clase
+            ingresos_clase = float(ingresos[seleccion].sum())
+            resultado[clase] = {
+                'productos': [int(p) for p in productos[seleccion]],
+                'ingresos': ingresos_clase,
+                'participacion': ingresos_clase / total if total else 0.0
+            }
+        return resultado
+
+    def tasa_venta(self):
+        """
+        Calcula la tasa de venta (sell-through) de cada producto del catálogo:
+        unidades vendidas / (unidades vendidas + stock actual).
+
+        Returns:
+            list: Diccionarios con 'producto_id', 'nombre', 'vendidas', 'stock' y 'tasa',
+                de mayor a menor tasa
+        """
+        ids = np.fromiter(self.stock.keys(), dtype=np.int64, count=len(self.stock))
+        stock = np.fromiter(self.stock.values(), dtype=np.int64, count=len(self.stock))
+        productos, unidades, _ = self._por_producto()
+        vendidas = np.zeros(len(ids), dtype=np.int64)
+        if len(productos):
+            posicion = np.clip(np.searchsorted(productos, ids), 0, len(productos) - 1)
+            encontrados = productos[posicion] == ids
+            vendidas[encontrados] = unidades[posicion[encontrados]].astype(np.int64)
+        disponibles = vendidas + stock
+        tasa = np.divide(vendidas, disponibles, out=np.zeros(len(ids)), where=disponibles > 0)
+        orden = np.argsort(-tasa, kind='stable')
+        return [
+            {'producto_id': int(ids[i]), 'nombre': self.nombres.get(int(ids[i])),
+             'vendidas': int(vendidas[i]), 'stock': int(stock[i]), 'tasa': float(tasa[i])}
+            for i in orden
+        ]
+
+    def distribucion_canasta(self):
+        """
+        Calcula la distribución del tamaño de canasta (unidades por venta).
+
+        Returns:
+            dict: 'ventas', 'media', 'mediana', 'p90' e 'histograma' ({unidades: ventas})
+        """
+        _, _, (unidades,) = _agrupar(self.venta_id, self.cantidad)
+        if not len(unidades):
+            return {'ventas': 0, 'media': 0.0, 'mediana': 0.0, 'p90': 0.0, 'histograma': {}}
+        unidades = unidades.astype(np.int64)
+        conteo = np.bincount(unidades)
+        tamanos = np.nonzero(conteo)[0]
+        return {
+            'ventas': int(len(unidades)),
+            'media': float(unidades.mean()),
+            'mediana': float(np.median(unidades)),
+            'p90': float(np.percentile(unidades, 90)),
+            'histograma': {int(t): int(conteo[t]) for t in tamanos}
+        }
+
+    def resumen(self, n=10):
+        """
+        Reúne las métricas para mostrarlas en la consola o en la web.
+
+        Returns:
+            dict: 'top', 'abc' (sin la lista de productos), 'tasa_venta' (los `n` mayores)
+                y 'canasta'
+        """
+        abc = {clase: {'productos': len(datos['productos']), 'ingresos': datos['ingresos'],
+                       'participacion': datos['participacion']}
+               for clase, datos in self.clasificacion_abc().items()}
+        return {
+            'top': self.top_productos(n),
+            'abc': abc,
+            'tasa_venta': self.tasa_venta()[:n],
+            'canasta': self.distribucion_canasta()
+        }
@@ -0,0 +1,232 @@
+"""
+Importación masiva de productos desde archivos CSV, JSON o NDJSON.
+
+Las filas se leen de forma incremental, se validan con las reglas de `Producto`
+y se guardan por lotes con `upsert_products`, que inserta o actualiza por nombre.
+Las filas inválidas no detienen la importación: se informan en el resultado.
+"""
+import csv
+import io
+import json
+import logging
+import itertools
+import os
+import numpy as np
+from modelos.producto import Producto
+from errores.producto_invalido import ProductoInvalidoError
+from errores.precio_invalido import PrecioInvalidoError
+from errores.stock_invalido import StockInvalidoError
+from errores.importacion_invalida import ImportacionInvalidaError
+
+logger = logging.getLogger(__name__)
+
+COLUMNAS = ('nombre', 'precio', 'cantidad', 'categoria', 'stock_minimo')
+FORMATOS = ('csv', 'json', 'ndjson')
+TAMANO_LOTE = 1000
+
+
+def _convertir(valores, tipo):
+    """
+    Convierte una columna a un array de `tipo`.
+
+    Returns:
+        tuple: (array convertido, array booleano con las posiciones convertidas)
+    """
+    try:
+        array = np.array(valores, dtype=tipo)
+        if array.shape == (len(valores),):
+            return array, np.ones(len(valores), dtype=bool)
+    except (TypeError, ValueError, OverflowError):
+        pass
+    # Alguna celda no es un número: se convierten una por una para ubicarla
+    convertir = float if tipo is np.float64 else int
+    array = np.zeros(len(valores), dtype=tipo)
+    validos = np.zeros(len(valores), dtype=bool)
+    for i, valor in enumerate(valores):
+        try:
+            array[i] = convertir(valor)
+            validos[i] = True
+        except (TypeError, ValueError, OverflowError):
+            pass
+    return array, validos
+
+
+class ImportadorProductos:
+    """
+    Importa catálogos de productos en bloque.
+
+    Attributes:
+        db: Base de datos donde se guardan los productos
+        tamano_lote (int): Productos enviados a la base de datos por operación
+    """
+
+    def __init__(self, db, tamano_lote=TAMANO_LOTE):
+        """
+        Inicializa el importador.
+
+        Args:
+            db (DatabaseInterface): Base de datos donde se guardan los productos
+            tamano_lote (int): Productos por lote de escritura
+        """
+        if tamano_lote < 1:
+            raise ValueError("El tamaño de lote debe ser mayor a cero")
+        self.db = db
+        self.tamano_lote = tamano_lote
+
+    def importar_archivo(self, ruta):
+        """
+        Importa los productos de un archivo según su extensión (.csv, .json o .ndjson).
+
+        Args:
+            ruta (str): Ruta del archivo
+
+        Returns:
+            dict: Resultado de la importación (ver `importar`)
+
+        Raises:
+            ImportacionInvalidaError: Si el formato no está soportado o el archivo no se puede leer
+        """
+        formato = os.path.splitext(ruta)[1].lstrip('.').lower()
+        try:
+            with open(ruta, encoding='utf-8-sig', newline='') as archivo:
+                return self.importar_flujo(archivo, formato)
+        except OSError as e:
+            raise ImportacionInvalidaError(f"No se pudo leer el archivo '{ruta}': {e}")
+
+    def importar_flujo(self, archivo, formato):
+        """
+        Importa los productos de un archivo ya abierto.
+
+        Args:
+            archivo: Archivo de texto o binario (p. ej. una subida web)
+            formato (str): 'csv', 'json' o 'ndjson'
+
+        Returns:
+            dict: Resultado de la importación (ver `importar`)
+
+        Raises:
+            ImportacionInvalidaError: Si el formato no está soportado o el contenido no se puede leer
+        """
+        if formato not in FORMATOS:
+            raise ImportacionInvalidaError(
+                f"Formato '{formato}' no soportado. Use uno de: {', '.join(FORMATOS)}")
+        if isinstance(archivo.read(0), bytes):
+            archivo = io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+        lector = {'csv': self._leer_csv, 'json': self._leer_json, 'ndjson': self._leer_ndjson}[formato]
+        return self.importar(lector(archivo))
+
+    def importar(self, filas):
+        """
+        Valida y guarda por lotes un iterable de filas.
+
+        Las filas se validan de a `tamano_lote` con `_validar_lote` y las válidas se
+        acumulan hasta completar un lote de escritura. Si un nombre se repite,
+        prevalece la última fila válida con ese nombre.
+
+        Args:
+            filas (iterable): Diccionarios con las columnas de `COLUMNAS`, o excepciones
+                de lectura que se registran como error de esa fila
+
+        Returns:
+            dict: 'procesadas' (filas leídas), 'importadas' (productos guardados)
+                y 'errores' (lista de {'fila', 'error'})
+        """
+        resultado = {'procesadas': 0, 'importadas': 0, 'errores': []}
+        lote = {}
+        filas = enumerate(filas, start=1)
+        while True:
+            bloque = list(itertools.islice(filas, self.tamano_lote))
+            if not bloque:
+                break
+            resultado['procesadas'] += len(bloque)
+            productos, errores = self._validar_lote(bloque)
+            resultado['errores'].extend(errores)
+            for producto in productos:
+                lote.pop(producto['nombre'], None)
+                lote[producto['nombre']] = producto
+                if len(lote) >= self.tamano_lote:
+                    resultado['importadas'] += self.db.upsert_products(list(lote.values()))
+                    lote = {}
+        if lote:
+            resultado['importadas'] += self.db.upsert_products(list(lote.values()))
+        logger.info(f"Importación de productos: {resultado['importadas']} guardados, "
+                    f"{len(resultado['errores'])} filas con errores")
+        return resultado
+
+    def _validar_lote(self, bloque):
+        """
+        Convierte un bloque de filas en datos de producto aplicando las reglas de `Producto`.
+
+        Las columnas numéricas se convierten de una vez por columna (valor por valor
+        solo si alguna no se puede convertir) y las reglas se aplican con
+        `Producto.validar_lote`.
+
+        Args:
+            bloque (list): Tuplas (número de fila, fila)
+
+        Returns:
+            tuple: (productos válidos en el orden de las filas, errores {'fila', 'error'})
+        """
+        errores = {}
+        numeros, filas = [], []
+        for numero, fila in bloque:
+            if isinstance(fila, Exception):
+                errores[numero] = fila
+            elif not isinstance(fila, dict):
+                errores[numero] = ProductoInvalidoError("La fila debe ser un objeto con los datos del producto")
+            else:
+                numeros.append(numero)
+                filas.append(fila)
+
+        columnas = {columna: [fila.get(columna) for fila in filas] for columna in COLUMNAS}
+        vacias = {columna: [valor is None or valor == '' for valor in valores]
+                  for columna, valores in columnas.items()}
+        precios, precio_valido = _convertir(columnas['precio'], np.float64)
+        cantidades, cantidad_valida = _convertir(columnas['cantidad'], np.int64)
+        minimos, minimo_valido = _convertir(columnas['stock_minimo'], np.int64)
+        nombres = [str(nombre).strip() for nombre in columnas['nombre']]
+        categorias = [str(categoria).strip() for categoria in columnas['categoria']]
+        reglas = Producto.validar_lote(nombres, precios, cantidades, categorias, minimos)
+        completas = [not any(faltan) for faltan in zip(*vacias.values())]
+
+        productos = []
+        for i, (numero, precio, cantidad, minimo) in enumerate(
+                zip(numeros, precios.tolist(), cantidades.tolist(), minimos.tolist())):
+            if not completas[i]:
+                faltantes = [columna for columna in COLUMNAS if vacias[columna][i]]
+                errores[numero] = ProductoInvalidoError(f"Faltan datos: {', '.join(faltantes)}")
+            elif not precio_valido[i]:
+                errores[numero] = PrecioInvalidoError(f"Precio inválido: {columnas['precio'][i]}")
+            elif not (cantidad_valida[i] and minimo_valido[i]):
+                errores[numero] = StockInvalidoError("La cantidad y el stock mínimo deben ser números enteros")
+            elif reglas[i] is not None:
+                errores[numero] = reglas[i]
+            else:
+                productos.append({'nombre': nombres[i], 'precio': precio, 'cantidad': cantidad,
+                                  'categoria': categorias[i], 'stock_minimo': minimo})
+        return productos, [{'fila': numero, 'error': str(errores[numero])} for numero in sorted(errores)]
+
+    def _leer_csv(self, archivo):
+        lector = csv.DictReader(archivo)
+        faltantes = [columna for columna in COLUMNAS if columna not in (lector.fieldnames or [])]
+        if faltantes:
+            raise ImportacionInvalidaError(f"Faltan columnas en el CSV: {', '.join(faltantes)}")
+        return lector
+
+    def _leer_json(self, archivo):
+        try:
+            datos = json.load(archivo)
+        except ValueError as e:
+            raise ImportacionInvalidaError(f"JSON inválido: {e}")
+        if not isinstance(datos, list):
+            raise ImportacionInvalidaError("El JSON debe contener una lista de productos")
+        return datos
+
+    def _leer_ndjson(self, archivo):
+        for linea in archivo:
+            if not linea.strip():
+                continue
+            try:
+                yield json.loads(linea)
+            except ValueError as e:
+                yield ProductoInvalidoError(f"JSON inválido: {e}")
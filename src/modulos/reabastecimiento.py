@@ -0,0 +1,380 @@
+"""
+Motor de reabastecimiento: demanda por producto y puntos de pedido dinámicos.
+
+La demanda diaria de cada producto se estima con medias móviles ponderadas
+exponencialmente (EWMA) de la cantidad vendida por día y de su varianza. El
+estado se guarda en arrays de NumPy alineados por producto, de modo que el
+cálculo de todo el catálogo es una operación vectorizada por día de historia.
+
+El estado se actualiza de forma incremental con cada venta: las unidades se
+acumulan en el día en curso y, al cambiar de día, ese día se cierra con un
+paso del EWMA y los días sin ventas se aplican de una vez con la forma cerrada
+de la recurrencia con demanda cero.
+
+Con la demanda estimada, el punto de pedido es la demanda esperada durante el
+tiempo de entrega más un stock de seguridad (z * desviación durante la entrega),
+nunca menor que el `stock_minimo` del producto; la cantidad sugerida repone
+hasta cubrir el punto de pedido más los días de cobertura.
+
+Los procesos de larga duración (workers web) usan `DemandaProceso`, que calcula
+el motor una sola vez y lo mantiene con las ventas notificadas en lugar de
+recorrer la historia en cada consulta.
+"""
+import math
+import threading
+from datetime import datetime, timedelta
+import numpy as np
+from modulos.analitica import TAMANO_BLOQUE, _leer_columnas
+
+ALFA = 0.2
+DIAS_HISTORIA = 180
+TIEMPO_ENTREGA_DIAS = 7
+DIAS_COBERTURA = 14
+# Factor z de la normal para un nivel de servicio del 95%
+FACTOR_SERVICIO = 1.65
+
+SEGUNDOS_DIA = 86400
+COLUMNAS = {
+    'venta_id': np.int64,
+    'producto_id': np.int64,
+    'cantidad': np.int64,
+    'fecha': 'datetime64[s]',
+}
+
+
+def _dia(fecha):
+    """Número de día desde 1970 de una fecha."""
+    return (fecha - datetime(1970, 1, 1)).days
+
+
+class MotorReabastecimiento:
+    """
+    Demanda diaria estimada por producto.
+
+    Attributes:
+        alfa (float): Peso de cada día nuevo en el EWMA (0 < alfa <= 1)
+        ids (ndarray): ID de producto de cada posición
+        media (ndarray): Demanda diaria estimada
+        varianza (ndarray): Varianza estimada de la demanda diaria
+        dia (ndarray): Día en curso (desde 1970) de cada producto
+        pendiente (ndarray): Unidades vendidas en el día en curso, aún no aplicadas
+        ultima_venta (int): Mayor ID de venta leído por `desde_base` (0 si no hay)
+    """
+
+    def __init__(self, alfa=ALFA):
+        if not 0 < alfa <= 1:
+            raise ValueError("alfa debe estar entre 0 (excluido) y 1")
+        self.alfa = alfa
+        self.ids = np.empty(0, dtype=np.int64)
+        self.media = np.empty(0)
+        self.varianza = np.empty(0)
+        self.dia = np.empty(0, dtype=np.int64)
+        self.pendiente = np.empty(0)
+        self.ultima_venta = 0
+        self._posicion = {}
+
+    @classmethod
+    def desde_columnas(cls, producto_id, cantidad, fecha, hasta, ids=(), alfa=ALFA):
+        """
+        Calcula el estado de todo el catálogo a partir de las líneas de venta.
+
+        Se arma la matriz productos x días con las unidades vendidas de los
+        productos que tienen ventas y se aplica el EWMA día por día sobre todos
+        ellos a la vez; el resto del catálogo queda con demanda cero. El EWMA arranca
+        con la media y la varianza del período, para no sesgar hacia cero los
+        productos con historia corta. El día de `hasta` queda abierto.
+
+        Args:
+            producto_id (ndarray): ID de producto de cada línea
+            cantidad (ndarray): Unidades de cada línea
+            fecha (ndarray): Fecha de cada línea, en segundos desde 1970
+            hasta (datetime): Día en curso
+            ids (iterable, optional): Productos del catálogo sin ventas a incluir
+            alfa (float): Peso de cada día nuevo
+
+        Returns:
+            MotorReabastecimiento: Motor con la demanda calculada
+        """
+        motor = cls(alfa)
+        producto_id = np.asarray(producto_id, dtype=np.int64)
+        cantidad = np.asarray(cantidad, dtype=np.float64)
+        dias = np.asarray(fecha, dtype=np.int64) // SEGUNDOS_DIA
+        hoy = _dia(hasta)
+        motor._agregar(np.union1d(np.unique(producto_id), np.fromiter(ids, dtype=np.int64)), hoy)
+        if not len(producto_id):
+            return motor
+
+        vendidos, fila = np.unique(producto_id, return_inverse=True)
+        posiciones = np.searchsorted(motor.ids, vendidos)
+        primero = int(dias.min())
+        num_dias = hoy - primero
+        # Las ventas de hoy quedan pendientes: el día no terminó
+        de_hoy = dias == hoy
+        np.add.at(motor.pendiente, posiciones[fila[de_hoy]], cantidad[de_hoy])
+        cerradas = dias < hoy
+        if num_dias <= 0:
+            return motor
+        demanda = np.bincount(fila[cerradas] * num_dias + (dias[cerradas] - primero),
+                              weights=cantidad[cerradas], minlength=len(vendidos) * num_dias)
+        demanda = demanda.reshape(len(vendidos), num_dias)
+
+        media = demanda.mean(axis=1)
+        varianza = demanda.var(axis=1)
+        beta = 1 - alfa
+        for columna in demanda.T:
+            diferencia = columna - media
+            media = media + alfa * diferencia
+            varianza = beta * (varianza + alfa * diferencia ** 2)
+        motor.media[posiciones] = media
+        motor.varianza[posiciones] = varianza
+        return motor
+
+    @classmethod
+    def desde_base(cls, db, hasta=None, dias_historia=DIAS_HISTORIA, alfa=ALFA, tamano_bloque=TAMANO_BLOQUE):
+        """
+        Calcula la demanda de todo el catálogo con las ventas de los últimos días.
+
+        Args:
+            db (DatabaseInterface): Base de datos conectada
+            hasta (datetime, optional): Día en curso (hoy por omisión)
+            dias_historia (int): Días de ventas que se consideran
+            alfa (float): Peso de cada día nuevo
+            tamano_bloque (int): Líneas convertidas a arrays por bloque
+
+        Returns:
+            MotorReabastecimiento: Motor con la demanda calculada
+        """
+        hasta = hasta or datetime.now()
+        hoy = datetime(hasta.year, hasta.month, hasta.day)
+        lineas = (fila for fila in db.iter_sales_history(date_from=hoy - timedelta(days=dias_historia))
+                  if fila['producto_id'] is not None)
+        columnas = _leer_columnas(lineas, COLUMNAS, tamano_bloque)
+        motor = cls.desde_columnas(columnas['producto_id'], columnas['cantidad'],
+                                   columnas['fecha'].astype(np.int64), hasta,
+                                   ids=(producto['id'] for producto in db.iter_products()), alfa=alfa)
+        motor.ultima_venta = int(columnas['venta_id'].max()) if len(columnas['venta_id']) else 0
+        return motor
+
+    def _agregar(self, ids, dia):
+        """Agrega productos nuevos sin demanda, con `dia` como día en curso."""
+        nuevos = np.unique(np.fromiter((producto for producto in ids if int(producto) not in self._posicion),
+                                       dtype=np.int64))
+        if not len(nuevos):
+            return
+        self.ids = np.concatenate([self.ids, nuevos])
+        self.media = np.concatenate([self.media, np.zeros(len(nuevos))])
+        self.varianza = np.concatenate([self.varianza, np.zeros(len(nuevos))])
+        self.dia = np.concatenate([self.dia, np.full(len(nuevos), dia, dtype=np.int64)])
+        self.pendiente = np.concatenate([self.pendiente, np.zeros(len(nuevos))])
+        self._posicion.update((int(producto), i) for i, producto in enumerate(nuevos.tolist(), len(self._posicion)))
+
+    def _avanzar(self, posiciones, dia):
+        """
+        Lleva los productos de `posiciones` hasta el día `dia`: cierra su día en
+        curso con las unidades pendientes y aplica los días intermedios sin ventas.
+        """
+        atrasados = posiciones[self.dia[posiciones] < dia]
+        if not len(atrasados):
+            return
+        alfa, beta = self.alfa, 1 - self.alfa
+        diferencia = self.pendiente[atrasados] - self.media[atrasados]
+        media = self.media[atrasados] + alfa * diferencia
+        varianza = beta * (self.varianza[atrasados] + alfa * diferencia ** 2)
+        # k días con demanda cero: media * beta^k y varianza * beta^k + media^2 * beta^k * (1 - beta^k)
+        factor = beta ** (dia - self.dia[atrasados] - 1)
+        self.varianza[atrasados] = factor * (varianza + (1 - factor) * media ** 2)
+        self.media[atrasados] = factor * media
+        self.pendiente[atrasados] = 0
+        self.dia[atrasados] = dia
+
+    def registrar_venta(self, lineas, fecha):
+        """
+        Actualiza la demanda con una venta.
+
+        Las ventas con fecha anterior al día en curso de un producto se suman al
+        día en curso.
+
+        Args:
+            lineas (iterable): Tuplas (producto_id, cantidad)
+            fecha (datetime): Fecha de la venta
+        """
+        lineas = list(lineas)
+        if not lineas:
+            return
+        dia = _dia(fecha)
+        self._agregar([producto for producto, _ in lineas], dia)
+        posiciones = np.array([self._posicion[producto] for producto, _ in lineas], dtype=np.int64)
+        self._avanzar(np.unique(posiciones), dia)
+        np.add.at(self.pendiente, posiciones, np.array([cantidad for _, cantidad in lineas], dtype=np.float64))
+
+    def avanzar(self, fecha):
+        """
+        Cierra los días anteriores a `fecha` en todo el catálogo.
+
+        Args:
+            fecha (datetime): Día en curso
+        """
+        self._avanzar(np.arange(len(self.ids)), _dia(fecha))
+
+    def sugerencias(self, productos, fecha=None, tiempo_entrega=TIEMPO_ENTREGA_DIAS,
+                    dias_cobertura=DIAS_COBERTURA, factor_servicio=FACTOR_SERVICIO, solo_reponer=True):
+        """
+        Calcula los puntos de pedido y las cantidades sugeridas del catálogo.
+
+        Args:
+            productos (iterable): Diccionarios de producto con 'id', 'nombre', 'cantidad' y 'stock_minimo'
+            fecha (datetime, optional): Día en curso (hoy por omisión)
+            tiempo_entrega (int): Días entre el pedido y la recepción
+            dias_cobertura (int): Días de demanda que debe cubrir cada pedido
+            factor_servicio (float): Factor z del stock de seguridad
+            solo_reponer (bool): Si es True, solo retorna los productos en o bajo su punto de pedido
+
+        Returns:
+            list: Diccionarios con 'producto_id', 'nombre', 'stock', 'stock_minimo', 'demanda_diaria',
+                'desviacion', 'punto_pedido' y 'cantidad_sugerida', de mayor a menor cantidad sugerida
+        """
+        productos = list(productos)
+        self._agregar([producto['id'] for producto in productos], _dia(fecha or datetime.now()))
+        self.avanzar(fecha or datetime.now())
+        posiciones = np.array([self._posicion[producto['id']] for producto in productos], dtype=np.int64)
+        stock = np.array([producto['cantidad'] for producto in productos], dtype=np.float64)
+        minimo = np.array([producto['stock_minimo'] for producto in productos], dtype=np.float64)
+        media = self.media[posiciones] if len(posiciones) else np.empty(0)
+        desviacion = np.sqrt(self.varianza[posiciones]) if len(posiciones) else np.empty(0)
+
+        punto_pedido = np.maximum(
+            np.ceil(media * tiempo_entrega + factor_servicio * desviacion * math.sqrt(tiempo_entrega)), minimo)
+        cantidad = np.ceil(np.maximum(punto_pedido + media * dias_cobertura - stock, 0))
+        seleccion = stock <= punto_pedido if solo_reponer else np.ones(len(productos), dtype=bool)
+        orden = [i for i in np.argsort(-cantidad, kind='stable') if seleccion[i]]
+        return [
+            {'producto_id': productos[i]['id'], 'nombre': productos[i]['nombre'], 'stock': int(stock[i]),
+             'stock_minimo': int(minimo[i]), 'demanda_diaria': float(media[i]), 'desviacion': float(desviacion[i]),
+             'punto_pedido': int(punto_pedido[i]), 'cantidad_sugerida': int(cantidad[i])}
+            for i in orden
+        ]
+
+
+class DemandaProceso:
+    """
+    Motor de reabastecimiento de un proceso, compartido entre hilos.
+
+    El motor se calcula desde la base la primera vez que se usa y luego se
+    actualiza con las ventas anotadas: las del propio proceso (`anotar_venta`) y
+    las de los demás procesos, que llegan como notificaciones de `detalle_ventas`.
+    Las líneas de las ventas anotadas se leen en una sola consulta al usar el motor.
+    Una venta anotada por las dos vías se aplica una sola vez. Las notificaciones
+    confirmadas antes del cálculo (versión de detalle_ventas no mayor que la leída
+    al calcular) se descartan: la venta ya está en la historia. Si se pierden
+    notificaciones, una transacción modifica demasiadas líneas para enumerarlas o
+    se modifica una venta ya incorporada al motor (el EWMA no permite restarla),
+    el motor se vuelve a calcular.
+
+    Attributes:
+        dias_historia (int): Días de ventas con que se calcula el motor
+        alfa (float): Peso de cada día nuevo
+    """
+
+    def __init__(self, dias_historia=DIAS_HISTORIA, alfa=ALFA, reloj=datetime.now):
+        self.dias_historia = dias_historia
+        self.alfa = alfa
+        self._reloj = reloj
+        self._motor = None
+        # venta_id -> [fecha, notificada]
+        self._pendientes = {}
+        # Ventas propias ya aplicadas cuya notificación aún no llegó
+        self._aplicadas = set()
+        # Ventas aplicadas desde el último cálculo; las anteriores tienen ID <= motor.ultima_venta
+        self._incorporadas = set()
+        # Versión de detalle_ventas leída antes del último cálculo
+        self._version_base = 0
+        self._escuchando = False
+        self._lock = threading.Lock()
+
+    def anotar_venta(self, venta_id, fecha):
+        """
+        Anota una venta confirmada por este proceso.
+
+        Args:
+            venta_id (int): ID de la venta
+            fecha (datetime): Fecha de la venta
+        """
+        with self._lock:
+            # Sin motor, o si se calculó después de confirmarse la venta, ya está en la historia
+            if self._motor is None or venta_id <= self._motor.ultima_venta or venta_id in self._incorporadas:
+                return
+            self._pendientes.setdefault(venta_id, [fecha, False])
+
+    def escuchar(self, canal):
+        """
+        Anota las ventas de los eventos de un canal de notificaciones.
+
+        Args:
+            canal (CanalLocal): Canal de `database.notificaciones`
+        """
+        self._escuchando = True
+        canal.suscribir(self._procesar_evento)
+
+    def _procesar_evento(self, evento):
+        if evento['tabla'] not in (None, 'detalle_ventas'):
+            return
+        with self._lock:
+            if self._motor is None:
+                return  # El próximo cálculo lee la historia completa
+            if evento['ids'] is None:
+                self._motor = None
+                return
+            # Eventos que esperaban el lock durante el cálculo: ya están en la historia
+            if evento.get('version') is not None and evento['version'] <= self._version_base:
+                return
+            # La venta se confirmó justo antes de la notificación
+            ahora = self._reloj()
+            for venta_id in evento['ids']:
+                if venta_id in self._aplicadas:
+                    self._aplicadas.discard(venta_id)
+                elif venta_id in self._pendientes:
+                    self._pendientes[venta_id][1] = True
+                elif venta_id <= self._motor.ultima_venta or venta_id in self._incorporadas:
+                    # Venta ya incorporada modificada (actualizar, eliminar o deshacer)
+                    self._motor = None
+                    return
+                else:
+                    self._pendientes[venta_id] = [ahora, True]
+
+    def _actualizar(self, db, fecha):
+        if self._motor is None:
+            # Se lee antes que la historia: lo confirmado hasta esa versión queda incluido
+            self._version_base = db.get_table_versions().get('detalle_ventas', 0)
+            self._motor = MotorReabastecimiento.desde_base(db, hasta=fecha, dias_historia=self.dias_historia,
+                                                           alfa=self.alfa)
+            self._pendientes.clear()
+            self._aplicadas.clear()
+            self._incorporadas.clear()
+            return
+        if not self._pendientes:
+            return
+        lineas = {}
+        for detalle in db.get_sale_details_for_sales(list(self._pendientes)):
+            lineas.setdefault(detalle['venta_id'], []).append((detalle['producto_id'], detalle['cantidad']))
+        for venta_id, (fecha, notificada) in sorted(self._pendientes.items(), key=lambda venta: venta[1][0]):
+            self._motor.registrar_venta(lineas.get(venta_id, ()), fecha)
+            self._incorporadas.add(venta_id)
+            if self._escuchando and not notificada:
+                self._aplicadas.add(venta_id)
+        self._pendientes.clear()
+
+    def sugerencias(self, db, fecha=None, solo_reponer=True):
+        """
+        Calcula las sugerencias del catálogo con el motor al día con las ventas anotadas.
+
+        Args:
+            db (DatabaseInterface): Base de datos conectada
+            fecha (datetime, optional): Día en curso (hoy por omisión)
+            solo_reponer (bool): Si es True, solo retorna los productos en o bajo su punto de pedido
+
+        Returns:
+            list: Sugerencias de `MotorReabastecimiento.sugerencias`
+        """
+        with self._lock:
+            self._actualizar(db, fecha)
+            return self._motor.sugerencias(db.iter_products(), fecha=fecha, solo_reponer=solo_reponer)
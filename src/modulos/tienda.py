@@ -2,11 +2,32 @@ from modelos.inventario import Inventario
 from modelos.venta import Venta
 from errores.stock_insuficiente import StockInsuficienteError
 from errores.venta_producto_no_registrado import VentaProductoNoRegistradoError
+from modulos.reabastecimiento import MotorReabastecimiento
+from utils.metricas import VENTAS
+from datetime import date, datetime
 from typing import List, Dict
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+def _stock_insuficiente(producto, cantidad):
+    return StockInsuficienteError(f"Stock insuficiente para el producto {producto['nombre']}. Requerido: {cantidad}.")
+
+
+def _detalles_venta(venta_id, productos_vendidos):
+    """Filas de detalle_ventas de una venta, con el precio actual de cada producto."""
+    return [
+        {
+            'venta_id': venta_id,
+            'producto_id': producto['id'],
+            'cantidad': cantidad,
+            'precio': producto['precio']
+        }
+        for producto, cantidad in productos_vendidos
+    ]
+
+
 class Tienda:
     """
     Clase que representa la lógica de ventas y gestión de historial en la tienda.
@@ -16,24 +37,28 @@ class Tienda:
     Attributes:
         db: Instancia de la base de datos utilizada para persistencia
         inventario: Instancia del inventario de productos
+        reabastecimiento: Motor de reabastecimiento que se actualiza con cada venta, o None
     """
     
-    def __init__(self, db, inventario):
+    def __init__(self, db, inventario, reabastecimiento=None):
         """
         Inicializa la tienda con la base de datos y el inventario.
         
         Args:
             db: Instancia de la base de datos
             inventario: Instancia del inventario
+            reabastecimiento (MotorReabastecimiento, optional): Motor de demanda a actualizar con las ventas
         """
         self.db = db
         self.inventario = inventario
+        self.reabastecimiento = reabastecimiento
 
     def registrar_venta(self, venta, inventario):
         """
         Registra una nueva venta en el sistema.
-        Valida existencia y stock de todos los productos antes de descontar stock o registrar la venta.
-        Si hay algún error, aborta la operación y muestra un mensaje claro. Solo descuenta stock y registra la venta si todo es válido.
+        Descuenta el stock de cada línea con una operación atómica que falla si no hay
+        stock suficiente. Los descuentos, la venta y sus detalles se confirman en una
+        única transacción; si algo falla no queda ningún cambio aplicado.
         
         Args:
             venta (Venta): Venta a registrar
@@ -43,22 +68,17 @@ class Tienda:
             int: ID de la venta registrada
         
         Raises:
-            StockInsuficienteError: Si no hay suficiente stock para algún producto
-            ProductoNoEncontradoError: Si algún producto no existe
+            StockInsuficienteError: Si no hay suficiente stock para algún producto o ya no existe
         """
-        try:
-            # Validar existencia y stock de todos los productos antes de modificar nada
-            productos_db = inventario.db.get_all_products()
+        # El inventario y la tienda comparten la misma base de datos; la transacción
+        # se abre sobre la del inventario, que es la que descuenta el stock.
+        with inventario.db.transaction():
+            # Descontar stock de forma atómica; falla si otro proceso lo agotó antes
             for producto, cantidad in venta.productos_vendidos:
-                producto_db = next((p for p in productos_db if p['id'] == producto['id']), None)
-                if not producto_db:
-                    raise VentaProductoNoRegistradoError(f"Producto con ID {producto['id']} no encontrado.")
-                if producto_db['cantidad'] < cantidad:
-                    raise StockInsuficienteError(f"Stock insuficiente para el producto {producto['nombre']}. Disponible: {producto_db['cantidad']}, requerido: {cantidad}.")
-
-            # Si todo es válido, descontar stock y registrar la venta
-            for producto, cantidad in venta.productos_vendidos:
-                inventario.reducir_stock(producto['id'], cantidad)
+                try:
+                    inventario.reducir_stock(producto['id'], cantidad)
+                except StockInsuficienteError:
+                    raise _stock_insuficiente(producto, cantidad)
 
             # Obtener el siguiente ID de venta
             venta_id = self.db.get_next_sale_id()
@@ -72,68 +92,66 @@ class Tienda:
             }
             self.db.insert_sale(venta_dict)
 
-            # Registrar detalles de la venta
-            for producto, cantidad in venta.productos_vendidos:
-                detalle = {
-                    'venta_id': venta_id,
-                    'producto_id': producto['id'],
-                    'cantidad': cantidad,
-                    'precio': producto['precio']
-                }
-                self.db.insert_sale_detail(detalle)
+            # Registrar detalles de la venta en un solo INSERT
+            self.db.insert_sale_details(_detalles_venta(venta_id, venta.productos_vendidos))
 
-            return venta_id
+        VENTAS.incrementar()
+        # Solo después de confirmar: una venta revertida no cuenta como demanda
+        if self.reabastecimiento is not None:
+            self.reabastecimiento.registrar_venta(
+                [(producto['id'], cantidad) for producto, cantidad in venta.productos_vendidos], venta.fecha)
 
-        except Exception as e:
-            # Si algo falla, revertir los cambios en el stock
-            for producto, cantidad in venta.productos_vendidos:
-                try:
-                    inventario.actualizar_stock(producto['id'], producto['cantidad'])
-                except:
-                    pass  # Ignorar errores al revertir
-            raise e
+        return venta_id
 
     def generar_historial(self):
         """
         Genera un historial de ventas con información detallada.
+
+        Obtiene ventas, detalles y nombres de productos y empleados en una sola
+        consulta y los agrupa por venta en una única pasada (ver `iterar_historial`).
         
         Returns:
             List[Dict]: Lista de diccionarios con información de cada venta
         """
         try:
-            ventas = self.db.get_all_sales()
-            if not ventas:
-                return []
-
-            historial = []
-            productos_db = {p['id']: p['nombre'] for p in self.db.get_all_products()}
-            usuarios_db = {u['id']: u['nombre'] for u in self.db.get_all_users()}
-
-            for venta in ventas:
-                productos = []
-                detalles = self.db.get_sale_details(venta['id'])
-                for detalle in detalles:
-                    producto_id = detalle['producto_id']
-                    nombre = productos_db.get(producto_id, f"ID {producto_id}")
-                    cantidad = detalle['cantidad']
-                    precio = detalle['precio']
-                    productos.append(f"{nombre} (x{cantidad}) - ${precio:,.2f}")
-
-                # Formatear fecha
-                fecha = venta['fecha'].strftime('%d/%m/%Y %H:%M') if hasattr(venta['fecha'], 'strftime') else str(venta['fecha'])
-                
-                historial.append({
-                    'id': venta['id'],
-                    'fecha': fecha,
-                    'productos': productos,
-                    'total': venta['total'],
-                    'empleado': usuarios_db.get(venta['id_usuario'], f"ID {venta['id_usuario']}")
-                })
-            return historial
+            return list(self.iterar_historial())
         except Exception as e:
             logger.error(f"Error al generar historial: {str(e)}")
             return []
 
+    def iterar_historial(self):
+        """
+        Recorre el historial de ventas venta por venta.
+
+        Las filas se leen con un cursor del lado del servidor, por lo que en memoria
+        solo se mantiene la venta que se está armando.
+
+        Yields:
+            Dict: Información de cada venta, con el mismo formato que `generar_historial`
+        """
+        venta_actual = None
+        for fila in self.db.iter_sales_history():
+            if venta_actual is None or venta_actual['id'] != fila['venta_id']:
+                if venta_actual is not None:
+                    yield venta_actual
+                # Formatear fecha
+                fecha = fila['fecha'].strftime('%d/%m/%Y %H:%M') if hasattr(fila['fecha'], 'strftime') else str(fila['fecha'])
+                venta_actual = {
+                    'id': fila['venta_id'],
+                    'fecha': fecha,
+                    'productos': [],
+                    'total': fila['total'],
+                    'empleado': fila['usuario_nombre'] or f"ID {fila['id_usuario']}"
+                }
+
+            producto_id = fila['producto_id']
+            if producto_id is None:
+                continue
+            nombre = fila['producto_nombre'] or f"ID {producto_id}"
+            venta_actual['productos'].append(f"{nombre} (x{fila['cantidad']}) - ${fila['precio']:,.2f}")
+        if venta_actual is not None:
+            yield venta_actual
+
     def obtener_ventas_usuario(self, id_usuario: int) -> List[Dict]:
         """
         Obtiene las ventas realizadas por un usuario.
@@ -148,13 +166,80 @@ class Tienda:
 
     def calcular_total_ventas(self) -> float:
         """
-        Calcula el total de todas las ventas.
+        Calcula el total de todas las ventas a partir del resumen diario.
 
         Returns:
             float: Total de ventas.
         """
-        ventas = self.db.get_all_sales()
-        return sum(v['total'] for v in ventas)
+        return self.db.get_total_revenue()
+
+    def ingresos_por_dia(self, desde: date = None, hasta: date = None) -> List[Dict]:
+        """
+        Obtiene el número de ventas y lo facturado por día.
+
+        Args:
+            desde (date, optional): Primer día incluido.
+            hasta (date, optional): Primer día excluido.
+
+        Returns:
+            List[Dict]: Filas con 'dia', 'num_ventas' y 'total', ordenadas por día.
+        """
+        return self.db.get_revenue_by_day(desde, hasta)
+
+    def ingresos_por_empleado(self, desde: date = None, hasta: date = None) -> List[Dict]:
+        """
+        Obtiene el número de ventas y lo facturado por cada empleado.
+
+        Args:
+            desde (date, optional): Primer día incluido.
+            hasta (date, optional): Primer día excluido.
+
+        Returns:
+            List[Dict]: Filas con 'id_usuario', 'nombre', 'num_ventas' y 'total', de mayor a menor total.
+        """
+        return self.db.get_revenue_by_user(desde, hasta)
+
+    def ingresos_por_producto(self, desde: date = None, hasta: date = None) -> List[Dict]:
+        """
+        Obtiene las unidades vendidas y lo facturado por cada producto.
+
+        Args:
+            desde (date, optional): Primer día incluido.
+            hasta (date, optional): Primer día excluido.
+
+        Returns:
+            List[Dict]: Filas con 'producto_id', 'nombre', 'cantidad' y 'total', de mayor a menor total.
+        """
+        return self.db.get_revenue_by_product(desde, hasta)
+
+    def ingresos_por_categoria(self, desde: date = None, hasta: date = None) -> List[Dict]:
+        """
+        Obtiene las unidades vendidas y lo facturado por categoría de producto.
+
+        Args:
+            desde (date, optional): Primer día incluido.
+            hasta (date, optional): Primer día excluido.
+
+        Returns:
+            List[Dict]: Filas con 'categoria', 'cantidad' y 'total', de mayor a menor total.
+        """
+        return self.db.get_revenue_by_category(desde, hasta)
+
+    def sugerencias_reabastecimiento(self, solo_reponer: bool = True) -> List[Dict]:
+        """
+        Calcula los puntos de pedido y las cantidades a reponer de todo el catálogo.
+        Si la tienda no tiene motor de reabastecimiento, lo calcula desde el historial
+        y lo conserva para actualizarlo con las ventas siguientes.
+
+        Args:
+            solo_reponer (bool): Si es True, solo los productos en o bajo su punto de pedido
+
+        Returns:
+            List[Dict]: Sugerencias de `MotorReabastecimiento.sugerencias`
+        """
+        if self.reabastecimiento is None:
+            self.reabastecimiento = MotorReabastecimiento.desde_base(self.db)
+        return self.reabastecimiento.sugerencias(self.db.iter_products(), solo_reponer=solo_reponer)
 
     def validar_stock_venta(self, id_producto: int, cantidad: int, inventario: Inventario) -> bool:
         """
@@ -168,8 +253,7 @@ class Tienda:
         Returns:
             bool: True si hay suficiente stock, False en caso contrario
         """
-        productos_db = inventario.db.get_all_products()
-        producto = next((p for p in productos_db if p['id'] == id_producto), None)
+        producto = inventario.db.get_products([id_producto]).get(id_producto)
         return producto is not None and producto['cantidad'] >= cantidad
 
     def borrar_historial_ventas(self):
@@ -181,3 +265,73 @@ class Tienda:
         """
         self.db.delete_all_sales()
         return "Historial de ventas borrado correctamente."
+
+
+class _ProductosLeidos:
+    """Productos ya leídos de la base, con la consulta por nombres que usa `Venta` para validar."""
+
+    def __init__(self, productos):
+        self._por_nombre = {producto['nombre']: producto for producto in productos}
+
+    def get_products_by_names(self, names):
+        return {nombre: self._por_nombre[nombre] for nombre in names if nombre in self._por_nombre}
+
+
+class TiendaAsincrona:
+    """
+    Registro de ventas sobre una base de datos asíncrona (`AsyncDatabaseInterface`).
+
+    Aplica las mismas reglas que `Tienda`: la venta se valida con `Venta` y el stock,
+    la venta y sus detalles se confirman en una única transacción. Los productos se
+    leen una sola vez y `Venta` se valida contra esa lectura, sin consultas bloqueantes.
+
+    Attributes:
+        db: Instancia de la base de datos asíncrona
+    """
+
+    def __init__(self, db):
+        """
+        Inicializa la tienda con la base de datos asíncrona.
+
+        Args:
+            db: Instancia de `AsyncDatabaseInterface`
+        """
+        self.db = db
+
+    async def registrar_venta(self, seleccion, id_usuario):
+        """
+        Registra una venta con los precios actuales de los productos.
+
+        Args:
+            seleccion (dict): Cantidad por ID de producto
+            id_usuario (int): Usuario que registra la venta
+
+        Returns:
+            dict: Venta registrada con 'id', 'fecha', 'id_usuario', 'total' y 'detalles'
+
+        Raises:
+            VentaProductoNoRegistradoError: Si algún ID no corresponde a un producto
+            StockInsuficienteError: Si algún producto no tiene stock suficiente
+            Las excepciones de validación de `Venta` (categoría, cantidades, empleado...)
+        """
+        productos = await self.db.get_products(list(seleccion))
+        desconocidos = sorted(set(seleccion) - set(productos))
+        if desconocidos:
+            raise VentaProductoNoRegistradoError(f"Productos inexistentes: {', '.join(map(str, desconocidos))}")
+        venta = Venta(None, datetime.now(), [(productos[id], cantidad) for id, cantidad in seleccion.items()],
+                      id_usuario, Inventario(_ProductosLeidos(productos.values())))
+
+        async with self.db.transaction():
+            # Descontar stock de forma atómica; falla si otra petición lo agotó antes
+            for producto, cantidad in venta.productos_vendidos:
+                try:
+                    await self.db.decrement_stock(producto['id'], cantidad)
+                except StockInsuficienteError:
+                    raise _stock_insuficiente(producto, cantidad)
+            datos = venta.to_dict()
+            datos['id'] = await self.db.create_sale(datos)
+            datos['detalles'] = _detalles_venta(datos['id'], venta.productos_vendidos)
+            await self.db.insert_sale_details(datos['detalles'])
+
+        VENTAS.incrementar()
+        return datos
@@ -0,0 +1,460 @@
+"""
+Registro de métricas del proceso en formato de texto de Prometheus.
+
+Los contadores e histogramas guardan sus valores en un diccionario por hilo:
+incrementar no toma ningún lock (salvo la primera vez que un hilo usa una
+métrica), por lo que pueden quedar activos en el camino caliente de cada
+petición y de cada consulta. Cuando un hilo termina, sus valores se pliegan en
+una base común, de modo que la memoria no crece con los hilos que crea el
+servidor. Al exponer las métricas se suma la base y los valores de los hilos vivos.
+
+Los recolectores son funciones que se evalúan al exponer las métricas, para
+valores que ya lleva otro objeto (estado del pool de conexiones, aciertos de
+las cachés).
+
+Con varios procesos (workers de gunicorn) se indica un directorio compartido
+(`METRICAS_DIR`): cada proceso vuelca sus valores a `metricas_<pid>.json` cada
+`intervalo` segundos y al terminar, y el proceso que atiende `/metrics` suma los
+archivos de todos. Los contadores e histogramas de los procesos que ya terminaron
+se pasan a `metricas_retirados.json` y su archivo se elimina, así no retroceden
+ni se cuentan dos veces si el sistema reutiliza el PID; los recolectores solo se
+toman de los procesos vivos. El directorio debe vaciarse al desplegar, antes de
+arrancar los workers.
+"""
+import atexit
+import bisect
+import glob
+import json
+import logging
+import math
+import os
+import threading
+import time
+import weakref
+try:
+    import fcntl
+except ImportError:  # Windows: un solo proceso, no hay archivos que retirar
+    fcntl = None
+from database.database_config import METRICAS_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Límites (en segundos) de los histogramas de latencia
+LIMITES_LATENCIA = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Contadores e histogramas acumulados de los procesos que ya terminaron
+ARCHIVO_RETIRADOS = 'metricas_retirados.json'
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _formatear_etiquetas(nombres, valores, extra=None):
+    pares = [f'{nombre}="{_escapar(valor)}"' for nombre, valor in zip(nombres, valores)]
+    if extra:
+        pares.append(extra)
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+def _formatear_numero(valor):
+    if math.isinf(valor):
+        return '+Inf' if valor > 0 else '-Inf'
+    return repr(float(valor)) if isinstance(valor, float) and not valor.is_integer() else str(int(valor))
+
+
+class _Fragmento:
+    """Dueño, en el `threading.local`, del diccionario de valores de un hilo."""
+
+    __slots__ = ('valores', '__weakref__')
+
+    def __init__(self, valores):
+        self.valores = valores
+
+
+class _Metrica:
+    """
+    Base de las métricas con un diccionario de valores por hilo.
+
+    Attributes:
+        nombre (str): Nombre de la métrica
+        ayuda (str): Descripción para la línea # HELP
+        etiquetas (tuple): Nombres de las etiquetas, en el orden de sus valores
+    """
+
+    tipo = None
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._reiniciar()
+
+    def _reiniciar(self):
+        self._local = threading.local()
+        self._fragmentos = {}  # id -> valores de un hilo vivo
+        self._base = {}  # valores de los hilos que ya terminaron
+        self._lock = threading.Lock()
+
+    def _fragmento(self):
+        """Diccionario de valores del hilo actual (se crea en su primer uso)."""
+        try:
+            return self._local.fragmento.valores
+        except AttributeError:
+            valores = {}
+            fragmento = _Fragmento(valores)
+            with self._lock:
+                self._fragmentos[id(valores)] = valores
+            # Al terminar el hilo se descarta su threading.local y con él el fragmento
+            weakref.finalize(fragmento, self._plegar, valores, self._fragmentos)
+            self._local.fragmento = fragmento
+            return valores
+
+    def _plegar(self, valores, fragmentos):
+        """Pasa los valores de un hilo terminado a la base."""
+        with self._lock:
+            if fragmentos is not self._fragmentos:
+                return  # Fragmento anterior a un fork: ya no se cuenta en este proceso
+            del fragmentos[id(valores)]
+            for etiquetas, valor in valores.items():
+                self._acumular(self._base, etiquetas, valor)
+
+    def _acumular(self, totales, etiquetas, valor):
+        raise NotImplementedError
+
+    def valores(self):
+        """
+        Returns:
+            dict: Valores de las etiquetas -> total de la base y de todos los hilos
+        """
+        totales = {}
+        with self._lock:
+            for etiquetas, valor in self._base.items():
+                self._acumular(totales, etiquetas, valor)
+            fragmentos = list(self._fragmentos.values())
+        for fragmento in fragmentos:
+            for etiquetas, valor in list(fragmento.items()):
+                self._acumular(totales, etiquetas, valor)
+        return totales
+
+    def _validar(self, etiquetas):
+        if len(etiquetas) != len(self.etiquetas):
+            raise ValueError(f"{self.nombre} espera las etiquetas {self.etiquetas}")
+
+
+class Contador(_Metrica):
+    """Valor que solo aumenta."""
+
+    tipo = 'counter'
+
+    def incrementar(self, etiquetas=(), valor=1):
+        """
+        Args:
+            etiquetas (tuple): Valores de las etiquetas
+            valor (float): Cantidad a sumar (no negativa)
+        """
+        valores = self._fragmento()
+        try:
+            valores[etiquetas] += valor
+        except KeyError:
+            self._validar(etiquetas)
+            valores[etiquetas] = valor
+
+    def _acumular(self, totales, etiquetas, valor):
+        totales[etiquetas] = totales.get(etiquetas, 0) + valor
+
+
+class Histograma(_Metrica):
+    """
+    Distribución de observaciones en intervalos acumulados.
+
+    Por cada combinación de etiquetas guarda la cuenta de cada intervalo (el último
+    es +Inf) seguida de la suma de las observaciones.
+    """
+
+    tipo = 'histogram'
+
+    def __init__(self, nombre, ayuda, etiquetas=(), limites=LIMITES_LATENCIA):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.limites = tuple(sorted(limites))
+
+    def observar(self, valor, etiquetas=()):
+        """
+        Args:
+            valor (float): Observación (p. ej. segundos)
+            etiquetas (tuple): Valores de las etiquetas
+        """
+        valores = self._fragmento()
+        cuentas = valores.get(etiquetas)
+        if cuentas is None:
+            self._validar(etiquetas)
+            cuentas = valores[etiquetas] = [0] * (len(self.limites) + 1) + [0.0]
+        cuentas[bisect.bisect_left(self.limites, valor)] += 1
+        cuentas[-1] += valor
+
+    def _acumular(self, totales, etiquetas, cuentas):
+        total = totales.setdefault(etiquetas, [0] * len(cuentas))
+        for i, cuenta in enumerate(list(cuentas)):
+            total[i] += cuenta
+
+
+class Recolector:
+    """
+    Métrica calculada al exponer por una función.
+
+    La función retorna una lista de (valores de las etiquetas, valor).
+    """
+
+    def __init__(self, nombre, tipo, ayuda, funcion, etiquetas=()):
+        self.nombre = nombre
+        self.tipo = tipo
+        self.ayuda = ayuda
+        self.funcion = funcion
+        self.etiquetas = tuple(etiquetas)
+
+    def valores(self):
+        try:
+            return {tuple(etiquetas): valor for etiquetas, valor in self.funcion()}
+        except Exception as e:
+            logger.debug("No se pudo recolectar %s: %s", self.nombre, e)
+            return {}
+
+
+class RegistroMetricas:
+    """
+    Métricas del proceso y, opcionalmente, de los demás procesos que comparten directorio.
+
+    Attributes:
+        directorio (str): Directorio compartido entre procesos, o None para un solo proceso
+        intervalo (float): Segundos mínimos entre volcados al directorio
+    """
+
+    def __init__(self, directorio=None, intervalo=5.0):
+        self.directorio = directorio
+        self.intervalo = intervalo
+        self._metricas = {}
+        self._lock = threading.Lock()
+        self._ultimo_volcado = 0.0
+        self._volco = False
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+            atexit.register(self.volcar)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._despues_de_fork)
+
+    def _despues_de_fork(self):
+        # El hijo no debe volver a contar lo que ya contó (y volcará) el padre
+        self._ultimo_volcado = 0.0
+        self._volco = False
+        self._lock = threading.Lock()
+        for metrica in self._metricas.values():
+            if isinstance(metrica, _Metrica):
+                metrica._reiniciar()
+
+    def _registrar(self, clase, nombre, *args, **kwargs):
+        with self._lock:
+            existente = self._metricas.get(nombre)
+            if existente is not None:
+                if not isinstance(existente, clase):
+                    raise ValueError(f"La métrica {nombre} ya está registrada con otro tipo")
+                return existente
+            metrica = self._metricas[nombre] = clase(nombre, *args, **kwargs)
+            return metrica
+
+    def contador(self, nombre, ayuda, etiquetas=()):
+        """Registra (o retorna si ya existe) un contador."""
+        return self._registrar(Contador, nombre, ayuda, etiquetas)
+
+    def histograma(self, nombre, ayuda, etiquetas=(), limites=LIMITES_LATENCIA):
+        """Registra (o retorna si ya existe) un histograma."""
+        return self._registrar(Histograma, nombre, ayuda, etiquetas, limites)
+
+    def recolector(self, nombre, tipo, ayuda, funcion, etiquetas=()):
+        """
+        Registra una métrica calculada al exponer; reemplaza a la anterior del mismo nombre.
+
+        Args:
+            tipo (str): 'gauge' o 'counter'
+            funcion (callable): Retorna una lista de (valores de las etiquetas, valor)
+        """
+        with self._lock:
+            self._metricas[nombre] = Recolector(nombre, tipo, ayuda, funcion, etiquetas)
+
+    def _instantanea(self):
+        """Valores actuales de este proceso, serializables a JSON."""
+        with self._lock:
+            metricas = list(self._metricas.values())
+        instantanea = {}
+        for metrica in metricas:
+            instantanea[metrica.nombre] = {
+                'tipo': metrica.tipo,
+                'ayuda': metrica.ayuda,
+                'etiquetas': list(metrica.etiquetas),
+                'limites': list(getattr(metrica, 'limites', ())),
+                'recolector': isinstance(metrica, Recolector),
+                'valores': [[list(etiquetas), valor] for etiquetas, valor in metrica.valores().items()]
+            }
+        return instantanea
+
+    def volcar(self):
+        """Escribe los valores de este proceso en el directorio compartido."""
+        if not self.directorio:
+            return
+        self._ultimo_volcado = time.monotonic()
+        ruta = os.path.join(self.directorio, f'metricas_{os.getpid()}.json')
+        if not self._volco and os.path.exists(ruta):
+            # Es de un proceso anterior con el mismo PID: se retira antes de reemplazarlo
+            self._retirar(ruta)
+        self._volco = True
+        try:
+            _escribir_json(ruta, {'pid': os.getpid(), 'metricas': self._instantanea()})
+        except OSError as e:
+            logger.warning("No se pudieron volcar las métricas en %s: %s", ruta, e)
+
+    def volcar_periodico(self):
+        """Vuelca los valores si pasó el intervalo desde el último volcado (barato si no)."""
+        if self.directorio and time.monotonic() - self._ultimo_volcado >= self.intervalo:
+            self.volcar()
+
+    def _retirar(self, ruta):
+        """
+        Suma los contadores e histogramas de un proceso terminado a los retirados y
+        elimina su archivo. Un bloqueo de archivo evita que dos procesos lo retiren a la vez.
+
+        Returns:
+            bool: True si el archivo ya no está (retirado por este u otro proceso)
+        """
+        if fcntl is None:
+            return False
+        try:
+            with open(os.path.join(self.directorio, 'metricas.lock'), 'a') as cerrojo:
+                fcntl.flock(cerrojo, fcntl.LOCK_EX)
+                try:
+                    with open(ruta, encoding='utf-8') as archivo:
+                        datos = json.load(archivo)
+                except FileNotFoundError:
+                    return True
+                retirados = _leer_json(os.path.join(self.directorio, ARCHIVO_RETIRADOS)) or {}
+                for nombre, metrica in datos['metricas'].items():
+                    if not metrica['recolector']:
+                        _sumar(retirados.setdefault(nombre, dict(metrica, valores=[])), metrica['valores'])
+                _escribir_json(os.path.join(self.directorio, ARCHIVO_RETIRADOS), retirados)
+                os.remove(ruta)
+                return True
+        except (OSError, ValueError) as e:
+            logger.warning("No se pudieron retirar las métricas de %s: %s", ruta, e)
+            return False
+
+    def _otros_procesos(self):
+        """
+        Instantáneas de los demás procesos del directorio y de los retirados, con un
+        indicador de si siguen vivos. Los archivos de los procesos terminados se retiran.
+        """
+        if not self.directorio:
+            return []
+        procesos = []
+        for ruta in glob.glob(os.path.join(self.directorio, 'metricas_*.json')):
+            if os.path.basename(ruta) == ARCHIVO_RETIRADOS:
+                continue
+            datos = _leer_json(ruta)
+            if datos is None or datos['pid'] == os.getpid():
+                continue
+            if _proceso_vivo(datos['pid']):
+                procesos.append((datos['metricas'], True))
+            elif not self._retirar(ruta):
+                procesos.append((datos['metricas'], False))
+        retirados = _leer_json(os.path.join(self.directorio, ARCHIVO_RETIRADOS))
+        if retirados:
+            procesos.append((retirados, False))
+        return procesos
+
+    def exponer(self):
+        """
+        Retorna las métricas en el formato de texto de Prometheus (versión 0.0.4).
+
+        Returns:
+            str: Métricas de este proceso sumadas a las de los demás procesos del directorio
+        """
+        metricas = self._instantanea()
+        for otras, vivo in self._otros_procesos():
+            for nombre, datos in otras.items():
+                if datos['recolector'] and not vivo:
+                    continue
+                propia = metricas.setdefault(nombre, dict(datos, valores=[]))
+                _sumar(propia, datos['valores'])
+
+        lineas = []
+        for nombre in sorted(metricas):
+            datos = metricas[nombre]
+            lineas.append(f"# HELP {nombre} {datos['ayuda']}")
+            lineas.append(f"# TYPE {nombre} {datos['tipo']}")
+            for etiquetas, valor in sorted(datos['valores'], key=lambda item: item[0]):
+                if datos['tipo'] != 'histogram':
+                    lineas.append(f"{nombre}{_formatear_etiquetas(datos['etiquetas'], etiquetas)} "
+                                  f"{_formatear_numero(valor)}")
+                    continue
+                acumulado = 0
+                for limite, cuenta in zip(datos['limites'] + [math.inf], valor[:-1]):
+                    acumulado += cuenta
+                    le = f'le="{_formatear_numero(limite)}"'
+                    lineas.append(f"{nombre}_bucket{_formatear_etiquetas(datos['etiquetas'], etiquetas, le)} "
+                                  f"{acumulado}")
+                sufijo = _formatear_etiquetas(datos['etiquetas'], etiquetas)
+                lineas.append(f"{nombre}_sum{sufijo} {_formatear_numero(valor[-1])}")
+                lineas.append(f"{nombre}_count{sufijo} {acumulado}")
+        return '\n'.join(lineas) + '\n'
+
+
+def _sumar(datos, valores):
+    """Suma a `datos['valores']` los valores de otro proceso, por etiquetas."""
+    indice = {tuple(entrada[0]): entrada for entrada in datos['valores']}
+    for etiquetas, valor in valores:
+        entrada = indice.get(tuple(etiquetas))
+        if entrada is None:
+            entrada = [list(etiquetas), [0] * len(valor) if isinstance(valor, list) else 0]
+            datos['valores'].append(entrada)
+            indice[tuple(etiquetas)] = entrada
+        if isinstance(valor, list):
+            entrada[1] = [a + b for a, b in zip(entrada[1], valor)]
+        else:
+            entrada[1] += valor
+
+
+def _leer_json(ruta):
+    """Contenido de un archivo JSON, o None si no existe o no se puede leer."""
+    try:
+        with open(ruta, encoding='utf-8') as archivo:
+            return json.load(archivo)
+    except (OSError, ValueError):
+        return None
+
+
+def _escribir_json(ruta, datos):
+    """Escribe un archivo JSON de forma atómica (temporal y renombrado)."""
+    temporal = f'{ruta}.{os.getpid()}.tmp'
+    with open(temporal, 'w', encoding='utf-8') as archivo:
+        json.dump(datos, archivo)
+    os.replace(temporal, ruta)
+
+
+def _proceso_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # Existe pero pertenece a otro usuario
+        return True
+    return True
+
+
+# Registro del proceso y métricas compartidas por la web, la consola y la interfaz gráfica
+METRICAS = RegistroMetricas(METRICAS_CONFIG['directorio'], METRICAS_CONFIG['intervalo'])
+
+DURACION_PETICIONES = METRICAS.histograma(
+    'http_request_duration_seconds', 'Duración de las peticiones HTTP en segundos',
+    ('blueprint', 'endpoint', 'method', 'status'))
+DURACION_CONSULTAS = METRICAS.histograma(
+    'db_query_duration_seconds', 'Duración de las consultas a PostgreSQL en segundos', ('operation',))
+VENTAS = METRICAS.contador('sales_total', 'Ventas registradas')
+CONFLICTOS_STOCK = METRICAS.contador(
+    'stock_decrement_conflicts_total', 'Descuentos de stock rechazados por falta de stock (ventas concurrentes)')
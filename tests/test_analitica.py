@@ -0,0 +1,67 @@
+from datetime import datetime
+import pytest
+from database.test_database import DatabaseTest
+from modulos.analitica import AnaliticaVentas
+
+
+@pytest.fixture
+def db():
+    """
+    Base con tres productos y tres ventas:
+    lapiz 10 x 100 + 5 x 100, cuaderno 2 x 1000, regla sin ventas.
+    """
+    db = DatabaseTest()
+    empleado = db.create_user({'nombre': 'ana', 'rol': 'empleado', 'password': 'secreto1'})
+    lapiz, cuaderno, regla = (
+        db.create_product({'nombre': nombre, 'precio': precio, 'cantidad': stock,
+                           'categoria': 'escolar', 'stock_minimo': 1})
+        for nombre, precio, stock in (('lapiz', 100, 5), ('cuaderno', 1000, 8), ('regla', 50, 3))
+    )
+    for dia, lineas in ((1, [(lapiz, 10, 100), (cuaderno, 1, 1000)]), (2, [(lapiz, 5, 100)]), (3, [(cuaderno, 1, 1000)])):
+        venta_id = db.create_sale({'fecha': datetime(2025, 4, dia), 'id_usuario': empleado,
+                                   'total': sum(c * p for _, c, p in lineas)})
+        db.insert_sale_details([{'venta_id': venta_id, 'producto_id': producto, 'cantidad': c, 'precio': p}
+                                for producto, c, p in lineas])
+    db.create_sale({'fecha': datetime(2025, 4, 4), 'id_usuario': empleado, 'total': 0})  # sin líneas
+    db.ids = {'lapiz': lapiz, 'cuaderno': cuaderno, 'regla': regla}
+    return db
+
+
+def test_carga_por_bloques(db):
+    """
+    Verifica que la lectura por bloques produce columnas int64 con todas las líneas.
+    """
+    analitica = AnaliticaVentas.desde_base(db, tamano_bloque=2)
+    assert len(analitica.producto_id) == 4
+    assert analitica.fecha.dtype.name == 'int64'
+    assert analitica.fecha[0] == (datetime(2025, 4, 1) - datetime(1970, 1, 1)).total_seconds()
+    assert len(AnaliticaVentas.desde_base(db, desde=datetime(2025, 4, 2)).venta_id) == 2
+
+
+def test_metricas(db):
+    """
+    Verifica top de productos, clasificación ABC, tasa de venta y tamaño de canasta.
+    """
+    analitica = AnaliticaVentas.desde_base(db)
+    top = analitica.top_productos(1)
+    assert top == [{'producto_id': db.ids['cuaderno'], 'nombre': 'cuaderno', 'cantidad': 2, 'ingresos': 2000.0}]
+    assert analitica.clasificacion_abc()['A']['productos'] == [db.ids['cuaderno'], db.ids['lapiz']]
+    abc = analitica.clasificacion_abc(limite_a=0.5)
+    assert abc['A']['productos'] == [db.ids['cuaderno']]
+    assert abc['B']['productos'] == [db.ids['lapiz']]
+    assert abc['A']['participacion'] == pytest.approx(2000 / 3500)
+    tasas = {t['nombre']: t['tasa'] for t in analitica.tasa_venta()}
+    assert tasas == {'lapiz': 0.75, 'cuaderno': 0.2, 'regla': 0.0}
+    canasta = analitica.distribucion_canasta()
+    assert canasta['histograma'] == {1: 1, 5: 1, 11: 1}
+    assert canasta['mediana'] == 5.0
+
+
+def test_sin_ventas():
+    """
+    Verifica que las métricas no fallan sin líneas de venta.
+    """
+    analitica = AnaliticaVentas.desde_base(DatabaseTest())
+    assert analitica.top_productos() == []
+    assert analitica.clasificacion_abc()['A']['productos'] == []
+    assert analitica.distribucion_canasta()['ventas'] == 0
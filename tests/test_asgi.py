@@ -0,0 +1,239 @@
+import asyncio
+import gzip
+import json
+import time
+from database.test_database import AsyncDatabaseTest
+from web.app import app as app_flask
+from web.asgi import AplicacionAsgi
+
+
+def cookie_sesion(**sesion):
+    """Cookie de sesión firmada igual que la de la interfaz web."""
+    valor = app_flask.session_interface.get_signing_serializer(app_flask).dumps(sesion)
+    return f"session={valor}"
+
+
+ADMIN = cookie_sesion(user_id=1, user_role='admin')
+EMPLEADO = cookie_sesion(user_id=2, user_role='empleado')
+
+
+async def pedir(aplicacion, metodo, ruta, cuerpo=None, cookie=ADMIN, cabeceras=None):
+    """Envía una petición a la aplicación ASGI y retorna (estado, cabeceras, cuerpo)."""
+    ruta, _, query = ruta.partition('?')
+    encabezados = {'cookie': cookie} if cookie else {}
+    datos = b''
+    if cuerpo is not None:
+        datos = json.dumps(cuerpo).encode('utf-8')
+        encabezados['content-type'] = 'application/json'
+    encabezados.update(cabeceras or {})
+    scope = {'type': 'http', 'method': metodo, 'path': ruta, 'query_string': query.encode('latin-1'),
+             'headers': [(k.encode('latin-1'), v.encode('latin-1')) for k, v in encabezados.items()]}
+    mensajes = [{'type': 'http.request', 'body': datos, 'more_body': False}]
+    enviados = []
+
+    async def receive():
+        return mensajes.pop(0) if mensajes else {'type': 'http.disconnect'}
+
+    async def send(mensaje):
+        enviados.append(mensaje)
+
+    await aplicacion(scope, receive, send)
+    inicio, cuerpo_respuesta = enviados
+    respuesta = {k.decode('latin-1'): v.decode('latin-1') for k, v in inicio['headers']}
+    return inicio['status'], respuesta, cuerpo_respuesta['body']
+
+
+def crear_aplicacion(latencia=0.0):
+    db = AsyncDatabaseTest(latencia=latencia)
+    db.db.create_user({'nombre': 'admin', 'rol': 'admin', 'password': 'secreto1'})
+    return AplicacionAsgi(db, secret_key=app_flask.secret_key), db.db
+
+
+def crear_producto(db, nombre='cuaderno', cantidad=10, categoria='escolar'):
+    return db.create_product({'nombre': nombre, 'precio': 100.0, 'cantidad': cantidad,
+                              'categoria': categoria, 'stock_minimo': 1})
+
+
+def test_requiere_sesion():
+    async def escenario():
+        aplicacion, _ = crear_aplicacion()
+        estado, _, cuerpo = await pedir(aplicacion, 'GET', '/api/v1/productos', cookie=None)
+        assert estado == 401
+        assert json.loads(cuerpo) == {'error': 'Debe iniciar sesión'}
+        estado, _, _ = await pedir(aplicacion, 'GET', '/api/v1/productos',
+                                   cookie='session=firma-falsa')
+        assert estado == 401
+        estado, _, _ = await pedir(aplicacion, 'GET', '/api/v1/nada')
+        assert estado == 404
+    asyncio.run(escenario())
+
+
+def test_listado_condicional_y_campos():
+    """
+    Verifica la paginación, la selección de campos y el 304 sin consultar la base
+    de datos mientras la tabla no cambia.
+    """
+    async def escenario():
+        aplicacion, db = crear_aplicacion()
+        for i in range(3):
+            crear_producto(db, f'cuaderno {i}')
+        estado, cabeceras, cuerpo = await pedir(aplicacion, 'GET', '/api/v1/productos?por_pagina=2&campos=id,nombre')
+        assert estado == 200
+        datos = json.loads(cuerpo)
+        assert datos['items'] == [{'id': 2, 'nombre': 'cuaderno 0'}, {'id': 3, 'nombre': 'cuaderno 1'}]
+        assert datos['paginacion'] == {'pagina': 1, 'por_pagina': 2, 'siguiente': 3}
+        etag = cabeceras['etag']
+        assert etag.startswith('W/')
+
+        estado, cabeceras, cuerpo = await pedir(aplicacion, 'GET', '/api/v1/productos?por_pagina=2&campos=id,nombre',
+                                                cabeceras={'if-none-match': etag})
+        assert (estado, cuerpo) == (304, b'')
+        assert cabeceras['x-query-count'] == '0'
+
+        crear_producto(db, 'lapiz')
+        aplicacion.versiones.invalidar()  # En producción llega la notificación del trigger
+        estado, _, _ = await pedir(aplicacion, 'GET', '/api/v1/productos?por_pagina=2&campos=id,nombre',
+                                   cabeceras={'if-none-match': etag})
+        assert estado == 200
+
+        estado, _, cuerpo = await pedir(aplicacion, 'GET', '/api/v1/productos?campos=inventado')
+        assert estado == 400
+    asyncio.run(escenario())
+
+
+def test_gzip():
+    async def escenario():
+        aplicacion, db = crear_aplicacion()
+        for i in range(20):
+            crear_producto(db, f'cuaderno {i}')
+        estado, cabeceras, cuerpo = await pedir(aplicacion, 'GET', '/api/v1/productos',
+                                                cabeceras={'accept-encoding': 'gzip, deflate'})
+        assert estado == 200
+        assert cabeceras['content-encoding'] == 'gzip'
+        assert len(json.loads(gzip.decompress(cuerpo))['items']) == 20
+    asyncio.run(escenario())
+
+
+def test_crear_venta_e_historial():
+    """
+    Verifica que la venta descuenta el stock, responde como la API de Flask y
+    aparece con sus líneas en el historial y en el detalle.
+    """
+    async def escenario():
+        aplicacion, db = crear_aplicacion()
+        cuaderno = crear_producto(db)
+        lapiz = crear_producto(db, 'lapiz')
+        estado, _, cuerpo = await pedir(aplicacion, 'POST', '/api/v1/ventas', {'productos': [
+            {'producto_id': cuaderno, 'cantidad': 2}, {'producto_id': lapiz, 'cantidad': 1},
+            {'producto_id': cuaderno, 'cantidad': 1}]})
+        assert estado == 201
+        venta = json.loads(cuerpo)
+        assert venta['total'] == 400.0
+        assert venta['id_usuario'] == 1
+        assert venta['productos'] == [{'producto_id': cuaderno, 'cantidad': 3, 'precio': 100.0},
+                                      {'producto_id': lapiz, 'cantidad': 1, 'precio': 100.0}]
+        assert db.get_product(cuaderno)['cantidad'] == 7
+
+        estado, _, cuerpo = await pedir(aplicacion, 'GET', '/api/v1/historial')
+        assert estado == 200
+        [registrada] = json.loads(cuerpo)['items']
+        assert [linea['producto'] for linea in registrada['productos']] == ['cuaderno', 'lapiz']
+
+        estado, _, cuerpo = await pedir(aplicacion, 'GET', f"/api/v1/ventas/{venta['id']}?campos=id,total")
+        assert json.loads(cuerpo) == {'id': venta['id'], 'total': 400.0}
+        estado, _, _ = await pedir(aplicacion, 'GET', '/api/v1/ventas/999')
+        assert estado == 404
+    asyncio.run(escenario())
+
+
+def test_venta_rechazada_no_registra_nada():
+    """
+    Verifica que las reglas de `Venta` y el stock se aplican y que una venta
+    rechazada no deja cambios.
+    """
+    async def escenario():
+        aplicacion, db = crear_aplicacion()
+        cuaderno = crear_producto(db, cantidad=2)
+        remera = crear_producto(db, 'remera', categoria='ropa')
+        estado, _, cuerpo = await pedir(aplicacion, 'POST', '/api/v1/ventas', {'productos': [
+            {'producto_id': cuaderno, 'cantidad': 1}, {'producto_id': cuaderno, 'cantidad': 2}]})
+        assert estado == 409
+        assert 'cuaderno' in json.loads(cuerpo)['error']
+        estado, _, cuerpo = await pedir(aplicacion, 'POST', '/api/v1/ventas',
+                                        {'productos': [{'producto_id': remera, 'cantidad': 1}]})
+        assert estado == 400
+        assert 'categoría' in json.loads(cuerpo)['error']
+        estado, _, cuerpo = await pedir(aplicacion, 'POST', '/api/v1/ventas',
+                                        {'productos': [{'producto_id': 99, 'cantidad': 1}]})
+        assert (estado, json.loads(cuerpo)) == (400, {'error': 'Productos inexistentes: 99'})
+        estado, _, _ = await pedir(aplicacion, 'POST', '/api/v1/ventas', {'productos': []})
+        assert estado == 400
+        assert db.ventas == {}
+        assert db.get_product(cuaderno)['cantidad'] == 2
+    asyncio.run(escenario())
+
+
+def test_crear_producto():
+    """
+    Verifica que el alta de productos valida con `Producto`, rechaza duplicados y
+    solo la puede hacer el administrador.
+    """
+    async def escenario():
+        aplicacion, db = crear_aplicacion()
+        producto = {'nombre': 'regla', 'precio': 50.0, 'cantidad': 4, 'categoria': 'escolar', 'stock_minimo': 1}
+        estado, _, cuerpo = await pedir(aplicacion, 'POST', '/api/v1/productos', producto)
+        assert estado == 201
+        assert json.loads(cuerpo)['nombre'] == 'regla'
+        estado, _, _ = await pedir(aplicacion, 'POST', '/api/v1/productos', producto)
+        assert estado == 409
+        estado, _, cuerpo = await pedir(aplicacion, 'POST', '/api/v1/productos', dict(producto, precio=0))
+        assert (estado, json.loads(cuerpo)) == (400, {'error': 'El precio debe ser mayor que cero'})
+        estado, _, _ = await pedir(aplicacion, 'POST', '/api/v1/productos', dict(producto, cantidad='4'))
+        assert estado == 400
+        estado, _, _ = await pedir(aplicacion, 'POST', '/api/v1/productos', dict(producto, nombre='otra'),
+                                   cookie=EMPLEADO)
+        assert estado == 403
+        assert len(db.productos) == 1
+    asyncio.run(escenario())
+
+
+def test_peticiones_concurrentes_con_base_lenta():
+    """
+    Verifica que el proceso atiende las peticiones a la vez mientras esperan a la base
+    de datos, y que las ventas concurrentes no venden más stock del que hay.
+    """
+    async def escenario():
+        aplicacion, db = crear_aplicacion(latencia=0.05)
+        cuaderno = crear_producto(db, cantidad=5)
+        await aplicacion.versiones.refrescar_asincrono()
+        inicio = time.perf_counter()
+        respuestas = await asyncio.gather(*(pedir(aplicacion, 'GET', f'/api/v1/productos/{cuaderno}?n={i}')
+                                            for i in range(20)))
+        assert all(estado == 200 for estado, _, _ in respuestas)
+        # En serie serían 20 x 0.05 s
+        assert time.perf_counter() - inicio < 0.5
+
+        respuestas = await asyncio.gather(*(pedir(aplicacion, 'POST', '/api/v1/ventas',
+                                                  {'productos': [{'producto_id': cuaderno, 'cantidad': 1}]})
+                                            for _ in range(8)))
+        assert sorted(estado for estado, _, _ in respuestas) == [201] * 5 + [409] * 3
+        assert db.get_product(cuaderno)['cantidad'] == 0
+        assert len(db.ventas) == 5
+    asyncio.run(escenario())
+
+
+def test_ciclo_de_vida():
+    async def escenario():
+        aplicacion, _ = crear_aplicacion()
+        mensajes = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+        enviados = []
+
+        async def receive():
+            return mensajes.pop(0)
+
+        async def send(mensaje):
+            enviados.append(mensaje['type'])
+
+        await aplicacion({'type': 'lifespan'}, receive, send)
+        assert enviados == ['lifespan.startup.complete', 'lifespan.shutdown.complete']
+    asyncio.run(escenario())
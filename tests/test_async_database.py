@@ -0,0 +1,295 @@
+import asyncio
+import os
+import socket
+from datetime import datetime
+import psycopg2
+import pytest
+from psycopg2.errors import UniqueViolation
+from psycopg2.extensions import POLL_OK, POLL_READ, TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_INTRANS
+from database.connection_pool import ConnectionPool
+from database.async_connection_pool import AsyncConnectionPool, esperar
+from database.async_postgres_database import AsyncPostgresDatabase
+from database.database_config import CURRENT_CONFIG
+from database.postgres_database import PostgresDatabase
+from errores.database_error import DatabaseError
+from errores.productos_duplicados import ProductoDuplicadoError
+from errores.stock_insuficiente import StockInsuficienteError
+from modulos.tienda import TiendaAsincrona
+
+
+class ConexionAsincronaFalsa:
+    """Conexión asíncrona mínima: cada sentencia termina en el primer `poll`."""
+
+    def __init__(self, filas=None, error=None):
+        self.closed = 0
+        self.sentencias = []
+        self.filas = filas if filas is not None else []
+        self.error = error
+        self.estado_transaccion = TRANSACTION_STATUS_IDLE
+
+    def poll(self):
+        return POLL_OK
+
+    def fileno(self):
+        return -1
+
+    def isexecuting(self):
+        return False
+
+    def get_transaction_status(self):
+        return self.estado_transaccion
+
+    def cursor(self):
+        return CursorAsincronoFalso(self)
+
+    def close(self):
+        self.closed = 1
+
+
+class CursorAsincronoFalso:
+    def __init__(self, conexion):
+        self.conexion = conexion
+        self.description = None
+        self.rowcount = -1
+
+    def execute(self, query, params=None):
+        self.conexion.sentencias.append(query)
+        if self.conexion.error is not None and query.startswith('INSERT'):
+            raise self.conexion.error
+        if query.lstrip().startswith(('SELECT', 'INSERT', 'UPDATE')):
+            self.description = [('columna',)]
+            self.rowcount = len(self.conexion.filas)
+
+    def fetchall(self):
+        return list(self.conexion.filas)
+
+    def close(self):
+        pass
+
+
+def crear_pool(creadas, **opciones):
+    async def fabrica():
+        conexion = ConexionAsincronaFalsa()
+        creadas.append(conexion)
+        return conexion
+    parametros = {'min_size': 0, 'max_size': 2, 'timeout': 0.05}
+    parametros.update(opciones)
+    return AsyncConnectionPool({}, connection_factory=fabrica, **parametros)
+
+
+def test_pool_reutiliza_conexion_devuelta():
+    """
+    Verifica que una conexión devuelta se vuelve a prestar sin abrir otra.
+    """
+    async def escenario():
+        creadas = []
+        pool = crear_pool(creadas)
+        conexion = await pool.obtener()
+        await pool.devolver(conexion)
+        assert await pool.obtener() is conexion
+        assert len(creadas) == 1
+    asyncio.run(escenario())
+
+
+def test_pool_espera_sin_bloquear_y_agota_tiempo():
+    """
+    Verifica que con el pool lleno una tarea espera a que se devuelva una conexión
+    (sin bloquear a las demás) y que sin devoluciones se agota el tiempo de espera.
+    """
+    async def escenario():
+        creadas = []
+        pool = crear_pool(creadas, max_size=1, timeout=1)
+        conexion = await pool.obtener()
+        espera = asyncio.create_task(pool.obtener())
+        await asyncio.sleep(0.01)
+        assert not espera.done()
+        await pool.devolver(conexion)
+        assert await espera is conexion
+
+        pool.timeout = 0.05
+        with pytest.raises(DatabaseError):
+            await pool.obtener()
+        assert pool.estadisticas() == {'abiertas': 1, 'libres': 0, 'en_uso': 1, 'max_size': 1}
+    asyncio.run(escenario())
+
+
+def test_pool_descarta_conexion_con_transaccion_abierta():
+    async def escenario():
+        creadas = []
+        pool = crear_pool(creadas)
+        conexion = await pool.obtener()
+        conexion.estado_transaccion = TRANSACTION_STATUS_INTRANS
+        await pool.devolver(conexion)
+        assert conexion.closed
+        assert await pool.obtener() is not conexion
+        assert pool.estadisticas()['abiertas'] == 1
+    asyncio.run(escenario())
+
+
+class ConexionSocket:
+    """Conexión cuya sentencia termina cuando llegan datos al socket."""
+
+    def __init__(self, lector):
+        self.lector = lector
+
+    def poll(self):
+        try:
+            self.lector.recv(1)
+            return POLL_OK
+        except BlockingIOError:
+            return POLL_READ
+
+    def fileno(self):
+        return self.lector.fileno()
+
+
+def test_esperar_no_bloquea_el_bucle():
+    """
+    Verifica que mientras una conexión espera respuesta el bucle atiende otras tareas.
+    """
+    async def escenario():
+        lector, escritor = socket.socketpair()
+        lector.setblocking(False)
+        atendidas = []
+
+        async def otra_tarea():
+            atendidas.append('otra')
+            escritor.send(b'x')
+        try:
+            await asyncio.gather(esperar(ConexionSocket(lector)), otra_tarea())
+        finally:
+            lector.close()
+            escritor.close()
+        assert atendidas == ['otra']
+    asyncio.run(escenario())
+
+
+class PoolAsincronoFalso:
+    """Pool que presta una conexión nueva en cada préstamo y registra las devoluciones."""
+
+    def __init__(self, **opciones):
+        self.opciones = opciones
+        self.prestadas = []
+        self.devueltas = []
+
+    async def obtener(self):
+        conexion = ConexionAsincronaFalsa(**self.opciones)
+        self.prestadas.append(conexion)
+        return conexion
+
+    async def devolver(self, conexion):
+        self.devueltas.append(conexion)
+
+    async def cerrar(self):
+        pass
+
+
+def test_transaccion_en_una_conexion():
+    """
+    Verifica que las sentencias de una transacción (también las anidadas) van por la
+    misma conexión entre BEGIN y COMMIT, y que fuera de ella cada sentencia toma una.
+    """
+    async def escenario():
+        pool = PoolAsincronoFalso(filas=[(7,)])
+        db = AsyncPostgresDatabase({}, pool=pool)
+        async with db.transaction():
+            await db.decrement_stock(1, 2)
+            async with db.transaction():
+                await db.create_sale({'fecha': datetime(2025, 4, 3), 'id_usuario': 1, 'total': 10.0})
+        assert len(pool.prestadas) == 1
+        sentencias = pool.prestadas[0].sentencias
+        assert sentencias[0] == "BEGIN" and sentencias[-1] == "COMMIT"
+        assert len(sentencias) == 4
+        assert pool.devueltas == pool.prestadas
+
+        await db.decrement_stock(1, 1)
+        await db.decrement_stock(2, 1)
+        assert len(pool.prestadas) == 3
+    asyncio.run(escenario())
+
+
+def test_transaccion_revierte_y_tareas_separadas():
+    """
+    Verifica que un error revierte la transacción y que dos tareas concurrentes no
+    comparten la conexión de su transacción.
+    """
+    async def escenario():
+        pool = PoolAsincronoFalso()
+        db = AsyncPostgresDatabase({}, pool=pool)
+        with pytest.raises(StockInsuficienteError):
+            async with db.transaction():
+                await db.decrement_stock(1, 2)
+        assert pool.prestadas[0].sentencias[-1] == "ROLLBACK"
+
+        async def venta():
+            async with db.transaction():
+                await asyncio.sleep(0)
+                await db.get_sale(1)
+        await asyncio.gather(venta(), venta())
+        assert [len(c.sentencias) for c in pool.prestadas[1:]] == [3, 3]
+    asyncio.run(escenario())
+
+
+def test_producto_duplicado():
+    async def escenario():
+        db = AsyncPostgresDatabase({}, pool=PoolAsincronoFalso(error=UniqueViolation('duplicado')))
+        with pytest.raises(ProductoDuplicadoError):
+            await db.create_product({'nombre': 'lapiz', 'precio': 1.0, 'cantidad': 1, 'categoria': 'escolar',
+                                     'stock_minimo': 0})
+    asyncio.run(escenario())
+
+
+ESQUEMA = f"prueba_asincrona_{os.getpid()}"
+
+
+def conectar(**extra):
+    return psycopg2.connect(connect_timeout=2, **CURRENT_CONFIG, **extra)
+
+
+def test_postgres_asincrono():
+    """
+    Verifica ventas concurrentes sobre PostgreSQL real (se omite sin servidor): el
+    stock nunca queda negativo y las rechazadas no dejan cambios.
+    """
+    try:
+        admin = conectar()
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"PostgreSQL no disponible: {e}")
+    admin.autocommit = True
+    admin.cursor().execute(f"CREATE SCHEMA {ESQUEMA}")
+    try:
+        pool = ConnectionPool(CURRENT_CONFIG, min_size=0, max_size=1,
+                              connection_factory=lambda: conectar(options=f"-c search_path={ESQUEMA}"))
+        sincrona = PostgresDatabase(CURRENT_CONFIG, pool=pool)
+        sincrona.connect()
+        sincrona.create_tables()
+        id_usuario = sincrona.create_user({'nombre': 'cajero', 'rol': 'empleado', 'password': 'secreto1'})
+        sincrona.disconnect()
+        pool.cerrar()
+
+        async def fabrica():
+            conexion = psycopg2.connect(async_=1, connect_timeout=2, options=f"-c search_path={ESQUEMA}",
+                                        **CURRENT_CONFIG)
+            await esperar(conexion)
+            return conexion
+
+        async def escenario():
+            db = AsyncPostgresDatabase(CURRENT_CONFIG,
+                                       pool=AsyncConnectionPool(CURRENT_CONFIG, max_size=3, connection_factory=fabrica))
+            try:
+                tienda = TiendaAsincrona(db)
+                id_producto = await db.create_product({'nombre': 'cuaderno', 'precio': 10.0, 'cantidad': 5,
+                                                       'categoria': 'escolar', 'stock_minimo': 1})
+                resultados = await asyncio.gather(
+                    *(tienda.registrar_venta({id_producto: 1}, id_usuario) for _ in range(8)),
+                    return_exceptions=True)
+                assert sum(isinstance(r, StockInsuficienteError) for r in resultados) == 3
+                assert (await db.get_product(id_producto))['cantidad'] == 0
+                assert (await db.get_sales_page(10, with_total=True))['total'] == 5
+                assert (await db.get_table_versions())['ventas'] >= 5
+            finally:
+                await db.close()
+        asyncio.run(escenario())
+    finally:
+        admin.cursor().execute(f"DROP SCHEMA {ESQUEMA} CASCADE")
+        admin.close()
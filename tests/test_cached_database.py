@@ -0,0 +1,95 @@
+import pytest
+from database.cached_database import CacheLRU, CachedDatabase
+from database.database_interface import DatabaseInterface
+from database.test_database import DatabaseTest
+
+
+class RelojFalso:
+    def __init__(self):
+        self.ahora = 0.0
+
+    def __call__(self):
+        return self.ahora
+
+
+@pytest.fixture
+def db():
+    db = CachedDatabase(DatabaseTest(), ttl=60, max_size=100)
+    db.connect()
+    return db
+
+
+def crear_producto(db, nombre='lapiz', cantidad=10):
+    return db.create_product({'nombre': nombre, 'precio': 500.0, 'cantidad': cantidad,
+                              'categoria': 'escolar', 'stock_minimo': 1})
+
+
+def test_lecturas_repetidas_desde_cache(db):
+    """
+    Verifica que la segunda lectura de un producto no consulta la base de datos.
+    """
+    producto_id = crear_producto(db)
+    assert db.get_product(producto_id)['nombre'] == 'lapiz'
+    assert db.get_product(producto_id)['nombre'] == 'lapiz'
+    estadisticas = db.estadisticas_cache()['productos']
+    assert (estadisticas['aciertos'], estadisticas['fallos']) == (1, 1)
+    assert isinstance(db, DatabaseInterface)
+
+
+def test_escrituras_invalidan(db):
+    """
+    Verifica que modificar el stock o eliminar el producto invalida la entrada en caché.
+    """
+    producto_id = crear_producto(db)
+    db.get_product(producto_id)
+    db.decrement_stock(producto_id, 3)
+    assert db.get_product(producto_id)['cantidad'] == 7
+    db.delete_product(producto_id)
+    assert db.get_product(producto_id) is None
+
+
+def test_rollback_no_deja_valores_en_cache(db):
+    """
+    Verifica que una transacción revertida no deja en caché el stock no confirmado.
+    """
+    producto_id = crear_producto(db)
+    db.get_product(producto_id)
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            db.decrement_stock(producto_id, 4)
+            assert db.get_product(producto_id)['cantidad'] == 6
+            raise RuntimeError("falla en medio de la venta")
+    assert db.get_product(producto_id)['cantidad'] == 10
+
+
+def test_lectura_en_bloque_consulta_solo_faltantes(db):
+    """
+    Verifica que get_products toma de la caché los productos vigentes y lee el resto en una sola llamada.
+    """
+    ids = [crear_producto(db, nombre) for nombre in ('lapiz', 'cuaderno', 'regla')]
+    db.get_product(ids[0])
+    llamadas = []
+    leer = db.db.get_products
+    db.db.get_products = lambda product_ids: (llamadas.append(sorted(product_ids)), leer(product_ids))[1]
+    productos = db.get_products(ids + [999])
+    assert sorted(productos) == ids
+    assert llamadas == [sorted(ids[1:] + [999])]
+    assert db.get_products(ids)[ids[2]]['nombre'] == 'regla'
+    assert len(llamadas) == 1
+
+
+def test_cache_lru_y_ttl():
+    reloj = RelojFalso()
+    cache = CacheLRU(ttl=10, max_size=2, reloj=reloj)
+    cache.guardar(1, 'a')
+    cache.guardar(2, 'b')
+    cache.obtener(1)
+    cache.guardar(3, 'c')
+    assert cache.obtener(2) == (False, None)
+    assert cache.obtener(1) == (True, 'a')
+    reloj.ahora = 11
+    assert cache.obtener(1) == (False, None)
+    version = cache.version()
+    cache.invalidar(3)
+    cache.guardar(1, 'viejo', version)
+    assert cache.obtener(1) == (False, None)
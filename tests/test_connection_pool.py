@@ -0,0 +1,105 @@
+import pytest
+from database.connection_pool import ConnectionPool
+from errores.database_error import DatabaseError
+
+
+class ConexionFalsa:
+    """Conexión mínima con la interfaz que usa el pool."""
+
+    def __init__(self):
+        self.closed = 0
+        self.rollbacks = 0
+
+    def cursor(self):
+        if self.closed:
+            raise Exception("conexión cerrada")
+        return CursorFalso()
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = 1
+
+
+class CursorFalso:
+    def execute(self, query):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def creadas():
+    return []
+
+
+def crear_pool(creadas, **opciones):
+    def fabrica():
+        conexion = ConexionFalsa()
+        creadas.append(conexion)
+        return conexion
+    parametros = {'min_size': 0, 'max_size': 2, 'timeout': 0.05}
+    parametros.update(opciones)
+    return ConnectionPool({}, connection_factory=fabrica, **parametros)
+
+
+def test_reutiliza_conexion_devuelta(creadas):
+    """
+    Verifica que una conexión devuelta se vuelve a prestar sin abrir otra.
+    """
+    pool = crear_pool(creadas)
+    conexion = pool.obtener()
+    pool.devolver(conexion)
+    assert pool.obtener() is conexion
+    assert len(creadas) == 1
+
+
+def test_llena_tamano_minimo(creadas):
+    pool = crear_pool(creadas, min_size=2)
+    pool.obtener()
+    assert len(creadas) == 2
+    assert pool.estadisticas() == {'abiertas': 2, 'libres': 1, 'en_uso': 1, 'max_size': 2}
+
+
+def test_timeout_al_agotar_pool(creadas):
+    """
+    Verifica que se lance DatabaseError cuando no hay conexiones disponibles a tiempo.
+    """
+    pool = crear_pool(creadas)
+    pool.obtener()
+    pool.obtener()
+    with pytest.raises(DatabaseError):
+        pool.obtener()
+
+
+def test_descarta_conexion_caducada(creadas):
+    pool = crear_pool(creadas, max_lifetime=0)
+    conexion = pool.obtener()
+    pool.devolver(conexion)
+    assert conexion.closed
+    assert pool.obtener() is not conexion
+
+
+def test_verificacion_descarta_conexion_rota(creadas):
+    """
+    Verifica que una conexión inactiva que falla el chequeo de salud se reemplaza.
+    """
+    pool = crear_pool(creadas, health_check_interval=0)
+    conexion = pool.obtener()
+    pool.devolver(conexion)
+    conexion.cursor = lambda: (_ for _ in ()).throw(Exception("servidor reiniciado"))
+    nueva = pool.obtener()
+    assert nueva is not conexion
+    assert pool.estadisticas()['abiertas'] == 1
+
+
+def test_pool_cerrado(creadas):
+    pool = crear_pool(creadas)
+    conexion = pool.obtener()
+    pool.cerrar()
+    pool.devolver(conexion)
+    assert conexion.closed
+    with pytest.raises(DatabaseError):
+        pool.obtener()
@@ -0,0 +1,215 @@
+import pytest
+from database.test_database import DatabaseTest
+
+
+@pytest.fixture
+def db():
+    db = DatabaseTest()
+    db.connect()
+    db.create_tables()
+    yield db
+    db.disconnect()
+
+
+def crear_productos(db, cantidad):
+    return [
+        db.create_product({'nombre': f'producto {i}', 'precio': 100.0, 'cantidad': 10,
+                           'categoria': 'escolar', 'stock_minimo': 1})
+        for i in range(cantidad)
+    ]
+
+
+def test_paginacion_por_desplazamiento(db):
+    """
+    Verifica que la paginación por desplazamiento respeta el orden por ID y el total.
+    """
+    ids = crear_productos(db, 5)
+    pagina = db.get_products_page(limit=2, offset=2, with_total=True)
+    assert [p['id'] for p in pagina['items']] == ids[2:4]
+    assert pagina['next_after_id'] == ids[3]
+    assert pagina['total'] == 5
+
+
+def test_paginacion_por_cursor_recorre_todo(db):
+    """
+    Verifica que recorrer las páginas con el cursor devuelve cada producto una sola vez.
+    """
+    ids = crear_productos(db, 5)
+    vistos = []
+    cursor = None
+    while True:
+        pagina = db.get_products_page(limit=2, after_id=cursor)
+        vistos.extend(p['id'] for p in pagina['items'])
+        cursor = pagina['next_after_id']
+        if cursor is None:
+            break
+    assert vistos == ids
+    assert pagina['total'] is None
+
+
+def test_paginacion_detalles_con_cursor_compuesto(db):
+    ids = crear_productos(db, 2)
+    for venta_id in (1, 2):
+        for producto_id in ids:
+            db.insert_sale_detail({'venta_id': venta_id, 'producto_id': producto_id, 'cantidad': 1, 'precio': 100.0})
+    pagina = db.get_sale_details_page(limit=3)
+    assert pagina['next_after_id'] == (2, ids[0])
+    siguiente = db.get_sale_details_page(limit=3, after_id=pagina['next_after_id'])
+    assert [(d['venta_id'], d['producto_id']) for d in siguiente['items']] == [(2, ids[1])]
+    assert siguiente['next_after_id'] is None
+
+
+class ConexionRegistrada:
+    """Conexión falsa que registra las sentencias y confirmaciones recibidas."""
+
+    def __init__(self):
+        self.autocommit = False
+        self.sentencias = []
+        self.commits = 0
+        self.rollbacks = 0
+        self.filas = []
+        self.cursores = []
+
+    def cursor(self, name=None, cursor_factory=None):
+        cursor = CursorRegistrado(self, name)
+        self.cursores.append(cursor)
+        return cursor
+
+    def commit(self):
+        if not self.autocommit:
+            self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+class CursorRegistrado:
+    def __init__(self, conexion, name=None):
+        self.conexion = conexion
+        self.name = name
+        self.itersize = 2000
+        self.rowcount = 1
+
+    def execute(self, query, params=None):
+        self.conexion.sentencias.append((query, self.conexion.autocommit))
+
+    def fetchall(self):
+        return list(self.conexion.filas)
+
+    def __iter__(self):
+        return iter(self.conexion.filas)
+
+    def close(self):
+        pass
+
+
+class PoolFalso:
+    def __init__(self, conexion):
+        self.conexion = conexion
+
+    def obtener(self):
+        return self.conexion
+
+    def devolver(self, conexion):
+        pass
+
+
+class PoolDeConexiones:
+    """Pool falso que presta una conexión distinta en cada préstamo."""
+
+    def __init__(self):
+        self.prestadas = []
+        self.devueltas = []
+
+    def obtener(self):
+        conexion = ConexionRegistrada()
+        self.prestadas.append(conexion)
+        return conexion
+
+    def devolver(self, conexion):
+        self.devueltas.append(conexion)
+
+
+@pytest.fixture
+def postgres():
+    from database.postgres_database import PostgresDatabase
+    conexion = ConexionRegistrada()
+    db = PostgresDatabase({}, pool=PoolFalso(conexion))
+    db.connect()
+    return db, conexion
+
+
+def test_lecturas_sin_commit(postgres):
+    """
+    Verifica que las lecturas se ejecutan en autocommit sin confirmar.
+    """
+    db, conexion = postgres
+    db.fetch_all("SELECT 1")
+    assert conexion.sentencias == [("SELECT 1", True)]
+    assert conexion.commits == 0
+
+
+def test_transaccion_confirma_una_vez(postgres):
+    """
+    Verifica que las escrituras dentro de una transacción se confirman juntas al final.
+    """
+    db, conexion = postgres
+    with db.transaction():
+        db.increment_stock(1, 2)
+        db.increment_stock(2, 3)
+        assert conexion.commits == 0
+    assert conexion.commits == 1
+    assert all(not autocommit for _, autocommit in conexion.sentencias)
+    assert conexion.autocommit
+
+
+def test_iterar_con_cursor_de_servidor(postgres):
+    """
+    Verifica que los métodos iter_* usan un cursor con nombre dentro de una transacción
+    y que la conexión vuelve a autocommit al terminar.
+    """
+    db, conexion = postgres
+    db.itersize = 500
+    conexion.filas = [(1, None, 2, 100), (2, None, 2, 50)]
+    ventas = db.iter_sales()
+    assert next(ventas)['total'] == 100.0
+    cursor = conexion.cursores[-1]
+    assert cursor.name and cursor.itersize == 500
+    assert not conexion.autocommit
+    assert [v['id'] for v in ventas] == [2]
+    assert conexion.autocommit
+
+
+def test_iteradores_intercalados_usan_su_propia_conexion():
+    """
+    Verifica que dos iter_* intercalados en el mismo hilo usan cada uno su propia
+    conexión y transacción, y que ambas vuelven al pool en autocommit.
+    """
+    from database.postgres_database import PostgresDatabase
+    pool = PoolDeConexiones()
+    db = PostgresDatabase({}, pool=pool)
+    db.connect()
+    productos = db.iter_products()
+    detalles = db.iter_sale_details()
+    next(productos, None)
+    next(detalles, None)
+    list(productos)
+    list(detalles)
+    principal, *propias = pool.prestadas
+    assert len(propias) == 2 and propias[0] is not propias[1]
+    assert not any(cursor.name for cursor in principal.cursores)
+    assert pool.devueltas == propias
+    assert all(conexion.autocommit and conexion.rollbacks == 1 for conexion in propias)
+
+
+def test_iterar_dentro_de_transaccion_usa_la_conexion_del_hilo(postgres):
+    """
+    Verifica que dentro de `transaction()` los iter_* ven los cambios no confirmados
+    porque usan la conexión del hilo, y que no la confirman al terminar.
+    """
+    db, conexion = postgres
+    conexion.filas = [(1, None, 2, 100)]
+    with db.transaction():
+        assert [v['id'] for v in db.iter_sales()] == [1]
+        assert conexion.commits == 0 and conexion.rollbacks == 0
+    assert conexion.commits == 1
@@ -0,0 +1,88 @@
+import io
+import pytest
+from database.test_database import DatabaseTest
+from modulos.importador import ImportadorProductos
+from errores.importacion_invalida import ImportacionInvalidaError
+
+
+@pytest.fixture
+def db():
+    db = DatabaseTest()
+    db.connect()
+    db.create_tables()
+    yield db
+    db.disconnect()
+
+
+def test_importar_csv_por_lotes_con_errores(db):
+    """
+    Verifica que las filas válidas se guardan por lotes y las inválidas se informan con su número.
+    """
+    csv = io.StringIO(
+        "nombre,precio,cantidad,categoria,stock_minimo\n"
+        "lapiz,500,10,escolar,2\n"
+        "cuaderno,abc,5,escolar,1\n"
+        "regla,800,5,escolar,1\n"
+        "no,100,1,escolar,1\n"
+        "borrador,300,2,escolar,1\n"
+    )
+    lotes = []
+    upsert = db.upsert_products
+    db.upsert_products = lambda productos: (lotes.append(len(productos)), upsert(productos))[1]
+    resultado = ImportadorProductos(db, tamano_lote=2).importar_flujo(csv, 'csv')
+    assert resultado['procesadas'] == 5
+    assert resultado['importadas'] == 3
+    assert [error['fila'] for error in resultado['errores']] == [2, 4]
+    assert lotes == [2, 1]
+    assert sorted(p['nombre'] for p in db.get_all_products()) == ['borrador', 'lapiz', 'regla']
+
+
+def test_importar_actualiza_por_nombre(db):
+    """
+    Verifica que un producto existente se actualiza en lugar de duplicarse.
+    """
+    db.create_product({'nombre': 'lapiz', 'precio': 500.0, 'cantidad': 10,
+                       'categoria': 'escolar', 'stock_minimo': 2})
+    ndjson = io.BytesIO(
+        b'{"nombre": "lapiz", "precio": 650, "cantidad": 40, "categoria": "escolar", "stock_minimo": 5}\n'
+        b'{"nombre": "tijeras"\n'
+    )
+    resultado = ImportadorProductos(db).importar_flujo(ndjson, 'ndjson')
+    assert resultado['importadas'] == 1
+    assert resultado['errores'][0]['fila'] == 2
+    productos = db.get_all_products()
+    assert len(productos) == 1
+    assert productos[0]['precio'] == 650.0 and productos[0]['cantidad'] == 40
+
+
+def test_importar_formato_no_soportado(db):
+    with pytest.raises(ImportacionInvalidaError):
+        ImportadorProductos(db).importar_flujo(io.StringIO(""), 'xlsx')
+    with pytest.raises(ImportacionInvalidaError):
+        ImportadorProductos(db).importar_flujo(io.StringIO("nombre,precio\nlapiz,500\n"), 'csv')
+
+
+def test_validacion_por_lote_igual_al_constructor():
+    """
+    Verifica que la validación vectorizada asigna a cada fila el mismo error que el constructor de Producto.
+    """
+    from modelos.producto import Producto
+    filas = [
+        ('lapiz', 500.0, 10, 'escolar', 2),
+        ('  ', -1.0, -1, '', -1),
+        ('ab', 500.0, 10, 'escolar', 2),
+        ('regla', 0.0, 10, 'escolar', 2),
+        ('regla', 10.0, 1001, 'escolar', -1),
+        ('regla', 10.0, 10, 'escolar', 1001),
+        ('regla', 10.0, 10, '  ', 1),
+    ]
+    esperados = []
+    for fila in filas:
+        try:
+            Producto(0, *fila)
+            esperados.append(None)
+        except Exception as e:
+            esperados.append((type(e), str(e)))
+    obtenidos = Producto.validar_lote(*zip(*filas))
+    assert [error and (type(error), str(error)) for error in obtenidos] == esperados
+    assert Producto.validar_lote([], [], [], [], []) == []
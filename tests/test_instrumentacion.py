@@ -0,0 +1,94 @@
+import logging
+import pytest
+import psycopg2
+from database import instrumentacion
+from database.database_config import CURRENT_CONFIG, INSTRUMENTACION_CONFIG
+from database.instrumentacion import huella, medir_accion
+
+
+class CursorFalso:
+    """Cursor mínimo sobre el que se monta la medición."""
+
+    def __init__(self):
+        self.rowcount = -1
+
+    def execute(self, query, vars=None):
+        self.rowcount = 2
+
+    def executemany(self, query, vars_list):
+        self.rowcount = len(vars_list)
+
+
+class CursorFalsoMedido(instrumentacion._CursorMedido, CursorFalso):
+    pass
+
+
+def obtener_producto(cursor, producto_id):
+    cursor.execute("SELECT * FROM productos WHERE id = %s", (producto_id,))
+
+
+def test_huella_agrupa_por_forma():
+    """
+    Verifica que las sentencias que solo difieren en sus valores tienen la misma huella.
+    """
+    assert huella("SELECT *  FROM productos\n WHERE id = %s") == "SELECT * FROM productos WHERE id = ?"
+    assert huella("SELECT * FROM productos WHERE nombre = 'o''hara' AND id IN (1, 2, 3)") == \
+        "SELECT * FROM productos WHERE nombre = ? AND id IN (?...)"
+    assert huella(b"INSERT INTO detalle_ventas VALUES (1, 2, 3, 4.5),(1, 3, 1, 9)") == \
+        "INSERT INTO detalle_ventas VALUES (?...)"
+    assert huella("SELECT id FROM idx_1 LIMIT %(limite)s") == "SELECT id FROM idx_1 LIMIT ?"
+
+
+def test_registro_por_accion(monkeypatch, caplog):
+    """
+    Verifica que las consultas se acumulan en la acción en curso con su origen
+    y que las sentencias repetidas generan un aviso de N+1.
+    """
+    monkeypatch.setitem(INSTRUMENTACION_CONFIG, 'repeticiones', 3)
+    cursor = CursorFalsoMedido()
+    with caplog.at_level(logging.WARNING, logger='database.instrumentacion'):
+        with medir_accion('listado') as registro:
+            for producto_id in range(3):
+                obtener_producto(cursor, producto_id)
+            cursor.executemany("INSERT INTO ventas VALUES (%s)", [(1,), (2,)])
+    assert registro.total == 4
+    assert registro.consultas[0]['filas'] == 2
+    assert registro.consultas[0]['origen'].startswith('test_instrumentacion.py:')
+    assert registro.consultas[0]['origen'].endswith('(obtener_producto)')
+    assert registro.por_huella()["SELECT * FROM productos WHERE id = ?"]['veces'] == 3
+    assert 'db;dur=' in registro.server_timing() and '"4 consultas"' in registro.server_timing()
+    assert sum('N+1 en listado: 3 ejecuciones' in r.getMessage() for r in caplog.records) == 1
+    assert instrumentacion.registro_actual() is None
+
+
+def test_consulta_lenta_sin_accion(monkeypatch, caplog):
+    """
+    Verifica que una consulta sobre el umbral se registra en el log aunque no haya una acción.
+    """
+    monkeypatch.setitem(INSTRUMENTACION_CONFIG, 'lenta_ms', 0)
+    with caplog.at_level(logging.WARNING, logger='database.instrumentacion'):
+        obtener_producto(CursorFalsoMedido(), 7)
+    assert len(caplog.records) == 1
+    assert 'Consulta lenta' in caplog.records[0].getMessage()
+    assert 'WHERE id = ?' in caplog.records[0].getMessage()
+
+
+def test_cursor_postgres_instrumentado():
+    """
+    Verifica la medición con cursores reales de psycopg2 (se omite sin PostgreSQL).
+    """
+    try:
+        conexion = psycopg2.connect(connect_timeout=2, cursor_factory=instrumentacion.fabrica_cursor(),
+                                    **CURRENT_CONFIG)
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"PostgreSQL no disponible: {e}")
+    try:
+        with medir_accion('prueba') as registro:
+            cursor = conexion.cursor()
+            cursor.execute("SELECT generate_series(1, %s)", (5,))
+            conexion.cursor(cursor_factory=instrumentacion.fabrica_cursor(diccionario=True)).execute("SELECT 1 AS uno")
+        assert registro.total == 2
+        assert registro.consultas[0]['huella'] == "SELECT generate_series(?, ?)"
+        assert registro.consultas[0]['filas'] == 5
+    finally:
+        conexion.close()
@@ -254,3 +254,29 @@ def test_obtener_todos_productos(inventario):
     assert len(todos_productos) == 2
     assert todos_productos[0]['nombre'] == productos[0].nombre
     assert todos_productos[1]['nombre'] == productos[1].nombre
+
+
+def test_reducir_stock_insuficiente_no_modifica(inventario_limpio):
+    """
+    Test para verificar que reducir más stock del disponible falla sin modificar la cantidad.
+    """
+    producto = Producto(1, "lapiz", 500, 3, "escolar", 1)
+    producto_id = inventario_limpio.agregar_producto(producto)
+    assert inventario_limpio.reducir_stock(producto_id, 2) == "Stock reducido a 1 unidades."
+    with pytest.raises(StockInsuficienteError):
+        inventario_limpio.reducir_stock(producto_id, 2)
+    assert inventario_limpio.db.get_product(producto_id)['cantidad'] == 1
+
+
+def test_iterar_stock_bajo_por_lotes(inventario_limpio):
+    """
+    Test para verificar que el recorrido por lotes devuelve solo productos con stock bajo
+    de la categoría pedida, sin repetir ni saltar ninguno entre lotes.
+    """
+    for i in range(7):
+        categoria = "escolar" if i % 2 == 0 else "oficina"
+        inventario_limpio.agregar_producto(Producto(0, f"producto {i}", 100, i, categoria, 4))
+    productos = list(inventario_limpio.iterar_stock_bajo(tamano_lote=2))
+    assert [p.nombre for p in productos] == [f"producto {i}" for i in range(5)]
+    escolares = list(inventario_limpio.iterar_stock_bajo(categoria="escolar", tamano_lote=1))
+    assert [p.nombre for p in escolares] == ["producto 0", "producto 2", "producto 4"]
@@ -0,0 +1,106 @@
+import os
+import threading
+import pytest
+from utils.metricas import RegistroMetricas
+
+
+def test_exposicion_suma_hilos():
+    """
+    Verifica el formato de texto de contadores, histogramas y recolectores, y que
+    los valores de varios hilos se suman.
+    """
+    registro = RegistroMetricas()
+    ventas = registro.contador('ventas_total', 'Ventas', ('canal',))
+    latencia = registro.histograma('latencia_seconds', 'Latencia', limites=(0.1, 1.0))
+    registro.recolector('pool', 'gauge', 'Pool', lambda: [(('en_uso',), 3)], ('estado',))
+
+    def trabajar():
+        for _ in range(1000):
+            ventas.incrementar(('web',))
+        latencia.observar(0.05)
+    hilos = [threading.Thread(target=trabajar) for _ in range(4)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    ventas.incrementar(('caja "1"',), 2)
+    latencia.observar(5)
+
+    texto = registro.exponer()
+    assert '# TYPE ventas_total counter' in texto
+    assert 'ventas_total{canal="web"} 4000' in texto
+    assert 'ventas_total{canal="caja \\"1\\""} 2' in texto
+    assert 'latencia_seconds_bucket{le="0.1"} 4' in texto
+    assert 'latencia_seconds_bucket{le="1"} 4' in texto
+    assert 'latencia_seconds_bucket{le="+Inf"} 5' in texto
+    assert 'latencia_seconds_count 5' in texto
+    assert 'latencia_seconds_sum 5.2' in texto
+    assert 'pool{estado="en_uso"} 3' in texto
+    with pytest.raises(ValueError):
+        ventas.incrementar(('web', 'sobra'))
+    assert registro.contador('ventas_total', 'Ventas', ('canal',)) is ventas
+
+
+def test_hilos_terminados_se_pliegan():
+    """
+    Verifica que los valores de los hilos que terminaron pasan a la base y no quedan
+    diccionarios por hilo, para que la memoria no crezca con los hilos del servidor.
+    """
+    import gc
+    registro = RegistroMetricas()
+    ventas = registro.contador('ventas_total', 'Ventas')
+    latencia = registro.histograma('latencia_seconds', 'Latencia', limites=(0.1,))
+    for _ in range(50):
+        hilo = threading.Thread(target=lambda: (ventas.incrementar(), latencia.observar(0.5)))
+        hilo.start()
+        hilo.join()
+    gc.collect()
+    assert ventas._fragmentos == {} and latencia._fragmentos == {}
+    ventas.incrementar(valor=2)
+    assert ventas.valores() == {(): 52}
+    assert latencia.valores() == {(): [0, 50, 25.0]}
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="Requiere fork")
+def test_directorio_compartido_entre_procesos(tmp_path):
+    """
+    Verifica que el proceso que expone suma los contadores de otro proceso (aunque
+    ya haya terminado) y descarta sus recolectores.
+    """
+    registro = RegistroMetricas(str(tmp_path), intervalo=0)
+    ventas = registro.contador('ventas_total', 'Ventas')
+    registro.recolector('pool', 'gauge', 'Pool', lambda: [((), 1)])
+    ventas.incrementar()
+    pid = os.fork()
+    if pid == 0:
+        # El hijo empieza en cero: lo del padre lo cuenta el padre
+        ventas.incrementar(valor=2)
+        registro.volcar()
+        os._exit(0)
+    os.waitpid(pid, 0)
+    assert (tmp_path / f'metricas_{pid}.json').exists()
+    texto = registro.exponer()
+    assert 'ventas_total 3' in texto
+    assert 'pool 1' in texto
+    # El archivo del proceso terminado pasó a los retirados: si otro proceso
+    # reutiliza el PID no se vuelve a sumar
+    assert not (tmp_path / f'metricas_{pid}.json').exists()
+    assert (tmp_path / 'metricas_retirados.json').exists()
+    assert 'ventas_total 3' in registro.exponer()
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="Requiere fork")
+def test_pid_reutilizado_retira_el_archivo_anterior(tmp_path):
+    """
+    Verifica que un proceso que encuentra un archivo con su PID (de un proceso
+    anterior) lo retira antes de volcar sus propios valores.
+    """
+    anterior = RegistroMetricas(str(tmp_path), intervalo=0)
+    anterior.contador('ventas_total', 'Ventas').incrementar(valor=5)
+    anterior.volcar()
+    registro = RegistroMetricas(str(tmp_path), intervalo=0)
+    registro.contador('ventas_total', 'Ventas').incrementar()
+    registro.volcar()
+    assert 'ventas_total 6' in registro.exponer()
+    registro.volcar()
+    assert 'ventas_total 6' in registro.exponer()
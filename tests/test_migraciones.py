@@ -0,0 +1,250 @@
+import os
+import pytest
+import psycopg2
+from database.connection_pool import ConnectionPool
+from database.database_config import CURRENT_CONFIG
+from database.postgres_database import PostgresDatabase
+
+ESQUEMA = f"prueba_migraciones_{os.getpid()}"
+
+
+def conectar(**extra):
+    return psycopg2.connect(connect_timeout=2, **CURRENT_CONFIG, **extra)
+
+
+@pytest.fixture
+def postgres():
+    """
+    Base de datos PostgreSQL real en un esquema temporal.
+    Se omite si no hay un servidor disponible.
+    """
+    try:
+        admin = conectar()
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"PostgreSQL no disponible: {e}")
+    admin.autocommit = True
+    admin.cursor().execute(f"CREATE SCHEMA {ESQUEMA}")
+    pool = ConnectionPool(CURRENT_CONFIG, min_size=0, max_size=3,
+                          connection_factory=lambda: conectar(options=f"-c search_path={ESQUEMA}"))
+    db = PostgresDatabase(CURRENT_CONFIG, pool=pool)
+    db.connect()
+    try:
+        db.create_tables()
+        yield db
+    finally:
+        db.disconnect()
+        pool.cerrar()
+        admin.cursor().execute(f"DROP SCHEMA {ESQUEMA} CASCADE")
+        admin.close()
+
+
+def plan(db, consulta, params):
+    cursor = db.connection.cursor()
+    cursor.execute("SET enable_seqscan = off")
+    cursor.execute("EXPLAIN " + consulta, params)
+    texto = "\n".join(fila[0] for fila in cursor.fetchall())
+    cursor.execute("RESET enable_seqscan")
+    cursor.close()
+    return texto
+
+
+def test_migraciones_idempotentes(postgres):
+    """
+    Verifica que volver a crear las tablas no repite migraciones ya aplicadas.
+    """
+    from database.migraciones import MIGRACIONES, aplicar_migraciones
+    assert aplicar_migraciones(postgres) == []
+    version = postgres.fetch_one("SELECT MAX(version) FROM schema_version")[0]
+    assert version == MIGRACIONES[-1][0]
+
+
+@pytest.mark.parametrize('consulta, params, indice', [
+    ("SELECT id FROM ventas WHERE id_usuario = %s", (1,), 'idx_ventas_id_usuario'),
+    ("SELECT id FROM ventas WHERE fecha >= now() - interval '1 day'", None, 'idx_ventas_fecha'),
+    ("SELECT venta_id FROM detalle_ventas WHERE producto_id = %s", (1,), 'idx_detalle_ventas_producto_id'),
+    ("SELECT id FROM productos WHERE cantidad <= stock_minimo ORDER BY id", None, 'idx_productos_stock_bajo'),
+    ("SELECT id FROM productos WHERE cantidad <= stock_minimo AND categoria = %s ORDER BY id", ('escolar',),
+     'idx_productos_stock_bajo_categoria'),
+])
+def test_consultas_usan_indices(postgres, consulta, params, indice):
+    """
+    Verifica con EXPLAIN que las consultas frecuentes usan los índices secundarios.
+    """
+    assert indice in plan(postgres, consulta, params)
+
+
+def escuchar_cambios():
+    from database.notificaciones import CANAL
+    escucha = conectar()
+    escucha.autocommit = True
+    escucha.cursor().execute(f"LISTEN {CANAL}")
+    return escucha
+
+
+def recibir(escucha):
+    import json
+    import select
+    select.select([escucha], [], [], 5)
+    escucha.poll()
+    eventos = [json.loads(n.payload) for n in escucha.notifies]
+    escucha.notifies.clear()
+    return eventos
+
+
+def test_triggers_notifican_cambios(postgres):
+    """
+    Verifica que modificar un producto envía una notificación con la tabla y el ID.
+    """
+    escucha = escuchar_cambios()
+    try:
+        producto_id = postgres.create_product({'nombre': 'lapiz', 'precio': 500, 'cantidad': 10,
+                                               'categoria': 'escolar', 'stock_minimo': 1})
+        assert recibir(escucha) == [{'tabla': 'productos', 'ids': [producto_id],
+                                     'version': postgres.get_table_versions()['productos']}]
+    finally:
+        escucha.close()
+
+
+def test_notificaciones_por_transaccion(postgres):
+    """
+    Verifica que una transacción envía un solo NOTIFY por tabla con los IDs de todas
+    sus sentencias, y que una carga masiva notifica la tabla sin enumerar los IDs.
+    """
+    from database.notificaciones import MAX_IDS_NOTIFICACION
+    escucha = escuchar_cambios()
+    try:
+        with postgres.transaction():
+            ids = [postgres.create_product({'nombre': f'producto {i}', 'precio': 100, 'cantidad': 10,
+                                            'categoria': 'escolar', 'stock_minimo': 1}) for i in range(3)]
+            postgres.update_stock(ids[0], 5)
+        eventos = recibir(escucha)
+        assert len(eventos) == 1 and sorted(eventos[0]['ids']) == ids
+        postgres.upsert_products([{'nombre': f'masivo {i}', 'precio': 100, 'cantidad': 10,
+                                   'categoria': 'escolar', 'stock_minimo': 1}
+                                  for i in range(MAX_IDS_NOTIFICACION + 1)])
+        eventos = recibir(escucha)
+        assert [(e['tabla'], e['ids']) for e in eventos] == [('productos', None)]
+        assert postgres.fetch_one("SELECT COUNT(*) FROM cambios_pendientes")[0] == 0
+    finally:
+        escucha.close()
+
+
+def test_notificacion_con_ids_repetidos(postgres):
+    """
+    Verifica que una sentencia que modifica más de `MAX_IDS_NOTIFICACION` líneas de
+    solo dos ventas notifica los IDs de ambas ventas.
+    """
+    from datetime import datetime
+    from database.notificaciones import MAX_IDS_NOTIFICACION
+    postgres.upsert_products([{'nombre': f'producto {i}', 'precio': 100, 'cantidad': 10,
+                               'categoria': 'escolar', 'stock_minimo': 1} for i in range(MAX_IDS_NOTIFICACION + 50)])
+    productos = [fila[0] for fila in postgres.fetch_all("SELECT id FROM productos ORDER BY id")]
+    ventas = []
+    for lineas in (productos, productos[:5]):
+        venta_id = postgres.create_sale({'fecha': datetime(2025, 4, 3), 'id_usuario': None, 'total': 0})
+        postgres.insert_sale_details([{'venta_id': venta_id, 'producto_id': producto_id, 'cantidad': 1,
+                                       'precio': 100} for producto_id in lineas])
+        ventas.append(venta_id)
+    escucha = escuchar_cambios()
+    try:
+        postgres.execute_query("DELETE FROM detalle_ventas")
+        eventos = {e['tabla']: e for e in recibir(escucha)}
+        assert sorted(eventos['detalle_ventas']['ids']) == ventas
+    finally:
+        escucha.close()
+
+
+def test_versiones_compartidas(postgres):
+    """
+    Verifica que cada transacción confirmada incrementa una vez la versión de las
+    tablas que modificó, que una transacción revertida no la cambia y que las
+    líneas de venta se notifican con el ID de su venta.
+    """
+    from datetime import datetime
+    producto_id = postgres.create_product({'nombre': 'lapiz', 'precio': 500, 'cantidad': 10,
+                                           'categoria': 'escolar', 'stock_minimo': 1})
+    antes = postgres.get_table_versions()
+    escucha = escuchar_cambios()
+    try:
+        with postgres.transaction():
+            venta_id = postgres.create_sale({'fecha': datetime(2025, 4, 3), 'id_usuario': None, 'total': 1000})
+            postgres.insert_sale_details([{'venta_id': venta_id, 'producto_id': producto_id,
+                                           'cantidad': 2, 'precio': 500}])
+            postgres.decrement_stock(producto_id, 2)
+            postgres.decrement_stock(producto_id, 1)
+        despues = postgres.get_table_versions()
+        eventos = {e['tabla']: e for e in recibir(escucha)}
+        assert eventos['detalle_ventas']['ids'] == [venta_id]
+        for tabla in ('ventas', 'detalle_ventas', 'productos'):
+            assert despues[tabla] == antes.get(tabla, 0) + 1
+            assert eventos[tabla]['version'] == despues[tabla]
+        with pytest.raises(RuntimeError):
+            with postgres.transaction():
+                postgres.update_stock(producto_id, 5)
+                raise RuntimeError("revertir")
+        assert postgres.get_table_versions() == despues
+        assert recibir(escucha) == []
+    finally:
+        escucha.close()
+
+
+def test_resumenes_se_mantienen_con_las_ventas(postgres):
+    """
+    Verifica que los triggers actualizan los resúmenes al registrar y eliminar ventas.
+    """
+    from datetime import datetime
+    usuario_id = postgres.create_user({'nombre': 'ana', 'rol': 'empleado', 'password': 'secreto1'})
+    producto_id = postgres.create_product({'nombre': 'lapiz', 'precio': 500, 'cantidad': 10,
+                                           'categoria': 'escolar', 'stock_minimo': 1})
+    ventas = []
+    for hora in (9, 18):
+        venta_id = postgres.create_sale({'fecha': datetime(2025, 4, 3, hora), 'id_usuario': usuario_id, 'total': 1000})
+        postgres.insert_sale_details([{'venta_id': venta_id, 'producto_id': producto_id, 'cantidad': 2, 'precio': 500}])
+        ventas.append(venta_id)
+    assert postgres.get_revenue_by_day() == [{'dia': datetime(2025, 4, 3).date(), 'num_ventas': 2, 'total': 2000.0}]
+    assert postgres.get_revenue_by_category()[0] == {'categoria': 'escolar', 'cantidad': 4, 'total': 2000.0}
+    postgres.delete_sale(ventas[0])
+    assert postgres.get_total_revenue() == 1000.0
+    assert postgres.get_revenue_by_product()[0]['cantidad'] == 2
+    postgres.delete_sale(ventas[1])
+    assert postgres.fetch_one("SELECT COUNT(*) FROM ventas_producto_dia")[0] == 0
+    assert postgres.get_revenue_by_user() == []
+
+
+def test_iteradores_intercalados(postgres):
+    """
+    Verifica que dos recorridos con cursores de servidor se pueden intercalar en el
+    mismo hilo sin que el primero en terminar cierre el cursor del otro.
+    """
+    from datetime import datetime
+    usuario_id = postgres.create_user({'nombre': 'ana', 'rol': 'empleado', 'password': 'secreto1'})
+    ids = [postgres.create_product({'nombre': f'producto {i}', 'precio': 100, 'cantidad': 10,
+                                    'categoria': 'escolar', 'stock_minimo': 1}) for i in range(3)]
+    venta_id = postgres.create_sale({'fecha': datetime(2025, 4, 3), 'id_usuario': usuario_id, 'total': 300})
+    postgres.insert_sale_details([{'venta_id': venta_id, 'producto_id': i, 'cantidad': 1, 'precio': 100}
+                                  for i in ids])
+    postgres.itersize = 1
+    productos = postgres.iter_products()
+    detalles = postgres.iter_sale_details()
+    vistos = [next(productos)['id'], next(detalles)['producto_id']]
+    # El recorrido de productos termina (y cierra su transacción) antes que el de detalles
+    vistos += [p['id'] for p in productos]
+    vistos += [d['producto_id'] for d in detalles]
+    assert vistos == [ids[0], ids[0], ids[1], ids[2], ids[1], ids[2]]
+
+
+def test_nombre_unico_informa_repetidos(postgres):
+    """
+    Verifica que la migración del nombre único se detiene con un mensaje que lista
+    los nombres repetidos en lugar de un error de índice.
+    """
+    from database.migraciones import aplicar_migraciones
+    from errores.database_error import DatabaseError
+    cursor = postgres.connection.cursor()
+    cursor.execute("DROP INDEX idx_productos_nombre")
+    cursor.execute("DELETE FROM schema_version WHERE version >= 3")
+    cursor.execute("INSERT INTO productos (nombre, precio, cantidad, categoria, stock_minimo) "
+                   "VALUES ('lapiz', 500, 1, 'escolar', 1), ('lapiz', 600, 1, 'escolar', 1)")
+    cursor.close()
+    with pytest.raises(DatabaseError, match=r"mismo nombre: lapiz \(2\)"):
+        aplicar_migraciones(postgres)
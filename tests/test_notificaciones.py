@@ -0,0 +1,68 @@
+from database.cached_database import CachedDatabase
+from database.notificaciones import CanalLocal, CanalPostgres, EVENTO_REINICIO
+from database.test_database import DatabaseTest
+
+
+def crear_db_con_canal():
+    db = CachedDatabase(DatabaseTest(), ttl=60, max_size=100)
+    canal = CanalLocal()
+    db.escuchar(canal)
+    producto_id = db.create_product({'nombre': 'lapiz', 'precio': 500.0, 'cantidad': 10,
+                                     'categoria': 'escolar', 'stock_minimo': 1})
+    return db, canal, producto_id
+
+
+def test_notificacion_de_otro_proceso_invalida_cache():
+    """
+    Verifica que un cambio hecho por otro proceso (escritura directa sobre la base
+    envuelta) deja de verse desactualizado al llegar su notificación.
+    """
+    db, canal, producto_id = crear_db_con_canal()
+    assert db.get_product(producto_id)['cantidad'] == 10
+    db.db.update_stock(producto_id, -4)  # el mock suma la cantidad
+    assert db.get_product(producto_id)['cantidad'] == 10
+    canal.publicar({'tabla': 'productos', 'ids': [producto_id]})
+    assert db.get_product(producto_id)['cantidad'] == 6
+
+
+def test_notificacion_sin_ids_limpia_la_tabla():
+    """
+    Verifica que una notificación sin IDs (cambio masivo) descarta toda la caché de
+    esa tabla y no la de las demás.
+    """
+    db, canal, producto_id = crear_db_con_canal()
+    usuario_id = db.create_user({'nombre': 'ana', 'rol': 'empleado', 'password': 'secreto1'})
+    db.get_product(producto_id)
+    db.get_user(usuario_id)
+    canal.publicar({'tabla': 'productos', 'ids': None})
+    estadisticas = db.estadisticas_cache()
+    assert estadisticas['productos']['entradas'] == 0
+    assert estadisticas['usuarios']['entradas'] == 1
+
+
+def test_reinicio_limpia_todas_las_caches():
+    db, canal, producto_id = crear_db_con_canal()
+    usuario_id = db.create_user({'nombre': 'ana', 'rol': 'empleado', 'password': 'secreto1'})
+    db.get_product(producto_id)
+    db.get_user(usuario_id)
+    canal.publicar(dict(EVENTO_REINICIO))
+    estadisticas = db.estadisticas_cache()
+    assert estadisticas['productos']['entradas'] == 0
+    assert estadisticas['usuarios']['entradas'] == 0
+
+
+def test_suscriptor_con_error_no_corta_la_entrega():
+    canal = CanalLocal()
+    recibidos = []
+    canal.suscribir(lambda evento: 1 / 0)
+    canal.suscribir(recibidos.append)
+    canal.publicar({'tabla': 'ventas', 'ids': [1]})
+    assert recibidos == [{'tabla': 'ventas', 'ids': [1]}]
+
+
+def test_decodificar_payload():
+    assert CanalPostgres._decodificar('{"tabla": "usuarios", "ids": [3, 4], "version": 7}') == \
+        {'tabla': 'usuarios', 'ids': [3, 4], 'version': 7}
+    assert CanalPostgres._decodificar('{"tabla": "productos", "ids": null, "version": 2}') == \
+        {'tabla': 'productos', 'ids': None, 'version': 2}
+    assert CanalPostgres._decodificar('no es json') == EVENTO_REINICIO
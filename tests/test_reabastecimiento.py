@@ -0,0 +1,181 @@
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+from database.test_database import DatabaseTest
+from modulos.reabastecimiento import DemandaProceso, MotorReabastecimiento
+
+HOY = datetime(2025, 4, 30, 12, 0)
+
+
+def ewma(serie, alfa, inicial=None):
+    """Referencia escalar: EWMA de media y varianza, por omisión iniciado con las del período."""
+    media, varianza = inicial or (np.mean(serie), np.var(serie))
+    for x in serie:
+        diferencia = x - media
+        media += alfa * diferencia
+        varianza = (1 - alfa) * (varianza + alfa * diferencia ** 2)
+    return media, varianza
+
+
+@pytest.fixture
+def db():
+    """
+    Base con un lápiz que vende 4 unidades por día los últimos 10 días,
+    un cuaderno que vendió 30 unidades hace 10 días y una regla sin ventas.
+    """
+    db = DatabaseTest()
+    empleado = db.create_user({'nombre': 'ana', 'rol': 'empleado', 'password': 'secreto1'})
+    db.ids = {
+        nombre: db.create_product({'nombre': nombre, 'precio': 100, 'cantidad': stock,
+                                   'categoria': 'escolar', 'stock_minimo': minimo})
+        for nombre, stock, minimo in (('lapiz', 20, 2), ('cuaderno', 5, 1), ('regla', 3, 5))
+    }
+    for dias_atras in range(10, 0, -1):
+        lineas = [(db.ids['lapiz'], 4)]
+        if dias_atras == 10:
+            lineas.append((db.ids['cuaderno'], 30))
+        venta_id = db.create_sale({'fecha': HOY - timedelta(days=dias_atras), 'id_usuario': empleado, 'total': 0})
+        db.insert_sale_details([{'venta_id': venta_id, 'producto_id': p, 'cantidad': c, 'precio': 100}
+                                for p, c in lineas])
+    return db
+
+
+def test_demanda_del_catalogo(db):
+    """
+    Verifica la demanda por producto calculada en lote contra el EWMA escalar.
+    """
+    motor = MotorReabastecimiento.desde_base(db, hasta=HOY)
+    media = dict(zip(motor.ids.tolist(), motor.media))
+    varianza = dict(zip(motor.ids.tolist(), motor.varianza))
+    assert media[db.ids['lapiz']] == pytest.approx(4.0)
+    assert varianza[db.ids['lapiz']] == pytest.approx(0.0)
+    esperado = ewma([30] + [0] * 9, motor.alfa)
+    assert (media[db.ids['cuaderno']], varianza[db.ids['cuaderno']]) == pytest.approx(esperado)
+    assert media[db.ids['regla']] == 0.0
+
+
+def test_actualizacion_incremental(db):
+    """
+    Verifica que registrar ventas día a día, con días sin ventas en medio, da el
+    mismo estado que aplicar el EWMA a la serie diaria completa.
+    """
+    motor = MotorReabastecimiento.desde_base(db, hasta=HOY)
+    lapiz, cuaderno = db.ids['lapiz'], db.ids['cuaderno']
+    posicion = {producto: i for i, producto in enumerate(motor.ids.tolist())}
+    inicial = {p: (motor.media[posicion[p]], motor.varianza[posicion[p]]) for p in (lapiz, cuaderno)}
+    for dias, cantidad in ((0, 7), (0, 1), (3, 2)):
+        motor.registrar_venta([(lapiz, cantidad)], HOY + timedelta(days=dias))
+    motor.avanzar(HOY + timedelta(days=6))
+
+    for producto, serie in ((lapiz, [8, 0, 0, 2, 0, 0]), (cuaderno, [0] * 6)):
+        media, varianza = ewma(serie, motor.alfa, inicial[producto])
+        assert motor.media[posicion[producto]] == pytest.approx(media)
+        assert motor.varianza[posicion[producto]] == pytest.approx(varianza)
+
+
+def test_sugerencias(db):
+    """
+    Verifica el punto de pedido dinámico, el piso en stock_minimo y la cantidad sugerida.
+    """
+    motor = MotorReabastecimiento.desde_base(db, hasta=HOY)
+    sugerencias = {s['nombre']: s for s in motor.sugerencias(db.iter_products(), fecha=HOY,
+                                                              tiempo_entrega=7, dias_cobertura=14)}
+    # Lápiz: 4 por día sin variación -> punto de pedido 28, reponer hasta 28 + 56
+    assert sugerencias['lapiz']['punto_pedido'] == 28
+    assert sugerencias['lapiz']['cantidad_sugerida'] == 28 + 56 - 20
+    # Regla sin ventas: el punto de pedido es su stock_minimo
+    assert sugerencias['regla']['punto_pedido'] == 5
+    assert sugerencias['regla']['cantidad_sugerida'] == 2
+    assert list(sugerencias)[0] == 'lapiz'
+
+
+def test_demanda_del_proceso(db):
+    """
+    Verifica que el motor del proceso recorre la historia una sola vez, aplica cada
+    venta una vez aunque llegue anotada y notificada, y se recalcula si se pierden
+    notificaciones.
+    """
+    from database.notificaciones import CanalLocal, EVENTO_REINICIO
+    recorridos = []
+    iter_sales_history = db.iter_sales_history
+    db.iter_sales_history = lambda **kwargs: (recorridos.append(kwargs), iter_sales_history(**kwargs))[1]
+    demanda = DemandaProceso(reloj=lambda: HOY)
+    canal = CanalLocal()
+    demanda.escuchar(canal)
+    referencia = MotorReabastecimiento.desde_base(db, hasta=HOY)
+    recorridos.clear()
+    demanda.sugerencias(db, fecha=HOY)
+
+    def vender(cantidad):
+        venta_id = db.create_sale({'fecha': HOY, 'id_usuario': 1, 'total': 0})
+        db.insert_sale_details([{'venta_id': venta_id, 'producto_id': db.ids['lapiz'], 'cantidad': cantidad,
+                                 'precio': 100}])
+        referencia.registrar_venta([(db.ids['lapiz'], cantidad)], HOY)
+        return venta_id
+
+    def notificar(venta_id):
+        canal.publicar({'tabla': 'detalle_ventas', 'ids': [venta_id],
+                        'version': db.get_table_versions()['detalle_ventas']})
+    propia = vender(6)
+    demanda.anotar_venta(propia, HOY)
+    demanda.sugerencias(db, fecha=HOY)
+    notificar(propia)
+    notificar(vender(2))
+    manana = HOY + timedelta(days=1)
+    esperado = referencia.sugerencias(db.iter_products(), fecha=manana, solo_reponer=False)
+    assert demanda.sugerencias(db, fecha=manana, solo_reponer=False) == esperado
+    assert len(recorridos) == 1
+
+    canal.publicar(dict(EVENTO_REINICIO))
+    demanda.sugerencias(db, fecha=manana)
+    assert len(recorridos) == 2
+
+
+def test_demanda_del_proceso_ventas_incorporadas(db):
+    """
+    Verifica que las notificaciones confirmadas antes del cálculo no se aplican de
+    nuevo y que modificar una venta ya incorporada obliga a recalcular el motor.
+    """
+    from database.notificaciones import CanalLocal
+    recorridos = []
+    iter_sales_history = db.iter_sales_history
+    db.iter_sales_history = lambda **kwargs: (recorridos.append(kwargs), iter_sales_history(**kwargs))[1]
+    demanda = DemandaProceso(reloj=lambda: HOY)
+    canal = CanalLocal()
+    demanda.escuchar(canal)
+    venta_id = db.create_sale({'fecha': HOY, 'id_usuario': 1, 'total': 0})
+    db.insert_sale_details([{'venta_id': venta_id, 'producto_id': db.ids['lapiz'], 'cantidad': 9, 'precio': 100}])
+    version = db.get_table_versions()['detalle_ventas']
+    # El cálculo incluye la venta; su notificación llega después (esperaba el lock)
+    esperado = demanda.sugerencias(db, fecha=HOY, solo_reponer=False)
+    canal.publicar({'tabla': 'detalle_ventas', 'ids': [venta_id], 'version': version})
+    demanda.anotar_venta(venta_id, HOY)
+    assert demanda.sugerencias(db, fecha=HOY, solo_reponer=False) == esperado
+    assert len(recorridos) == 1
+
+    # Se agrega una línea a la venta ya incorporada
+    db.insert_sale_details([{'venta_id': venta_id, 'producto_id': db.ids['cuaderno'], 'cantidad': 5, 'precio': 100}])
+    canal.publicar({'tabla': 'detalle_ventas', 'ids': [venta_id], 'version': db.get_table_versions()['detalle_ventas']})
+    assert demanda.sugerencias(db, fecha=HOY, solo_reponer=False) == \
+        MotorReabastecimiento.desde_base(db, hasta=HOY).sugerencias(db.iter_products(), fecha=HOY, solo_reponer=False)
+    assert len(recorridos) == 3
+
+
+def test_catalogo_grande_con_pocos_productos_vendidos():
+    """
+    Verifica que los productos sin ventas quedan con demanda cero sin entrar en la
+    matriz de días, aunque el catálogo sea grande y la historia larga.
+    """
+    ids = np.arange(1, 200_001)
+    dias = np.array([0, 1, 364, 200], dtype=np.int64)
+    hasta = datetime(1970, 1, 1) + timedelta(days=365)
+    motor = MotorReabastecimiento.desde_columnas(np.array([7, 7, 150_000, 150_000]), np.array([3, 5, 2, 4]),
+                                                 dias * 86400, hasta, ids=ids.tolist())
+    assert motor.ids.tolist() == ids.tolist()
+    serie = np.zeros(365)
+    serie[[0, 1]] = [3, 5]
+    assert (motor.media[6], motor.varianza[6]) == pytest.approx(ewma(serie, motor.alfa))
+    serie = np.zeros(365)
+    serie[[200, 364]] = [4, 2]
+    assert (motor.media[149_999], motor.varianza[149_999]) == pytest.approx(ewma(serie, motor.alfa))
+    assert np.count_nonzero(motor.media) == 2
@@ -149,6 +149,28 @@ def test_generar_historial(inventario_limpio):
     venta_id = gestor_venta.registrar_venta(venta, gestor_inventario)
     assert isinstance(venta_id, int)
 
+def test_generar_historial_agrupa_detalles(inventario_limpio):
+    """
+    Test para verificar que el historial agrupa los detalles de cada venta con
+    los nombres de productos y del empleado.
+    """
+    producto1 = Producto(1, "lapiz", 500, 10, "escolar", 1)
+    producto2 = Producto(2, "cuaderno", 1500, 20, "escolar", 1)
+    inventario_limpio.agregar_producto(producto1)
+    inventario_limpio.agregar_producto(producto2)
+    id_empleado = inventario_limpio.db.create_user({'nombre': 'Ana', 'rol': 'empleado', 'password': 'secreto1'})
+    tienda = Tienda(inventario_limpio.db, inventario_limpio)
+    venta1 = Venta(1, "03/04/25", [(producto1.to_dict(), 2), (producto2.to_dict(), 1)], id_empleado, inventario_limpio)
+    venta2 = Venta(2, "04/04/25", [(producto2.to_dict(), 3)], id_empleado, inventario_limpio)
+    tienda.registrar_venta(venta1, inventario_limpio)
+    tienda.registrar_venta(venta2, inventario_limpio)
+    historial = tienda.generar_historial()
+    assert [v['id'] for v in historial] == [1, 2]
+    assert historial[0]['productos'] == ["lapiz (x2) - $500.00", "cuaderno (x1) - $1,500.00"]
+    assert historial[1]['productos'] == ["cuaderno (x3) - $1,500.00"]
+    assert historial[0]['empleado'] == 'Ana'
+    assert historial[0]['total'] == 2500
+
 # tests error
 def test_producto_precio_negativo():
     """
@@ -258,3 +280,84 @@ def test_venta_producto_categoria_invalida():
     """
     with pytest.raises(CategoriaInvalidaError):
         Producto(1, "lapiz", 500, 10, "", 1)
+
+def test_registrar_venta_revierte_transaccion(inventario_limpio):
+    """
+    Test para verificar que si una línea de la venta falla no queda stock descontado
+    ni venta registrada.
+    """
+    producto1 = Producto(1, "lapiz", 500, 10, "escolar", 1)
+    producto2 = Producto(2, "cuaderno", 1500, 5, "escolar", 1)
+    inventario_limpio.agregar_producto(producto1)
+    inventario_limpio.agregar_producto(producto2)
+    productos_vendidos = [(producto1.to_dict(), 3), (producto2.to_dict(), 4)]
+    venta = Venta(1, "04/03/25", productos_vendidos, 1, inventario_limpio)
+    # Otra venta agota el cuaderno entre la validación y el registro
+    inventario_limpio.db.update_stock(2, -3)
+    gestor_ventas = Tienda(inventario_limpio.db, inventario_limpio)
+    with pytest.raises(StockInsuficienteError):
+        gestor_ventas.registrar_venta(venta, inventario_limpio)
+    assert inventario_limpio.db.get_product(1)['cantidad'] == 10
+    assert inventario_limpio.db.get_product(2)['cantidad'] == 2
+    assert inventario_limpio.db.get_all_sales() == []
+
+def test_venta_valida_sin_recorrer_catalogo(inventario_limpio):
+    """
+    Test para verificar que crear una venta consulta solo los productos vendidos
+    y no el catálogo completo.
+    """
+    producto1 = Producto(1, "lapiz", 500, 10, "escolar", 1)
+    producto2 = Producto(2, "cuaderno", 1500, 5, "escolar", 1)
+    inventario_limpio.agregar_producto(producto1)
+    inventario_limpio.agregar_producto(producto2)
+    def sin_catalogo():
+        raise AssertionError("No se debe leer el catálogo completo")
+    inventario_limpio.db.get_all_products = sin_catalogo
+    venta = Venta(1, "04/03/25", [(producto1.to_dict(), 3), (producto2.to_dict(), 1)], 1, inventario_limpio)
+    assert venta.total == 3000
+    with pytest.raises(VentaProductoNoRegistradoError):
+        Venta(2, "04/03/25", [(Producto(3, "regla", 800, 5, "escolar", 1).to_dict(), 1)], 1, inventario_limpio)
+
+def test_ingresos_resumidos(inventario_limpio):
+    """
+    Test para verificar los ingresos totales y por día, empleado, producto y categoría.
+    """
+    from datetime import date, datetime
+    db = inventario_limpio.db
+    empleado = db.create_user({'nombre': 'ana', 'rol': 'empleado', 'password': 'secreto1'})
+    lapiz = db.create_product({'nombre': 'lapiz', 'precio': 500, 'cantidad': 10, 'categoria': 'escolar', 'stock_minimo': 1})
+    radio = db.create_product({'nombre': 'radio', 'precio': 9000, 'cantidad': 5, 'categoria': 'electronica', 'stock_minimo': 1})
+    for fecha, lineas in ((datetime(2025, 4, 3, 9), [(lapiz, 2, 500)]), (datetime(2025, 4, 3, 18), [(radio, 1, 9000)]),
+                          (datetime(2025, 4, 4, 10), [(lapiz, 1, 500)])):
+        venta_id = db.create_sale({'fecha': fecha, 'id_usuario': empleado,
+                                   'total': sum(c * precio for _, c, precio in lineas)})
+        db.insert_sale_details([{'venta_id': venta_id, 'producto_id': p, 'cantidad': c, 'precio': precio}
+                                for p, c, precio in lineas])
+    tienda = Tienda(db, inventario_limpio)
+    assert tienda.calcular_total_ventas() == 10500
+    assert [(f['dia'], f['num_ventas'], f['total']) for f in tienda.ingresos_por_dia()] == [
+        (date(2025, 4, 3), 2, 10000), (date(2025, 4, 4), 1, 500)]
+    assert tienda.ingresos_por_dia(desde=date(2025, 4, 4))[0]['total'] == 500
+    assert tienda.ingresos_por_empleado() == [{'id_usuario': empleado, 'nombre': 'ana', 'num_ventas': 3, 'total': 10500}]
+    assert [(f['nombre'], f['cantidad'], f['total']) for f in tienda.ingresos_por_producto()] == [
+        ('radio', 1, 9000), ('lapiz', 3, 1500)]
+    assert [f['categoria'] for f in tienda.ingresos_por_categoria(hasta=date(2025, 4, 4))] == ['electronica', 'escolar']
+
+def test_registrar_venta_actualiza_reabastecimiento(inventario_limpio):
+    """
+    Test para verificar que una venta confirmada suma demanda al motor de
+    reabastecimiento y que una venta revertida no.
+    """
+    from modulos.reabastecimiento import MotorReabastecimiento
+    producto1 = Producto(1, "lapiz", 500, 10, "escolar", 1)
+    inventario_limpio.agregar_producto(producto1)
+    motor = MotorReabastecimiento()
+    tienda = Tienda(inventario_limpio.db, inventario_limpio, reabastecimiento=motor)
+    tienda.registrar_venta(Venta(1, "04/03/25", [(producto1.to_dict(), 3)], 1, inventario_limpio), inventario_limpio)
+    venta = Venta(2, "04/03/25", [(producto1.to_dict(), 5)], 1, inventario_limpio)
+    inventario_limpio.db.update_stock(1, -5)
+    with pytest.raises(StockInsuficienteError):
+        tienda.registrar_venta(venta, inventario_limpio)
+    assert motor.pendiente.tolist() == [3.0]
+    sugerencias = tienda.sugerencias_reabastecimiento(solo_reponer=False)
+    assert [s['producto_id'] for s in sugerencias] == [1]
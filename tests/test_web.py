@@ -0,0 +1,437 @@
+import pytest
+from datetime import datetime
+from database.cached_database import CacheLRU
+from database.test_database import DatabaseTest
+from database.versiones import VersionesTablas
+from modulos.reabastecimiento import DemandaProceso
+from web.app import app
+
+
+class ContadorConsultas:
+    """Envuelve una base de datos y cuenta las llamadas de acceso a datos."""
+
+    SIN_CONSULTA = {'connect', 'disconnect', 'close'}
+
+    def __init__(self, db):
+        self.db = db
+        self.consultas = 0
+
+    def __getattr__(self, nombre):
+        atributo = getattr(self.db, nombre)
+        if not callable(atributo) or nombre in self.SIN_CONSULTA:
+            return atributo
+
+        def contar(*args, **kwargs):
+            self.consultas += 1
+            return atributo(*args, **kwargs)
+        return contar
+
+
+def poblar_ventas(db, num_ventas, lineas_por_venta, prefijo='producto'):
+    id_usuario = db.create_user({'nombre': f'empleado {prefijo}', 'rol': 'empleado', 'password': 'secreto1'})
+    productos = [
+        db.create_product({'nombre': f'{prefijo} {i}', 'precio': 100.0, 'cantidad': 50,
+                           'categoria': 'escolar', 'stock_minimo': 1})
+        for i in range(lineas_por_venta)
+    ]
+    for _ in range(num_ventas):
+        venta_id = db.create_sale({'fecha': datetime(2025, 4, 3, 10, 30), 'id_usuario': id_usuario,
+                                   'total': 100.0 * lineas_por_venta})
+        for producto_id in productos:
+            db.insert_sale_detail({'venta_id': venta_id, 'producto_id': producto_id,
+                                   'cantidad': 1, 'precio': 100.0})
+
+
+@pytest.fixture
+def db():
+    db = ContadorConsultas(DatabaseTest())
+    app.config['DATABASE'] = db
+    app.config['TESTING'] = True
+    app.config['VERSIONES'] = VersionesTablas(db.get_table_versions)
+    app.config['FRAGMENTOS'] = CacheLRU()
+    app.config['REABASTECIMIENTO'] = DemandaProceso()
+    return db
+
+
+@pytest.fixture
+def cliente(db):
+    with app.test_client() as cliente:
+        with cliente.session_transaction() as sesion:
+            sesion['user_id'] = 1
+            sesion['user_role'] = 'admin'
+        yield cliente
+
+
+@pytest.mark.parametrize('ruta', ['/ventas', '/historial'])
+def test_consultas_constantes_por_pagina(db, cliente, ruta):
+    """
+    Verifica que el número de consultas de las páginas de ventas e historial
+    no crece con la cantidad de ventas ni de líneas por venta.
+    """
+    poblar_ventas(db.db, 2, 1, 'cuaderno')
+    app.config['VERSIONES'].refrescar()
+    db.consultas = 0
+    respuesta = cliente.get(ruta)
+    assert respuesta.status_code == 200
+    consultas_pocas_ventas = db.consultas
+
+    poblar_ventas(db.db, 40, 5)
+    # Escritura directa sobre la base: en producción llega la notificación del trigger
+    app.config['VERSIONES'].refrescar()
+    db.consultas = 0
+    respuesta = cliente.get(ruta)
+    assert respuesta.status_code == 200
+    assert db.consultas == consultas_pocas_ventas
+    assert db.consultas <= 2
+    assert 'producto 4 (1)' in respuesta.get_data(as_text=True)
+
+
+def test_paginacion_productos(db, cliente):
+    """
+    Verifica que el listado de productos se pagina y enlaza la página siguiente con el cursor.
+    """
+    poblar_ventas(db.db, 0, 3)
+    respuesta = cliente.get('/productos?por_pagina=2')
+    html = respuesta.get_data(as_text=True)
+    assert 'producto 1' in html and 'producto 2' not in html
+    assert 'despues_de=' in html
+    respuesta = cliente.get('/productos?pagina=2&por_pagina=2&despues_de=3')
+    html = respuesta.get_data(as_text=True)
+    assert 'producto 2' in html and 'producto 1' not in html
+
+
+def test_eliminar_producto_con_ventas(db, cliente):
+    """
+    Verifica que solo se elimina el producto sin ventas y que la comprobación no recorre los detalles.
+    """
+    poblar_ventas(db.db, 1, 1, 'vendido')
+    sin_ventas = db.db.create_product({'nombre': 'goma', 'precio': 100.0, 'cantidad': 5,
+                                       'categoria': 'escolar', 'stock_minimo': 1})
+    db.db.iter_sale_details = None
+    cliente.post('/productos/2/eliminar')
+    cliente.post(f'/productos/{sin_ventas}/eliminar')
+    assert [p['nombre'] for p in db.db.get_all_products()] == ['vendido 0']
+
+
+def test_crear_venta_inserta_detalles_en_bloque(db, cliente):
+    """
+    Verifica que crear una venta inserta todas sus líneas con una sola llamada y descuenta el stock.
+    """
+    poblar_ventas(db.db, 0, 3)
+    formulario = {'id_usuario': '1', 'metodo_pago': 'efectivo'}
+    for producto_id in (2, 3, 4):
+        formulario[f'producto_{producto_id}'] = 'on'
+        formulario[f'cantidad_{producto_id}'] = '2'
+    llamadas = []
+    insertar = db.db.insert_sale_details
+    db.db.insert_sale_details = lambda detalles: (llamadas.append(len(detalles)), insertar(detalles))
+    db.consultas = 0
+    respuesta = cliente.post('/ventas/crear', data=formulario)
+    assert respuesta.status_code == 302
+    assert llamadas == [3]
+    # get_products, transaction, 3 x decrement_stock, create_sale, insert_sale_details
+    # y la relectura de las versiones tras la escritura
+    assert db.consultas == 8
+    assert [p['cantidad'] for p in db.db.get_all_products()] == [48, 48, 48]
+
+
+def test_exportar_historial_csv_filtrado(db, cliente):
+    """
+    Verifica que la exportación CSV incluye una fila por producto vendido y respeta los filtros.
+    """
+    poblar_ventas(db.db, 2, 2)
+    poblar_ventas(db.db, 1, 1, 'cuaderno')
+    respuesta = cliente.get('/historial/export.csv')
+    assert respuesta.status_code == 200
+    assert respuesta.mimetype == 'text/csv'
+    lineas = respuesta.get_data(as_text=True).splitlines()
+    assert lineas[0] == 'venta_id,fecha,id_usuario,empleado,total,producto_id,producto,cantidad,precio'
+    assert len(lineas) == 1 + 2 * 2 + 1
+    respuesta = cliente.get('/historial/export.csv?empleado=1&desde=2025-04-03&hasta=2025-04-03')
+    lineas = respuesta.get_data(as_text=True).splitlines()
+    assert len(lineas) == 1 + 2 * 2
+    respuesta = cliente.get('/historial/export.csv?desde=2025-04-04')
+    assert respuesta.get_data(as_text=True).splitlines()[1:] == []
+
+
+def test_exportar_historial_ndjson(db, cliente):
+    import json
+    poblar_ventas(db.db, 1, 2)
+    respuesta = cliente.get('/historial/export.ndjson')
+    filas = [json.loads(linea) for linea in respuesta.get_data(as_text=True).splitlines()]
+    assert [f['producto'] for f in filas] == ['producto 0', 'producto 1']
+    assert filas[0]['fecha'] == '2025-04-03T10:30:00'
+    assert cliente.get('/historial/export.ndjson?desde=03/04/2025').status_code == 400
+
+
+def test_analitica_historial(db, cliente):
+    """
+    Verifica que el análisis de ventas se muestra y respeta el filtro por empleado.
+    """
+    poblar_ventas(db.db, 2, 2)
+    respuesta = cliente.get('/historial/analitica')
+    assert respuesta.status_code == 200
+    html = respuesta.get_data(as_text=True)
+    assert 'Clasificación ABC' in html and 'producto 0' in html
+    assert '2 ventas' in html
+    html = cliente.get('/historial/analitica?empleado=99').get_data(as_text=True)
+    assert '0 ventas' in html
+
+
+def test_reabastecimiento(db, cliente):
+    """
+    Verifica que la página de reabastecimiento lista solo los productos en su punto de pedido.
+    """
+    poblar_ventas(db.db, 1, 2)
+    db.db.create_product({'nombre': 'regla', 'precio': 50.0, 'cantidad': 1, 'categoria': 'escolar', 'stock_minimo': 4})
+    html = cliente.get('/productos/reabastecimiento').get_data(as_text=True)
+    assert 'regla' in html and 'producto 0' not in html
+    html = cliente.get('/productos/reabastecimiento?todos=1').get_data(as_text=True)
+    assert 'producto 0' in html
+
+
+def test_reabastecimiento_incremental_y_por_dia(db, cliente, monkeypatch):
+    """
+    Verifica que la página de reabastecimiento no recorre la historia de ventas en
+    cada cambio, que incluye las ventas registradas desde la web y que su ETag
+    cambia de un día a otro aunque no cambien los datos.
+    """
+    import datetime as dt
+    from web.controllers import productos
+    poblar_ventas(db.db, 1, 2)
+    recorridos = []
+    iter_sales_history = db.db.iter_sales_history
+    db.db.iter_sales_history = lambda **kwargs: (recorridos.append(kwargs), iter_sales_history(**kwargs))[1]
+    respuesta = cliente.get('/productos/reabastecimiento?todos=1')
+    etag = respuesta.headers['ETag']
+    assert cliente.post('/api/v1/ventas', json={'productos': [{'producto_id': 2, 'cantidad': 40}]}).status_code == 201
+    respuesta = cliente.get('/productos/reabastecimiento?todos=1', headers={'If-None-Match': etag})
+    assert respuesta.status_code == 200
+    etag = respuesta.headers['ETag']
+    assert len(recorridos) == 1
+    # La venta de hoy entra en la demanda al cerrar el día
+    sugerencias = app.config['REABASTECIMIENTO'].sugerencias(db.db, fecha=datetime.now() + dt.timedelta(days=1),
+                                                            solo_reponer=False)
+    assert {s['producto_id']: s['demanda_diaria'] for s in sugerencias}[2] > 0
+    assert len(recorridos) == 1
+
+    class Manana(dt.date):
+        @classmethod
+        def today(cls):
+            return dt.date.today() + dt.timedelta(days=1)
+    monkeypatch.setattr(productos, 'date', Manana)
+    assert cliente.get('/productos/reabastecimiento?todos=1', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_cabeceras_de_consultas(db, cliente):
+    """
+    Verifica que la respuesta informa las consultas medidas durante la petición.
+    """
+    from database import instrumentacion
+    pagina = db.db.get_products_page
+
+    def pagina_medida(*args, **kwargs):
+        instrumentacion.registrar("SELECT * FROM productos LIMIT %s", 0.002, 0)
+        return pagina(*args, **kwargs)
+    db.db.get_products_page = pagina_medida
+    respuesta = cliente.get('/productos')
+    assert respuesta.headers['X-Query-Count'] == '1'
+    assert respuesta.headers['Server-Timing'].startswith('db;dur=2.00;desc="1 consultas"')
+    assert instrumentacion.registro_actual() is None
+
+
+def test_metricas(db, cliente, monkeypatch):
+    """
+    Verifica que /metrics expone la latencia por endpoint y exige el token si se configuró.
+    """
+    from database.database_config import METRICAS_CONFIG
+    cliente.get('/productos')
+    respuesta = cliente.get('/metrics')
+    assert respuesta.status_code == 200
+    assert respuesta.mimetype == 'text/plain'
+    texto = respuesta.get_data(as_text=True)
+    assert ('http_request_duration_seconds_count{blueprint="productos",endpoint="productos.index",'
+            'method="GET",status="200"}') in texto
+    assert 'cache_hits_total{cache="fragmentos"}' in texto
+    monkeypatch.setitem(METRICAS_CONFIG, 'token', 'secreto')
+    assert cliente.get('/metrics').status_code == 401
+    assert cliente.get('/metrics', headers={'Authorization': 'Bearer secreto'}).status_code == 200
+
+
+def test_importar_productos_subida(db, cliente):
+    """
+    Verifica que la subida de un catálogo CSV crea los productos y lista las filas inválidas.
+    """
+    import io
+    contenido = b"nombre,precio,cantidad,categoria,stock_minimo\nlapiz,500,10,escolar,2\nx,1,1,escolar,1\n"
+    respuesta = cliente.post('/productos/importar', data={'archivo': (io.BytesIO(contenido), 'catalogo.csv')},
+                             content_type='multipart/form-data')
+    assert respuesta.status_code == 200
+    assert [p['nombre'] for p in db.db.get_all_products()] == ['lapiz']
+    assert '1 productos importados de 2 filas' in respuesta.get_data(as_text=True)
+
+
+def test_api_productos_etag_y_gzip(db, cliente):
+    """
+    Verifica que la API responde JSON paginado con los campos pedidos, 304 cuando
+    el cliente ya tiene la versión actual y gzip si lo acepta.
+    """
+    import gzip
+    import json
+    poblar_ventas(db.db, 0, 30)
+    respuesta = cliente.get('/api/v1/productos?por_pagina=2&campos=id,nombre')
+    assert respuesta.status_code == 200
+    datos = respuesta.get_json()
+    assert datos['items'] == [{'id': 2, 'nombre': 'producto 0'}, {'id': 3, 'nombre': 'producto 1'}]
+    assert datos['paginacion']['siguiente'] == 3
+    etag = respuesta.headers['ETag']
+    db.consultas = 0
+    assert cliente.get('/api/v1/productos?por_pagina=2&campos=id,nombre',
+                       headers={'If-None-Match': etag}).status_code == 304
+    assert db.consultas == 0
+    db.db.update_stock(2, -1)
+    # Escritura directa sobre la base: en producción llega la notificación del trigger
+    app.config['VERSIONES'].refrescar()
+    respuesta = cliente.get('/api/v1/productos?por_pagina=2&campos=id,nombre', headers={'If-None-Match': etag})
+    assert respuesta.status_code == 200
+    assert respuesta.headers['ETag'] != etag
+    respuesta = cliente.get('/api/v1/productos', headers={'Accept-Encoding': 'gzip'})
+    assert respuesta.headers['Content-Encoding'] == 'gzip'
+    assert len(json.loads(gzip.decompress(respuesta.data))['items']) == 30
+    assert cliente.get('/api/v1/productos?campos=clave').status_code == 400
+
+
+def test_api_registrar_venta_y_ajustar_stock(db, cliente):
+    """
+    Verifica que la API registra ventas descontando el stock, ajusta el stock y
+    rechaza productos inexistentes y ventas sin stock suficiente sin registrar nada.
+    """
+    poblar_ventas(db.db, 0, 2)
+    respuesta = cliente.post('/api/v1/ventas', json={'productos': [
+        {'producto_id': 2, 'cantidad': 3}, {'producto_id': 3, 'cantidad': 1}]})
+    assert respuesta.status_code == 201
+    venta = respuesta.get_json()
+    assert venta['total'] == 400.0 and venta['id_usuario'] == 1
+    assert cliente.get(f"/api/v1/ventas/{venta['id']}").get_json()['productos'][0]['cantidad'] == 3
+    assert db.db.get_product(2)['cantidad'] == 47
+
+    respuesta = cliente.post('/api/v1/ventas', json={'productos': [{'producto_id': 2, 'cantidad': 48}]})
+    assert respuesta.status_code == 409 and respuesta.get_json()['error']
+    respuesta = cliente.post('/api/v1/ventas', json={'productos': [{'producto_id': 99, 'cantidad': 1}]})
+    assert respuesta.status_code == 400 and '99' in respuesta.get_json()['error']
+    assert cliente.post('/api/v1/ventas', json={'productos': [{'producto_id': 2, 'cantidad': 0}]}).status_code == 400
+    assert cliente.post('/api/v1/ventas', data='x').status_code == 400
+    assert len(db.db.get_all_sales()) == 1
+
+    respuesta = cliente.patch('/api/v1/stock/2', json={'ajuste': 5})
+    assert respuesta.status_code == 200 and respuesta.get_json()['cantidad'] == 52
+    assert cliente.patch('/api/v1/stock/2', json={'ajuste': -60}).status_code == 409
+    assert cliente.patch('/api/v1/stock/2', json={'ajuste': '3'}).status_code == 400
+    assert cliente.patch('/api/v1/stock/99', json={'ajuste': 1}).status_code == 404
+    assert db.db.get_product(2)['cantidad'] == 52
+    with cliente.session_transaction() as sesion:
+        sesion['user_role'] = 'empleado'
+    assert cliente.patch('/api/v1/stock/2', json={'ajuste': 5}).status_code == 403
+    assert db.db.get_product(2)['cantidad'] == 52
+
+
+def test_api_usuarios_sin_password_y_solo_admin(db, cliente):
+    """
+    Verifica que la API de usuarios no expone contraseñas y exige sesión y rol de administrador.
+    """
+    poblar_ventas(db.db, 1, 1)
+    datos = cliente.get('/api/v1/usuarios').get_json()
+    assert datos['items'] and all('password' not in u for u in datos['items'])
+    venta = cliente.get('/api/v1/ventas/3').get_json()
+    assert venta['productos'][0]['producto'] == 'producto 0'
+    with cliente.session_transaction() as sesion:
+        sesion['user_role'] = 'empleado'
+    assert cliente.get('/api/v1/usuarios').status_code == 403
+    assert cliente.get('/api/v1/stock?bajo=1').status_code == 200
+    with cliente.session_transaction() as sesion:
+        sesion.clear()
+    respuesta = cliente.get('/api/v1/productos')
+    assert respuesta.status_code == 401 and respuesta.get_json()['error']
+
+
+def test_historial_304_y_fragmento_en_cache(db, cliente):
+    """
+    Verifica que el historial responde 304 mientras no cambian los datos, que el
+    listado se sirve desde la caché de fragmentos y que una escritura lo invalida.
+    """
+    poblar_ventas(db.db, 2, 1)
+    respuesta = cliente.get('/historial')
+    etag = respuesta.headers['ETag']
+    db.consultas = 0
+    assert cliente.get('/historial', headers={'If-None-Match': etag}).status_code == 304
+    respuesta = cliente.get('/historial')
+    assert respuesta.status_code == 200 and 'producto 0 (1)' in respuesta.get_data(as_text=True)
+    assert db.consultas == 0
+    cliente.post('/historial/eliminar')
+    respuesta = cliente.get('/historial', headers={'If-None-Match': etag})
+    assert respuesta.status_code == 200
+    assert 'producto 0 (1)' not in respuesta.get_data(as_text=True)
+    assert 'ETag' not in respuesta.headers  # mostró el mensaje flash de la eliminación
+    assert cliente.get('/historial', headers={'If-None-Match': etag}).status_code == 200
+
+
+@pytest.mark.parametrize('ruta', ['/historial', '/historial/analitica'])
+def test_historial_depende_de_las_lineas(db, cliente, ruta):
+    """
+    Verifica que un cambio solo en las líneas de venta invalida el historial y la analítica.
+    """
+    poblar_ventas(db.db, 1, 1)
+    db.db.create_product({'nombre': 'regla', 'precio': 50.0, 'cantidad': 5, 'categoria': 'escolar',
+                          'stock_minimo': 1})
+    etag = cliente.get(ruta).headers['ETag']
+    db.db.insert_sale_detail({'venta_id': 3, 'producto_id': 4, 'cantidad': 2, 'precio': 50.0})
+    # Escritura directa sobre la base: en producción llega la notificación del trigger
+    app.config['VERSIONES'].refrescar()
+    respuesta = cliente.get(ruta, headers={'If-None-Match': etag})
+    assert respuesta.status_code == 200
+
+
+def test_post_sin_escrituras_no_cambia_versiones(db, cliente):
+    """
+    Verifica que una petición de escritura que falla no invalida las páginas en
+    caché y que una venta solo cambia las tablas que modifica.
+    """
+    poblar_ventas(db.db, 1, 1)
+    historial = cliente.get('/api/v1/historial').headers['ETag']
+    usuarios = cliente.get('/api/v1/usuarios').headers['ETag']
+    assert cliente.post('/api/v1/ventas', json={'productos': []}).status_code == 400
+    assert cliente.get('/api/v1/historial', headers={'If-None-Match': historial}).status_code == 304
+    assert cliente.post('/api/v1/ventas', json={'productos': [{'producto_id': 2, 'cantidad': 1}]}).status_code == 201
+    assert cliente.get('/api/v1/historial', headers={'If-None-Match': historial}).status_code == 200
+    assert cliente.get('/api/v1/usuarios', headers={'If-None-Match': usuarios}).status_code == 304
+
+
+def test_versiones_por_tabla_y_notificaciones():
+    """
+    Verifica que la etiqueta sale de las versiones de la base de datos, cambia solo
+    con las tablas indicadas, también con notificaciones confirmadas fuera de orden,
+    y se relee tras un reinicio.
+    """
+    from database.notificaciones import CanalLocal, EVENTO_REINICIO
+    db = DatabaseTest()
+    db.create_product({'nombre': 'lapiz', 'precio': 500, 'cantidad': 10, 'categoria': 'escolar', 'stock_minimo': 1})
+    versiones = VersionesTablas(db.get_table_versions)
+    canal = CanalLocal()
+    versiones.escuchar(canal)
+    assert versiones.etiqueta('productos', 'ventas') == '1.0'
+    # Otro proceso con la misma base genera la misma etiqueta
+    assert VersionesTablas(db.get_table_versions).etiqueta('productos', 'ventas') == '1.0'
+    canal.publicar({'tabla': 'ventas', 'ids': [1], 'version': 4})
+    assert versiones.etiqueta('productos') == '1'
+    canal.publicar({'tabla': 'productos', 'ids': [1], 'version': 3})
+    assert versiones.etiqueta('productos', 'ventas') == '3.4'
+    # La transacción con versión 2 se confirmó después que la 3
+    canal.publicar({'tabla': 'productos', 'ids': [1], 'version': 2})
+    assert versiones.etiqueta('productos', 'ventas') == '3+1.4'
+    db.update_stock(1, 5)
+    db.update_stock(1, 5)
+    db.update_stock(1, 5)
+    db.update_stock(1, 5)
+    assert versiones.etiqueta('productos') == '3+1'
+    canal.publicar(dict(EVENTO_REINICIO))
+    assert versiones.etiqueta('productos') == '5'
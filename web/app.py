@@ -4,21 +4,30 @@ Configura la aplicación, la base de datos y los blueprints.
 """
 import os
 import sys
+import time
 from pathlib import Path
 
 # Agregar el directorio src al PYTHONPATH
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
 
-from flask import Flask, g
+from flask import Flask, g, request
+from database import instrumentacion
 from dotenv import load_dotenv
 from database.postgres_database import PostgresDatabase
-from database.database_config import CURRENT_CONFIG
+from database.cached_database import CacheLRU, CachedDatabase
+from database.versiones import VersionesTablas
+from database.notificaciones import CanalPostgres
+from database.database_config import CACHE_CONFIG, CURRENT_CONFIG, INSTRUMENTACION_CONFIG
+from modulos.reabastecimiento import DemandaProceso
 from web.controllers.auth import auth_bp
 from web.controllers.main import main_bp
 from web.controllers.productos import productos_bp
 from web.controllers.usuarios import usuarios_bp
 from web.controllers.ventas import ventas_bp
 from web.controllers.historial import historial_bp
+from web.controllers.api import api_bp
+from web.controllers.metricas import metricas_bp
+from utils.metricas import DURACION_PETICIONES, METRICAS
 
 # Cargar variables de entorno
 def cargar_variables_entorno():
@@ -32,8 +41,24 @@ cargar_variables_entorno()
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY', 'clave_secreta_default')
 
-# Configuración de la base de datos
-app.config['DATABASE'] = PostgresDatabase(CURRENT_CONFIG)
+# Configuración de la base de datos (las conexiones se toman del pool compartido
+# y los productos y usuarios leídos por ID se guardan en una caché del proceso,
+# invalidada por las notificaciones de cambios de los demás procesos)
+app.config['DATABASE'] = CachedDatabase(PostgresDatabase(CURRENT_CONFIG))
+app.config['NOTIFICACIONES'] = CanalPostgres(CURRENT_CONFIG)
+app.config['DATABASE'].escuchar(app.config['NOTIFICACIONES'])
+
+# Versiones de las tablas (compartidas por todos los procesos a través de la base
+# de datos) para responder 304 a las páginas que no cambiaron y caché de los
+# listados ya renderizados para cada versión
+app.config['VERSIONES'] = VersionesTablas(app.config['DATABASE'].get_table_versions)
+app.config['VERSIONES'].escuchar(app.config['NOTIFICACIONES'])
+app.config['FRAGMENTOS'] = CacheLRU(ttl=CACHE_CONFIG['ttl'], max_size=CACHE_CONFIG['fragmentos_max'])
+
+# Demanda por producto para el reabastecimiento: se calcula una vez y se mantiene
+# con las ventas de este y de los demás procesos
+app.config['REABASTECIMIENTO'] = DemandaProceso()
+app.config['REABASTECIMIENTO'].escuchar(app.config['NOTIFICACIONES'])
 
 # Registrar blueprints
 app.register_blueprint(auth_bp)
@@ -42,19 +67,92 @@ app.register_blueprint(productos_bp)
 app.register_blueprint(usuarios_bp)
 app.register_blueprint(ventas_bp)
 app.register_blueprint(historial_bp)
+app.register_blueprint(api_bp)
+app.register_blueprint(metricas_bp)
+
+def _estado_pool():
+    return [((estado,), valor) for estado, valor in app.config['DATABASE'].pool.estadisticas().items()]
+
+def _caches(campo):
+    estadisticas = {'fragmentos': app.config['FRAGMENTOS'].estadisticas()}
+    if isinstance(app.config['DATABASE'], CachedDatabase):
+        estadisticas.update(app.config['DATABASE'].estadisticas_cache())
+    return [((nombre,), datos[campo]) for nombre, datos in estadisticas.items()]
+
+# Métricas que ya llevan el pool y las cachés; se leen al exponer /metrics
+METRICAS.recolector('db_pool_connections', 'gauge', 'Conexiones del pool por estado (abiertas, libres, en_uso, max_size)',
+                    _estado_pool, ('state',))
+METRICAS.recolector('cache_hits_total', 'counter', 'Lecturas resueltas desde la caché',
+                    lambda: _caches('aciertos'), ('cache',))
+METRICAS.recolector('cache_misses_total', 'counter', 'Lecturas que no estaban en la caché',
+                    lambda: _caches('fallos'), ('cache',))
 
 @app.before_request
 def before_request():
     """
-    Conectar a la base de datos antes de cada petición HTTP.
+    Tomar prestada una conexión del pool antes de cada petición HTTP y asegurar
+    que el proceso escucha las notificaciones de cambios.
     """
+    if not app.testing:
+        app.config['NOTIFICACIONES'].iniciar()
+    g.inicio_peticion = time.perf_counter()
+    g.consultas, g.token_consultas = instrumentacion.iniciar(request.endpoint or request.path)
     g.db = app.config['DATABASE']
     g.db.connect()
 
+@app.after_request
+def cabeceras_consultas(respuesta):
+    """
+    Informa al cliente cuántas consultas hizo la petición y cuánto tardaron.
+    """
+    registro = g.get('consultas')
+    if registro is not None and INSTRUMENTACION_CONFIG['activa']:
+        respuesta.headers['X-Query-Count'] = str(registro.total)
+        respuesta.headers['Server-Timing'] = registro.server_timing()
+    return respuesta
+
+def _observar_duracion(estado):
+    """
+    Registra la duración de la petición en el histograma (una sola vez por petición).
+    Las rutas inexistentes se agrupan sin endpoint para no multiplicar las series.
+    """
+    inicio = g.pop('inicio_peticion', None)
+    if inicio is not None:
+        DURACION_PETICIONES.observar(time.perf_counter() - inicio,
+                                     (request.blueprint or '', request.endpoint or '', request.method, str(estado)))
+    METRICAS.volcar_periodico()
+
+@app.after_request
+def metricas_peticion(respuesta):
+    _observar_duracion(respuesta.status_code)
+    return respuesta
+
+@app.teardown_request
+def terminar_consultas(exception):
+    """
+    Cierra el registro de consultas de la petición (y avisa de posibles N+1).
+    """
+    token = g.pop('token_consultas', None)
+    if token is not None:
+        instrumentacion.terminar(token)
+    if exception is not None:
+        # La petición terminó con una excepción sin manejar: no pasó por after_request
+        _observar_duracion(500)
+
+@app.teardown_request
+def registrar_escritura(exception):
+    """
+    Tras una petición que pudo modificar datos se releen las versiones, sin esperar
+    a la notificación, para que la siguiente página ya muestre los cambios. Solo
+    cambian las tablas en las que se confirmó alguna escritura.
+    """
+    if exception is None and request.method not in ('GET', 'HEAD', 'OPTIONS') and 'db' in g:
+        app.config['VERSIONES'].refrescar()
+
 @app.teardown_appcontext
 def teardown_db(exception):
     """
-    Cerrar la conexión a la base de datos después de cada petición HTTP.
+    Devolver la conexión al pool después de cada petición HTTP.
     """
     db = g.pop('db', None)
     if db is not None:
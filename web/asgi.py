@@ -0,0 +1,382 @@
+"""
+API JSON asíncrona (ASGI) para terminales de venta.
+
+Atiende las rutas de productos, ventas e historial de `/api/v1` con las mismas
+respuestas que la API de Flask (`web.controllers.api`), pero sobre la base de datos
+asíncrona: mientras una petición espera a PostgreSQL el proceso atiende las demás,
+de modo que un solo worker sostiene muchas terminales concurrentes con pocas
+conexiones. Las ventas y los productos se validan con `Venta`, `Producto` y
+`TiendaAsincrona`, y la sesión es la misma cookie que la de la interfaz web.
+
+Se ejecuta con cualquier servidor ASGI, p. ej.:
+
+    uvicorn web.asgi:app --workers 4
+"""
+import asyncio
+import gzip
+import json
+import logging
+import os
+import re
+import sys
+import time
+from urllib.parse import parse_qsl
+
+# Agregar el directorio src al PYTHONPATH
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from flask import Flask, abort
+from werkzeug.datastructures import MultiDict
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import parse_accept_header, parse_cookie, parse_etags, parse_options_header, quote_etag
+from database import instrumentacion
+from database.async_postgres_database import AsyncPostgresDatabase
+from database.database_config import CURRENT_CONFIG, INSTRUMENTACION_CONFIG
+from database.notificaciones import CanalPostgres
+from database.versiones import VersionesTablas
+from errores.categoria_invalida import CategoriaInvalidaError
+from errores.fecha_invalida import FechaInvalidaError
+from errores.precio_invalido import PrecioInvalidoError
+from errores.producto_invalido import ProductoInvalidoError
+from errores.productos_duplicados import ProductoDuplicadoError
+from errores.stock_insuficiente import StockInsuficienteError
+from errores.stock_invalido import StockInvalidoError
+from errores.total_invalido import TotalInvalidoError
+from errores.venta_invalida import VentaInvalidaError
+from errores.venta_producto_no_registrado import VentaProductoNoRegistradoError
+from errores.venta_sin_empleado import VentaSinEmpleadoError
+from modelos.producto import Producto
+from modulos.tienda import TiendaAsincrona
+from utils.metricas import DURACION_PETICIONES, METRICAS
+from web.controllers.api import (NIVEL_GZIP, TAMANO_MINIMO_GZIP, _campos_solicitados, _entero, _objeto_json,
+                                 _seleccionar, _solo_admin, asignar_lineas, calcular_etag, codificar_json,
+                                 leer_seleccion, venta_creada)
+from web.controllers.comun import paginacion, parametros_pagina
+
+logger = logging.getLogger(__name__)
+
+# Cuerpos de petición más grandes que esto (en bytes) se rechazan con 413
+TAMANO_MAXIMO_CUERPO = 1024 * 1024
+# Errores de validación de `Venta` que se responden con 400
+ERRORES_VENTA = (VentaInvalidaError, VentaProductoNoRegistradoError, VentaSinEmpleadoError, CategoriaInvalidaError,
+                 FechaInvalidaError, TotalInvalidoError)
+ERRORES_PRODUCTO = (ProductoInvalidoError, PrecioInvalidoError, StockInvalidoError, CategoriaInvalidaError)
+
+
+class PeticionAsgi:
+    """
+    Datos de una petición HTTP recibida por ASGI, con los nombres de la petición de Flask.
+
+    Attributes:
+        method (str): Método HTTP
+        path (str): Ruta sin query string
+        full_path (str): Ruta y query string, como `request.full_path`
+        args (MultiDict): Parámetros de la query string
+        headers (dict): Cabeceras, con el nombre en minúsculas
+        cookies (dict): Cookies de la petición
+        cuerpo (bytes): Cuerpo de la petición
+        sesion (dict): Sesión de Flask asociada a la cookie (vacía si no hay)
+    """
+
+    def __init__(self, scope, cuerpo):
+        self.method = scope['method']
+        self.path = scope['path']
+        query = scope.get('query_string', b'').decode('latin-1')
+        self.full_path = f"{self.path}?{query}"
+        self.args = MultiDict(parse_qsl(query, keep_blank_values=True))
+        self.headers = {}
+        for nombre, valor in scope.get('headers', []):
+            nombre = nombre.decode('latin-1').lower()
+            valor = valor.decode('latin-1')
+            self.headers[nombre] = f"{self.headers[nombre]}, {valor}" if nombre in self.headers else valor
+        self.cookies = parse_cookie(self.headers.get('cookie', ''))
+        self.cuerpo = cuerpo
+        self.sesion = {}
+
+    def json(self):
+        """Cuerpo JSON de la petición, o None si no es JSON válido (como `get_json(silent=True)`)."""
+        tipo, _ = parse_options_header(self.headers.get('content-type', ''))
+        if tipo != 'application/json' and not (tipo.startswith('application/') and tipo.endswith('+json')):
+            return None
+        try:
+            return json.loads(self.cuerpo)
+        except ValueError:
+            return None
+
+
+class RespuestaAsgi:
+    """Respuesta HTTP a enviar por ASGI."""
+
+    def __init__(self, estado, cuerpo=b'', cabeceras=None):
+        self.estado = estado
+        self.cuerpo = cuerpo
+        self.cabeceras = cabeceras or {}
+
+
+class AplicacionAsgi:
+    """
+    Aplicación ASGI de la API asíncrona.
+
+    Attributes:
+        db: Base de datos asíncrona (`AsyncDatabaseInterface`)
+        tienda (TiendaAsincrona): Registro de ventas sobre `db`
+        versiones (VersionesTablas): Versiones de las tablas para los ETag
+        notificaciones (CanalPostgres): Canal de cambios que mantiene `versiones`, o None
+    """
+
+    def __init__(self, db, notificaciones=None, secret_key=None):
+        """
+        Inicializa la aplicación sin abrir conexiones.
+
+        Args:
+            db: Base de datos asíncrona
+            notificaciones (CanalLocal, optional): Canal de notificaciones de cambios;
+                se inicia y detiene con el ciclo de vida del servidor
+            secret_key (str, optional): Clave con la que la interfaz web firma la sesión
+        """
+        self.db = db
+        self.tienda = TiendaAsincrona(db)
+        self.versiones = VersionesTablas(db.get_table_versions)
+        self.notificaciones = notificaciones
+        if notificaciones is not None:
+            self.versiones.escuchar(notificaciones)
+        # Solo se usa para leer la cookie de sesión con la configuración de Flask
+        self._sesiones = Flask(__name__)
+        self._sesiones.secret_key = secret_key
+        self.rutas = [
+            ('GET', re.compile(r'/api/v1/productos'), self.productos),
+            ('POST', re.compile(r'/api/v1/productos'), self.crear_producto),
+            ('GET', re.compile(r'/api/v1/productos/(\d+)'), self.producto),
+            ('GET', re.compile(r'/api/v1/ventas'), self.ventas),
+            ('POST', re.compile(r'/api/v1/ventas'), self.crear_venta),
+            ('GET', re.compile(r'/api/v1/ventas/(\d+)'), self.venta),
+            ('GET', re.compile(r'/api/v1/historial'), self.historial),
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._ciclo_de_vida(receive, send)
+        elif scope['type'] == 'http':
+            await self._atender(scope, receive, send)
+
+    async def _ciclo_de_vida(self, receive, send):
+        """Inicia la escucha de cambios al arrancar y cierra las conexiones al terminar."""
+        while True:
+            mensaje = await receive()
+            if mensaje['type'] == 'lifespan.startup':
+                try:
+                    if self.notificaciones is not None:
+                        self.notificaciones.iniciar()
+                except Exception as e:
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif mensaje['type'] == 'lifespan.shutdown':
+                if self.notificaciones is not None:
+                    await asyncio.to_thread(self.notificaciones.detener)
+                await self.db.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _atender(self, scope, receive, send):
+        """
+        Atiende una petición HTTP: la despacha, la mide y envía la respuesta con las
+        mismas cabeceras de instrumentación que la aplicación Flask.
+        """
+        inicio = time.perf_counter()
+        endpoint = ''
+        registro, token = instrumentacion.iniciar(scope['path'])
+        try:
+            cuerpo = await self._leer_cuerpo(receive)
+            peticion = PeticionAsgi(scope, cuerpo)
+            vista, argumentos = self._resolver(peticion)
+            endpoint = f"api.{vista.__name__}"
+            registro.nombre = endpoint
+            peticion.sesion = self._sesiones.session_interface.open_session(self._sesiones, peticion) or {}
+            if 'user_id' not in peticion.sesion:
+                abort(401, description='Debe iniciar sesión')
+            respuesta = await vista(peticion, *argumentos)
+        except HTTPException as e:
+            respuesta = _error(e.code, e.description)
+        except Exception:
+            logger.exception("Error al atender %s %s", scope['method'], scope['path'])
+            respuesta = _error(500, 'Error interno del servidor')
+        finally:
+            instrumentacion.terminar(token)
+        if INSTRUMENTACION_CONFIG['activa']:
+            respuesta.cabeceras['X-Query-Count'] = str(registro.total)
+            respuesta.cabeceras['Server-Timing'] = registro.server_timing()
+        DURACION_PETICIONES.observar(time.perf_counter() - inicio,
+                                     ('api' if endpoint else '', endpoint, scope['method'], str(respuesta.estado)))
+        METRICAS.volcar_periodico()
+        await _enviar(send, respuesta, con_cuerpo=scope['method'] != 'HEAD')
+
+    async def _leer_cuerpo(self, receive):
+        partes = []
+        tamano = 0
+        while True:
+            mensaje = await receive()
+            if mensaje['type'] == 'http.disconnect':
+                break
+            parte = mensaje.get('body', b'')
+            tamano += len(parte)
+            if tamano > TAMANO_MAXIMO_CUERPO:
+                abort(413, description='El cuerpo de la petición es demasiado grande')
+            partes.append(parte)
+            if not mensaje.get('more_body', False):
+                break
+        return b''.join(partes)
+
+    def _resolver(self, peticion):
+        """Vista y argumentos de la ruta; 404 si no existe y 405 si no admite el método."""
+        metodos = set()
+        for metodo, patron, vista in self.rutas:
+            coincidencia = patron.fullmatch(peticion.path)
+            if coincidencia is None:
+                continue
+            if metodo == peticion.method or (metodo == 'GET' and peticion.method == 'HEAD'):
+                return vista, [int(grupo) for grupo in coincidencia.groups()]
+            metodos.add(metodo)
+        if metodos:
+            abort(405, description='Método no permitido')
+        abort(404, description='Recurso no encontrado')
+
+    # RESPUESTAS
+    async def _condicional(self, peticion, tablas, datos):
+        """
+        Responde 304 sin consultar la base de datos si las tablas no cambiaron desde
+        la versión que tiene el cliente; si no, espera `datos()` y responde con el ETag.
+        """
+        version = await self.versiones.etiqueta_asincrona(*tablas)
+        etag = calcular_etag(version, peticion.full_path, peticion.sesion)
+        if parse_etags(peticion.headers.get('if-none-match')).contains_weak(etag):
+            return RespuestaAsgi(304, cabeceras={'ETag': quote_etag(etag, weak=True), 'Vary': 'Accept-Encoding'})
+        return _responder(peticion, await datos(), etag)
+
+    async def _listado(self, peticion, consulta, adaptar=None):
+        campos = _campos_solicitados(peticion.args)
+        pagina, por_pagina, despues_de = parametros_pagina(peticion.args)
+        resultado = await consulta(limit=por_pagina, offset=(pagina - 1) * por_pagina, after_id=despues_de)
+        items = resultado['items']
+        if adaptar is not None:
+            await adaptar(items)
+        return {'items': [_seleccionar(item, campos) for item in items],
+                'paginacion': paginacion(pagina, por_pagina, resultado)}
+
+    async def _agregar_lineas(self, ventas):
+        return asignar_lineas(ventas, await self.db.get_sale_details_for_sales([venta['id'] for venta in ventas]))
+
+    def _uno(self, peticion, item, recurso):
+        if item is None:
+            abort(404, description=f'{recurso} no encontrado')
+        return _seleccionar(item, _campos_solicitados(peticion.args))
+
+    async def _escritura(self, peticion, datos, estado):
+        """Tras una escritura se releen las versiones, como hace la aplicación Flask."""
+        await self.versiones.refrescar_asincrono()
+        return _responder(peticion, datos, estado=estado)
+
+    # VISTAS
+    async def productos(self, peticion):
+        """Lista paginada de productos."""
+        return await self._condicional(peticion, ('productos',),
+                                       lambda: self._listado(peticion, self.db.get_products_page))
+
+    async def producto(self, peticion, id):
+        """Datos de un producto."""
+        async def datos():
+            return self._uno(peticion, await self.db.get_product(id), 'Producto')
+        return await self._condicional(peticion, ('productos',), datos)
+
+    async def crear_producto(self, peticion):
+        """
+        Crea un producto (solo administrador). El cuerpo tiene 'nombre', 'precio',
+        'cantidad', 'categoria' y 'stock_minimo', que se validan con `Producto`.
+        Responde 201 con el producto, 400 si no es válido y 409 si el nombre ya existe.
+        """
+        _solo_admin(peticion.sesion)
+        datos = _objeto_json(peticion.json())
+        precio = datos.get('precio')
+        if isinstance(precio, bool) or not isinstance(precio, (int, float)):
+            abort(400, description="'precio' debe ser un número")
+        for campo in ('nombre', 'categoria'):
+            if not isinstance(datos.get(campo), str):
+                abort(400, description=f"'{campo}' debe ser un texto")
+        try:
+            producto = Producto(None, datos['nombre'], precio, _entero(datos.get('cantidad'), 'cantidad'),
+                                datos['categoria'], _entero(datos.get('stock_minimo'), 'stock_minimo'))
+        except ERRORES_PRODUCTO as e:
+            abort(400, description=str(e))
+        try:
+            id_producto = await self.db.create_product(producto.to_dict())
+        except ProductoDuplicadoError as e:
+            abort(409, description=str(e))
+        return await self._escritura(peticion, await self.db.get_product(id_producto), 201)
+
+    async def ventas(self, peticion):
+        """Lista paginada de ventas."""
+        return await self._condicional(peticion, ('ventas',),
+                                       lambda: self._listado(peticion, self.db.get_sales_page))
+
+    async def crear_venta(self, peticion):
+        """
+        Registra una venta del usuario de la sesión, igual que `POST /api/v1/ventas`
+        de la API de Flask: 201 con la venta, 400 si no es válida y 409 si algún
+        producto no tiene stock suficiente (en ese caso no se registra nada).
+        """
+        seleccion = leer_seleccion(_objeto_json(peticion.json()))
+        try:
+            venta = await self.tienda.registrar_venta(seleccion, peticion.sesion['user_id'])
+        except ERRORES_VENTA as e:
+            abort(400, description=str(e))
+        except StockInsuficienteError as e:
+            abort(409, description=str(e))
+        return await self._escritura(peticion, venta_creada(venta), 201)
+
+    async def venta(self, peticion, id):
+        """Datos de una venta con sus líneas."""
+        async def datos():
+            venta = await self.db.get_sale(id)
+            if venta is not None:
+                await self._agregar_lineas([venta])
+            return self._uno(peticion, venta, 'Venta')
+        return await self._condicional(peticion, ('ventas', 'detalle_ventas', 'productos'), datos)
+
+    async def historial(self, peticion):
+        """Historial paginado de ventas con los productos vendidos en cada una."""
+        return await self._condicional(peticion, ('ventas', 'detalle_ventas', 'productos'),
+                                       lambda: self._listado(peticion, self.db.get_sales_page,
+                                                             self._agregar_lineas))
+
+
+def _responder(peticion, datos, etag=None, estado=200):
+    """Igual que `web.controllers.api.responder`: JSON con ETag débil y gzip si el cliente lo acepta."""
+    cuerpo = codificar_json(datos)
+    cabeceras = {'Content-Type': 'application/json', 'Vary': 'Accept-Encoding'}
+    if etag is not None:
+        cabeceras['ETag'] = quote_etag(etag, weak=True)
+        cabeceras['Cache-Control'] = 'no-cache'
+    if len(cuerpo) >= TAMANO_MINIMO_GZIP and 'gzip' in parse_accept_header(peticion.headers.get('accept-encoding')):
+        cuerpo = gzip.compress(cuerpo, compresslevel=NIVEL_GZIP)
+        cabeceras['Content-Encoding'] = 'gzip'
+    return RespuestaAsgi(estado, cuerpo, cabeceras)
+
+
+def _error(estado, descripcion):
+    return RespuestaAsgi(estado, codificar_json({'error': descripcion}), {'Content-Type': 'application/json'})
+
+
+async def _enviar(send, respuesta, con_cuerpo=True):
+    cabeceras = dict(respuesta.cabeceras)
+    cabeceras['Content-Length'] = str(len(respuesta.cuerpo))
+    await send({
+        'type': 'http.response.start',
+        'status': respuesta.estado,
+        'headers': [(nombre.lower().encode('latin-1'), valor.encode('latin-1')) for nombre, valor in cabeceras.items()]
+    })
+    await send({'type': 'http.response.body', 'body': respuesta.cuerpo if con_cuerpo else b''})
+
+
+# Las conexiones se abren en la primera petición, dentro del bucle del servidor
+app = AplicacionAsgi(AsyncPostgresDatabase(CURRENT_CONFIG), CanalPostgres(CURRENT_CONFIG),
+                     os.getenv('SECRET_KEY', 'clave_secreta_default'))
@@ -0,0 +1,397 @@
+"""
+API JSON versionada para terminales de venta e integraciones.
+Expone productos, stock, ventas, historial y usuarios sobre la misma base de datos
+que las vistas HTML, con paginación, selección de campos, GET condicional (ETag)
+y compresión gzip, y permite registrar ventas y ajustar el stock.
+"""
+import functools
+import gzip
+import hashlib
+import json
+from datetime import date, datetime
+from flask import Blueprint, Response, abort, current_app, g, jsonify, request, session
+from errores.stock_insuficiente import StockInsuficienteError
+from errores.venta_invalida import VentaInvalidaError
+from web.controllers.comun import obtener_pagina, parametros_pagina, registrar_venta
+
+api_bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+# Respuestas más pequeñas que esto (en bytes) no se comprimen
+TAMANO_MINIMO_GZIP = 500
+NIVEL_GZIP = 6
+# Campos que nunca se exponen
+CAMPOS_PRIVADOS = {'password'}
+
+
+@api_bp.before_request
+def requiere_sesion():
+    """
+    Exige una sesión iniciada para usar la API.
+    """
+    if 'user_id' not in session:
+        abort(401, description='Debe iniciar sesión')
+
+
+@api_bp.errorhandler(400)
+@api_bp.errorhandler(401)
+@api_bp.errorhandler(403)
+@api_bp.errorhandler(404)
+@api_bp.errorhandler(409)
+def error_json(error):
+    """
+    Responde los errores de la API en JSON en lugar de HTML.
+    """
+    return jsonify({'error': error.description}), error.code
+
+
+def _solo_admin(sesion=None):
+    sesion = session if sesion is None else sesion
+    if sesion.get('user_role') != 'admin':
+        abort(403, description='Solo el administrador puede acceder a este recurso')
+
+
+def _serializar(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    raise TypeError(f"Tipo no serializable: {type(valor).__name__}")
+
+
+def _campos_solicitados(args=None):
+    """
+    Lee el parámetro 'campos' (lista separada por comas) o None si no se indicó.
+    """
+    campos = (request.args if args is None else args).get('campos')
+    if not campos:
+        return None
+    return [campo.strip() for campo in campos.split(',') if campo.strip()]
+
+
+def _seleccionar(item, campos):
+    """
+    Quita los campos privados y, si se pidieron campos, deja solo esos.
+    """
+    publico = {clave: valor for clave, valor in item.items() if clave not in CAMPOS_PRIVADOS}
+    if campos is None:
+        return publico
+    desconocidos = [campo for campo in campos if campo not in publico]
+    if desconocidos:
+        abort(400, description=f"Campos desconocidos: {', '.join(desconocidos)}")
+    return {campo: publico[campo] for campo in campos}
+
+
+def _etag(tablas):
+    """
+    ETag de la URL actual según la versión de las tablas de las que depende y el
+    usuario, de modo que se puede comparar con If-None-Match antes de consultar la
+    base de datos.
+    """
+    return calcular_etag(current_app.config['VERSIONES'].etiqueta(*tablas), request.full_path, session)
+
+
+def calcular_etag(version, ruta, sesion):
+    """
+    ETag de una URL (ruta con query string) para una versión de los datos y un usuario.
+    """
+    clave = f"{version}|{ruta}|{sesion.get('user_id')}|{sesion.get('user_role')}"
+    return hashlib.sha1(clave.encode('utf-8')).hexdigest()
+
+
+def _no_modificado(etag):
+    """
+    Retorna la respuesta 304 si el cliente ya tiene la versión `etag`, o None.
+    """
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    respuesta = Response(status=304)
+    respuesta.set_etag(etag, weak=True)
+    respuesta.vary.add('Accept-Encoding')
+    return respuesta
+
+
+def responder(datos, etag=None, estado=200):
+    """
+    Construye la respuesta JSON, con su ETag y comprimida con gzip si el cliente lo acepta.
+
+    El ETag es débil, porque la misma representación puede enviarse con o sin gzip.
+
+    Args:
+        datos: Contenido serializable a JSON
+        etag (str, optional): Versión de la representación (ver `_etag`)
+        estado (int): Código de estado HTTP
+
+    Returns:
+        Response: Respuesta JSON
+    """
+    cuerpo = codificar_json(datos)
+    respuesta = Response(cuerpo, status=estado, mimetype='application/json')
+    if etag is not None:
+        respuesta.set_etag(etag, weak=True)
+        respuesta.headers['Cache-Control'] = 'no-cache'
+    respuesta.vary.add('Accept-Encoding')
+    if len(cuerpo) >= TAMANO_MINIMO_GZIP and 'gzip' in request.accept_encodings:
+        respuesta.set_data(gzip.compress(cuerpo, compresslevel=NIVEL_GZIP))
+        respuesta.headers['Content-Encoding'] = 'gzip'
+    return respuesta
+
+
+def codificar_json(datos):
+    """
+    Serializa la respuesta en JSON compacto y con las claves ordenadas (UTF-8).
+    """
+    return json.dumps(datos, default=_serializar, ensure_ascii=False, sort_keys=True,
+                      separators=(',', ':')).encode('utf-8')
+
+
+def condicional(*tablas):
+    """
+    Decorador de los GET de la API: responde 304 sin ejecutar la vista si las tablas
+    de las que depende no cambiaron desde la versión que tiene el cliente.
+
+    La vista retorna los datos a serializar; el decorador arma la respuesta con el ETag.
+
+    Args:
+        *tablas (str): Tablas de las que dependen los datos
+    """
+    def decorador(vista):
+        @functools.wraps(vista)
+        def envoltura(*args, **kwargs):
+            etag = _etag(tablas)
+            return _no_modificado(etag) or responder(vista(*args, **kwargs), etag)
+        return envoltura
+    return decorador
+
+
+def _listado(consulta, adaptar=None):
+    """
+    Retorna una página de resultados de un método paginado de la base de datos.
+    """
+    campos = _campos_solicitados()
+    items, paginacion = obtener_pagina(consulta)
+    if adaptar is not None:
+        adaptar(items)
+    return {'items': [_seleccionar(item, campos) for item in items], 'paginacion': paginacion}
+
+
+def _uno(item, recurso):
+    if item is None:
+        abort(404, description=f'{recurso} no encontrado')
+    return _seleccionar(item, _campos_solicitados())
+
+
+def _cuerpo_json():
+    """
+    Lee el cuerpo JSON de la petición, que debe ser un objeto.
+    """
+    return _objeto_json(request.get_json(silent=True))
+
+
+def _objeto_json(datos):
+    if not isinstance(datos, dict):
+        abort(400, description='El cuerpo debe ser un objeto JSON')
+    return datos
+
+
+def _entero(valor, campo):
+    if isinstance(valor, bool) or not isinstance(valor, int):
+        abort(400, description=f"'{campo}' debe ser un número entero")
+    return valor
+
+
+def _agregar_lineas(ventas):
+    """
+    Agrega a cada venta la lista 'productos' con sus líneas, en una sola consulta.
+    """
+    return asignar_lineas(ventas, g.db.get_sale_details_for_sales([venta['id'] for venta in ventas]))
+
+
+def asignar_lineas(ventas, detalles):
+    """
+    Agrega a cada venta la lista 'productos' con sus líneas, tomadas de `detalles`
+    (filas de `get_sale_details_for_sales`).
+    """
+    lineas = {}
+    for det in detalles:
+        lineas.setdefault(det['venta_id'], []).append({
+            'producto_id': det['producto_id'],
+            'producto': det.get('producto_nombre'),
+            'cantidad': det['cantidad'],
+            'precio': det['precio']
+        })
+    for venta in ventas:
+        venta['productos'] = lineas.get(venta['id'], [])
+    return ventas
+
+
+def leer_seleccion(datos):
+    """
+    Lee las líneas {"productos": [{"producto_id": 1, "cantidad": 2}, ...]} del cuerpo
+    de una venta.
+
+    Returns:
+        dict: Cantidad por ID de producto (las líneas repetidas se suman)
+    """
+    lineas = datos.get('productos')
+    if not isinstance(lineas, list) or not lineas:
+        abort(400, description="'productos' debe ser una lista no vacía")
+    seleccion = {}
+    for linea in lineas:
+        if not isinstance(linea, dict):
+            abort(400, description="Cada producto debe ser un objeto con 'producto_id' y 'cantidad'")
+        producto_id = _entero(linea.get('producto_id'), 'producto_id')
+        cantidad = _entero(linea.get('cantidad'), 'cantidad')
+        if cantidad <= 0:
+            abort(400, description="'cantidad' debe ser mayor que cero")
+        seleccion[producto_id] = seleccion.get(producto_id, 0) + cantidad
+    return seleccion
+
+
+def venta_creada(venta):
+    """
+    Representación de una venta recién registrada: sus 'detalles' pasan a 'productos'.
+    """
+    venta['productos'] = [{clave: detalle[clave] for clave in ('producto_id', 'cantidad', 'precio')}
+                          for detalle in venta.pop('detalles')]
+    return venta
+
+
+def _solo_stock_producto(producto):
+    return {clave: producto[clave] for clave in ('id', 'nombre', 'cantidad', 'stock_minimo')}
+
+
+def _solo_stock(pagina):
+    pagina['items'] = [_solo_stock_producto(p) for p in pagina['items']]
+    return pagina
+
+
+@api_bp.route('/productos')
+@condicional('productos')
+def productos():
+    """
+    Lista paginada de productos.
+    """
+    return _listado(g.db.get_products_page)
+
+
+@api_bp.route('/productos/<int:id>')
+@condicional('productos')
+def producto(id):
+    """
+    Datos de un producto.
+    """
+    return _uno(g.db.get_product(id), 'Producto')
+
+
+@api_bp.route('/stock')
+@condicional('productos')
+def stock():
+    """
+    Stock de los productos. Con 'bajo=1' lista solo los productos con stock bajo,
+    opcionalmente de una 'categoria', paginando con 'despues_de'.
+    """
+    if not request.args.get('bajo', type=int):
+        return _listado(lambda **pagina: _solo_stock(g.db.get_products_page(**pagina)))
+    campos = _campos_solicitados()
+    _, por_pagina, despues_de = parametros_pagina()
+    productos = g.db.get_low_stock_products(por_pagina + 1, category=request.args.get('categoria'),
+                                            after_id=despues_de)
+    hay_mas = len(productos) > por_pagina
+    productos = productos[:por_pagina]
+    return {
+        'items': [_seleccionar(_solo_stock_producto(p), campos) for p in productos],
+        'paginacion': {'por_pagina': por_pagina, 'siguiente': productos[-1]['id'] if hay_mas else None}
+    }
+
+
+@api_bp.route('/stock/<int:id>', methods=['PATCH'])
+def ajustar_stock(id):
+    """
+    Ajusta el stock de un producto en 'ajuste' unidades (positivo: ingreso,
+    negativo: salida). El ajuste es atómico; una salida mayor que el stock responde 409.
+    Solo el administrador, como en la sección de productos de la interfaz web.
+    """
+    _solo_admin()
+    ajuste = _entero(_cuerpo_json().get('ajuste'), 'ajuste')
+    if ajuste == 0:
+        abort(400, description="'ajuste' no puede ser cero")
+    if g.db.get_product(id) is None:
+        abort(404, description='Producto no encontrado')
+    try:
+        if ajuste > 0:
+            g.db.increment_stock(id, ajuste)
+        else:
+            g.db.decrement_stock(id, -ajuste)
+    except StockInsuficienteError:
+        abort(409, description='Stock insuficiente para el ajuste')
+    return responder(_solo_stock_producto(g.db.get_product(id)))
+
+
+@api_bp.route('/ventas')
+@condicional('ventas')
+def ventas():
+    """
+    Lista paginada de ventas.
+    """
+    return _listado(g.db.get_sales_page)
+
+
+@api_bp.route('/ventas', methods=['POST'])
+def crear_venta():
+    """
+    Registra una venta del usuario de la sesión con los precios actuales.
+
+    El cuerpo es {"productos": [{"producto_id": 1, "cantidad": 2}, ...]}. Responde
+    201 con la venta registrada, 400 si algún producto no existe y 409 si alguno no
+    tiene stock suficiente (en ese caso no se registra nada).
+    """
+    seleccion = leer_seleccion(_cuerpo_json())
+    desconocidos = sorted(set(seleccion) - set(g.db.get_products(list(seleccion))))
+    if desconocidos:
+        abort(400, description=f"Productos inexistentes: {', '.join(map(str, desconocidos))}")
+    try:
+        venta = registrar_venta(seleccion, session['user_id'])
+    except VentaInvalidaError as e:
+        abort(400, description=str(e))
+    except StockInsuficienteError as e:
+        abort(409, description=str(e))
+    return responder(venta_creada(venta), estado=201)
+
+
+@api_bp.route('/ventas/<int:id>')
+@condicional('ventas', 'detalle_ventas', 'productos')
+def venta(id):
+    """
+    Datos de una venta con sus líneas.
+    """
+    venta = g.db.get_sale(id)
+    if venta is not None:
+        _agregar_lineas([venta])
+    return _uno(venta, 'Venta')
+
+
+@api_bp.route('/historial')
+@condicional('ventas', 'detalle_ventas', 'productos')
+def historial():
+    """
+    Historial paginado de ventas con los productos vendidos en cada una.
+    """
+    return _listado(g.db.get_sales_page, _agregar_lineas)
+
+
+@api_bp.route('/usuarios')
+@condicional('usuarios')
+def usuarios():
+    """
+    Lista paginada de usuarios (solo administrador).
+    """
+    _solo_admin()
+    return _listado(g.db.get_users_page)
+
+
+@api_bp.route('/usuarios/<int:id>')
+@condicional('usuarios')
+def usuario(id):
+    """
+    Datos de un usuario (solo administrador).
+    """
+    _solo_admin()
+    return _uno(g.db.get_user(id), 'Usuario')
@@ -0,0 +1,183 @@
+"""
+Funciones auxiliares compartidas por los controladores web.
+"""
+import hashlib
+from datetime import datetime
+from flask import current_app, g, make_response, render_template, request, session
+from markupsafe import Markup
+from errores.venta_invalida import VentaInvalidaError
+from utils.metricas import VENTAS
+
+# Tamaño de página por defecto y máximo permitido en los listados
+POR_PAGINA_DEFECTO = 50
+POR_PAGINA_MAXIMO = 200
+
+
+def parametros_pagina(args=None):
+    """
+    Lee de la query string los parámetros de paginación ya normalizados.
+
+    Args:
+        args (MultiDict, optional): Query string; por defecto la de la petición Flask
+
+    Returns:
+        tuple: (pagina, por_pagina, despues_de)
+    """
+    args = request.args if args is None else args
+    pagina = max(args.get('pagina', 1, type=int), 1)
+    por_pagina = min(max(args.get('por_pagina', POR_PAGINA_DEFECTO, type=int), 1), POR_PAGINA_MAXIMO)
+    despues_de = args.get('despues_de', type=int)
+    return pagina, por_pagina, despues_de
+
+
+def paginacion(pagina, por_pagina, resultado):
+    """
+    Datos de paginación de la respuesta a partir del resultado de un método paginado.
+
+    Returns:
+        dict: 'pagina', 'por_pagina' y 'siguiente' (cursor de la página siguiente o None)
+    """
+    return {
+        'pagina': pagina,
+        'por_pagina': por_pagina,
+        'siguiente': resultado['next_after_id']
+    }
+
+
+def obtener_pagina(consulta):
+    """
+    Obtiene la página de resultados solicitada en la query string.
+
+    Lee los parámetros 'pagina', 'por_pagina' y 'despues_de'. Si llega 'despues_de'
+    se usa paginación por cursor (keyset), que no se degrada en páginas profundas;
+    si no, se calcula el desplazamiento a partir del número de página.
+
+    Args:
+        consulta (callable): Método paginado de la base de datos (p. ej. g.db.get_products_page)
+
+    Returns:
+        tuple: (items, paginacion) donde paginacion contiene 'pagina', 'por_pagina'
+            y 'siguiente' (cursor de la página siguiente o None)
+    """
+    pagina, por_pagina, despues_de = parametros_pagina()
+    resultado = consulta(limit=por_pagina, offset=(pagina - 1) * por_pagina, after_id=despues_de)
+    return resultado['items'], paginacion(pagina, por_pagina, resultado)
+
+
+def agregar_productos_legibles(ventas):
+    """
+    Agrega a cada venta el texto 'productos_legibles' con sus productos y cantidades.
+
+    Obtiene los detalles de todas las ventas recibidas en una sola consulta,
+    en lugar de consultar los detalles y cada producto por separado.
+
+    Args:
+        ventas (list): Lista de ventas (diccionarios con la clave 'id')
+
+    Returns:
+        list: La misma lista de ventas, con 'productos_legibles' agregado
+    """
+    productos_por_venta = {}
+    for det in g.db.get_sale_details_for_sales([venta['id'] for venta in ventas]):
+        if det.get('producto_nombre'):
+            productos_por_venta.setdefault(det['venta_id'], []).append(
+                f"{det['producto_nombre']} ({det['cantidad']})")
+    for venta in ventas:
+        venta['productos_legibles'] = ', '.join(productos_por_venta.get(venta['id'], []))
+    return ventas
+
+
+def registrar_venta(seleccion, id_usuario):
+    """
+    Registra una venta con los precios actuales de los productos.
+
+    El stock de cada línea se descuenta de forma atómica y la venta y sus detalles
+    se confirman en la misma transacción. Los IDs que no corresponden a un producto
+    se ignoran.
+
+    Args:
+        seleccion (dict): Cantidad (positiva) por ID de producto
+        id_usuario (int): Usuario que registra la venta
+
+    Returns:
+        dict: Venta registrada con 'id', 'fecha', 'id_usuario', 'total' y 'detalles'
+
+    Raises:
+        VentaInvalidaError: Si ningún producto de la selección existe
+        StockInsuficienteError: Si algún producto no tiene stock suficiente
+    """
+    productos_venta = g.db.get_products(list(seleccion))
+    detalles = []
+    total = 0
+    for prod_id, cantidad in seleccion.items():
+        producto = productos_venta.get(prod_id)
+        if producto:
+            total += producto['precio'] * cantidad
+            detalles.append({
+                'producto_id': producto['id'],
+                'cantidad': cantidad,
+                'precio': producto['precio']
+            })
+    if not detalles:
+        raise VentaInvalidaError('Debes seleccionar al menos un producto y su cantidad.')
+    venta = {
+        'id_usuario': id_usuario,
+        'fecha': datetime.now(),
+        'total': total
+    }
+    with g.db.transaction():
+        # Descontar el stock de forma atómica antes de registrar la venta
+        for detalle in detalles:
+            g.db.decrement_stock(detalle['producto_id'], detalle['cantidad'])
+        venta['id'] = g.db.create_sale(venta)
+        for detalle in detalles:
+            detalle['venta_id'] = venta['id']
+        g.db.insert_sale_details(detalles)
+    VENTAS.incrementar()
+    current_app.config['REABASTECIMIENTO'].anotar_venta(venta['id'], venta['fecha'])
+    venta['detalles'] = detalles
+    return venta
+
+
+def pagina_condicional(tablas, plantilla, plantilla_fragmento, datos, clave_extra=''):
+    """
+    Renderiza una página de listado con ETag y caché del fragmento del listado.
+
+    El ETag combina la versión de las tablas, la URL y el usuario de la sesión (el
+    menú depende del rol); si el cliente ya tiene esa versión se responde 304 sin
+    consultar la base de datos. El listado se guarda ya renderizado bajo la versión
+    de las tablas y la URL, de modo que otros usuarios que consultan la misma página
+    tampoco la recalculan. Con mensajes flash pendientes nunca se responde 304 ni se
+    envía ETag, porque la página debe mostrarlos una sola vez.
+
+    Args:
+        tablas (tuple): Tablas de las que depende el listado
+        plantilla (str): Plantilla de la página; recibe el listado como `tabla`
+        plantilla_fragmento (str): Plantilla del listado
+        datos (callable): Retorna el contexto de `plantilla_fragmento`; solo se
+            llama si el fragmento no está en caché
+        clave_extra (str): Otro dato del que depende el listado además de las
+            tablas (p. ej. el día en curso); forma parte del ETag y de la caché
+
+    Returns:
+        Response: La página, o 304 si el cliente ya la tiene
+    """
+    version = f"{current_app.config['VERSIONES'].etiqueta(*tablas)}|{clave_extra}"
+    clave_etag = f"{version}|{request.full_path}|{session.get('user_id')}|{session.get('user_role')}"
+    etag = hashlib.sha1(clave_etag.encode('utf-8')).hexdigest()
+    hay_mensajes = '_flashes' in session
+    if not hay_mensajes and etag in request.if_none_match:
+        respuesta = current_app.response_class(status=304)
+        respuesta.set_etag(etag)
+        return respuesta
+    fragmentos = current_app.config['FRAGMENTOS']
+    clave = (plantilla_fragmento, version, request.full_path)
+    encontrado, html = fragmentos.obtener(clave)
+    if not encontrado:
+        html = render_template(plantilla_fragmento, **datos())
+        fragmentos.guardar(clave, html)
+    respuesta = make_response(render_template(plantilla, tabla=Markup(html)))
+    if not hay_mensajes:
+        respuesta.set_etag(etag)
+        respuesta.headers['Cache-Control'] = 'no-cache'
+    return respuesta
@@ -2,31 +2,41 @@
 Controlador de historial de ventas para la interfaz web.
 Gestiona las rutas y vistas relacionadas con el historial de ventas.
 """
-from flask import Blueprint, render_template, request, redirect, url_for, flash, g
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+from flask import Blueprint, render_template, request, redirect, url_for, flash, g, abort, Response, stream_with_context
 from database.postgres_database import PostgresDatabase
 from database.database_config import DatabaseConfig
+from markupsafe import Markup
+from modulos.analitica import AnaliticaVentas
+from web.controllers.comun import agregar_productos_legibles, obtener_pagina, pagina_condicional
 
 historial_bp = Blueprint('historial', __name__)
 
+# Columnas de las exportaciones, en el orden en que se escriben
+COLUMNAS_EXPORTACION = ['venta_id', 'fecha', 'id_usuario', 'empleado', 'total',
+                        'producto_id', 'producto', 'cantidad', 'precio']
+# Filas que se agrupan en cada bloque enviado al cliente
+FILAS_POR_BLOQUE = 500
+
 @historial_bp.route('/historial')
 def index():
     """
-    Muestra el historial de ventas, incluyendo productos vendidos y cantidades.
+    Muestra el historial paginado de ventas, incluyendo productos vendidos y cantidades.
     """
+    def datos():
+        ventas, paginacion = obtener_pagina(g.db.get_sales_page)
+        agregar_productos_legibles(ventas)
+        return {'ventas': ventas, 'paginacion': paginacion}
     try:
-        ventas = g.db.get_all_sales()
-        for venta in ventas:
-            detalles = g.db.get_sale_details(venta['id'])
-            productos_legibles = []
-            for det in detalles:
-                producto = g.db.get_product(det['producto_id'])
-                if producto:
-                    productos_legibles.append(f"{producto['nombre']} ({det['cantidad']})")
-            venta['productos_legibles'] = ', '.join(productos_legibles)
-        return render_template('historial/index.html', ventas=ventas)
+        return pagina_condicional(('ventas', 'detalle_ventas', 'productos'), 'historial/index.html',
+                                  'historial/_tabla.html', datos)
     except Exception as e:
         flash(f'Error al obtener historial: {str(e)}', 'error')
-        return render_template('historial/index.html', ventas=[])
+        tabla = render_template('historial/_tabla.html', ventas=[], paginacion=None)
+        return render_template('historial/index.html', tabla=Markup(tabla))
 
 @historial_bp.route('/historial/eliminar', methods=['POST'])
 def eliminar():
@@ -38,4 +48,127 @@ def eliminar():
         flash('Historial eliminado exitosamente', 'success')
     except Exception as e:
         flash(f'Error al eliminar historial: {str(e)}', 'error')
-    return redirect(url_for('historial.index')) 
\ No newline at end of file
+    return redirect(url_for('historial.index')) 
+
+def _filtros_exportacion():
+    """
+    Lee los filtros de la exportación: 'desde' y 'hasta' (AAAA-MM-DD, ambos inclusive)
+    y 'empleado' (ID del usuario).
+    """
+    filtros = {}
+    try:
+        if request.args.get('desde'):
+            filtros['date_from'] = datetime.strptime(request.args['desde'], '%Y-%m-%d')
+        if request.args.get('hasta'):
+            filtros['date_to'] = datetime.strptime(request.args['hasta'], '%Y-%m-%d') + timedelta(days=1)
+    except ValueError:
+        abort(400, description='Las fechas deben tener el formato AAAA-MM-DD')
+    if request.args.get('empleado'):
+        empleado = request.args.get('empleado', type=int)
+        if empleado is None:
+            abort(400, description='El empleado debe ser un ID numérico')
+        filtros['user_id'] = empleado
+    return filtros
+
+
+def _filas_exportacion(db, filtros):
+    """
+    Recorre las filas del historial a exportar.
+
+    La respuesta se genera después de que `teardown_db` devuelve la conexión de la
+    petición al pool, por eso el generador toma prestada la suya mientras dura el envío.
+    """
+    db.connect()
+    try:
+        for fila in db.iter_sales_history(**filtros):
+            yield {
+                'venta_id': fila['venta_id'],
+                'fecha': fila['fecha'].isoformat() if hasattr(fila['fecha'], 'isoformat') else fila['fecha'],
+                'id_usuario': fila['id_usuario'],
+                'empleado': fila['usuario_nombre'],
+                'total': fila['total'],
+                'producto_id': fila['producto_id'],
+                'producto': fila['producto_nombre'],
+                'cantidad': fila['cantidad'],
+                'precio': fila['precio']
+            }
+    finally:
+        db.disconnect()
+
+
+def _en_bloques(lineas):
+    """Agrupa las líneas generadas para no enviar un fragmento por fila."""
+    bloque = []
+    for linea in lineas:
+        bloque.append(linea)
+        if len(bloque) >= FILAS_POR_BLOQUE:
+            yield ''.join(bloque)
+            bloque = []
+    if bloque:
+        yield ''.join(bloque)
+
+
+def _respuesta_exportacion(lineas, mimetype, extension):
+    return Response(
+        stream_with_context(_en_bloques(lineas)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=historial_ventas.{extension}'}
+    )
+
+
+@historial_bp.route('/historial/export.csv')
+def exportar_csv():
+    """
+    Exporta el historial de ventas en CSV, una fila por producto vendido.
+
+    Las filas se envían a medida que se leen de un cursor del lado del servidor,
+    así que la memoria usada no depende del tamaño del historial.
+    """
+    filas = _filas_exportacion(g.db, _filtros_exportacion())
+
+    def lineas():
+        buffer = io.StringIO()
+        escritor = csv.DictWriter(buffer, fieldnames=COLUMNAS_EXPORTACION)
+        escritor.writeheader()
+        for fila in filas:
+            escritor.writerow(fila)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+
+    return _respuesta_exportacion(lineas(), 'text/csv', 'csv')
+
+
+@historial_bp.route('/historial/export.ndjson')
+def exportar_ndjson():
+    """
+    Exporta el historial de ventas en NDJSON (un objeto JSON por línea y producto vendido).
+    """
+    filas = _filas_exportacion(g.db, _filtros_exportacion())
+
+    def lineas():
+        for fila in filas:
+            yield json.dumps(fila, ensure_ascii=False) + '\n'
+
+    return _respuesta_exportacion(lineas(), 'application/x-ndjson', 'ndjson')
+
+
+@historial_bp.route('/historial/analitica')
+def analitica():
+    """
+    Muestra el análisis de ventas: productos con más ingresos, clasificación ABC,
+    tasa de venta y tamaño de canasta. Acepta los filtros de la exportación.
+    """
+    filtros = _filtros_exportacion()
+
+    def datos():
+        analisis = AnaliticaVentas.desde_base(g.db, desde=filtros.get('date_from'), hasta=filtros.get('date_to'),
+                                              id_usuario=filtros.get('user_id'))
+        return {'resumen': analisis.resumen()}
+    try:
+        return pagina_condicional(('ventas', 'detalle_ventas', 'productos'), 'historial/analitica.html',
+                                  'historial/_analitica.html', datos)
+    except Exception as e:
+        flash(f'Error al calcular el análisis de ventas: {str(e)}', 'error')
+        return redirect(url_for('historial.index'))
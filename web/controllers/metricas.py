@@ -0,0 +1,23 @@
+"""
+Controlador de métricas para Prometheus.
+Expone en /metrics las métricas del registro de `utils.metricas` en formato de texto.
+"""
+from flask import Blueprint, Response, abort, request
+from database.database_config import METRICAS_CONFIG
+from utils.metricas import METRICAS
+
+metricas_bp = Blueprint('metricas', __name__)
+
+TIPO_CONTENIDO = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+@metricas_bp.route('/metrics')
+def metrics():
+    """
+    Métricas de la aplicación (de todos los workers si se configuró METRICAS_DIR).
+    Si se configuró METRICAS_TOKEN, exige la cabecera 'Authorization: Bearer <token>'.
+    """
+    token = METRICAS_CONFIG['token']
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        abort(401)
+    return Response(METRICAS.exponer(), content_type=TIPO_CONTENIDO)
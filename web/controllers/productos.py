@@ -2,10 +2,14 @@
 Controlador de productos para la interfaz web.
 Gestiona las rutas y vistas relacionadas con la administración de productos.
 """
-from flask import Blueprint, render_template, request, redirect, url_for, flash, g, session
+from datetime import date
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, flash, g, session
 from modelos.producto import Producto
 from database.postgres_database import PostgresDatabase
 from database.database_config import DatabaseConfig
+from modulos.importador import ImportadorProductos
+from markupsafe import Markup
+from web.controllers.comun import obtener_pagina, pagina_condicional
 
 productos_bp = Blueprint('productos', __name__)
 
@@ -21,14 +25,55 @@ def solo_admin():
 @productos_bp.route('/productos')
 def index():
     """
-    Muestra la lista de productos registrados en el sistema.
+    Muestra la lista paginada de productos registrados en el sistema.
     """
+    def datos():
+        productos, paginacion = obtener_pagina(g.db.get_products_page)
+        return {'productos': productos, 'paginacion': paginacion}
     try:
-        productos = g.db.get_all_products()
-        return render_template('productos/index.html', productos=productos)
+        return pagina_condicional(('productos',), 'productos/index.html', 'productos/_tabla.html', datos)
     except Exception as e:
         flash(f'Error al obtener productos: {str(e)}', 'error')
-        return render_template('productos/index.html', productos=[])
+        tabla = render_template('productos/_tabla.html', productos=[], paginacion=None)
+        return render_template('productos/index.html', tabla=Markup(tabla))
+
+@productos_bp.route('/productos/importar', methods=['GET', 'POST'])
+def importar():
+    """
+    Importa un catálogo de productos desde un archivo CSV, JSON o NDJSON subido por formulario.
+    Los productos existentes se actualizan por nombre y las filas inválidas se listan.
+    """
+    resultado = None
+    if request.method == 'POST':
+        archivo = request.files.get('archivo')
+        if not archivo or not archivo.filename:
+            flash('Debes seleccionar un archivo.', 'error')
+            return render_template('productos/importar.html', resultado=None)
+        try:
+            formato = archivo.filename.rsplit('.', 1)[-1].lower()
+            resultado = ImportadorProductos(g.db).importar_flujo(archivo.stream, formato)
+            flash(f"{resultado['importadas']} productos importados de {resultado['procesadas']} filas.", 'success')
+        except Exception as e:
+            flash(f'Error al importar productos: {str(e)}', 'error')
+    return render_template('productos/importar.html', resultado=resultado)
+
+@productos_bp.route('/productos/reabastecimiento')
+def reabastecimiento():
+    """
+    Muestra los productos que llegaron a su punto de pedido y la cantidad sugerida
+    a reponer, según la demanda de los últimos días. Con 'todos=1' lista todo el catálogo.
+    """
+    def datos():
+        solo_reponer = not request.args.get('todos', type=int)
+        demanda = current_app.config['REABASTECIMIENTO']
+        return {'sugerencias': demanda.sugerencias(g.db, solo_reponer=solo_reponer)}
+    try:
+        # La demanda decae con cada día sin ventas: la página cambia también con la fecha
+        return pagina_condicional(('ventas', 'detalle_ventas', 'productos'), 'productos/reabastecimiento.html',
+                                  'productos/_reabastecimiento.html', datos, clave_extra=date.today().isoformat())
+    except Exception as e:
+        flash(f'Error al calcular el reabastecimiento: {str(e)}', 'error')
+        return redirect(url_for('productos.index'))
 
 @productos_bp.route('/productos/crear', methods=['GET', 'POST'])
 def crear():
@@ -135,8 +180,7 @@ def eliminar(id):
     """
     try:
         # Verificar si el producto está asociado a alguna venta
-        detalles = g.db.get_all_sale_details()
-        asociado = any(det['producto_id'] == id for det in detalles)
+        asociado = g.db.product_has_sales(id)
         if asociado:
             flash('No se puede eliminar este producto porque está asociado a una o más ventas. Si deseas eliminarlo, primero elimina las ventas asociadas.', 'warning')
         else:
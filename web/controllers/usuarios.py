@@ -6,6 +6,7 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from modelos.usuario import Usuario
 from database.postgres_database import PostgresDatabase
 from database.database_config import DatabaseConfig
+from web.controllers.comun import obtener_pagina
 
 usuarios_bp = Blueprint('usuarios', __name__)
 
@@ -21,14 +22,14 @@ def solo_admin():
 @usuarios_bp.route('/usuarios')
 def index():
     """
-    Muestra la lista de usuarios registrados en el sistema.
+    Muestra la lista paginada de usuarios registrados en el sistema.
     """
     try:
-        usuarios = g.db.get_all_users()
-        return render_template('usuarios/index.html', usuarios=usuarios)
+        usuarios, paginacion = obtener_pagina(g.db.get_users_page)
+        return render_template('usuarios/index.html', usuarios=usuarios, paginacion=paginacion)
     except Exception as e:
         flash(f'Error al obtener usuarios: {str(e)}', 'error')
-        return render_template('usuarios/index.html', usuarios=[])
+        return render_template('usuarios/index.html', usuarios=[], paginacion=None)
 
 @usuarios_bp.route('/usuarios/crear', methods=['GET', 'POST'])
 def crear():
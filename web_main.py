@@ -9,10 +9,11 @@ from database.postgres_database import PostgresDatabase
 from database.database_config import CURRENT_CONFIG
 
 def inicializar_base_datos():
-    """Inicializa la base de datos y crea las tablas necesarias."""
+    """Inicializa la base de datos, crea las tablas necesarias y devuelve la conexión al pool."""
     db = PostgresDatabase(CURRENT_CONFIG)
     db.connect()
     db.create_tables()
+    db.disconnect()
     return db
 
 if __name__ == '__main__':